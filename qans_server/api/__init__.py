@@ -2,12 +2,14 @@
 
 from fastapi import APIRouter
 
-from qans_server.api import chat, document, knowledge_base
+from qans_server.api import chat, document, knowledge_base, maintenance, retrieval
 
 api_router = APIRouter()
 api_router.include_router(knowledge_base.router)
 api_router.include_router(document.router)
 api_router.include_router(chat.router)
+api_router.include_router(retrieval.router)
+api_router.include_router(maintenance.router)
 
 
 __all__ = ["api_router"]
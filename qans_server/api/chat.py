@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import json
-from typing import Generator, List, Optional
+from typing import Generator, List, Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from fastapi.responses import StreamingResponse
@@ -15,6 +15,7 @@ from qans_server.api.dependencies import (
     get_db_session,
 )
 from qans_server.db.mysql.models.chat_message import ChatMessage
+from qans_server.api.retrieval import ChunkFilterRequest, parse_chunk_filter
 from qans_server.db.mysql.models.chat_session import ChatSession
 from qans_server.service.chat_service import ChatService
 
@@ -100,7 +101,8 @@ class ChatMessageRequest(BaseModel):
     top_k: int = Field(
         5,
         ge=1,
-        description="召回知识片段的数量上限，默认 5。",
+        le=100,
+        description="召回知识片段的数量上限，默认 5，最大 100。",
     )
     score_threshold: float = Field(
         0.7,
@@ -108,6 +110,19 @@ class ChatMessageRequest(BaseModel):
         le=1,
         description="相似度阈值，低于该阈值的片段将被过滤，默认 0.7。",
     )
+    quality: Optional[Literal["fast", "balanced", "accurate"]] = Field(
+        None,
+        description="检索质量档位：fast 延迟最低、accurate 召回率最高，未提供时使用系统默认档位。",
+    )
+    latency_budget_ms: Optional[int] = Field(
+        None,
+        ge=1,
+        description="检索延迟预算（毫秒），提供时按预算选择检索参数，优先于 quality。",
+    )
+    filters: Optional[ChunkFilterRequest] = Field(
+        None,
+        description="元数据过滤条件，只在指定的文档、文件类型、上传时间范围或元数据范围内召回。",
+    )
 
 
 @router.post(
@@ -281,7 +296,7 @@ def list_session_messages(
     summary="发送消息并流式获取回复",
     description="以流式 SSE 的形式返回模型回复，可用于前端实时展示生成内容。",
 )
-def stream_message(
+async def stream_message(
     payload: ChatMessageRequest,
     db: Session = Depends(get_db_session),
     service: ChatService = Depends(get_chat_service_dep),
@@ -292,12 +307,18 @@ def stream_message(
         db: 数据库会话依赖。
         service: 聊天服务依赖。
     """
-    generator, sources = service.stream_message(
+    filter_expr = parse_chunk_filter(payload.filters)
+
+    # 检索走异步 Milvus 客户端；回答生成器仍由 StreamingResponse 在线程池中迭代
+    generator, sources = await service.astream_message(
         db,
         session_id=payload.session_id,
         query=payload.query,
         knowledge_base_ids=payload.knowledge_base_ids,
         top_k=payload.top_k,
+        quality=payload.quality,
+        latency_budget_ms=payload.latency_budget_ms,
+        filter_expr=filter_expr,
     )
 
     def event_stream() -> Generator[str, None, None]:
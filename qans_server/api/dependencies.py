@@ -10,6 +10,9 @@ from qans_server.service.chat_service import ChatService
 from qans_server.service.document_service import DocumentService
 from qans_server.service.embedding_service import EmbeddingService
 from qans_server.service.knowledge_base_service import KnowledgeBaseService
+from qans_server.service.maintenance_service import MaintenanceService
+from qans_server.service.retrieval_service import RetrievalService
+from qans_server.service.snapshot_service import SnapshotService
 
 
 def get_db_session() -> Generator:
@@ -35,9 +38,29 @@ def _get_document_service() -> DocumentService:
     return DocumentService(settings=settings, embedding_service=_get_embedding_service())
 
 
+@lru_cache()
+def _get_retrieval_service() -> RetrievalService:
+    return RetrievalService(embedding_service=_get_embedding_service())
+
+
 @lru_cache()
 def _get_chat_service() -> ChatService:
-    return ChatService(embedding_service=_get_embedding_service())
+    retrieval_service = _get_retrieval_service()
+    return ChatService(
+        embedding_service=_get_embedding_service(),
+        vector_repo=retrieval_service.vector_repo,
+        retrieval_service=retrieval_service,
+    )
+
+
+@lru_cache()
+def _get_snapshot_service() -> SnapshotService:
+    return SnapshotService(settings=get_settings())
+
+
+@lru_cache()
+def _get_maintenance_service() -> MaintenanceService:
+    return MaintenanceService(vector_repo=_get_retrieval_service().vector_repo)
 
 
 def get_settings_dep() -> Settings:
@@ -56,3 +79,13 @@ def get_chat_service_dep() -> ChatService:
     return _get_chat_service()
 
 
+def get_retrieval_service_dep() -> RetrievalService:
+    return _get_retrieval_service()
+
+
+def get_snapshot_service_dep() -> SnapshotService:
+    return _get_snapshot_service()
+
+
+def get_maintenance_service_dep() -> MaintenanceService:
+    return _get_maintenance_service()
@@ -34,6 +34,7 @@ class DocumentOut(BaseModel):
     chunk_count: int
     status: str
     error_message: Optional[str]
+    import_progress: Optional[int]
     create_time: str
     update_time: str
 
@@ -49,6 +50,7 @@ class DocumentOut(BaseModel):
             chunk_count=doc.chunk_count,
             status=doc.status,
             error_message=doc.error_message,
+            import_progress=doc.import_progress,
             create_time=doc.create_time.isoformat(),
             update_time=doc.update_time.isoformat(),
         )
@@ -329,7 +331,7 @@ def delete_document_endpoint(
 @router.get(
     "/{document_id}/status",
     summary="查询文档处理状态",
-    description="返回指定文档的处理状态、切分数量及错误信息。",
+    description="返回指定文档的处理状态、切分数量、错误信息及批量导入进度。",
 )
 def get_document_status(
     document_id: int = Path(..., description="需要查询的文档 ID。"),
@@ -348,6 +350,7 @@ def get_document_status(
         "status": doc.status,
         "chunk_count": doc.chunk_count,
         "error_message": doc.error_message,
+        "import_progress": doc.import_progress,
     }
 
 
@@ -2,19 +2,28 @@
 
 from __future__ import annotations
 
+import tempfile
+from datetime import datetime
+from pathlib import Path as FilePath
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Path, Query, UploadFile
+from fastapi.responses import FileResponse
 from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 
 from qans_server.api.dependencies import (
     get_db_session,
     get_kb_service_dep,
+    get_settings_dep,
+    get_snapshot_service_dep,
 )
 from qans_server.db.mysql.models.knowledge_base import KnowledgeBase
 from qans_server.service.knowledge_base_service import KnowledgeBaseService
-from qans_server.util.file_util import delete_file
+from qans_server.service.snapshot_service import SnapshotError, SnapshotService
+from qans_server.setting_config import Settings
+from qans_server.util.file_util import delete_file, save_upload_file
 
 
 router = APIRouter(prefix="/knowledge-bases", tags=["知识库"])
@@ -228,3 +237,75 @@ def get_knowledge_base_stats(
     return service.get_statistics(session, kb_id)
 
 
+
+
+@router.get(
+    "/{kb_id}/export",
+    summary="导出知识库快照",
+    description="将知识库的文档、分块及向量数据导出为压缩的列式快照文件，可用于克隆与恢复。",
+)
+def export_knowledge_base(
+    kb_id: int = Path(..., description="需要导出的知识库 ID。"),
+    session: Session = Depends(get_db_session),
+    service: SnapshotService = Depends(get_snapshot_service_dep),
+    settings: Settings = Depends(get_settings_dep),
+):
+    """导出知识库快照文件（写入临时文件，响应发送完成后删除）。
+
+    参数:
+        kb_id: 目标知识库 ID。
+        session: 数据库会话依赖。
+        service: 快照服务依赖。
+        settings: 应用配置依赖。
+    """
+    outgoing_dir = settings.snapshot_dir / "outgoing"
+    outgoing_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=outgoing_dir, suffix=".qsnap", delete=False) as tmp:
+        snapshot_path = FilePath(tmp.name)
+    try:
+        service.export_knowledge_base(session, kb_id, target_path=snapshot_path)
+    except ValueError as exc:
+        delete_file(snapshot_path)
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except Exception:
+        delete_file(snapshot_path)
+        raise
+
+    return FileResponse(
+        path=snapshot_path,
+        filename=f"kb_{kb_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.qsnap",
+        media_type="application/octet-stream",
+        background=BackgroundTask(delete_file, snapshot_path),
+    )
+
+
+@router.post(
+    "/import",
+    response_model=KnowledgeBaseOut,
+    summary="从快照导入知识库",
+    description="上传知识库快照文件并恢复为一个新的知识库，向量直接批量写入，无需重新向量化。",
+)
+def import_knowledge_base(
+    file: UploadFile = File(..., description="知识库快照文件。"),
+    name: Optional[str] = Form(None, max_length=200, description="新知识库名称，未提供则沿用快照中的名称。"),
+    session: Session = Depends(get_db_session),
+    service: SnapshotService = Depends(get_snapshot_service_dep),
+    settings: Settings = Depends(get_settings_dep),
+):
+    """从快照文件恢复知识库。
+
+    参数:
+        file: 上传的快照文件。
+        name: 可选的新知识库名称。
+        session: 数据库会话依赖。
+        service: 快照服务依赖。
+        settings: 应用配置依赖。
+    """
+    snapshot_path = save_upload_file(settings.snapshot_dir / "incoming", file)
+    try:
+        kb = service.import_knowledge_base(session, snapshot_path, name=name)
+    except SnapshotError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    finally:
+        delete_file(snapshot_path)
+    return KnowledgeBaseOut.from_orm(kb)
@@ -0,0 +1,144 @@
+"""向量集合维护相关 API。"""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+
+from qans_server.api.dependencies import get_maintenance_service_dep
+from qans_server.db.vector.load_manager import get_load_manager
+from qans_server.service.maintenance_service import MaintenanceReport, MaintenanceService
+
+
+router = APIRouter(prefix="/maintenance", tags=["维护"])
+
+
+class SegmentHealthOut(BaseModel):
+    segment_count: int
+    small_segment_count: int
+    growing_segment_count: int
+    growing_rows: int
+    l0_segment_count: int
+    stored_rows: int
+    live_rows: int
+    deleted_ratio: float
+
+
+class MaintenanceReportOut(BaseModel):
+    checked_at: str
+    health: SegmentHealthOut
+    actions: List[str]
+    executed: List[str]
+    skipped_reason: Optional[str] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_report(cls, report: MaintenanceReport) -> "MaintenanceReportOut":  # pragma: no cover - simple mapping
+        return cls(
+            checked_at=report.checked_at.isoformat(),
+            health=SegmentHealthOut(**report.health.to_dict()),
+            actions=report.actions,
+            executed=report.executed,
+            skipped_reason=report.skipped_reason,
+            error=report.error,
+        )
+
+
+class LoadedPartitionOut(BaseModel):
+    partition_name: str
+    row_count: int
+    estimated_mb: float
+    idle_seconds: float
+
+
+class LatencyOut(BaseModel):
+    count: int
+    avg_ms: float
+    p95_ms: float
+    max_ms: float
+
+
+class PartitionLoadStatsOut(BaseModel):
+    loaded: List[LoadedPartitionOut]
+    estimated_mb: float
+    memory_budget_mb: float
+    idle_seconds: float
+    releases: int
+    evictions: int
+    load_latency: LatencyOut
+    cold_hit_latency: LatencyOut
+
+
+class MaintenanceStatusOut(BaseModel):
+    health: SegmentHealthOut
+    windows: List[str]
+    in_window: bool
+    planned_actions: List[str]
+    last_report: Optional[MaintenanceReportOut] = None
+
+
+@router.get(
+    "/health",
+    response_model=MaintenanceStatusOut,
+    summary="查询分块集合段健康度",
+    description="返回分块集合的段数量、已删除行比例、growing 段大小，以及维护时段与最近一次维护结果。",
+)
+def get_segment_health(
+    service: MaintenanceService = Depends(get_maintenance_service_dep),
+):
+    """查询分块集合的段健康度指标。
+
+    参数:
+        service: 维护服务依赖。
+    """
+    health = service.health()
+    last_report = service.last_report
+    return MaintenanceStatusOut(
+        health=SegmentHealthOut(**health.to_dict()),
+        windows=[str(window) for window in service.windows],
+        in_window=service.in_window(),
+        planned_actions=service.plan(health),
+        last_report=MaintenanceReportOut.from_report(last_report) if last_report else None,
+    )
+
+
+@router.post(
+    "/run",
+    response_model=MaintenanceReportOut,
+    summary="执行分块集合维护",
+    description="检查段健康度并按需执行 flush / compaction，默认只在维护时段内执行，force=true 时立即执行。",
+)
+def run_maintenance(
+    force: bool = Query(False, description="是否忽略维护时段立即执行。"),
+    service: MaintenanceService = Depends(get_maintenance_service_dep),
+):
+    """手动触发一次分块集合维护。
+
+    参数:
+        force: 是否忽略维护时段立即执行。
+        service: 维护服务依赖。
+    """
+    report = service.run(force=force)
+    if report.error:
+        raise HTTPException(status_code=500, detail=f"维护失败: {report.error}")
+    return MaintenanceReportOut.from_report(report)
+
+
+@router.get(
+    "/partitions",
+    response_model=PartitionLoadStatsOut,
+    summary="查询知识库分区加载状态",
+    description="返回本进程已加载的知识库分区（按最近使用排序）、估算内存与预算、释放 / 淘汰次数，"
+    "以及分区加载耗时与冷命中延迟统计。需启用 VECTOR_LOAD_MANAGEMENT 且 VECTOR_PARTITION_MODE=partition。",
+)
+def get_partition_load_stats():
+    """查询知识库分区的按需加载状态与延迟统计。"""
+    manager = get_load_manager()
+    if manager is None:
+        raise HTTPException(
+            status_code=400,
+            detail="未启用知识库分区按需加载（需 VECTOR_LOAD_MANAGEMENT=true 且 VECTOR_PARTITION_MODE=partition）",
+        )
+    return PartitionLoadStatsOut(**manager.stats())
@@ -0,0 +1,244 @@
+"""检索相关 API。"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Literal, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+
+from qans_server.api.dependencies import get_retrieval_service_dep
+from qans_server.db.vector.filters import FilterExpr, chunk_filter
+from qans_server.llm import get_rerank_client
+from qans_server.service.retrieval_service import RetrievalService
+from qans_server.setting_config import settings
+
+
+router = APIRouter(prefix="/retrieve", tags=["检索"])
+
+
+class ChunkFilterRequest(BaseModel):
+    doc_ids: Optional[List[int]] = Field(
+        None,
+        min_items=1,
+        description="只检索这些文档的片段。",
+    )
+    file_types: Optional[List[str]] = Field(
+        None,
+        min_items=1,
+        description="只检索这些文件类型（扩展名，如 pdf、md）的文档。",
+    )
+    uploaded_after: Optional[datetime] = Field(
+        None,
+        description="只检索在该时间（含）之后上传的文档。",
+    )
+    uploaded_before: Optional[datetime] = Field(
+        None,
+        description="只检索在该时间之前上传的文档。",
+    )
+    meta: Optional[Dict[str, Union[bool, int, float, str]]] = Field(
+        None,
+        description="分块元数据键值，逐个按相等过滤。",
+    )
+
+    def to_filter(self) -> FilterExpr:
+        """转换为向量库过滤条件，元数据键不合法或上传时间范围为空时抛出 ValueError。"""
+        return chunk_filter(
+            doc_ids=self.doc_ids,
+            file_types=self.file_types,
+            uploaded_after=self.uploaded_after,
+            uploaded_before=self.uploaded_before,
+            meta=self.meta,
+        )
+
+
+def parse_chunk_filter(filters: Optional[ChunkFilterRequest]) -> Optional[FilterExpr]:
+    """把请求中的过滤条件转换为向量库过滤条件，不合法时返回 400。"""
+    if filters is None:
+        return None
+    try:
+        return filters.to_filter()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"过滤条件不合法: {exc}") from exc
+
+
+class RetrieveRequest(BaseModel):
+    query: str = Field(..., description="检索问题。")
+    knowledge_base_ids: List[int] = Field(
+        ...,
+        min_items=1,
+        description="检索的知识库 ID 列表，至少包含一个知识库。",
+    )
+    top_k: int = Field(
+        5,
+        ge=1,
+        le=100,
+        description="召回知识片段的数量上限，默认 5，最大 100。",
+    )
+    quality: Optional[Literal["fast", "balanced", "accurate"]] = Field(
+        None,
+        description="检索质量档位：fast 延迟最低、accurate 召回率最高，未提供时使用系统默认档位。",
+    )
+    latency_budget_ms: Optional[int] = Field(
+        None,
+        ge=1,
+        description="检索延迟预算（毫秒），提供时按预算选择检索参数，优先于 quality。",
+    )
+    filters: Optional[ChunkFilterRequest] = Field(
+        None,
+        description="元数据过滤条件（文档、文件类型、上传时间、元数据键），在向量库中过滤后再召回。",
+    )
+
+
+class BatchRetrieveRequest(BaseModel):
+    queries: List[str] = Field(
+        ...,
+        min_items=1,
+        description="检索问题列表，单次最多 RETRIEVAL_BATCH_MAX_QUERIES 个。",
+    )
+    knowledge_base_ids: List[int] = Field(
+        ...,
+        min_items=1,
+        description="检索的知识库 ID 列表，对所有问题相同。",
+    )
+    top_k: int = Field(
+        5,
+        ge=1,
+        le=100,
+        description="每个问题召回知识片段的数量上限，默认 5，最大 100。",
+    )
+    quality: Optional[Literal["fast", "balanced", "accurate"]] = Field(
+        None,
+        description="检索质量档位，未提供时使用系统默认档位。",
+    )
+    latency_budget_ms: Optional[int] = Field(
+        None,
+        ge=1,
+        description="检索延迟预算（毫秒），优先于 quality。",
+    )
+    filters: Optional[ChunkFilterRequest] = Field(
+        None,
+        description="元数据过滤条件，对所有问题相同。",
+    )
+
+
+class RerankLatencyOut(BaseModel):
+    count: int
+    avg_ms: float
+    p95_ms: float
+    max_ms: float
+
+
+class RerankStatsOut(BaseModel):
+    model: str
+    breaker_state: Literal["closed", "open", "half_open"]
+    breaker_trips: int
+    failures: int
+    slow_calls: int
+    fallbacks: int
+    cache_size: int
+    cache_hits: int
+    cache_misses: int
+    latency: RerankLatencyOut
+
+
+class RetrievedChunk(BaseModel):
+    doc_id: Optional[int] = None
+    chunk_id: Optional[int] = None
+    knowledge_base_id: Optional[int] = None
+    text: str = ""
+    meta: dict = Field(default_factory=dict)
+    score: Optional[float] = Field(None, description="检索阶段的融合分数。")
+    chunk_ids: Optional[List[int]] = Field(None, description="相邻分块扩展（RETRIEVAL_CONTEXT_WINDOW）后片段包含的分块序号。")
+
+
+class BatchRetrieveResult(BaseModel):
+    query: str
+    chunks: List[RetrievedChunk]
+
+
+@router.post(
+    "",
+    response_model=List[RetrievedChunk],
+    summary="检索知识片段",
+    description="对指定知识库执行混合检索与重排，返回相关知识片段，可按质量档位或延迟预算调整检索力度，"
+    "并可按文档、文件类型、上传时间与元数据限定检索范围。",
+)
+async def retrieve(
+    payload: RetrieveRequest,
+    service: RetrievalService = Depends(get_retrieval_service_dep),
+):
+    """检索与问题相关的知识片段。
+
+    参数:
+        payload: 检索请求体，包含问题、知识库 ID 列表、检索力度参数及过滤条件。
+        service: 检索服务依赖。
+    """
+    filter_expr = parse_chunk_filter(payload.filters)
+    try:
+        chunks = await service.aretrieve(
+            payload.query,
+            payload.knowledge_base_ids,
+            top_k=payload.top_k,
+            quality=payload.quality,
+            latency_budget_ms=payload.latency_budget_ms,
+            filter_expr=filter_expr,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return [RetrievedChunk(**chunk) for chunk in chunks]
+
+
+@router.get(
+    "/rerank/stats",
+    response_model=RerankStatsOut,
+    summary="查询重排模型调用统计",
+    description="返回本进程重排模型的熔断状态、失败 / 慢调用 / 降级次数、结果缓存命中情况与请求延迟统计。",
+)
+def get_rerank_stats():
+    """查询重排模型客户端的调用统计。"""
+    client = get_rerank_client()
+    if client is None:
+        raise HTTPException(status_code=400, detail="未配置重排模型（LLM_RERANK_URL / LLM_RERANK_MODEL）")
+    return RerankStatsOut(**client.stats())
+
+
+@router.post(
+    "/batch",
+    response_model=List[BatchRetrieveResult],
+    summary="批量检索知识片段",
+    description="一次检索多个问题（离线评估、预缓存等场景）：问题批量向量化，每组知识库只发起一次多查询混合检索，"
+    "按请求顺序返回每个问题的知识片段与检索分数。",
+)
+def retrieve_batch(
+    payload: BatchRetrieveRequest,
+    service: RetrievalService = Depends(get_retrieval_service_dep),
+):
+    """批量检索与问题相关的知识片段。
+
+    参数:
+        payload: 批量检索请求体，包含问题列表、知识库 ID 列表、检索力度参数及过滤条件。
+        service: 检索服务依赖。
+    """
+    if len(payload.queries) > settings.retrieval_batch_max_queries:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次批量检索最多 {settings.retrieval_batch_max_queries} 个问题",
+        )
+    filter_expr = parse_chunk_filter(payload.filters)
+    try:
+        results = service.retrieve_batch(
+            payload.queries,
+            payload.knowledge_base_ids,
+            top_k=payload.top_k,
+            quality=payload.quality,
+            latency_budget_ms=payload.latency_budget_ms,
+            filter_expr=filter_expr,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return [
+        BatchRetrieveResult(query=query, chunks=[RetrievedChunk(**chunk) for chunk in chunks])
+        for query, chunks in zip(payload.queries, results)
+    ]
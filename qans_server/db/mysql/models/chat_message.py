@@ -139,3 +139,18 @@ def delete_chat_messages_by_session(session: Session, session_id: int) -> int:
     )
     return deleted_count
 
+
+
+def list_recent_user_queries(session: Session, limit: int = 1000) -> list[tuple[str, list[int]]]:
+    """获取最近的用户提问及其所在会话的知识库ID列表（用于检索调参的查询日志），按时间倒序"""
+    from .chat_session import ChatSession
+
+    rows = (
+        session.query(ChatMessage.content, ChatSession.knowledge_base_ids)
+        .join(ChatSession, ChatSession.id == ChatMessage.session_id)
+        .filter(ChatMessage.role == MESSAGE_ROLE_USER)
+        .order_by(ChatMessage.create_time.desc())
+        .limit(limit)
+        .all()
+    )
+    return [(content, kb_ids or []) for content, kb_ids in rows]
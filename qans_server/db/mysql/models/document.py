@@ -1,4 +1,6 @@
 from datetime import datetime
+from typing import Iterator, List, Optional
+
 from sqlalchemy import Integer, String, DateTime, ForeignKey, BigInteger, Index
 from sqlalchemy.orm import Mapped, mapped_column, Session, relationship
 from qans_server.db.mysql import Base
@@ -24,9 +26,15 @@ class Document(Base):
         String(20),
         nullable=False,
         default="uploaded",
-        comment="状态：uploaded/processing/chunked/completed/failed"
+        comment="状态：uploaded/processing/chunked/importing/completed/failed"
     )
     error_message: Mapped[str] = mapped_column(String(1000), nullable=True, comment="错误信息")
+    import_progress: Mapped[Optional[int]] = mapped_column(
+        Integer, nullable=True, comment="批量导入进度（0-100），仅 importing 状态下有值"
+    )
+    vectorize_version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, comment="向量化完成次数（跨 worker 判断向量化是否已由他人完成）"
+    )
     create_time: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, default=datetime.now, comment="创建时间"
     )
@@ -77,6 +85,8 @@ class Document(Base):
 DOCUMENT_STATUS_UPLOADED = "uploaded"
 DOCUMENT_STATUS_PROCESSING = "processing"
 DOCUMENT_STATUS_CHUNKED = "chunked"
+# 向量批量导入（Milvus bulk insert）进行中
+DOCUMENT_STATUS_IMPORTING = "importing"
 DOCUMENT_STATUS_COMPLETED = "completed"
 DOCUMENT_STATUS_FAILED = "failed"
 
@@ -133,13 +143,35 @@ def list_documents(
     )
 
 
+def iter_knowledge_base_documents(
+    session: Session,
+    knowledge_base_id: int,
+    batch_size: int = 1000,
+) -> Iterator[List[Document]]:
+    """按主键顺序分批遍历知识库的全部文档。"""
+    last_id = 0
+    while True:
+        batch = (
+            session.query(Document)
+            .filter(Document.knowledge_base_id == knowledge_base_id, Document.id > last_id)
+            .order_by(Document.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        yield batch
+        last_id = batch[-1].id
+
+
 def update_document_status(
     session: Session,
     doc_id: int,
     status: str,
-    error_message: str = None
+    error_message: str = None,
+    import_progress: Optional[int] = None,
 ) -> Document | None:
-    """更新文档处理状态"""
+    """更新文档处理状态；导入进度只在 importing 状态下保留，其他状态清除。"""
     doc = session.get(Document, doc_id)
     if not doc:
         return None
@@ -147,6 +179,21 @@ def update_document_status(
     doc.status = status
     if error_message is not None:
         doc.error_message = error_message
+    doc.import_progress = import_progress if status == DOCUMENT_STATUS_IMPORTING else None
+    doc.update_time = datetime.now()
+    session.flush()
+    return doc
+
+
+def mark_document_vectorized(session: Session, doc_id: int) -> Document | None:
+    """标记文档向量化完成，并递增向量化完成次数。"""
+    doc = session.get(Document, doc_id)
+    if not doc:
+        return None
+
+    doc.status = DOCUMENT_STATUS_COMPLETED
+    doc.import_progress = None
+    doc.vectorize_version = Document.vectorize_version + 1
     doc.update_time = datetime.now()
     session.flush()
     return doc
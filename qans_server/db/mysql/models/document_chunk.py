@@ -2,9 +2,9 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Iterable, List
+from typing import Iterable, Iterator, List, Tuple
 
-from sqlalchemy import DateTime, ForeignKey, Integer, Text
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, Row, Text, insert, select, tuple_
 from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 
 from qans_server.db.mysql import Base
@@ -20,7 +20,6 @@ class DocumentChunk(Base):
         Integer,
         ForeignKey("t_document.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
         comment="文档ID",
     )
     knowledge_base_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True, comment="知识库ID")
@@ -38,6 +37,11 @@ class DocumentChunk(Base):
 
     document = relationship("Document", back_populates="chunks")
 
+    # 按 (document_id, chunk_index) 批量查询分块（回填、相邻分块扩展）走该联合索引
+    __table_args__ = (
+        Index("idx_document_chunk", "document_id", "chunk_index"),
+    )
+
 
 @dataclass(slots=True)
 class DocumentChunkCreate:
@@ -82,3 +86,74 @@ def list_document_chunks(session: Session, document_id: int) -> list[DocumentChu
         .all()
     )
 
+
+
+def get_chunks_by_keys(
+    session: Session,
+    keys: Iterable[Tuple[int, int]],
+    *,
+    with_content: bool = True,
+    with_metadata: bool = True,
+    batch_size: int = 1000,
+) -> List[Row]:
+    """按 (document_id, chunk_index) 批量获取分块记录（只读列），可按需省略大字段。"""
+    key_list = list(keys)
+    columns = [DocumentChunk.document_id, DocumentChunk.chunk_index, DocumentChunk.knowledge_base_id]
+    if with_content:
+        columns.append(DocumentChunk.content)
+    if with_metadata:
+        columns.append(DocumentChunk.metadata_json)
+
+    rows: List[Row] = []
+    for start in range(0, len(key_list), batch_size):
+        batch = key_list[start:start + batch_size]
+        rows.extend(
+            session.execute(
+                select(*columns).where(tuple_(DocumentChunk.document_id, DocumentChunk.chunk_index).in_(batch))
+            ).all()
+        )
+    return rows
+
+
+def bulk_insert_document_chunks(
+    session: Session,
+    rows: List[dict],
+    batch_size: int = 5000,
+) -> int:
+    """批量写入分块记录（executemany），用于快照恢复等大批量导入场景。"""
+    if not rows:
+        return 0
+
+    for start in range(0, len(rows), batch_size):
+        session.execute(insert(DocumentChunk), rows[start:start + batch_size])
+    session.flush()
+    return len(rows)
+
+
+def iter_knowledge_base_chunks(
+    session: Session,
+    knowledge_base_id: int,
+    batch_size: int = 5000,
+) -> Iterator[List[Row]]:
+    """按主键顺序分批遍历知识库的全部分块记录（只读列，不进入 Session 标识映射）。"""
+    last_id = 0
+    while True:
+        batch = session.execute(
+            select(
+                DocumentChunk.id,
+                DocumentChunk.document_id,
+                DocumentChunk.chunk_index,
+                DocumentChunk.content,
+                DocumentChunk.metadata_json,
+            )
+            .where(
+                DocumentChunk.knowledge_base_id == knowledge_base_id,
+                DocumentChunk.id > last_id,
+            )
+            .order_by(DocumentChunk.id.asc())
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        yield batch
+        last_id = batch[-1].id
@@ -1,6 +1,63 @@
+import itertools
+from typing import List, Optional
 
-from pymilvus import MilvusClient
-from qans_server.setting_config import settings
+from pymilvus import AsyncMilvusClient, MilvusClient
+from qans_server.setting_config import VECTOR_BACKEND_MILVUS, settings
+from qans_server.util.loop_local import LoopLocal
 
-db_client = MilvusClient(settings.vector_url)
-db_client.use_database(settings.vector_db)
+# 本地向量后端（VECTOR_URL=local://...）不连接 Milvus
+db_client: Optional[MilvusClient] = None
+if settings.vector_backend == VECTOR_BACKEND_MILVUS:
+    db_client = MilvusClient(settings.vector_url)
+    db_client.use_database(settings.vector_db)
+
+
+class AsyncClientPool:
+    """异步 Milvus 客户端池。
+
+    每个客户端独占一条 gRPC 通道，按轮询分配给并发请求；gRPC aio 通道绑定事件循环，
+    因此每个事件循环各有一组客户端（见 ``LoopLocal``），旧事件循环的客户端在其结束后关闭。
+    """
+
+    def __init__(self, uri: str, db_name: str, size: int) -> None:
+        self.uri = uri
+        self.db_name = db_name
+        self.size = size
+        self._clients: LoopLocal[List[AsyncMilvusClient]] = LoopLocal(self._create_clients, self._close_clients)
+        self._counter = itertools.count()
+
+    def client(self) -> AsyncMilvusClient:
+        clients = self._clients.get()
+        return clients[next(self._counter) % self.size]
+
+    async def close(self) -> None:
+        await self._clients.aclose()
+
+    def _create_clients(self) -> List[AsyncMilvusClient]:
+        return [AsyncMilvusClient(self.uri, db_name=self.db_name, dedicated=True) for _ in range(self.size)]
+
+    @staticmethod
+    async def _close_clients(clients: List[AsyncMilvusClient]) -> None:
+        for client in clients:
+            await client.close()
+
+
+_async_pool: Optional[AsyncClientPool] = None
+
+
+def get_async_client() -> Optional[AsyncMilvusClient]:
+    """获取一个异步 Milvus 客户端；``VECTOR_ASYNC_CONNECTIONS=0`` 或使用本地向量后端时返回 None。"""
+
+    global _async_pool
+    if settings.vector_async_connections <= 0 or db_client is None:
+        return None
+    if _async_pool is None:
+        _async_pool = AsyncClientPool(settings.vector_url, settings.vector_db, settings.vector_async_connections)
+    return _async_pool.client()
+
+
+async def close_async_clients() -> None:
+    """关闭异步客户端池（应用退出时调用）。"""
+
+    if _async_pool is not None:
+        await _async_pool.close()
@@ -0,0 +1,325 @@
+"""向量批量导入（Milvus bulk insert）。
+
+逐批 ``insert`` 的行要经过 WAL 与 growing segment，BM25 函数与索引也随写入实时计算，
+百万级分块的知识库导入很慢。批量导入把行写成 Milvus bulk insert 格式的 Parquet 文件，
+上传到 Milvus 使用的对象存储（MinIO / S3），再提交导入任务：DataNode 直接生成 sealed segment，
+索引在导入完成后统一构建。
+
+Parquet 列与集合 schema 对应：稠密向量写为 float 列表（float16 / bfloat16 字段由 Milvus 转换），
+二值向量写为 uint8 列表，``meta`` 写为 JSON 字符串；``sparse_vector`` 由 BM25 函数在导入时生成，不写入。
+
+依赖 pyarrow 与 minio（可选依赖，只有启用批量导入时需要安装）。
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from qans_server.db.vector.vector_codec import binary_quantize, decode_vector
+from qans_server.setting_config import settings
+
+# 导入任务状态查询间隔（秒）
+_POLL_INTERVAL = 2.0
+# 对象存储中导入文件的前缀
+_REMOTE_PREFIX = "qans_bulk_import"
+
+# BulkInsertState.state 取值
+_STATE_FAILED = (1, 7)
+_STATE_COMPLETED = 6
+
+
+@dataclass
+class BulkImportProgress:
+    """批量导入进度。"""
+
+    total_rows: int
+    imported_rows: int = 0
+    percent: int = 0
+    done: bool = False
+
+
+ProgressCallback = Callable[[BulkImportProgress], None]
+
+
+def _require(module: str):
+    try:
+        return importlib.import_module(module)
+    except ImportError as exc:
+        raise RuntimeError(f"向量批量导入需要安装 {module}（pip install pyarrow minio）") from exc
+
+
+class ParquetChunkWriter:
+    """把分块行写成 Parquet 文件，每个文件不超过 ``file_rows`` 行。"""
+
+    def __init__(self, directory: Path, file_rows: int = 100_000, binary_index: bool = False) -> None:
+        self.directory = Path(directory)
+        self.file_rows = max(file_rows, 1)
+        self.binary_index = binary_index
+        self.files: List[Path] = []
+        self.row_count = 0
+        self._buffer: List[dict] = []
+
+    def add(self, rows: List[dict]) -> None:
+        self._buffer.extend(rows)
+        while len(self._buffer) >= self.file_rows:
+            self._write(self._buffer[:self.file_rows])
+            self._buffer = self._buffer[self.file_rows:]
+
+    def close(self) -> List[Path]:
+        if self._buffer:
+            self._write(self._buffer)
+            self._buffer = []
+        return self.files
+
+    def _write(self, rows: List[dict]) -> None:
+        pa = _require("pyarrow")
+        parquet = _require("pyarrow.parquet")
+
+        vectors = np.stack([decode_vector(row["vector"]) for row in rows])
+        columns = {
+            "id": pa.array([int(row["id"]) for row in rows], pa.int64()),
+            "vector": _list_array(pa, vectors.reshape(-1), vectors.shape[1], pa.float32()),
+            "doc_id": pa.array([int(row["doc_id"]) for row in rows], pa.int64()),
+            "chunk_id": pa.array([int(row["chunk_id"]) for row in rows], pa.int64()),
+            "knowledge_base_id": pa.array([int(row["knowledge_base_id"]) for row in rows], pa.int64()),
+            "text": pa.array([row.get("text") or "" for row in rows], pa.string()),
+            "meta": pa.array([json.dumps(row.get("meta") or {}, ensure_ascii=False) for row in rows], pa.string()),
+        }
+        if self.binary_index:
+            packed = np.stack([np.frombuffer(binary_quantize(vector), dtype=np.uint8) for vector in vectors])
+            columns["binary_vector"] = _list_array(pa, packed.reshape(-1), packed.shape[1], pa.uint8())
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"part_{len(self.files):05d}.parquet"
+        parquet.write_table(pa.table(columns), path)
+        self.files.append(path)
+        self.row_count += len(rows)
+
+
+def _list_array(pa, values: np.ndarray, width: int, value_type):
+    offsets = np.arange(0, len(values) + 1, width, dtype=np.int32)
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, value_type))
+
+
+class ObjectStorageUploader:
+    """把导入文件上传到 Milvus 使用的对象存储桶。"""
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket: str) -> None:
+        minio = _require("minio")
+        secure = endpoint.startswith("https://")
+        host = endpoint.split("://", 1)[-1].rstrip("/")
+        self.client = minio.Minio(host, access_key=access_key, secret_key=secret_key, secure=secure)
+        self.bucket = bucket
+
+    def upload(self, path: Path, object_name: str) -> str:
+        self.client.fput_object(self.bucket, object_name, str(path))
+        return object_name
+
+    def remove(self, object_names: List[str]) -> None:
+        for name in object_names:
+            try:
+                self.client.remove_object(self.bucket, name)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning(f"删除批量导入文件失败 {name}: {exc}")
+
+
+class BulkImporter:
+    """上传 Parquet 文件、提交 Milvus 导入任务并等待完成。"""
+
+    def __init__(
+        self,
+        db_client,
+        uploader: ObjectStorageUploader,
+        *,
+        poll_interval: float = _POLL_INTERVAL,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.db_client = db_client
+        self.uploader = uploader
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def import_files(
+        self,
+        collection_name: str,
+        files: List[Path],
+        total_rows: int,
+        partition_name: Optional[str] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> int:
+        """
+        导入一组 Parquet 文件（每个文件一个导入任务）。
+
+        Returns:
+            导入的行数
+
+        Raises:
+            RuntimeError: 导入任务失败或超时
+        """
+        if not files:
+            return 0
+
+        handler = self.db_client._get_connection()
+        batch = uuid.uuid4().hex
+        remote: List[str] = []
+        try:
+            for path in files:
+                remote.append(self.uploader.upload(path, f"{_REMOTE_PREFIX}/{batch}/{path.name}"))
+            task_ids = [
+                handler.do_bulk_insert(collection_name, partition_name or "", [name]) for name in remote
+            ]
+            logger.info(f"批量导入 {collection_name}/{partition_name or '-'}: 已提交 {len(task_ids)} 个任务，共 {total_rows} 行")
+            return self._wait(handler, task_ids, total_rows, on_progress)
+        finally:
+            self.uploader.remove(remote)
+
+    def _wait(
+        self,
+        handler,
+        task_ids: List[int],
+        total_rows: int,
+        on_progress: Optional[ProgressCallback],
+    ) -> int:
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        last_percent = -1
+        while True:
+            states = [handler.get_bulk_insert_state(task_id) for task_id in task_ids]
+            for state in states:
+                if state.state in _STATE_FAILED:
+                    raise RuntimeError(f"批量导入任务 {state.task_id} 失败: {state.failed_reason}")
+
+            done = all(state.state == _STATE_COMPLETED for state in states)
+            progress = BulkImportProgress(
+                total_rows=total_rows,
+                imported_rows=sum(state.row_count for state in states),
+                percent=100 if done else int(sum(state.progress for state in states) / len(states)),
+                done=done,
+            )
+            if on_progress is not None and (progress.percent != last_percent or done):
+                on_progress(progress)
+            last_percent = progress.percent
+            if done:
+                return progress.imported_rows
+            if deadline is not None and time.monotonic() > deadline:
+                raise RuntimeError(f"批量导入超时，任务: {task_ids}")
+            time.sleep(self.poll_interval)
+
+
+class BulkImportSession:
+    """
+    一次批量导入：分批 ``add`` 行（按分区分别落盘），``commit`` 时上传并导入。
+
+    作为上下文管理器使用时正常退出自动提交，异常退出只清理本地文件。
+    """
+
+    def __init__(
+        self,
+        importer: BulkImporter,
+        collection_name: str,
+        *,
+        work_dir: Path,
+        file_rows: int,
+        binary_index: bool = False,
+        partition_of: Optional[Callable[[dict], Optional[str]]] = None,
+        before_commit: Optional[Callable[[List[str]], None]] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> None:
+        self.importer = importer
+        self.collection_name = collection_name
+        self.work_dir = Path(work_dir) / uuid.uuid4().hex
+        self.file_rows = file_rows
+        self.binary_index = binary_index
+        self.partition_of = partition_of
+        self.before_commit = before_commit
+        self.on_progress = on_progress
+        self._writers: Dict[Optional[str], ParquetChunkWriter] = {}
+
+    @property
+    def row_count(self) -> int:
+        return sum(writer.row_count + len(writer._buffer) for writer in self._writers.values())
+
+    def add(self, rows: List[dict]) -> None:
+        groups: Dict[Optional[str], List[dict]] = {}
+        for row in rows:
+            partition = self.partition_of(row) if self.partition_of is not None else None
+            groups.setdefault(partition, []).append(row)
+        for partition, group in groups.items():
+            writer = self._writers.get(partition)
+            if writer is None:
+                directory = self.work_dir / (partition or "_default")
+                writer = ParquetChunkWriter(directory, self.file_rows, self.binary_index)
+                self._writers[partition] = writer
+            writer.add(group)
+
+    def commit(self) -> int:
+        """上传并导入全部文件，返回导入的行数。"""
+        try:
+            files = {partition: writer.close() for partition, writer in self._writers.items()}
+            total = sum(writer.row_count for writer in self._writers.values())
+            partitions = [partition for partition in files if partition is not None]
+            if partitions and self.before_commit is not None:
+                self.before_commit(partitions)
+
+            imported = 0
+            done_rows = 0
+            for partition, paths in files.items():
+                rows = self._writers[partition].row_count
+
+                def report(progress: BulkImportProgress, offset: int = done_rows) -> None:
+                    # 各分区依次导入，换算为整体进度
+                    if self.on_progress is not None:
+                        overall = offset + progress.imported_rows
+                        self.on_progress(BulkImportProgress(
+                            total_rows=total,
+                            imported_rows=overall,
+                            percent=int(100 * (offset + rows * progress.percent / 100) / max(total, 1)),
+                            done=progress.done and offset + rows >= total,
+                        ))
+
+                imported += self.importer.import_files(self.collection_name, paths, rows, partition, report)
+                done_rows += rows
+            return imported
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """删除本地临时文件。"""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def __enter__(self) -> "BulkImportSession":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.close()
+
+
+_uploader: Optional[ObjectStorageUploader] = None
+
+
+def get_bulk_importer(db_client) -> BulkImporter:
+    """按配置创建批量导入器（对象存储客户端进程内复用）。"""
+
+    global _uploader
+    if not settings.vector_bulk_minio_endpoint:
+        raise RuntimeError("向量批量导入需要配置 VECTOR_BULK_MINIO_ENDPOINT（Milvus 使用的对象存储）")
+    if _uploader is None:
+        _uploader = ObjectStorageUploader(
+            settings.vector_bulk_minio_endpoint,
+            settings.vector_bulk_minio_access_key,
+            settings.vector_bulk_minio_secret_key,
+            settings.vector_bulk_minio_bucket,
+        )
+    return BulkImporter(db_client, _uploader)
@@ -1,21 +1,270 @@
-from typing import List, Optional
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
 from langchain_core.documents import Document
-from pymilvus import AnnSearchRequest, Function, FunctionType
+from loguru import logger
+from pymilvus import AnnSearchRequest, Function, FunctionType, MilvusException
+
+from qans_server.db.vector.base import db_client, get_async_client
+from qans_server.db.vector.bulk_import import BulkImportSession, ProgressCallback, get_bulk_importer
+from qans_server.db.vector.filters import FilterExpr, knowledge_base_filter, pk_range_filter
+from qans_server.db.vector.fusion import rrf_fuse
+from qans_server.db.vector.index_profile import binary_index_profile, dense_index_profile, sparse_index_profile
+from qans_server.db.vector.load_manager import PartitionLoadManager, get_load_manager, is_not_loaded_error
+from qans_server.db.vector.maintenance import SegmentHealth, collect_segment_health, compact_collection
+from qans_server.db.vector.search_tuning import SearchEffort, resolve_search_effort, scale_search_params
+from qans_server.db.vector.schema import PARTITION_MODE_PER_KB, kb_partition_name
+from qans_server.db.vector.vector_codec import STORAGE_FLOAT32, binary_quantize, decode_vector, encode_vector
+from qans_server.db.vector.write_buffer import VectorWriteBuffer
+from qans_server.setting_config import VECTOR_BACKEND_LOCAL, settings
+from qans_server.util.vector_util import as_matrix
+
+COLLECTION_NAME = "t_doc_chunk"
+
+# 主键 = (doc_id << CHUNK_INDEX_BITS) | chunk_index，doc_id 可用 39 位，保证为正的 int64
+CHUNK_INDEX_BITS = 24
+_MAX_CHUNK_INDEX = (1 << CHUNK_INDEX_BITS) - 1
+_MAX_DOC_ID = (1 << (63 - CHUNK_INDEX_BITS)) - 1
+
+# 按主键点查 / 点删的单批数量，避免 in 表达式过长
+_PK_BATCH_SIZE = 1000
+# 检索结果默认返回的分块字段
+CHUNK_OUTPUT_FIELDS = ["doc_id", "chunk_id", "knowledge_base_id", "text", "meta"]
+
+_write_buffer: VectorWriteBuffer | None = None
+_write_buffer_lock = threading.Lock()
+
+
+def make_chunk_pk(doc_id: int, chunk_index: int) -> int:
+    """由文档ID与分块序号生成确定性的 int64 主键。"""
+
+    if not 0 <= doc_id <= _MAX_DOC_ID:
+        raise ValueError(f"文档ID超出主键可编码范围: {doc_id}")
+    if not 0 <= chunk_index <= _MAX_CHUNK_INDEX:
+        raise ValueError(f"分块序号超出主键可编码范围: {chunk_index}")
+    return (doc_id << CHUNK_INDEX_BITS) | chunk_index
+
+
+def split_chunk_pk(pk: int) -> Tuple[int, int]:
+    """将主键拆分为 (doc_id, chunk_index)。"""
+
+    return pk >> CHUNK_INDEX_BITS, pk & _MAX_CHUNK_INDEX
+
+
+def doc_pk_range(doc_id: int) -> Tuple[int, int]:
+    """文档全部分块主键所在的半开区间 [start, end)。"""
+
+    start = make_chunk_pk(doc_id, 0)
+    return start, start + (1 << CHUNK_INDEX_BITS)
+
+
+def _single(query_vector: np.ndarray) -> np.ndarray:
+    """单个查询向量 → 1×D 矩阵。"""
+    return np.reshape(query_vector, (1, -1))
+
+
+class _SearchPlan(NamedTuple):
+    """一次检索的过滤条件、分区与检索力度。"""
+
+    filter: FilterExpr
+    partition_names: Optional[List[str]]
+    effort: SearchEffort
+    top_k: int
+    candidate_limit: int
+
+
+_known_partitions: Dict[str, Set[str]] = {}
+_partition_lock = threading.Lock()
+
+
+def _per_kb_partitions() -> bool:
+    return settings.vector_partition_mode == PARTITION_MODE_PER_KB
+
+
+def _list_partitions(collection_name: str, refresh: bool = False) -> Set[str]:
+    # 调用方需持有 _partition_lock
+    known = _known_partitions.get(collection_name)
+    if known is None or refresh:
+        known = set(db_client.list_partitions(collection_name=collection_name))
+        _known_partitions[collection_name] = known
+    return known
+
+
+def _ensure_partitions(collection_name: str, partition_names: Iterable[str]) -> None:
+    """确保分区存在（每知识库分区布局下写入前调用）。"""
+
+    with _partition_lock:
+        known = _list_partitions(collection_name)
+        for name in partition_names:
+            if name in known:
+                continue
+            # 其他 worker 可能已创建
+            if not db_client.has_partition(collection_name=collection_name, partition_name=name):
+                db_client.create_partition(collection_name=collection_name, partition_name=name)
+            known.add(name)
+
+
+def _existing_partitions(collection_name: str, partition_names: List[str]) -> List[str]:
+    """过滤出已存在的分区，检索时指定不存在的分区会报错。"""
+
+    with _partition_lock:
+        known = _list_partitions(collection_name)
+        if any(name not in known for name in partition_names):
+            known = _list_partitions(collection_name, refresh=True)
+        return [name for name in partition_names if name in known]
+
+
+def _forget_partition(collection_name: str, partition_name: str) -> None:
+    with _partition_lock:
+        _known_partitions.get(collection_name, set()).discard(partition_name)
+
+
+def write_chunk_rows(
+    op: str,
+    rows: List[dict],
+    collection_name: str = COLLECTION_NAME,
+    partition_mode: Optional[str] = None,
+) -> None:
+    """
+    按当前分区布局写入一批行。
+
+    分区键布局下 Milvus 根据 knowledge_base_id 自动路由；每知识库分区布局下按知识库分组，
+    写入各自的分区（不存在时自动创建）。行中的 float32 向量按配置的存储精度编码，
+    启用二值首轮索引时同时生成 ``binary_vector``。
 
-from qans_server.db.vector.base import db_client
+    Args:
+        op: "insert" 或 "upsert"
+        rows: 行数据（vector 为 float32 数组或列表）
+        collection_name: 目标集合（迁移工具写入影子集合时指定）
+        partition_mode: 目标集合的分区布局，默认取配置
+    """
+    if not rows:
+        return
+
+    rows = _encode_rows(rows)
+    write = db_client.upsert if op == "upsert" else db_client.insert
+    if (partition_mode or settings.vector_partition_mode) != PARTITION_MODE_PER_KB:
+        write(collection_name=collection_name, data=rows)
+        return
+
+    groups: Dict[int, List[dict]] = {}
+    for row in rows:
+        groups.setdefault(int(row["knowledge_base_id"]), []).append(row)
+    _ensure_partitions(collection_name, [kb_partition_name(kb_id) for kb_id in groups])
+    for kb_id, group in groups.items():
+        write(collection_name=collection_name, data=group, partition_name=kb_partition_name(kb_id))
+
+
+def open_bulk_import(
+    collection_name: str = COLLECTION_NAME,
+    partition_mode: Optional[str] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> BulkImportSession:
+    """
+    打开一次批量导入（Parquet 文件 + Milvus bulk insert），用法::
+
+        with open_bulk_import() as job:
+            job.add(rows)
+
+    行格式与 ``write_chunk_rows`` 相同（vector 为 float32）；每知识库分区布局下按知识库写入各自的分区。
+    导入是追加写入，主键已存在时会产生重复行，调用方需先删除旧分块或写入空集合。
+
+    Args:
+        collection_name: 目标集合（迁移工具写入影子集合时指定）
+        partition_mode: 目标集合的分区布局，默认取配置
+        on_progress: 导入进度回调
+    """
+    per_kb = (partition_mode or settings.vector_partition_mode) == PARTITION_MODE_PER_KB
+    return BulkImportSession(
+        get_bulk_importer(db_client),
+        collection_name,
+        work_dir=settings.vector_bulk_dir,
+        file_rows=settings.vector_bulk_file_rows,
+        binary_index=settings.vector_binary_index,
+        partition_of=(lambda row: kb_partition_name(int(row["knowledge_base_id"]))) if per_kb else None,
+        before_commit=lambda names: _ensure_partitions(collection_name, names),
+        on_progress=on_progress,
+    )
+
+
+def _encode_rows(rows: List[dict]) -> List[dict]:
+    storage_type = settings.vector_storage_type
+    binary_index = settings.vector_binary_index
+    if storage_type == STORAGE_FLOAT32 and not binary_index:
+        return rows
+
+    encoded = []
+    for row in rows:
+        vector = decode_vector(row["vector"])
+        row = dict(row, vector=encode_vector(vector, storage_type))
+        if binary_index:
+            row["binary_vector"] = binary_quantize(vector)
+        encoded.append(row)
+    return encoded
+
+
+def get_write_buffer() -> VectorWriteBuffer | None:
+    """获取进程级的向量写缓冲，未启用时返回 None。"""
+
+    global _write_buffer
+    if not settings.vector_write_buffer_enabled:
+        return None
+
+    with _write_buffer_lock:
+        if _write_buffer is None:
+            _write_buffer = VectorWriteBuffer(
+                write_chunk_rows,
+                max_rows=settings.vector_write_buffer_max_rows,
+                max_bytes=settings.vector_write_buffer_max_bytes,
+                max_delay=settings.vector_write_buffer_max_delay_ms / 1000,
+            )
+            # 进程退出前写出缓冲中剩余的数据
+            atexit.register(_write_buffer.close)
+        return _write_buffer
+
+
+def rescore_enabled(storage_type: str, binary_index: bool) -> bool:
+    """
+    是否对首轮候选精确重算。
+
+    重算使用集合中存储的 ``vector`` 字段：float32 存储时是全精度重算；半精度（float16 / bfloat16）
+    存储时集合中没有全精度向量，在同一半精度向量的索引上重算几乎没有收益，因此不重算。
+    二值首轮索引例外：半精度向量远比二值码精确，仍用半精度向量重算。
+    """
+    if not settings.vector_rescore:
+        return False
+    if storage_type == STORAGE_FLOAT32 or binary_index:
+        return True
+    logger.warning(f"向量以 {storage_type} 存储，集合中没有全精度向量，VECTOR_RESCORE 不生效")
+    return False
 
 
 class VectorDocChunk:
     """向量文档分块操作类"""
 
-    def __init__(self):
+    def __init__(self, write_buffer: VectorWriteBuffer | None = None):
         self.db_client = db_client
-        self.collection_name = "t_doc_chunk"
+        self.collection_name = COLLECTION_NAME
+        self.write_buffer = write_buffer or get_write_buffer()
+        # 检索参数需与集合实际使用的索引类型一致（见 VECTOR_INDEX_TYPE 等配置）
+        self.dense_profile = dense_index_profile()
+        self.sparse_profile = sparse_index_profile()
+        # 向量存储精度与量化首轮检索 / 精确重算配置
+        self.storage_type = settings.vector_storage_type
+        self.binary_profile = binary_index_profile() if settings.vector_binary_index else None
+        self.rescore = rescore_enabled(self.storage_type, self.binary_profile is not None)
+        self.rescore_multiplier = max(settings.vector_rescore_multiplier, 1)
+        # 每知识库分区布局下按需加载 / 释放分区（VECTOR_LOAD_MANAGEMENT）
+        self.load_manager: PartitionLoadManager | None = get_load_manager()
 
     def insert_documents(
         self,
         documents: List[Document],
-        vectors: List[List[float]],
+        vectors: np.ndarray,
         doc_id: int,
         knowledge_base_id: int
     ) -> int:
@@ -24,26 +273,64 @@ class VectorDocChunk:
         
         Args:
             documents: 文档分块列表
-            vectors: 对应的向量列表
+            vectors: 对应的向量矩阵（N×D，float32）
             doc_id: 文档ID
             knowledge_base_id: 知识库ID
             
         Returns:
             插入的向量数量
         """
-        if not documents or not vectors:
-            return 0
+        return self.submit_documents(documents, vectors, doc_id, knowledge_base_id).result()
+
+    def submit_documents(
+        self,
+        documents: List[Document],
+        vectors: np.ndarray,
+        doc_id: int,
+        knowledge_base_id: int,
+        upsert: bool = False,
+    ) -> Future:
+        """
+        提交文档分块写入，返回在该文档的行全部写入 Milvus 后完成的 ``Future``。
+
+        启用写缓冲时，多个文档的行会被合并为一次批量写入；否则同步写入后返回已完成的 ``Future``。
+        调用方可通过 ``future.add_done_callback`` 注册写入完成（持久化）回调。
+
+        Args:
+            upsert: 为 True 时按主键覆盖已有分块（重新向量化场景）
+
+        Returns:
+            结果为写入行数的 ``Future``
+        """
+        rows = self._build_rows(documents, vectors, doc_id, knowledge_base_id)
+        op = "upsert" if upsert else "insert"
+        if self.write_buffer is not None:
+            return self.write_buffer.submit(rows, op=op)
+
+        future: Future = Future()
+        try:
+            future.set_result(self.upsert_rows(rows) if upsert else self.insert_rows(rows))
+        except Exception as exc:  # noqa: BLE001
+            future.set_exception(exc)
+        return future
+
+    def _build_rows(
+        self,
+        documents: List[Document],
+        vectors: np.ndarray,
+        doc_id: int,
+        knowledge_base_id: int
+    ) -> List[dict]:
+        if not documents or len(vectors) == 0:
+            return []
 
-        if len(documents) != len(vectors):
+        matrix = as_matrix(vectors)
+        if len(documents) != matrix.shape[0]:
             raise ValueError("documents和vectors的长度必须一致")
 
         rows = []
         for i, doc in enumerate(documents):
             meta = dict(doc.metadata or {})
-            embeddings = vectors[i]
-            
-            if len(embeddings) == 0:
-                continue
 
             # 生成字段
             chunk_id = meta.get("chunk_index", i)
@@ -51,7 +338,9 @@ class VectorDocChunk:
 
             rows.append(
                 {
-                    "vector": embeddings,
+                    "id": make_chunk_pk(doc_id, chunk_id),
+                    # 行视图，不复制、不转换为 Python float 列表
+                    "vector": matrix[i],
                     "doc_id": doc_id,
                     "chunk_id": chunk_id,
                     "knowledge_base_id": knowledge_base_id,
@@ -60,19 +349,207 @@ class VectorDocChunk:
                 }
             )
 
+        return rows
+
+    def insert_rows(self, rows: List[dict], batch_size: int = 2000) -> int:
+        """
+        按批次写入已组装好的行数据（用于快照恢复等批量导入场景）。
+
+        Args:
+            rows: 行数据列表，字段需与集合 schema 一致
+            batch_size: 每批写入的行数
+
+        Returns:
+            写入的行数
+        """
+        if not rows:
+            return 0
+
+        for start in range(0, len(rows), batch_size):
+            write_chunk_rows("insert", rows[start:start + batch_size], self.collection_name)
+        return len(rows)
+
+    def upsert_documents(
+        self,
+        documents: List[Document],
+        vectors: np.ndarray,
+        doc_id: int,
+        knowledge_base_id: int
+    ) -> int:
+        """
+        按确定性主键覆盖写入文档分块（重新向量化时使用，无需先删除再插入）。
+
+        Returns:
+            写入的向量数量
+        """
+        return self.submit_documents(documents, vectors, doc_id, knowledge_base_id, upsert=True).result()
+
+    def upsert_rows(self, rows: List[dict], batch_size: int = 2000) -> int:
+        """按批次 upsert 已组装好的行数据，行中需包含主键 ``id``。"""
         if not rows:
             return 0
 
-        # 插入数据（行式）
-        self.db_client.insert(collection_name=self.collection_name, data=rows)
+        for start in range(0, len(rows), batch_size):
+            write_chunk_rows("upsert", rows[start:start + batch_size], self.collection_name)
         return len(rows)
 
+    def use_bulk_import(self, row_count: int) -> bool:
+        """写入行数达到 ``VECTOR_BULK_THRESHOLD`` 时改用批量导入。"""
+        threshold = settings.vector_bulk_threshold
+        return threshold > 0 and row_count >= threshold
+
+    def bulk_import(self, on_progress: Optional[ProgressCallback] = None) -> BulkImportSession:
+        """打开一次写入当前集合的批量导入，见 ``open_bulk_import``。"""
+        self._flush_write_buffer()
+        return open_bulk_import(self.collection_name, on_progress=on_progress)
+
+    def bulk_insert_documents(
+        self,
+        documents: List[Document],
+        vectors: np.ndarray,
+        doc_id: int,
+        knowledge_base_id: int,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> int:
+        """
+        通过批量导入写入文档分块（大文档使用），导入完成后返回。
+
+        导入是追加写入，重新向量化时需先删除文档已有的分块。
+
+        Returns:
+            导入的向量数量
+        """
+        rows = self._build_rows(documents, vectors, doc_id, knowledge_base_id)
+        if not rows:
+            return 0
+        with self.bulk_import(on_progress) as job:
+            job.add(rows)
+        return len(rows)
+
+    def get_chunks(
+        self,
+        pks: Iterable[int],
+        output_fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """
+        按主键批量获取分块。
+
+        Args:
+            pks: 主键列表（见 ``make_chunk_pk``）
+            output_fields: 需要返回的字段，默认返回标量字段与文本
+
+        Returns:
+            分块行数据列表（不存在的主键会被忽略）
+        """
+        pk_list = list(pks)
+        if not pk_list:
+            return []
+
+        fields = output_fields or CHUNK_OUTPUT_FIELDS
+        results: List[dict] = []
+        for start in range(0, len(pk_list), _PK_BATCH_SIZE):
+            results.extend(
+                self.db_client.get(
+                    collection_name=self.collection_name,
+                    ids=pk_list[start:start + _PK_BATCH_SIZE],
+                    output_fields=fields,
+                )
+            )
+        return results
+
+    async def aget_chunks(
+        self,
+        pks: Iterable[int],
+        output_fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """``get_chunks`` 的异步版本，各批次并发请求。"""
+        client = get_async_client()
+        if client is None:
+            return await asyncio.to_thread(self.get_chunks, list(pks), output_fields)
+
+        pk_list = list(pks)
+        if not pk_list:
+            return []
+
+        fields = output_fields or CHUNK_OUTPUT_FIELDS
+        batches = await asyncio.gather(*(
+            client.get(
+                collection_name=self.collection_name,
+                ids=pk_list[start:start + _PK_BATCH_SIZE],
+                output_fields=fields,
+            )
+            for start in range(0, len(pk_list), _PK_BATCH_SIZE)
+        ))
+        return [row for batch in batches for row in batch]
+
+    def get_chunk(self, doc_id: int, chunk_index: int) -> Optional[dict]:
+        """按文档ID与分块序号获取单个分块。"""
+        rows = self.get_chunks([make_chunk_pk(doc_id, chunk_index)])
+        return rows[0] if rows else None
+
+    def list_chunk_pks_by_doc_id(self, doc_id: int, knowledge_base_id: Optional[int] = None) -> List[int]:
+        """
+        列出文档当前在向量库中的全部分块主键。
+
+        使用主键区间过滤，Milvus 可依据各 segment 的主键统计直接跳过无关 segment。
+
+        Args:
+            doc_id: 文档ID
+            knowledge_base_id: 文档所属知识库ID；按知识库分区时只查询该分区，并确保分区已加载
+        """
+        self._flush_write_buffer()
+        partition_names = (
+            self._readable_partitions([knowledge_base_id]) if knowledge_base_id is not None else None
+        )
+        if partition_names == []:
+            # 知识库分区尚未创建，文档不可能有分块
+            return []
+        try:
+            return self._query_doc_pks(doc_id, partition_names)
+        except MilvusException as exc:
+            if not self._reload_released(partition_names, exc):
+                raise
+            return self._query_doc_pks(doc_id, partition_names)
+
+    def _query_doc_pks(self, doc_id: int, partition_names: Optional[List[str]]) -> List[int]:
+        start, end = doc_pk_range(doc_id)
+        pks: List[int] = []
+        for batch in self._iter_query(pk_range_filter(start, end), ["id"], partition_names=partition_names):
+            pks.extend(row["id"] for row in batch)
+        return pks
+
+    def delete_chunks(self, pks: Iterable[int]) -> int:
+        """
+        按主键点删分块。
+
+        Returns:
+            删除的向量数量
+        """
+        pk_list = list(pks)
+        if not pk_list:
+            return 0
+
+        self._flush_write_buffer()
+        deleted = 0
+        for start in range(0, len(pk_list), _PK_BATCH_SIZE):
+            result = self.db_client.delete(
+                collection_name=self.collection_name,
+                ids=pk_list[start:start + _PK_BATCH_SIZE],
+            )
+            deleted += result.get("delete_count", 0) if isinstance(result, dict) else 0
+        return deleted
+
     def search_similar_chunks(
         self,
         query: str,
-        query_vector: List[float],
+        query_vector: np.ndarray,
         knowledge_base_ids: List[int],
         top_k: int = 5,
+        *,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        output_fields: Optional[List[str]] = None,
+        filter_expr: Optional[FilterExpr] = None,
     ) -> List[dict]:
         """
         混合检索。
@@ -81,6 +558,11 @@ class VectorDocChunk:
             query_vector: 查询向量
             knowledge_base_ids: 知识库ID列表（用于过滤）
             top_k: 返回Top-K*2结果
+            quality: 质量档位（fast / balanced / accurate），决定 ef / nprobe 与候选数量
+            latency_budget_ms: 延迟预算（毫秒），优先于质量档位
+            output_fields: 返回的字段，默认见 ``CHUNK_OUTPUT_FIELDS``；传入空列表时只返回
+                主键与融合分数（``{"id", "score"}``），文本与元数据由调用方按需回填
+            filter_expr: 附加过滤条件，与知识库条件按 and 组合
 
         Returns:
             检索结果列表，每个结果包含：
@@ -90,38 +572,223 @@ class VectorDocChunk:
             - text: 文本内容
             - meta: 元数据
         """
-        if not query_vector:
+        plan = self._plan_search(query_vector, knowledge_base_ids, top_k, quality, latency_budget_ms, filter_expr)
+        if plan is None:
+            return []
+
+        self._ensure_loaded(plan.partition_names)
+        try:
+            return self._execute_search(query, query_vector, plan, output_fields)
+        except MilvusException as exc:
+            if not self._reload_released(plan.partition_names, exc):
+                raise
+            return self._execute_search(query, query_vector, plan, output_fields)
+
+    def _execute_search(
+        self,
+        query: str,
+        query_vector: np.ndarray,
+        plan: _SearchPlan,
+        output_fields: Optional[List[str]],
+    ) -> List[dict]:
+        # 量化首轮检索 / 全精度重算时稠密结果需要在客户端处理，改为分路检索后本地融合
+        if self._two_stage:
+            return self._search_two_stage(query, query_vector, plan, output_fields)
+
+        results = self.db_client.hybrid_search(
+            **self._hybrid_search_kwargs([query], _single(query_vector), plan, output_fields)
+        )
+        return self._hybrid_hits(results, output_fields)
+
+    async def asearch_similar_chunks(
+        self,
+        query: str,
+        query_vector: np.ndarray,
+        knowledge_base_ids: List[int],
+        top_k: int = 5,
+        *,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        output_fields: Optional[List[str]] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[dict]:
+        """``search_similar_chunks`` 的异步版本，等待 Milvus 返回期间不占用线程池线程。"""
+        client = get_async_client()
+        if client is None:
+            return await asyncio.to_thread(
+                self.search_similar_chunks,
+                query,
+                query_vector,
+                knowledge_base_ids,
+                top_k,
+                quality=quality,
+                latency_budget_ms=latency_budget_ms,
+                output_fields=output_fields,
+                filter_expr=filter_expr,
+            )
+
+        plan = self._plan_search(query_vector, knowledge_base_ids, top_k, quality, latency_budget_ms, filter_expr)
+        if plan is None:
             return []
+
+        if self.load_manager is not None and plan.partition_names and not self.load_manager.touch(plan.partition_names):
+            # 冷分区加载是阻塞调用，放到线程池执行
+            await asyncio.to_thread(self.load_manager.ensure_loaded, plan.partition_names)
+        try:
+            return await self._aexecute_search(client, query, query_vector, plan, output_fields)
+        except MilvusException as exc:
+            if not await asyncio.to_thread(self._reload_released, plan.partition_names, exc):
+                raise
+            return await self._aexecute_search(client, query, query_vector, plan, output_fields)
+
+    async def _aexecute_search(
+        self,
+        client,
+        query: str,
+        query_vector: np.ndarray,
+        plan: _SearchPlan,
+        output_fields: Optional[List[str]],
+    ) -> List[dict]:
+        if self._two_stage:
+            return await self._asearch_two_stage(client, query, query_vector, plan, output_fields)
+
+        results = await client.hybrid_search(
+            **self._hybrid_search_kwargs([query], _single(query_vector), plan, output_fields)
+        )
+        return self._hybrid_hits(results, output_fields)
+
+    def search_many(
+        self,
+        queries: List[str],
+        query_vectors: np.ndarray,
+        knowledge_base_ids: List[int],
+        top_k: int = 5,
+        *,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        output_fields: Optional[List[str]] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[List[dict]]:
+        """
+        批量混合检索：全部查询在同一次检索请求中执行（nq = 查询数），往返次数不随查询数增长。
+
+        Args:
+            queries: 问题列表
+            query_vectors: 查询向量矩阵（与 ``queries`` 一一对应）
+            其余参数同 ``search_similar_chunks``，对每个查询相同
+
+        Returns:
+            每个查询的命中列表（各 ``top_k * 2`` 个），每个命中带检索阶段的融合分数 ``score``
+        """
+        matrix = as_matrix(query_vectors)
+        if len(queries) != len(matrix):
+            raise ValueError(f"问题数量 {len(queries)} 与查询向量数量 {len(matrix)} 不一致")
+        if not queries:
+            return []
+
+        plan = self._plan_search(matrix[0], knowledge_base_ids, top_k, quality, latency_budget_ms, filter_expr)
+        if plan is None:
+            return [[] for _ in queries]
+
+        self._ensure_loaded(plan.partition_names)
+        try:
+            return self._execute_search_many(queries, matrix, plan, output_fields)
+        except MilvusException as exc:
+            if not self._reload_released(plan.partition_names, exc):
+                raise
+            return self._execute_search_many(queries, matrix, plan, output_fields)
+
+    def _execute_search_many(
+        self,
+        queries: List[str],
+        query_vectors: np.ndarray,
+        plan: _SearchPlan,
+        output_fields: Optional[List[str]],
+    ) -> List[List[dict]]:
+        if self._two_stage:
+            fused_lists = self._two_stage_fused(queries, query_vectors, plan)
+            if output_fields is not None and not output_fields:
+                return [[{"id": pk, "score": score} for pk, score in fused] for fused in fused_lists]
+            # 所有查询的命中行一次取回
+            pks = {pk for fused in fused_lists for pk, _ in fused}
+            rows = {row["id"]: row for row in self.get_chunks(pks, output_fields)}
+            return [
+                [dict(rows[pk], id=pk, score=score) for pk, score in fused if pk in rows]
+                for fused in fused_lists
+            ]
+
+        results = self.db_client.hybrid_search(
+            **self._hybrid_search_kwargs(queries, query_vectors, plan, output_fields)
+        )
+        return [
+            [dict(hit.fields, id=hit["id"], score=hit["distance"]) for hit in hits]
+            for hits in results
+        ]
+
+    @property
+    def _two_stage(self) -> bool:
+        return self.binary_profile is not None or self.rescore
+
+    def _plan_search(
+        self,
+        query_vector: np.ndarray,
+        knowledge_base_ids: List[int],
+        top_k: int,
+        quality: Optional[str],
+        latency_budget_ms: Optional[int],
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> Optional[_SearchPlan]:
+        if query_vector is None or len(query_vector) == 0:
+            return None
         
         if not knowledge_base_ids:
-            return []
+            return None
 
-        # 构建过滤表达式：knowledge_base_id in [1,2,3]
-        # MilvusClient使用in表达式格式
-        if len(knowledge_base_ids) == 1:
-            expr = f"knowledge_base_id == {knowledge_base_ids[0]}"
-        else:
-            kb_ids_str = ",".join(str(kb_id) for kb_id in knowledge_base_ids)
-            expr = f"knowledge_base_id in [{kb_ids_str}]"
+        # 模板参数化的过滤条件：不同知识库组合共用同一个表达式模板
+        search_filter = knowledge_base_filter(knowledge_base_ids) & filter_expr
+
+        # 每知识库分区布局下直接指定分区，只检索所选知识库
+        partition_names = self._partitions_for(knowledge_base_ids)
+        if partition_names is not None and not partition_names:
+            return None
 
-        """ milvus 混合检索 """
+        # 按质量档位 / 延迟预算（或自动调参结果）确定检索参数
+        effort = resolve_search_effort(
+            self.dense_profile,
+            self.sparse_profile,
+            top_k,
+            knowledge_base_ids,
+            quality=quality,
+            latency_budget_ms=latency_budget_ms,
+        )
+        return _SearchPlan(search_filter, partition_names, effort, top_k, top_k * effort.candidate_multiplier)
+
+    def _hybrid_search_kwargs(
+        self,
+        queries: List[str],
+        query_vectors: np.ndarray,
+        plan: _SearchPlan,
+        output_fields: Optional[List[str]],
+    ) -> dict:
+        """ milvus 混合检索（每个查询一行，nq = 查询数） """
+        top_k = plan.top_k
         # text semantic search (dense)
         search_param_1 = {
-            "data": [query_vector],
+            "data": [encode_vector(vector, self.storage_type) for vector in query_vectors],
             "anns_field": "vector",
-            "param": {"nprobe": 32},
-            "limit": top_k,
-            "expr": expr
+            "param": dict(plan.effort.dense_params),
+            "limit": plan.candidate_limit,
+            **plan.filter.ann_kwargs(),
         }
         request_1 = AnnSearchRequest(**search_param_1)
 
         # full-text search (sparse)
         search_param_2 = {
-            "data": [query],
+            "data": list(queries),
             "anns_field": "sparse_vector",
-            "param": {"drop_ratio_search": 0.2},
-            "limit": top_k,
-            "expr": expr
+            "param": dict(plan.effort.sparse_params),
+            "limit": plan.candidate_limit,
+            **plan.filter.ann_kwargs(),
         }
         request_2 = AnnSearchRequest(**search_param_2)
 
@@ -137,33 +804,216 @@ class VectorDocChunk:
             }
         )
 
-        results = self.db_client.hybrid_search(
+        # 过滤条件随各路 AnnSearchRequest 下发，hybrid_search 本身不接受过滤参数
+        return dict(
             collection_name=self.collection_name,
             reqs=reqs,
             ranker=ranker,
-            filter=expr,
             limit=top_k*2,
-            output_fields=["doc_id", "chunk_id", "knowledge_base_id", "text", "meta"]
+            output_fields=CHUNK_OUTPUT_FIELDS if output_fields is None else output_fields,
+            partition_names=plan.partition_names,
         )
+
+    @staticmethod
+    def _hybrid_hits(results, output_fields: Optional[List[str]]) -> List[dict]:
+        if output_fields is not None and not output_fields:
+            return [{"id": hit["id"], "score": hit["distance"]} for hits in results for hit in hits]
         return [hit.fields for hits in results for hit in hits]
 
+    def _first_pass_kwargs(self, query_vectors: np.ndarray, plan: _SearchPlan) -> dict:
+        first_limit = plan.candidate_limit * self.rescore_multiplier if self.rescore else plan.candidate_limit
+        if self.binary_profile is not None:
+            data = [binary_quantize(vector) for vector in query_vectors]
+            anns_field, profile, params = "binary_vector", self.binary_profile, self.binary_profile.search_params
+        else:
+            data = [encode_vector(vector, self.storage_type) for vector in query_vectors]
+            anns_field, profile, params = "vector", self.dense_profile, plan.effort.dense_params
+        # 重算时首轮候选数量是最终候选的若干倍，ef / search_list 需不小于实际的 limit
+        params = scale_search_params(params, 1.0, first_limit)
+
+        return dict(
+            collection_name=self.collection_name,
+            data=data,
+            anns_field=anns_field,
+            **plan.filter.search_kwargs(),
+            limit=first_limit,
+            search_params={"metric_type": profile.metric_type, "params": params},
+            output_fields=[],
+            partition_names=plan.partition_names,
+        )
+
+    def _sparse_search_kwargs(self, queries: List[str], plan: _SearchPlan) -> dict:
+        return dict(
+            collection_name=self.collection_name,
+            data=list(queries),
+            anns_field="sparse_vector",
+            **plan.filter.search_kwargs(),
+            limit=plan.candidate_limit,
+            search_params={"metric_type": self.sparse_profile.metric_type, "params": dict(plan.effort.sparse_params)},
+            output_fields=[],
+            partition_names=plan.partition_names,
+        )
+
+    def _search_two_stage(
+        self,
+        query: str,
+        query_vector: np.ndarray,
+        plan: _SearchPlan,
+        output_fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """量化首轮检索 → 全精度向量重算 → 与全文检索结果做 RRF 融合。"""
+
+        fused = self._two_stage_fused([query], _single(query_vector), plan)[0]
+        if output_fields is not None and not output_fields:
+            return [{"id": pk, "score": score} for pk, score in fused]
+        rows = {row["id"]: row for row in self.get_chunks((pk for pk, _ in fused), output_fields)}
+        return [rows[pk] for pk, _ in fused if pk in rows]
+
+    def _two_stage_fused(
+        self,
+        queries: List[str],
+        query_vectors: np.ndarray,
+        plan: _SearchPlan,
+    ) -> List[List[Tuple[int, float]]]:
+        """两阶段检索的融合结果（每个查询一组 (主键, 分数)），各路检索均一次请求全部查询。"""
+
+        dense_results = self.db_client.search(**self._first_pass_kwargs(query_vectors, plan))
+        dense_rankings = [[hit["id"] for hit in hits] for hits in dense_results]
+        if self.rescore:
+            # 所有查询的候选向量一次取回
+            vectors = self.get_vectors({pk for pks in dense_rankings for pk in pks})
+            dense_rankings = [
+                self._rank_candidates(vector, pks, vectors, plan.candidate_limit)
+                for vector, pks in zip(query_vectors, dense_rankings)
+            ]
+
+        sparse_results = self.db_client.search(**self._sparse_search_kwargs(queries, plan))
+        sparse_rankings = [[hit["id"] for hit in hits] for hits in sparse_results]
+
+        return [
+            rrf_fuse([dense_pks, sparse_pks], k=plan.top_k * 2, limit=plan.top_k * 2)
+            for dense_pks, sparse_pks in zip(dense_rankings, sparse_rankings)
+        ]
 
-    def delete_documents_by_doc_id(self, doc_id: int) -> int:
+    async def _asearch_two_stage(
+        self,
+        client,
+        query: str,
+        query_vector: np.ndarray,
+        plan: _SearchPlan,
+        output_fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        # 稠密首轮检索与全文检索并发执行
+        dense_results, sparse_results = await asyncio.gather(
+            client.search(**self._first_pass_kwargs(_single(query_vector), plan)),
+            client.search(**self._sparse_search_kwargs([query], plan)),
+        )
+        dense_pks = [hit["id"] for hits in dense_results for hit in hits]
+        if self.rescore:
+            rows = await self.aget_chunks(dense_pks, ["vector"])
+            vectors = {row["id"]: decode_vector(row["vector"], self.storage_type) for row in rows}
+            dense_pks = self._rank_candidates(query_vector, dense_pks, vectors, plan.candidate_limit)
+        sparse_pks = [hit["id"] for hits in sparse_results for hit in hits]
+
+        fused = rrf_fuse([dense_pks, sparse_pks], k=plan.top_k * 2, limit=plan.top_k * 2)
+        if output_fields is not None and not output_fields:
+            return [{"id": pk, "score": score} for pk, score in fused]
+        rows = {row["id"]: row for row in await self.aget_chunks([pk for pk, _ in fused], output_fields)}
+        return [rows[pk] for pk, _ in fused if pk in rows]
+
+    def get_vectors(self, pks: Iterable[int]) -> Dict[int, np.ndarray]:
+        """按主键获取向量（解码为 float32；半精度存储时精度仍为存储精度）。"""
+        return {
+            row["id"]: decode_vector(row["vector"], self.storage_type)
+            for row in self.get_chunks(pks, ["vector"])
+        }
+
+    def rescore_candidates(self, query_vector: np.ndarray, pks: List[int], limit: int) -> List[int]:
+        """
+        用存储的原始向量对候选重新精确打分，返回得分最高的 ``limit`` 个主键。
+
+        Args:
+            query_vector: 查询向量
+            pks: 首轮检索得到的候选主键
+            limit: 保留数量
+        """
+        return self._rank_candidates(query_vector, pks, self.get_vectors(pks), limit)
+
+    def _rank_candidates(
+        self,
+        query_vector: np.ndarray,
+        pks: List[int],
+        vectors: Dict[int, np.ndarray],
+        limit: int,
+    ) -> List[int]:
+        if not vectors:
+            return []
+
+        ids = [pk for pk in pks if pk in vectors]
+        matrix = np.stack([vectors[pk] for pk in ids])
+        query = np.asarray(query_vector, dtype=matrix.dtype)
+        metric_type = self.dense_profile.metric_type.upper()
+        if metric_type == "L2":
+            scores = -np.sum((matrix - query) ** 2, axis=1)
+        else:
+            scores = matrix @ query
+            if metric_type == "COSINE":
+                norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+                scores = scores / np.maximum(norms, 1e-12)
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [ids[i] for i in order]
+
+    def search_dense(
+        self,
+        query_vectors: np.ndarray,
+        knowledge_base_ids: List[int],
+        limit: int,
+        search_params: Optional[dict] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[List[int]]:
+        """
+        仅稠密向量检索，返回每个查询命中的主键列表（用于调参与召回率评估）。
+
+        Args:
+            query_vectors: 查询向量矩阵（Q×D）
+            knowledge_base_ids: 知识库ID列表
+            limit: 每个查询返回的数量
+            search_params: 索引检索参数，默认使用索引配置档的参数
+            filter_expr: 附加过滤条件
+        """
+        partition_names = self._readable_partitions(knowledge_base_ids)
+        if partition_names is not None and not partition_names:
+            return [[] for _ in range(len(query_vectors))]
+
+        results = self.db_client.search(
+            collection_name=self.collection_name,
+            data=[encode_vector(vector, self.storage_type) for vector in as_matrix(query_vectors)],
+            anns_field="vector",
+            **(knowledge_base_filter(knowledge_base_ids) & filter_expr).search_kwargs(),
+            limit=limit,
+            search_params={
+                "metric_type": self.dense_profile.metric_type,
+                "params": dict(self.dense_profile.search_params if search_params is None else search_params),
+            },
+            output_fields=[],
+            partition_names=partition_names,
+        )
+        return [[hit["id"] for hit in hits] for hits in results]
+
+    def delete_documents_by_doc_id(self, doc_id: int, knowledge_base_id: Optional[int] = None) -> int:
         """
         删除指定文档的所有向量数据。
         
         Args:
             doc_id: 文档ID
+            knowledge_base_id: 文档所属知识库ID，用于定位并加载分区
             
         Returns:
             删除的向量数量
         """
-        expr = f"doc_id == {doc_id}"
-        result = self.db_client.delete(
-            collection_name=self.collection_name,
-            filter=expr
-        )
-        return result.get("delete_count", 0) if isinstance(result, dict) else 0
+        # 先查出现存主键再点删（list_chunk_pks_by_doc_id 会先写出缓冲中的行），
+        # 只为实际存在的分块生成删除记录，避免表达式删除扫描全部 segment
+        return self.delete_chunks(self.list_chunk_pks_by_doc_id(doc_id, knowledge_base_id))
 
     def delete_documents_by_knowledge_base_id(self, knowledge_base_id: int) -> int:
         """
@@ -175,14 +1025,140 @@ class VectorDocChunk:
         Returns:
             删除的向量数量
         """
-        expr = f"knowledge_base_id == {knowledge_base_id}"
-        # MilvusClient的delete方法使用filter参数
+        self._flush_write_buffer()
+        if _per_kb_partitions():
+            return self._drop_knowledge_base_partition(knowledge_base_id)
+
+        # 分区键布局下删除表达式只会作用于该知识库所在的物理分区
         result = self.db_client.delete(
             collection_name=self.collection_name,
-            filter=expr
+            **knowledge_base_filter([knowledge_base_id]).search_kwargs(),
         )
         return result.get("delete_count", 0) if isinstance(result, dict) else 0
 
+    def _drop_knowledge_base_partition(self, knowledge_base_id: int) -> int:
+        """每知识库分区布局下删除知识库：直接释放并删除整个分区，不产生删除记录。"""
+        partition_name = kb_partition_name(knowledge_base_id)
+        if not self.db_client.has_partition(
+            collection_name=self.collection_name, partition_name=partition_name
+        ):
+            _forget_partition(self.collection_name, partition_name)
+            return 0
+
+        if self.load_manager is not None:
+            # 冷分区不为计数而加载，行数取分区统计（含尚未压缩掉的已删除行）
+            stats = self.db_client.get_partition_stats(
+                collection_name=self.collection_name, partition_name=partition_name
+            )
+            count = int(stats.get("row_count", 0))
+        else:
+            count = self.count_by_knowledge_base_id(knowledge_base_id)
+        self.db_client.release_partitions(
+            collection_name=self.collection_name, partition_names=[partition_name]
+        )
+        self.db_client.drop_partition(collection_name=self.collection_name, partition_name=partition_name)
+        _forget_partition(self.collection_name, partition_name)
+        if self.load_manager is not None:
+            self.load_manager.invalidate([partition_name])
+        return count
+
+    def _partitions_for(self, knowledge_base_ids: List[int]) -> Optional[List[str]]:
+        """知识库对应的已存在分区；分区键布局下返回 None（由过滤表达式裁剪）。"""
+        if not _per_kb_partitions():
+            return None
+        return _existing_partitions(
+            self.collection_name, [kb_partition_name(kb_id) for kb_id in knowledge_base_ids]
+        )
+
+    def _readable_partitions(self, knowledge_base_ids: List[int]) -> Optional[List[str]]:
+        """``_partitions_for``，并确保这些分区已加载（按需加载启用时）。"""
+        partition_names = self._partitions_for(knowledge_base_ids)
+        self._ensure_loaded(partition_names)
+        return partition_names
+
+    def _ensure_loaded(self, partition_names: Optional[List[str]]) -> None:
+        if self.load_manager is not None and partition_names:
+            self.load_manager.ensure_loaded(partition_names)
+
+    def _reload_released(self, partition_names: Optional[List[str]], exc: Exception) -> bool:
+        """分区被其他 worker 释放导致检索失败时重新加载，返回是否需要重试。"""
+        if self.load_manager is None or not partition_names or not is_not_loaded_error(exc):
+            return False
+        logger.info(f"知识库分区已被释放，重新加载后重试: {partition_names}")
+        self.load_manager.invalidate(partition_names)
+        self.load_manager.ensure_loaded(partition_names)
+        return True
+
+    def warm_knowledge_bases(self, knowledge_base_ids: List[int], wait: bool = True) -> None:
+        """
+        预热知识库分区（按需加载启用时；否则无操作）。
+
+        Args:
+            wait: 为 False 时在后台线程中加载，不阻塞调用方
+        """
+        if self.load_manager is None:
+            return
+        partition_names = self._partitions_for(knowledge_base_ids)
+        if not partition_names:
+            return
+        if wait:
+            self.load_manager.ensure_loaded(partition_names)
+        else:
+            self.load_manager.prefetch(partition_names)
+
+    def _flush_write_buffer(self) -> None:
+        if self.write_buffer is not None:
+            self.write_buffer.flush()
+
+    def iter_rows_by_knowledge_base_id(
+        self,
+        knowledge_base_id: int,
+        output_fields: List[str],
+        batch_size: int = 1000,
+    ) -> Iterator[List[dict]]:
+        """
+        分批遍历知识库的全部向量行（用于快照导出）。
+
+        Args:
+            knowledge_base_id: 知识库ID
+            output_fields: 需要返回的字段
+            batch_size: 每批返回的行数
+
+        Yields:
+            每批的行数据列表
+        """
+        partition_names = self._readable_partitions([knowledge_base_id])
+        if partition_names is not None and not partition_names:
+            return
+        yield from self._iter_query(
+            knowledge_base_filter([knowledge_base_id]), output_fields, batch_size, partition_names
+        )
+
+    def _iter_query(
+        self,
+        query_filter: FilterExpr,
+        output_fields: List[str],
+        batch_size: int = 1000,
+        partition_names: Optional[List[str]] = None,
+    ) -> Iterator[List[dict]]:
+        # query_iterator 不受单次 query 结果窗口（16384 行）限制；迭代器会在表达式后追加主键游标条件，
+        # 不支持模板参数，这里代入参数后下发
+        iterator = self.db_client.query_iterator(
+            collection_name=self.collection_name,
+            batch_size=batch_size,
+            filter=query_filter.render(),
+            output_fields=output_fields,
+            partition_names=partition_names,
+        )
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                yield batch
+        finally:
+            iterator.close()
+
     def count_by_knowledge_base_id(self, knowledge_base_id: int) -> int:
         """
         统计知识库的向量数量。
@@ -193,12 +1169,39 @@ class VectorDocChunk:
         Returns:
             向量数量
         """
-        expr = f"knowledge_base_id == {knowledge_base_id}"
-        # 使用query获取所有匹配的记录（不限制limit），然后计算长度
-        # 注意：对于大数据量，这可能效率较低，建议使用Milvus的count功能（如果支持）
+        partition_names = self._readable_partitions([knowledge_base_id])
+        if partition_names is not None and not partition_names:
+            return 0
+
+        # 使用 count(*) 由 Milvus 直接计数，不拉取全部记录
         result = self.db_client.query(
             collection_name=self.collection_name,
-            filter=expr,
-            output_fields=["doc_id"]
+            **knowledge_base_filter([knowledge_base_id]).search_kwargs(),
+            output_fields=["count(*)"],
+            partition_names=partition_names,
         )
-        return len(result) if result else 0
+        return int(result[0]["count(*)"]) if result else 0
+
+    def segment_health(self) -> SegmentHealth:
+        """统计分块集合的段健康度（段数量、已删除行比例、growing 段大小）。"""
+        return collect_segment_health(self.db_client, self.collection_name)
+
+    def flush(self) -> None:
+        """写出写缓冲并把 growing 段落盘封存。"""
+        self._flush_write_buffer()
+        self.db_client.flush(collection_name=self.collection_name)
+
+    def compact(self, timeout: Optional[float] = None) -> bool:
+        """压缩分块集合（合并小段、清理删除记录），返回是否在超时前完成。"""
+        return compact_collection(self.db_client, self.collection_name, timeout)
+
+
+def create_doc_chunk_repo() -> VectorDocChunk:
+    """按 VECTOR_URL 创建文档分块仓库：Milvus 或本地向量后端（``local://<目录>``）。"""
+
+    if settings.vector_backend == VECTOR_BACKEND_LOCAL:
+        # 延迟导入：本地后端模块依赖本模块
+        from qans_server.db.vector.collections.local_doc_chunk import LocalDocChunk
+
+        return LocalDocChunk()
+    return VectorDocChunk()
@@ -0,0 +1,298 @@
+"""文档级摘要向量。
+
+知识库分块数达到几十万时，直接在全部分块上检索延迟随语料增长，结果也更杂。启用
+``RETRIEVAL_DOC_SUMMARY`` 后，向量化完成时为每个文档计算摘要向量：按分块顺序把文档切成
+``RETRIEVAL_DOC_SUMMARY_VECTORS`` 个连续片段，取各片段分块向量的归一化质心，写入 ``t_doc_summary``。
+检索时先在摘要向量上粗选 ``RETRIEVAL_DOC_TOP_N`` 个文档，再以 ``doc_id in [...]`` 过滤检索分块；
+摘要集合的规模与文档数而不是分块数成正比。
+
+摘要向量的主键沿用分块主键的编码（文档ID + 片段序号），按文档删除即删除主键区间。
+"""
+
+import asyncio
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from qans_server.db.vector.base import db_client, get_async_client
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, doc_pk_range, make_chunk_pk, split_chunk_pk
+from qans_server.db.vector.filters import knowledge_base_filter, pk_range_filter
+from qans_server.db.vector.index_profile import dense_index_profile
+from qans_server.db.vector.local.store import LocalVectorStore
+from qans_server.db.vector.schema import create_doc_summary_collection
+from qans_server.db.vector.vector_codec import decode_vector
+from qans_server.setting_config import VECTOR_BACKEND_LOCAL, settings
+from qans_server.util.vector_util import VECTOR_DTYPE, as_matrix, normalize_rows
+
+SUMMARY_COLLECTION_NAME = "t_doc_summary"
+
+_collection_lock = threading.Lock()
+
+
+def section_labels(count: int, sections: int) -> np.ndarray:
+    """把按顺序排列的 ``count`` 个分块分为至多 ``sections`` 个连续片段，返回每个分块的片段序号。"""
+
+    sections = max(1, min(sections, count))
+    return np.arange(count) * sections // max(count, 1)
+
+
+def summary_vectors(vectors: np.ndarray, sections: int) -> np.ndarray:
+    """计算文档的摘要向量（各连续片段的归一化质心），``vectors`` 需按分块顺序排列。"""
+
+    matrix = as_matrix(vectors)
+    if not len(matrix):
+        return matrix
+    labels = section_labels(len(matrix), sections)
+    sums = np.zeros((int(labels[-1]) + 1, matrix.shape[1]), dtype=VECTOR_DTYPE)
+    np.add.at(sums, labels, matrix)
+    return normalize_rows(sums)
+
+
+def _top_documents(pks: Iterable[int], top_n: int) -> List[int]:
+    """按命中顺序去重得到文档ID（一个文档可能有多个摘要向量命中）。"""
+
+    doc_ids: Dict[int, None] = {}
+    for pk in pks:
+        doc_ids.setdefault(split_chunk_pk(int(pk))[0], None)
+        if len(doc_ids) >= top_n:
+            break
+    return list(doc_ids)
+
+
+class VectorDocSummary:
+    """文档摘要向量操作类（Milvus），集合在首次写入时创建。"""
+
+    def __init__(self, sections: Optional[int] = None):
+        self.db_client = db_client
+        self.collection_name = SUMMARY_COLLECTION_NAME
+        self.sections = sections or settings.retrieval_doc_summary_vectors
+        self.metric_type = dense_index_profile().metric_type
+        self._exists = False
+
+    def _collection_exists(self, create: bool = False) -> bool:
+        if self._exists:
+            return True
+        with _collection_lock:
+            if self.db_client.has_collection(collection_name=self.collection_name):
+                self._exists = True
+            elif create:
+                create_doc_summary_collection(self.db_client, self.collection_name, metric_type=self.metric_type)
+                self._exists = True
+        return self._exists
+
+    def _build_rows(self, doc_id: int, knowledge_base_id: int, summaries: np.ndarray) -> List[dict]:
+        return [
+            {
+                "id": make_chunk_pk(doc_id, i),
+                "vector": summaries[i],
+                "doc_id": doc_id,
+                "knowledge_base_id": knowledge_base_id,
+            }
+            for i in range(len(summaries))
+        ]
+
+    def upsert_document(self, doc_id: int, knowledge_base_id: int, vectors: np.ndarray) -> int:
+        """
+        根据文档的分块向量（按分块顺序）计算并写入摘要向量，覆盖旧的摘要。
+
+        Returns:
+            写入的摘要向量数
+        """
+        summaries = summary_vectors(vectors, self.sections)
+        if not len(summaries):
+            self.delete_document(doc_id)
+            return 0
+
+        self._collection_exists(create=True)
+        rows = self._build_rows(doc_id, knowledge_base_id, summaries)
+        self.db_client.upsert(collection_name=self.collection_name, data=rows)
+        # 片段数变少时删除多出来的旧摘要
+        stale = pk_range_filter(make_chunk_pk(doc_id, len(rows)), doc_pk_range(doc_id)[1])
+        self.db_client.delete(collection_name=self.collection_name, **stale.search_kwargs())
+        return len(rows)
+
+    def insert_summaries(self, items: List[tuple]) -> int:
+        """批量写入 ``(doc_id, knowledge_base_id, 摘要向量矩阵)``（用于重建，调用方需先删除旧摘要）。"""
+        rows = [row for doc_id, kb_id, summaries in items for row in self._build_rows(doc_id, kb_id, summaries)]
+        if not rows:
+            return 0
+        self._collection_exists(create=True)
+        self.db_client.insert(collection_name=self.collection_name, data=rows)
+        return len(rows)
+
+    def delete_document(self, doc_id: int) -> None:
+        """删除文档的摘要向量。"""
+        if not self._collection_exists():
+            return
+        self.db_client.delete(
+            collection_name=self.collection_name,
+            **pk_range_filter(*doc_pk_range(doc_id)).search_kwargs(),
+        )
+
+    def delete_knowledge_base(self, knowledge_base_id: int) -> None:
+        """删除知识库的全部摘要向量。"""
+        if not self._collection_exists():
+            return
+        self.db_client.delete(
+            collection_name=self.collection_name,
+            **knowledge_base_filter([knowledge_base_id]).search_kwargs(),
+        )
+
+    def _search_kwargs(self, query_vector: np.ndarray, knowledge_base_ids: List[int], top_n: int) -> dict:
+        return dict(
+            collection_name=self.collection_name,
+            data=[np.asarray(query_vector, dtype=VECTOR_DTYPE)],
+            anns_field="vector",
+            limit=top_n * self.sections,
+            output_fields=[],
+            search_params={"metric_type": self.metric_type},
+            **knowledge_base_filter(knowledge_base_ids).search_kwargs(),
+        )
+
+    def search_documents(self, query_vector: np.ndarray, knowledge_base_ids: List[int], top_n: int) -> List[int]:
+        """
+        粗选与查询最相关的文档。
+
+        Returns:
+            按相关度降序的文档ID（至多 top_n 个）；集合尚不存在时返回空列表
+        """
+        if not knowledge_base_ids or not self._collection_exists():
+            return []
+        results = self.db_client.search(**self._search_kwargs(query_vector, knowledge_base_ids, top_n))
+        return _top_documents((hit["id"] for hit in results[0]), top_n) if results else []
+
+    async def asearch_documents(
+        self,
+        query_vector: np.ndarray,
+        knowledge_base_ids: List[int],
+        top_n: int,
+    ) -> List[int]:
+        """``search_documents`` 的异步版本。"""
+        client = get_async_client()
+        if client is None or not self._exists:
+            # 首次检查集合是否存在走同步调用
+            return await asyncio.to_thread(self.search_documents, query_vector, knowledge_base_ids, top_n)
+        if not knowledge_base_ids:
+            return []
+        results = await client.search(**self._search_kwargs(query_vector, knowledge_base_ids, top_n))
+        return _top_documents((hit["id"] for hit in results[0]), top_n) if results else []
+
+
+class LocalDocSummary(VectorDocSummary):
+    """基于本地向量存储的文档摘要向量（``VECTOR_URL=local://<目录>``）。"""
+
+    def __init__(self, store: LocalVectorStore | None = None, sections: Optional[int] = None):
+        self.store = store or get_local_summary_store()
+        self.collection_name = SUMMARY_COLLECTION_NAME
+        self.sections = sections or settings.retrieval_doc_summary_vectors
+        self.metric_type = self.store.metric_type
+
+    def _build_rows(self, doc_id: int, knowledge_base_id: int, summaries: np.ndarray) -> List[dict]:
+        rows = super()._build_rows(doc_id, knowledge_base_id, summaries)
+        for i, row in enumerate(rows):
+            row.update(chunk_id=i, text="", meta={})
+        return rows
+
+    def upsert_document(self, doc_id: int, knowledge_base_id: int, vectors: np.ndarray) -> int:
+        summaries = summary_vectors(vectors, self.sections)
+        rows = self._build_rows(doc_id, knowledge_base_id, summaries)
+        if rows:
+            self.store.upsert(rows)
+        self.store.delete(self.store.pks_in_range(make_chunk_pk(doc_id, len(rows)), doc_pk_range(doc_id)[1]))
+        return len(rows)
+
+    def insert_summaries(self, items: List[tuple]) -> int:
+        rows = [row for doc_id, kb_id, summaries in items for row in self._build_rows(doc_id, kb_id, summaries)]
+        return self.store.upsert(rows) if rows else 0
+
+    def delete_document(self, doc_id: int) -> None:
+        self.store.delete(self.store.pks_in_range(*doc_pk_range(doc_id)))
+
+    def delete_knowledge_base(self, knowledge_base_id: int) -> None:
+        self.store.delete_knowledge_base(knowledge_base_id)
+
+    def search_documents(self, query_vector: np.ndarray, knowledge_base_ids: List[int], top_n: int) -> List[int]:
+        hits = self.store.search_dense(knowledge_base_ids, query_vector, top_n * self.sections)
+        return _top_documents((pk for pk, _ in hits), top_n)
+
+    async def asearch_documents(
+        self,
+        query_vector: np.ndarray,
+        knowledge_base_ids: List[int],
+        top_n: int,
+    ) -> List[int]:
+        return await asyncio.to_thread(self.search_documents, query_vector, knowledge_base_ids, top_n)
+
+
+_local_store: LocalVectorStore | None = None
+
+
+def get_local_summary_store() -> LocalVectorStore:
+    """获取进程级的本地摘要向量存储（数据量小，精确检索）。"""
+
+    global _local_store
+    with _collection_lock:
+        if _local_store is None:
+            _local_store = LocalVectorStore(
+                settings.vector_local_dir / SUMMARY_COLLECTION_NAME,
+                settings.stored_vector_dim,
+                metric_type=dense_index_profile().metric_type,
+            )
+        return _local_store
+
+
+def create_doc_summary_repo() -> Optional[VectorDocSummary]:
+    """按配置创建文档摘要向量仓库，未启用 ``RETRIEVAL_DOC_SUMMARY`` 时返回 None。"""
+
+    if not settings.retrieval_doc_summary:
+        return None
+    if settings.vector_backend == VECTOR_BACKEND_LOCAL:
+        return LocalDocSummary()
+    return VectorDocSummary()
+
+
+def rebuild_knowledge_base_summaries(
+    chunk_repo: VectorDocChunk,
+    summary_repo: VectorDocSummary,
+    knowledge_base_id: int,
+    batch_size: int = 1000,
+) -> int:
+    """
+    根据向量库中已有的分块向量重建知识库的文档摘要向量（用于存量数据回填与快照恢复）。
+
+    遍历两遍：第一遍只读分块序号以确定片段划分，第二遍按片段累加向量，
+    内存中只保留每个文档的片段向量和，不缓存分块向量。
+
+    Returns:
+        重建摘要的文档数
+    """
+    chunk_ids: Dict[int, List[int]] = {}
+    for batch in chunk_repo.iter_rows_by_knowledge_base_id(knowledge_base_id, ["doc_id", "chunk_id"], batch_size):
+        for row in batch:
+            chunk_ids.setdefault(int(row["doc_id"]), []).append(int(row["chunk_id"]))
+    ordered = {doc_id: np.sort(np.asarray(ids, dtype=np.int64)) for doc_id, ids in chunk_ids.items()}
+
+    sums: Dict[int, np.ndarray] = {}
+    for batch in chunk_repo.iter_rows_by_knowledge_base_id(
+        knowledge_base_id, ["doc_id", "chunk_id", "vector"], batch_size
+    ):
+        for row in batch:
+            doc_id = int(row["doc_id"])
+            ids = ordered.get(doc_id)
+            if ids is None:
+                # 两遍之间新写入的文档，由其向量化流程写入摘要
+                continue
+            # 与 section_labels 相同的划分：按分块序号的排名均分
+            sections = max(1, min(summary_repo.sections, len(ids)))
+            rank = min(int(np.searchsorted(ids, int(row["chunk_id"]))), len(ids) - 1)
+            vector = decode_vector(row["vector"], chunk_repo.storage_type)
+            if doc_id not in sums:
+                sums[doc_id] = np.zeros((sections, len(vector)), dtype=VECTOR_DTYPE)
+            sums[doc_id][rank * sections // len(ids)] += vector
+
+    summary_repo.delete_knowledge_base(knowledge_base_id)
+    items = [(doc_id, knowledge_base_id, normalize_rows(matrix)) for doc_id, matrix in sums.items()]
+    for start in range(0, len(items), batch_size):
+        summary_repo.insert_summaries(items[start:start + batch_size])
+    return len(items)
@@ -0,0 +1,280 @@
+"""本地向量后端的文档分块仓库。
+
+``VECTOR_URL=local://<目录>`` 时替代 Milvus：稠密向量检索在 mmap 的 float32 矩阵上用 NumPy
+批量计算（``VECTOR_INDEX_TYPE`` 为 IVF 系列时合并后的数据段按 ``VECTOR_IVF_NLIST`` 聚类，
+检索 ``nprobe`` 个聚类），全文检索使用段内 BM25 倒排表，两路结果按与 Milvus RRF ranker
+相同的公式融合。主键、字段与返回格式与 ``VectorDocChunk`` 一致，服务层无需区分后端。
+"""
+
+import asyncio
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from qans_server.db.vector.collections.doc_chunk import (
+    CHUNK_OUTPUT_FIELDS,
+    COLLECTION_NAME,
+    VectorDocChunk,
+    doc_pk_range,
+)
+from qans_server.db.vector.filters import FilterExpr
+from qans_server.db.vector.fusion import rrf_fuse
+from qans_server.db.vector.index_profile import dense_index_profile, sparse_index_profile
+from qans_server.db.vector.local.store import LocalVectorStore
+from qans_server.db.vector.maintenance import SegmentHealth
+from qans_server.db.vector.search_tuning import resolve_search_effort
+from qans_server.db.vector.vector_codec import STORAGE_FLOAT32
+from qans_server.setting_config import settings
+from qans_server.util.vector_util import as_matrix
+
+_store: LocalVectorStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_local_store() -> LocalVectorStore:
+    """获取进程级的本地向量存储（按配置）。"""
+
+    global _store
+    with _store_lock:
+        if _store is None:
+            profile = dense_index_profile()
+            _store = LocalVectorStore(
+                settings.vector_local_dir / COLLECTION_NAME,
+                settings.stored_vector_dim,
+                metric_type=profile.metric_type,
+                nlist=int(profile.build_params.get("nlist", 0)) if profile.index_type.startswith("IVF") else 0,
+                max_segments=settings.vector_local_max_segments,
+            )
+        return _store
+
+
+class LocalDocChunk(VectorDocChunk):
+    """基于本地向量存储的文档分块操作类（接口与 ``VectorDocChunk`` 一致）。"""
+
+    def __init__(self, store: LocalVectorStore | None = None):
+        self.store = store or get_local_store()
+        self.collection_name = COLLECTION_NAME
+        # 本地写入本身是批量的，不使用写缓冲
+        self.write_buffer = None
+        self.dense_profile = dense_index_profile()
+        self.sparse_profile = sparse_index_profile()
+        # 本地存储始终保存 float32 原始向量，检索即为精确打分，不需要量化首轮与重算
+        self.storage_type = STORAGE_FLOAT32
+        self.binary_profile = None
+        self.rescore = False
+        self.rescore_multiplier = 1
+        # 本地存储按 mmap 读取，不需要加载 / 释放管理
+        self.load_manager = None
+
+    def insert_rows(self, rows: List[dict], batch_size: int = 2000) -> int:
+        """写入行数据（同一批写入生成一个增量段，主键已存在时覆盖）。"""
+        if not rows:
+            return 0
+        return self.store.upsert(rows)
+
+    def upsert_rows(self, rows: List[dict], batch_size: int = 2000) -> int:
+        """按主键覆盖写入行数据。"""
+        if not rows:
+            return 0
+        return self.store.upsert(rows)
+
+    def use_bulk_import(self, row_count: int) -> bool:
+        """本地后端写入本身即按段批量落盘，不使用 Milvus 批量导入。"""
+        return False
+
+    def get_chunks(
+        self,
+        pks: Iterable[int],
+        output_fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """按主键批量获取分块（不存在的主键会被忽略）。"""
+        pk_list = list(pks)
+        if not pk_list:
+            return []
+        fields = ["id"] + [field for field in (output_fields or CHUNK_OUTPUT_FIELDS) if field != "id"]
+        rows = self.store.get_rows(pk_list, fields)
+        return [rows[pk] for pk in dict.fromkeys(pk_list) if pk in rows]
+
+    async def aget_chunks(
+        self,
+        pks: Iterable[int],
+        output_fields: Optional[List[str]] = None,
+    ) -> List[dict]:
+        return await asyncio.to_thread(self.get_chunks, list(pks), output_fields)
+
+    def list_chunk_pks_by_doc_id(self, doc_id: int, knowledge_base_id: Optional[int] = None) -> List[int]:
+        """列出文档当前的全部分块主键（本地存储不分区，忽略 ``knowledge_base_id``）。"""
+        start, end = doc_pk_range(doc_id)
+        return self.store.pks_in_range(start, end)
+
+    def delete_chunks(self, pks: Iterable[int]) -> int:
+        """按主键删除分块，返回删除的数量。"""
+        return self.store.delete(pks)
+
+    def search_similar_chunks(
+        self,
+        query: str,
+        query_vector: np.ndarray,
+        knowledge_base_ids: List[int],
+        top_k: int = 5,
+        *,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        output_fields: Optional[List[str]] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[dict]:
+        """
+        混合检索：稠密向量检索与 BM25 全文检索各召回候选后做 RRF 融合。
+
+        参数与返回值同 ``VectorDocChunk.search_similar_chunks``。
+        """
+        if query_vector is None or len(query_vector) == 0 or not knowledge_base_ids:
+            return []
+
+        effort = resolve_search_effort(
+            self.dense_profile,
+            self.sparse_profile,
+            top_k,
+            knowledge_base_ids,
+            quality=quality,
+            latency_budget_ms=latency_budget_ms,
+        )
+        candidate_limit = top_k * effort.candidate_multiplier
+        row_filter = filter_expr.matches if filter_expr else None
+        dense = self.store.search_dense(
+            knowledge_base_ids,
+            query_vector,
+            candidate_limit,
+            nprobe=int(effort.dense_params.get("nprobe", settings.vector_ivf_nprobe)),
+            row_filter=row_filter,
+        )
+        sparse = self.store.search_bm25(
+            knowledge_base_ids,
+            query,
+            candidate_limit,
+            drop_ratio=float(effort.sparse_params.get("drop_ratio_search", 0.0)),
+            row_filter=row_filter,
+        )
+
+        fused = rrf_fuse([[pk for pk, _ in dense], [pk for pk, _ in sparse]], k=top_k * 2, limit=top_k * 2)
+        if output_fields is not None and not output_fields:
+            return [{"id": pk, "score": score} for pk, score in fused]
+        fields = CHUNK_OUTPUT_FIELDS if output_fields is None else output_fields
+        rows = self.store.get_rows((pk for pk, _ in fused), fields)
+        return [rows[pk] for pk, _ in fused if pk in rows]
+
+    async def asearch_similar_chunks(
+        self,
+        query: str,
+        query_vector: np.ndarray,
+        knowledge_base_ids: List[int],
+        top_k: int = 5,
+        *,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        output_fields: Optional[List[str]] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[dict]:
+        # NumPy 矩阵运算会释放 GIL，放到线程池执行
+        return await asyncio.to_thread(
+            self.search_similar_chunks,
+            query,
+            query_vector,
+            knowledge_base_ids,
+            top_k,
+            quality=quality,
+            latency_budget_ms=latency_budget_ms,
+            output_fields=output_fields,
+            filter_expr=filter_expr,
+        )
+
+    def search_many(
+        self,
+        queries: List[str],
+        query_vectors: np.ndarray,
+        knowledge_base_ids: List[int],
+        top_k: int = 5,
+        *,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        output_fields: Optional[List[str]] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[List[dict]]:
+        """批量混合检索（本地检索没有网络往返，逐个查询检索后一次取回全部命中行）。"""
+        matrix = as_matrix(query_vectors)
+        if len(queries) != len(matrix):
+            raise ValueError(f"问题数量 {len(queries)} 与查询向量数量 {len(matrix)} 不一致")
+
+        scored = [
+            self.search_similar_chunks(
+                query,
+                vector,
+                knowledge_base_ids,
+                top_k,
+                quality=quality,
+                latency_budget_ms=latency_budget_ms,
+                output_fields=[],
+                filter_expr=filter_expr,
+            )
+            for query, vector in zip(queries, matrix)
+        ]
+        if output_fields is not None and not output_fields:
+            return scored
+        fields = CHUNK_OUTPUT_FIELDS if output_fields is None else output_fields
+        rows = self.store.get_rows({hit["id"] for hits in scored for hit in hits}, fields)
+        return [
+            [dict(rows[hit["id"]], id=hit["id"], score=hit["score"]) for hit in hits if hit["id"] in rows]
+            for hits in scored
+        ]
+
+    def get_vectors(self, pks: Iterable[int]) -> Dict[int, np.ndarray]:
+        """按主键获取 float32 向量。"""
+        return {pk: row["vector"] for pk, row in self.store.get_rows(pks, ["vector"]).items()}
+
+    def search_dense(
+        self,
+        query_vectors: np.ndarray,
+        knowledge_base_ids: List[int],
+        limit: int,
+        search_params: Optional[dict] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[List[int]]:
+        """仅稠密向量检索，返回每个查询命中的主键列表。"""
+        params = self.dense_profile.search_params if search_params is None else search_params
+        nprobe = int(params.get("nprobe", settings.vector_ivf_nprobe))
+        row_filter = filter_expr.matches if filter_expr else None
+        return [
+            [pk for pk, _ in self.store.search_dense(knowledge_base_ids, vector, limit, nprobe=nprobe, row_filter=row_filter)]
+            for vector in as_matrix(query_vectors)
+        ]
+
+    def delete_documents_by_knowledge_base_id(self, knowledge_base_id: int) -> int:
+        """删除知识库的全部分块（直接删除知识库目录）。"""
+        return self.store.delete_knowledge_base(knowledge_base_id)
+
+    def iter_rows_by_knowledge_base_id(
+        self,
+        knowledge_base_id: int,
+        output_fields: List[str],
+        batch_size: int = 1000,
+    ) -> Iterator[List[dict]]:
+        """分批遍历知识库的全部行。"""
+        yield from self.store.iter_rows(knowledge_base_id, output_fields, batch_size)
+
+    def count_by_knowledge_base_id(self, knowledge_base_id: int) -> int:
+        """统计知识库的分块数量。"""
+        return self.store.count(knowledge_base_id)
+
+    def segment_health(self) -> SegmentHealth:
+        """统计全部知识库的数据段数量与已删除行比例。"""
+        return self.store.segment_health()
+
+    def flush(self) -> None:
+        """本地写入即落盘，无需 flush。"""
+
+    def compact(self, timeout: Optional[float] = None) -> bool:
+        """合并每个知识库的数据段并清理删除记录。"""
+        for kb_id in self.store.knowledge_base_ids():
+            self.store.compact(kb_id)
+        return True
@@ -0,0 +1,243 @@
+"""Milvus 过滤表达式构建。
+
+过滤条件以表达式模板加参数（``filter_params`` / ``expr_params``）的形式发送：知识库、文档集合
+不同的请求共用同一个模板，Milvus 可以复用解析与执行计划，请求中也不再携带拼接出的长列表字符串。
+条件通过 ``&`` / ``all_of`` 组合，参数名冲突时自动重命名，调用方不需要拼接字符串。
+
+每个条件同时带有等价的 Python 谓词，本地向量后端据此在行上求值。
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+# 分块元数据中的文件类型与上传时间（Unix 秒）键
+META_FILE_TYPE = "file_type"
+META_UPLOAD_TIME = "upload_time"
+
+RowPredicate = Callable[[Mapping[str, Any]], bool]
+
+
+def _always(_: Mapping[str, Any]) -> bool:
+    return True
+
+
+@dataclass(frozen=True)
+class FilterExpr:
+    """过滤表达式模板、参数与等价的行谓词；空模板表示不过滤。"""
+
+    template: str = ""
+    params: Dict[str, Any] = field(default_factory=dict)
+    predicate: RowPredicate = field(default=_always, compare=False, repr=False)
+
+    def __bool__(self) -> bool:
+        return bool(self.template)
+
+    def __and__(self, other: Optional["FilterExpr"]) -> "FilterExpr":
+        return all_of(self, other)
+
+    def search_kwargs(self) -> dict:
+        """``search`` / ``query`` / ``delete`` 的过滤参数。"""
+        kwargs: dict = {"filter": self.template}
+        if self.params:
+            kwargs["filter_params"] = dict(self.params)
+        return kwargs
+
+    def ann_kwargs(self) -> dict:
+        """``AnnSearchRequest`` 的过滤参数。"""
+        kwargs: dict = {"expr": self.template}
+        if self.params:
+            kwargs["expr_params"] = dict(self.params)
+        return kwargs
+
+    def render(self) -> str:
+        """把参数代入模板得到普通表达式（用于不支持模板参数的接口，如 ``query_iterator``）。"""
+        return _PLACEHOLDER.sub(lambda match: _literal(self.params[match.group(1)]), self.template)
+
+    def matches(self, row: Mapping[str, Any]) -> bool:
+        return self.predicate(row)
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_literal(item) for item in value) + "]"
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _check_field(name: str) -> str:
+    if not _IDENTIFIER.fullmatch(name):
+        raise ValueError(f"非法的过滤字段名: {name}")
+    return name
+
+
+def _param_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_]", "_", name)
+
+
+def _field_ref(name: str):
+    """普通标量字段的 (表达式引用, 参数名, 取值函数)。"""
+    _check_field(name)
+    return name, _param_name(name), lambda row: row.get(name)
+
+
+def _json_ref(name: str, key: str):
+    """JSON 字段中某个键的 (表达式引用, 参数名, 取值函数)。"""
+    _check_field(name)
+    if not key or any(char in key for char in '{}"\\'):
+        raise ValueError(f"非法的 JSON 过滤键: {key}")
+
+    def getter(row: Mapping[str, Any]) -> Any:
+        data = row.get(name)
+        return data.get(key) if isinstance(data, Mapping) else None
+
+    return f"{name}[{json.dumps(key, ensure_ascii=False)}]", _param_name(f"{name}_{key}"), getter
+
+
+def _eq(ref, value: Any) -> FilterExpr:
+    expr, param, getter = ref
+    return FilterExpr(f"{expr} == {{{param}}}", {param: value}, lambda row: getter(row) == value)
+
+
+def _in(ref, values: Iterable[Any]) -> FilterExpr:
+    expr, param, getter = ref
+    values = list(values)
+    allowed = set(values)
+    return FilterExpr(f"{expr} in {{{param}}}", {param: values}, lambda row: getter(row) in allowed)
+
+
+def _range(ref, start: Any, end: Any) -> FilterExpr:
+    expr, param, getter = ref
+    if start is not None and end is not None and not start < end:
+        # 空区间多半是调用方把上下限写反了，直接报错而不是静默返回空结果
+        raise ValueError(f"过滤范围不合法: {expr} 的下限 {start} 不小于上限 {end}")
+    parts, params = [], {}
+    if start is not None:
+        parts.append(f"{expr} >= {{{param}_start}}")
+        params[f"{param}_start"] = start
+    if end is not None:
+        parts.append(f"{expr} < {{{param}_end}}")
+        params[f"{param}_end"] = end
+    if not parts:
+        return FilterExpr()
+
+    def predicate(row: Mapping[str, Any]) -> bool:
+        value = getter(row)
+        if value is None:
+            return False
+        return (start is None or value >= start) and (end is None or value < end)
+
+    return FilterExpr(" and ".join(parts), params, predicate)
+
+
+def field_eq(name: str, value: Any) -> FilterExpr:
+    """``name == value``"""
+    return _eq(_field_ref(name), value)
+
+
+def field_in(name: str, values: Iterable[Any]) -> FilterExpr:
+    """``name in [values]``（任意个数的取值共用同一个模板）。"""
+    return _in(_field_ref(name), values)
+
+
+def field_range(name: str, start: Any = None, end: Any = None) -> FilterExpr:
+    """``start <= name < end``（省略的一端不限制；两端都给出时 ``start >= end`` 抛出 ValueError）。"""
+    return _range(_field_ref(name), start, end)
+
+
+def json_eq(name: str, key: str, value: Any) -> FilterExpr:
+    """JSON 字段的键等于给定值：``name["key"] == value``。"""
+    return _eq(_json_ref(name, key), value)
+
+
+def json_in(name: str, key: str, values: Iterable[Any]) -> FilterExpr:
+    """JSON 字段的键取值在给定列表中：``name["key"] in [values]``。"""
+    return _in(_json_ref(name, key), values)
+
+
+def json_range(name: str, key: str, start: Any = None, end: Any = None) -> FilterExpr:
+    """``start <= name["key"] < end``（省略的一端不限制，键不存在的行不匹配；区间为空时抛出 ValueError）。"""
+    return _range(_json_ref(name, key), start, end)
+
+
+def all_of(*exprs: Optional[FilterExpr]) -> FilterExpr:
+    """用 ``and`` 组合多个条件（忽略空条件），参数名冲突时自动加后缀。"""
+
+    parts = [expr for expr in exprs if expr]
+    if not parts:
+        return FilterExpr()
+    if len(parts) == 1:
+        return parts[0]
+
+    templates, params = [], {}
+    for expr in parts:
+        renames = {}
+        for name in expr.params:
+            unique, index = name, 1
+            while unique in params or unique in renames.values():
+                index += 1
+                unique = f"{name}_{index}"
+            renames[name] = unique
+        template = _PLACEHOLDER.sub(lambda match: "{" + renames.get(match.group(1), match.group(1)) + "}", expr.template)
+        templates.append(f"({template})")
+        params.update({renames[name]: value for name, value in expr.params.items()})
+
+    predicates = [expr.predicate for expr in parts]
+    return FilterExpr(" and ".join(templates), params, lambda row: all(check(row) for check in predicates))
+
+
+def knowledge_base_filter(knowledge_base_ids: Iterable[int]) -> FilterExpr:
+    """按知识库过滤；分区键布局下 Milvus 依据该条件只检索对应的物理分区。"""
+    return field_in("knowledge_base_id", [int(kb_id) for kb_id in knowledge_base_ids])
+
+
+def pk_range_filter(start: int, end: int) -> FilterExpr:
+    """主键在 [start, end) 内（Milvus 可依据段的主键统计跳过无关段）。"""
+    return field_range("id", start, end)
+
+
+def chunk_filter(
+    *,
+    doc_ids: Optional[Iterable[int]] = None,
+    file_types: Optional[Iterable[str]] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    meta: Optional[Mapping[str, Any]] = None,
+) -> FilterExpr:
+    """
+    按文档、文件类型、上传时间与元数据键过滤分块（未指定的条件不限制）。
+
+    文件类型与上传时间保存在分块 ``meta`` 的 ``file_type`` / ``upload_time``（Unix 秒）中，
+    集合为这两个 JSON 路径与 ``doc_id`` 建了标量索引（见 ``schema.SCALAR_INDEXES``）。
+
+    Args:
+        doc_ids: 文档 ID 列表
+        file_types: 文件类型（扩展名，不含点号）列表，不区分大小写
+        uploaded_after: 上传时间下限（含）
+        uploaded_before: 上传时间上限（不含）
+        meta: 元数据键值，逐个按相等过滤
+    """
+    exprs = []
+    if doc_ids is not None:
+        exprs.append(field_in("doc_id", [int(doc_id) for doc_id in doc_ids]))
+    if file_types is not None:
+        exprs.append(json_in("meta", META_FILE_TYPE, [file_type.lower().lstrip(".") for file_type in file_types]))
+    exprs.append(json_range(
+        "meta",
+        META_UPLOAD_TIME,
+        int(uploaded_after.timestamp()) if uploaded_after else None,
+        int(uploaded_before.timestamp()) if uploaded_before else None,
+    ))
+    for key, value in (meta or {}).items():
+        exprs.append(json_eq("meta", key, value))
+    return all_of(*exprs)
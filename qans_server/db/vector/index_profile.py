@@ -0,0 +1,118 @@
+"""向量索引配置档。
+
+把索引类型、建索引参数与检索参数绑定在一起，保证检索时使用与索引类型匹配的参数
+（例如 HNSW 使用 ``ef``，IVF 系列使用 ``nprobe``，DISKANN 使用 ``search_list``）。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from qans_server.setting_config import Settings, settings as default_settings
+
+DENSE_INDEX_TYPES = ("AUTOINDEX", "HNSW", "HNSW_SQ", "IVF_FLAT", "IVF_SQ8", "IVF_PQ", "DISKANN")
+BINARY_INDEX_TYPES = ("BIN_FLAT", "BIN_IVF_FLAT")
+SPARSE_INDEX_TYPES = ("SPARSE_INVERTED_INDEX", "SPARSE_WAND")
+
+
+@dataclass(frozen=True)
+class IndexProfile:
+    """单个向量字段的索引配置。"""
+
+    index_type: str
+    metric_type: str
+    build_params: Dict[str, Any] = field(default_factory=dict)
+    search_params: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return self.index_type.lower()
+
+
+def dense_index_profile(
+    index_type: Optional[str] = None,
+    config: Optional[Settings] = None,
+) -> IndexProfile:
+    """
+    根据配置生成稠密向量索引配置档。
+
+    Args:
+        index_type: 索引类型，默认取 ``vector_index_type``（基准测试时可指定其他类型）
+        config: 配置，默认取全局配置
+    """
+
+    config = config or default_settings
+    index_type = (index_type or config.vector_index_type).upper()
+    metric_type = config.vector_metric_type
+
+    if index_type == "AUTOINDEX":
+        return IndexProfile(index_type, metric_type)
+    if index_type == "HNSW":
+        return IndexProfile(
+            index_type,
+            metric_type,
+            {"M": config.vector_hnsw_m, "efConstruction": config.vector_hnsw_ef_construction},
+            {"ef": config.vector_hnsw_ef},
+        )
+    if index_type == "HNSW_SQ":
+        # HNSW 图 + 8 位标量量化存储，内存约为 HNSW 的 1/4
+        return IndexProfile(
+            index_type,
+            metric_type,
+            {"M": config.vector_hnsw_m, "efConstruction": config.vector_hnsw_ef_construction, "sq_type": "SQ8"},
+            {"ef": config.vector_hnsw_ef},
+        )
+    if index_type in ("IVF_FLAT", "IVF_SQ8"):
+        return IndexProfile(
+            index_type,
+            metric_type,
+            {"nlist": config.vector_ivf_nlist},
+            {"nprobe": config.vector_ivf_nprobe},
+        )
+    if index_type == "IVF_PQ":
+        return IndexProfile(
+            index_type,
+            metric_type,
+            {"nlist": config.vector_ivf_nlist, "m": config.vector_pq_m, "nbits": config.vector_pq_nbits},
+            {"nprobe": config.vector_ivf_nprobe},
+        )
+    if index_type == "DISKANN":
+        return IndexProfile(index_type, metric_type, {}, {"search_list": config.vector_diskann_search_list})
+    raise ValueError(f"不支持的向量索引类型: {index_type}，可选值: {', '.join(DENSE_INDEX_TYPES)}")
+
+
+def binary_index_profile(index_type: str = "BIN_IVF_FLAT", config: Optional[Settings] = None) -> IndexProfile:
+    """二值量化向量（首轮检索）的索引配置档，度量为汉明距离。"""
+
+    config = config or default_settings
+    index_type = index_type.upper()
+    if index_type == "BIN_FLAT":
+        return IndexProfile(index_type, "HAMMING")
+    if index_type == "BIN_IVF_FLAT":
+        return IndexProfile(
+            index_type,
+            "HAMMING",
+            {"nlist": config.vector_ivf_nlist},
+            {"nprobe": config.vector_ivf_nprobe},
+        )
+    raise ValueError(f"不支持的二值索引类型: {index_type}，可选值: {', '.join(BINARY_INDEX_TYPES)}")
+
+
+def sparse_index_profile(config: Optional[Settings] = None) -> IndexProfile:
+    """根据配置生成稀疏（BM25）向量索引配置档。"""
+
+    config = config or default_settings
+    index_type = config.sparse_index_type.upper()
+    if index_type not in SPARSE_INDEX_TYPES:
+        raise ValueError(f"不支持的稀疏索引类型: {index_type}，可选值: {', '.join(SPARSE_INDEX_TYPES)}")
+
+    build_params: Dict[str, Any] = {}
+    if index_type == "SPARSE_INVERTED_INDEX":
+        build_params["inverted_index_algo"] = config.sparse_inverted_index_algo
+    return IndexProfile(
+        index_type,
+        "BM25",
+        build_params,
+        {"drop_ratio_search": config.sparse_drop_ratio_search},
+    )
@@ -0,0 +1,323 @@
+"""知识库分区的按需加载与释放（冷热分离）。
+
+所有知识库的分块都加载在同一个集合中时，QueryNode 内存随语料总量增长，而大部分流量只集中在少数知识库。
+每知识库分区布局（``VECTOR_PARTITION_MODE=partition``）下启用 ``VECTOR_LOAD_MANAGEMENT`` 后：
+
+- 检索、统计等读操作前确保所涉及的分区已加载（冷分区当场加载，记为一次冷命中）；
+- 后台线程释放空闲超过 ``VECTOR_LOAD_IDLE_SECONDS`` 的分区；
+- 已加载分区的估算内存超过 ``VECTOR_LOAD_MEMORY_BUDGET_MB`` 时按最近最少使用释放；
+- 加载 / 释放次数与耗时、冷命中延迟通过 ``stats()`` 汇报（``GET /maintenance/partitions``）。
+
+加载状态在 Milvus 端全局生效，但访问记录只在本进程内：多个 worker 时可能释放其他 worker 正在使用的分区，
+此时检索会收到分区未加载的错误，``VectorDocChunk`` 重新加载后重试一次。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from loguru import logger
+from pymilvus import MilvusClient
+from pymilvus.client.types import LoadState
+
+from qans_server.db.vector.schema import PARTITION_MODE_PER_KB
+from qans_server.db.vector.vector_codec import STORAGE_FLOAT32
+from qans_server.setting_config import VECTOR_BACKEND_MILVUS, settings
+from qans_server.util.latency_stats import LatencyStats
+from qans_server.util.single_flight import SingleFlight, make_key
+
+# 估算每行内存时文本、稀疏向量、标量字段与索引的额外开销（字节）
+_ROW_OVERHEAD_BYTES = 1024
+
+
+def estimate_row_bytes() -> int:
+    """按向量维度与存储精度估算每行加载后的内存（粗略值，用于内存预算）。"""
+
+    element_bytes = 4 if settings.vector_storage_type == STORAGE_FLOAT32 else 2
+    row_bytes = settings.stored_vector_dim * element_bytes + _ROW_OVERHEAD_BYTES
+    if settings.vector_binary_index:
+        row_bytes += settings.stored_vector_dim // 8
+    return row_bytes
+
+
+def is_not_loaded_error(exc: Exception) -> bool:
+    """Milvus 返回的是否为集合 / 分区未加载错误。"""
+
+    return "not loaded" in str(exc).lower()
+
+
+@dataclass
+class _LoadedPartition:
+    partition_name: str
+    row_count: int
+    estimated_bytes: int
+    loaded_at: float
+    last_used: float
+
+
+class PartitionLoadManager:
+    """按 LRU 管理已加载的知识库分区。"""
+
+    def __init__(
+        self,
+        db_client: MilvusClient,
+        collection_name: str,
+        *,
+        idle_seconds: float,
+        memory_budget_bytes: int = 0,
+        row_bytes: Optional[int] = None,
+        check_interval: float = 60,
+    ) -> None:
+        self.db_client = db_client
+        self.collection_name = collection_name
+        self.idle_seconds = idle_seconds
+        self.memory_budget_bytes = memory_budget_bytes
+        self.row_bytes = row_bytes or estimate_row_bytes()
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        # 按最近使用时间排序，最久未使用的在最前
+        self._loaded: "OrderedDict[str, _LoadedPartition]" = OrderedDict()
+        self._single_flight = SingleFlight()
+        self._load_latency = LatencyStats()
+        self._cold_hit_latency = LatencyStats()
+        self._releases = 0
+        self._evictions = 0
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # 加载
+    # ------------------------------------------------------------------
+    def touch(self, partition_names: Iterable[str]) -> bool:
+        """记录访问；全部分区均已加载时返回 True（无需加载）。"""
+
+        now = time.monotonic()
+        hot = True
+        with self._lock:
+            for name in partition_names:
+                entry = self._loaded.get(name)
+                if entry is None:
+                    hot = False
+                    continue
+                entry.last_used = now
+                self._loaded.move_to_end(name)
+        return hot
+
+    def ensure_loaded(self, partition_names: List[str]) -> float:
+        """
+        确保分区已加载，冷分区当场加载（并发请求同一分区只加载一次）。
+
+        Returns:
+            冷命中等待的耗时（毫秒），全部命中时为 0
+        """
+        if self.touch(partition_names):
+            return 0.0
+
+        started = time.perf_counter()
+        with self._lock:
+            cold = [name for name in partition_names if name not in self._loaded]
+        for name in cold:
+            self._single_flight.do(make_key("partition_load", self.collection_name, name), lambda: self._load(name))
+        elapsed = (time.perf_counter() - started) * 1000
+        if cold:
+            self._cold_hit_latency.add(elapsed)
+            self._enforce_budget(protected=set(partition_names))
+        return elapsed
+
+    def invalidate(self, partition_names: Iterable[str]) -> None:
+        """标记分区为未加载（被其他 worker 释放或已删除）。"""
+
+        with self._lock:
+            for name in partition_names:
+                self._loaded.pop(name, None)
+
+    def _load(self, partition_name: str) -> None:
+        with self._lock:
+            if partition_name in self._loaded:
+                return
+        started = time.perf_counter()
+        self.db_client.load_partitions(collection_name=self.collection_name, partition_names=[partition_name])
+        elapsed = (time.perf_counter() - started) * 1000
+        self._load_latency.add(elapsed)
+        self._register(partition_name)
+        logger.info(f"已加载知识库分区 {partition_name}，耗时 {elapsed:.0f}ms")
+
+    def _register(self, partition_name: str) -> None:
+        stats = self.db_client.get_partition_stats(
+            collection_name=self.collection_name, partition_name=partition_name
+        )
+        row_count = int(stats.get("row_count", 0))
+        now = time.monotonic()
+        with self._lock:
+            self._loaded[partition_name] = _LoadedPartition(
+                partition_name=partition_name,
+                row_count=row_count,
+                estimated_bytes=row_count * self.row_bytes,
+                loaded_at=now,
+                last_used=now,
+            )
+            self._loaded.move_to_end(partition_name)
+
+    def sync(self) -> None:
+        """从 Milvus 读取当前已加载的分区（启动时调用），视为刚被访问过。"""
+
+        names = [
+            name
+            for name in self.db_client.list_partitions(collection_name=self.collection_name)
+            if name != "_default"
+        ]
+        for name in names:
+            state = self.db_client.get_load_state(collection_name=self.collection_name, partition_name=name)
+            if state.get("state") == LoadState.Loaded:
+                self._register(name)
+        self._enforce_budget(protected=set())
+
+    # ------------------------------------------------------------------
+    # 释放
+    # ------------------------------------------------------------------
+    def release_idle(self) -> List[str]:
+        """释放空闲超时的分区，返回被释放的分区名。"""
+
+        deadline = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [name for name, entry in self._loaded.items() if entry.last_used < deadline]
+        for name in idle:
+            self._release(name)
+        return idle
+
+    def _enforce_budget(self, protected: set) -> None:
+        if self.memory_budget_bytes <= 0:
+            return
+        while True:
+            with self._lock:
+                total = sum(entry.estimated_bytes for entry in self._loaded.values())
+                if total <= self.memory_budget_bytes:
+                    return
+                victim = next((name for name in self._loaded if name not in protected), None)
+            if victim is None:
+                logger.warning(
+                    f"当前请求的知识库分区估算内存 {total / 1024 / 1024:.0f}MB 超过预算 "
+                    f"{self.memory_budget_bytes / 1024 / 1024:.0f}MB"
+                )
+                return
+            self._release(victim)
+            self._evictions += 1
+
+    def _release(self, partition_name: str) -> None:
+        with self._lock:
+            if self._loaded.pop(partition_name, None) is None:
+                return
+        started = time.perf_counter()
+        try:
+            self.db_client.release_partitions(collection_name=self.collection_name, partition_names=[partition_name])
+        except Exception as exc:  # noqa: BLE001 - 释放失败不影响检索，下个周期重试
+            logger.warning(f"释放知识库分区 {partition_name} 失败: {exc}")
+            self._register(partition_name)
+            return
+        self._releases += 1
+        logger.info(f"已释放知识库分区 {partition_name}，耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            loaded = [
+                {
+                    "partition_name": entry.partition_name,
+                    "row_count": entry.row_count,
+                    "estimated_mb": round(entry.estimated_bytes / 1024 / 1024, 1),
+                    "idle_seconds": round(now - entry.last_used, 1),
+                }
+                for entry in reversed(self._loaded.values())
+            ]
+            total = sum(entry.estimated_bytes for entry in self._loaded.values())
+        return {
+            "loaded": loaded,
+            "estimated_mb": round(total / 1024 / 1024, 1),
+            "memory_budget_mb": round(self.memory_budget_bytes / 1024 / 1024, 1),
+            "idle_seconds": self.idle_seconds,
+            "releases": self._releases,
+            "evictions": self._evictions,
+            "load_latency": self._load_latency.to_dict(),
+            "cold_hit_latency": self._cold_hit_latency.to_dict(),
+        }
+
+    # ------------------------------------------------------------------
+    # 后台释放
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """同步当前加载状态并启动空闲分区释放线程（重复调用无副作用）。"""
+
+        if self._thread is not None:
+            return
+        self.sync()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="partition-release", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"知识库分区按需加载已启用：空闲 {self.idle_seconds}s 释放，"
+            f"内存预算 {self.memory_budget_bytes // 1024 // 1024 or '不限'}MB，当前已加载 {len(self._loaded)} 个分区"
+        )
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=1)
+        self._thread = None
+
+    def prefetch(self, partition_names: List[str]) -> None:
+        """在后台线程中预热分区（不阻塞调用方）。"""
+
+        def run() -> None:
+            try:
+                self.ensure_loaded(partition_names)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning(f"预热知识库分区失败 {partition_names}: {exc}")
+
+        threading.Thread(target=run, name="partition-prefetch", daemon=True).start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.release_idle()
+            except Exception as exc:  # noqa: BLE001 - 检查失败不能终止线程
+                logger.error(f"释放空闲知识库分区失败: {exc}")
+
+
+_manager: Optional[PartitionLoadManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_load_manager() -> Optional[PartitionLoadManager]:
+    """进程级的分区加载管理器；未启用、非 Milvus 后端或非每知识库分区布局时返回 None。"""
+
+    global _manager
+    if (
+        not settings.vector_load_management
+        or settings.vector_backend != VECTOR_BACKEND_MILVUS
+        or settings.vector_partition_mode != PARTITION_MODE_PER_KB
+    ):
+        return None
+    with _manager_lock:
+        if _manager is None:
+            # 延迟导入：db_client 在导入时连接 Milvus
+            from qans_server.db.vector.base import db_client
+            from qans_server.db.vector.collections.doc_chunk import COLLECTION_NAME
+
+            _manager = PartitionLoadManager(
+                db_client,
+                COLLECTION_NAME,
+                idle_seconds=settings.vector_load_idle_seconds,
+                memory_budget_bytes=settings.vector_load_memory_budget_mb * 1024 * 1024,
+                check_interval=settings.vector_load_check_interval,
+            )
+        return _manager
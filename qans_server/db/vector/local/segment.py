@@ -0,0 +1,193 @@
+"""本地向量后端的数据段。
+
+数据段写入后不再修改（删除通过知识库清单中的删除记录实现），目录结构：
+
+- ``ids.npy``：按升序排列的主键（int64）
+- ``vectors.npy``：float32 向量矩阵，以 mmap 方式打开
+- ``rows.jsonl``：每行一个分块的 doc_id / chunk_id / text / meta
+- ``bm25.npz``：BM25 倒排表
+- ``ivf.npz``：可选的 IVF 聚类（行数足够多时生成）
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from qans_server.db.vector.local.bm25 import InvertedIndex
+from qans_server.util.vector_util import VECTOR_DTYPE
+
+# 每个聚类平均行数低于该值时不建 IVF，直接精确检索
+IVF_MIN_ROWS_PER_LIST = 8
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE_PER_LIST = 256
+# 打分时每批处理的行数，限制临时内存
+_SCORE_BATCH_ROWS = 65536
+
+
+def similarity(matrix: np.ndarray, query: np.ndarray, metric_type: str) -> np.ndarray:
+    """按度量计算相似度（越大越相似；L2 返回负的平方距离）。"""
+
+    metric_type = metric_type.upper()
+    if metric_type == "L2":
+        return -np.sum((matrix - query) ** 2, axis=1)
+    scores = matrix @ query
+    if metric_type == "COSINE":
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        scores = scores / np.maximum(norms, 1e-12)
+    return scores
+
+
+def _pairwise(matrix: np.ndarray, centroids: np.ndarray, metric_type: str) -> np.ndarray:
+    scores = matrix @ centroids.T
+    if metric_type.upper() == "L2":
+        scores = 2 * scores - np.sum(centroids ** 2, axis=1)
+    return scores
+
+
+class IvfIndex:
+    """IVF 聚类：``order[offsets[i]:offsets[i + 1]]`` 为第 i 个聚类的段内行号。"""
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray) -> None:
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: int, metric_type: str, seed: int = 0) -> "IvfIndex":
+        rng = np.random.default_rng(seed)
+        rows = len(vectors)
+        sample_size = min(rows, nlist * _KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(rows, sample_size, replace=False))], dtype=VECTOR_DTYPE)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            assign = np.argmax(_pairwise(sample, centroids, metric_type), axis=1)
+            for i in range(nlist):
+                members = sample[assign == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            if metric_type.upper() != "L2":
+                centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        assign = np.concatenate([
+            np.argmax(_pairwise(np.asarray(vectors[start:start + _SCORE_BATCH_ROWS]), centroids, metric_type), axis=1)
+            for start in range(0, rows, _SCORE_BATCH_ROWS)
+        ])
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        return cls(centroids, order, offsets)
+
+    def candidates(self, query: np.ndarray, nprobe: int, metric_type: str) -> np.ndarray:
+        """与查询最接近的 ``nprobe`` 个聚类中的行号。"""
+
+        scores = _pairwise(query.reshape(1, -1), self.centroids, metric_type)[0]
+        nprobe = min(max(nprobe, 1), len(self.centroids))
+        lists = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+    def save(self, path: Path) -> None:
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path: Path) -> "IvfIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["centroids"], data["order"], data["offsets"])
+
+
+class Segment:
+    """只读数据段。"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.name = path.name
+        self.ids: np.ndarray = np.load(path / "ids.npy")
+        self.vectors: np.ndarray = np.load(path / "vectors.npy", mmap_mode="r")
+        with open(path / "rows.jsonl", encoding="utf-8") as fp:
+            self.rows: List[dict] = [json.loads(line) for line in fp]
+        self.bm25 = InvertedIndex.load(path / "bm25.npz")
+        ivf_path = path / "ivf.npz"
+        self.ivf: Optional[IvfIndex] = IvfIndex.load(ivf_path) if ivf_path.exists() else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def locate(self, pks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """查找主键所在行，返回 (命中的主键下标, 段内行号)。"""
+
+        positions = np.searchsorted(self.ids, pks)
+        positions = np.minimum(positions, max(len(self.ids) - 1, 0))
+        found = np.flatnonzero(self.ids[positions] == pks) if len(self.ids) else np.empty(0, dtype=np.int64)
+        return found, positions[found]
+
+    def dense_search(
+        self,
+        query: np.ndarray,
+        live: np.ndarray,
+        limit: int,
+        metric_type: str,
+        nprobe: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """返回 (段内行号, 相似度)，按相似度降序。"""
+
+        if self.ivf is not None:
+            rows = np.sort(self.ivf.candidates(query, nprobe, metric_type))
+            rows = rows[live[rows]]
+            scores = similarity(np.asarray(self.vectors[rows]), query, metric_type)
+        else:
+            rows = np.flatnonzero(live)
+            scores = np.concatenate([
+                similarity(np.asarray(self.vectors[start:start + _SCORE_BATCH_ROWS]), query, metric_type)
+                for start in range(0, len(self), _SCORE_BATCH_ROWS)
+            ])[rows] if len(rows) else np.empty(0, dtype=VECTOR_DTYPE)
+
+        if len(rows) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def row(self, index: int, knowledge_base_id: int, fields: List[str]) -> dict:
+        stored = self.rows[index]
+        item = {}
+        for field in fields:
+            if field == "id":
+                item["id"] = int(self.ids[index])
+            elif field == "knowledge_base_id":
+                item["knowledge_base_id"] = knowledge_base_id
+            elif field == "vector":
+                item["vector"] = np.array(self.vectors[index], dtype=VECTOR_DTYPE)
+            elif field in stored:
+                item[field] = stored[field]
+        return item
+
+    @classmethod
+    def write(
+        cls,
+        path: Path,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        rows: List[dict],
+        metric_type: str,
+        nlist: int = 0,
+    ) -> "Segment":
+        """写入新数据段（先写临时目录再原子改名），行需已按主键升序排列。"""
+
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        np.save(tmp_path / "ids.npy", np.asarray(ids, dtype=np.int64))
+        np.save(tmp_path / "vectors.npy", np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE))
+        with open(tmp_path / "rows.jsonl", "w", encoding="utf-8") as fp:
+            for row in rows:
+                fp.write(json.dumps(row, ensure_ascii=False) + "\n")
+        InvertedIndex.build(row.get("text") or "" for row in rows).save(tmp_path / "bm25.npz")
+        if nlist > 0 and len(ids) >= nlist * IVF_MIN_ROWS_PER_LIST:
+            IvfIndex.build(vectors, nlist, metric_type).save(tmp_path / "ivf.npz")
+        # 清单之外的残留段目录（上次写入中断）直接覆盖
+        shutil.rmtree(path, ignore_errors=True)
+        tmp_path.replace(path)
+        return cls(path)
@@ -0,0 +1,404 @@
+"""本地向量存储。
+
+每个知识库一个目录，由若干只读数据段与清单 ``manifest.json`` 组成：每次写入生成一个新的增量段，
+upsert / 删除只在清单中为旧段记录被删除的主键；段数量超过 ``VECTOR_LOCAL_MAX_SEGMENTS``
+或删除比例过高时合并为一个段（合并后的段行数足够时建 IVF 聚类）。
+
+清单变化后自动重新加载，其他进程的写入可见；但写入之间没有跨进程锁，
+本地后端只适用于单个写入进程的部署（小规模部署、边缘环境与测试）。
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from qans_server.db.vector.local.bm25 import bm25_search
+from qans_server.db.vector.local.segment import Segment
+from qans_server.db.vector.maintenance import SMALL_SEGMENT_ROWS, SegmentHealth
+from qans_server.util.vector_util import VECTOR_DTYPE, as_matrix
+
+MANIFEST_NAME = "manifest.json"
+# 已删除行占比超过该值时合并数据段
+_COMPACT_DELETED_RATIO = 0.3
+# 附加过滤条件求值时读取的字段
+_FILTER_FIELDS = ["id", "doc_id", "chunk_id", "knowledge_base_id", "meta"]
+# 段目录在并发合并中被删除时重新加载清单的次数
+_RELOAD_ATTEMPTS = 3
+
+
+@dataclass(frozen=True)
+class _KbState:
+    """知识库某一时刻的数据段与有效行掩码（读取时使用的快照）。"""
+
+    version: Tuple[int, int]
+    next_seq: int
+    segments: Tuple[Segment, ...] = ()
+    live: Tuple[np.ndarray, ...] = ()
+    deleted: Dict[str, List[int]] = field(default_factory=dict)
+
+    @property
+    def live_count(self) -> int:
+        return sum(int(mask.sum()) for mask in self.live)
+
+    @property
+    def total_count(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+
+_EMPTY_STATE = _KbState(version=(0, 0), next_seq=1)
+
+
+class LocalVectorStore:
+    """按知识库分目录的本地向量与 BM25 存储。"""
+
+    def __init__(
+        self,
+        directory: Path,
+        dim: int,
+        metric_type: str = "COSINE",
+        nlist: int = 0,
+        max_segments: int = 8,
+    ) -> None:
+        self.directory = Path(directory)
+        self.dim = dim
+        self.metric_type = metric_type
+        self.nlist = nlist
+        self.max_segments = max(max_segments, 1)
+        self._lock = threading.RLock()
+        self._states: Dict[int, _KbState] = {}
+        self._segments: Dict[Path, Segment] = {}
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def knowledge_base_ids(self) -> List[int]:
+        if not self.directory.exists():
+            return []
+        ids = []
+        for path in self.directory.glob("kb_*"):
+            suffix = path.name[len("kb_"):]
+            if path.is_dir() and suffix.isdigit():
+                ids.append(int(suffix))
+        return sorted(ids)
+
+    def count(self, knowledge_base_id: int) -> int:
+        return self._state(knowledge_base_id).live_count
+
+    def segment_health(self) -> SegmentHealth:
+        """统计全部知识库的数据段数量与已删除行比例（本地后端没有 growing 段）。"""
+
+        health = SegmentHealth()
+        for kb_id in self.knowledge_base_ids():
+            state = self._state(kb_id)
+            health.segment_count += len(state.segments)
+            health.small_segment_count += sum(1 for segment in state.segments if len(segment) < SMALL_SEGMENT_ROWS)
+            health.stored_rows += state.total_count
+            health.live_rows += state.live_count
+        return health
+
+    def get_rows(self, pks: Iterable[int], fields: Sequence[str]) -> Dict[int, dict]:
+        """按主键获取行（不存在或已删除的主键会被忽略）。"""
+
+        wanted = np.unique(np.fromiter(pks, dtype=np.int64))
+        result: Dict[int, dict] = {}
+        if not len(wanted):
+            return result
+        for kb_id in self.knowledge_base_ids():
+            state = self._state(kb_id)
+            for segment, live in zip(state.segments, state.live):
+                _, rows = segment.locate(wanted)
+                for row in rows[live[rows]]:
+                    item = segment.row(int(row), kb_id, list(fields))
+                    result[int(segment.ids[row])] = item
+        return result
+
+    def pks_in_range(self, start: int, end: int) -> List[int]:
+        """主键在 [start, end) 内的全部有效行。"""
+
+        pks: List[int] = []
+        for kb_id in self.knowledge_base_ids():
+            state = self._state(kb_id)
+            for segment, live in zip(state.segments, state.live):
+                lo, hi = np.searchsorted(segment.ids, [start, end])
+                pks.extend(int(pk) for pk in segment.ids[lo:hi][live[lo:hi]])
+        return sorted(pks)
+
+    def iter_rows(
+        self,
+        knowledge_base_id: int,
+        fields: Sequence[str],
+        batch_size: int = 1000,
+    ) -> Iterator[List[dict]]:
+        state = self._state(knowledge_base_id)
+        batch: List[dict] = []
+        for segment, live in zip(state.segments, state.live):
+            for row in np.flatnonzero(live):
+                batch.append(segment.row(int(row), knowledge_base_id, list(fields)))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def search_dense(
+        self,
+        knowledge_base_ids: Sequence[int],
+        query_vector: np.ndarray,
+        limit: int,
+        nprobe: int = 16,
+        row_filter: Optional[Callable[[dict], bool]] = None,
+    ) -> List[Tuple[int, float]]:
+        """稠密向量检索，返回按相似度降序的 (主键, 相似度)；``row_filter`` 为附加的行过滤条件。"""
+
+        query = np.asarray(query_vector, dtype=VECTOR_DTYPE).reshape(-1)
+        hits: List[Tuple[int, float]] = []
+        for kb_id in knowledge_base_ids:
+            state = self._state(kb_id)
+            for segment, live in zip(state.segments, self._live_masks(kb_id, state, row_filter)):
+                rows, scores = segment.dense_search(query, live, limit, self.metric_type, nprobe)
+                hits.extend(zip(segment.ids[rows].tolist(), scores.tolist()))
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:limit]
+
+    def search_bm25(
+        self,
+        knowledge_base_ids: Sequence[int],
+        query: str,
+        limit: int,
+        drop_ratio: float = 0.0,
+        row_filter: Optional[Callable[[dict], bool]] = None,
+    ) -> List[Tuple[int, float]]:
+        """BM25 全文检索，返回按分数降序的 (主键, 分数)。"""
+
+        segments: List[Segment] = []
+        live: List[np.ndarray] = []
+        for kb_id in knowledge_base_ids:
+            state = self._state(kb_id)
+            segments.extend(state.segments)
+            live.extend(self._live_masks(kb_id, state, row_filter))
+        hits = bm25_search([(segment.bm25, mask) for segment, mask in zip(segments, live)], query, limit, drop_ratio)
+        return [(int(segments[index].ids[row]), score) for index, row, score in hits]
+
+    @staticmethod
+    def _live_masks(
+        kb_id: int,
+        state: _KbState,
+        row_filter: Optional[Callable[[dict], bool]],
+    ) -> List[np.ndarray]:
+        """有效行掩码，指定 ``row_filter`` 时只保留满足条件的行（逐行求值）。"""
+
+        if row_filter is None:
+            return list(state.live)
+        masks = []
+        for segment, live in zip(state.segments, state.live):
+            mask = live.copy()
+            for row in np.flatnonzero(live):
+                mask[row] = row_filter(segment.row(int(row), kb_id, _FILTER_FIELDS))
+            masks.append(mask)
+        return masks
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def upsert(self, rows: List[dict]) -> int:
+        """
+        写入行（按主键覆盖），每个知识库生成一个新的增量段。
+
+        Args:
+            rows: 行数据，需包含 id / vector / doc_id / chunk_id / knowledge_base_id / text / meta
+        """
+
+        groups: Dict[int, Dict[int, dict]] = {}
+        for row in rows:
+            # 同一批中重复的主键以最后一行为准
+            groups.setdefault(int(row["knowledge_base_id"]), {})[int(row["id"])] = row
+
+        with self._lock:
+            for kb_id, group in groups.items():
+                self._append_segment(kb_id, [group[pk] for pk in sorted(group)])
+        return sum(len(group) for group in groups.values())
+
+    def delete(self, pks: Iterable[int]) -> int:
+        """按主键删除，返回实际删除的行数。"""
+
+        wanted = np.unique(np.fromiter(pks, dtype=np.int64))
+        if not len(wanted):
+            return 0
+        deleted = 0
+        with self._lock:
+            for kb_id in self.knowledge_base_ids():
+                deleted += self._mark_deleted(kb_id, wanted)
+        return deleted
+
+    def delete_knowledge_base(self, knowledge_base_id: int) -> int:
+        """删除知识库目录，返回删除前的有效行数。"""
+
+        with self._lock:
+            count = self.count(knowledge_base_id)
+            shutil.rmtree(self._kb_dir(knowledge_base_id), ignore_errors=True)
+            self._states.pop(knowledge_base_id, None)
+            self._forget_segments(self._kb_dir(knowledge_base_id))
+        return count
+
+    def compact(self, knowledge_base_id: int) -> bool:
+        """把知识库的全部有效行合并为一个数据段，返回是否执行了合并。"""
+
+        with self._lock:
+            state = self._state(knowledge_base_id)
+            if not state.segments or (len(state.segments) == 1 and state.live_count == state.total_count):
+                return False
+
+            kb_dir = self._kb_dir(knowledge_base_id)
+            parts = [(segment, np.flatnonzero(live)) for segment, live in zip(state.segments, state.live)]
+            ids = np.concatenate([segment.ids[rows] for segment, rows in parts])
+            order = np.argsort(ids, kind="stable")
+            segments = []
+            if len(ids):
+                vectors = np.concatenate([np.asarray(segment.vectors[rows]) for segment, rows in parts])
+                stored = [segment.rows[row] for segment, rows in parts for row in rows]
+                name = self._segment_name(state.next_seq)
+                Segment.write(
+                    kb_dir / name,
+                    ids[order],
+                    vectors[order],
+                    [stored[i] for i in order],
+                    self.metric_type,
+                    self.nlist,
+                )
+                segments.append(name)
+            self._write_manifest(knowledge_base_id, state.next_seq + 1, segments, {})
+            for segment in state.segments:
+                shutil.rmtree(segment.path, ignore_errors=True)
+            self._forget_segments(kb_dir)
+            logger.info(f"本地向量库知识库 {knowledge_base_id}: {len(state.segments)} 个数据段已合并，有效行 {len(ids)}")
+            return True
+
+    def _append_segment(self, kb_id: int, rows: List[dict]) -> None:
+        state = self._state(kb_id)
+        ids = np.fromiter((int(row["id"]) for row in rows), dtype=np.int64, count=len(rows))
+        vectors = as_matrix([np.asarray(row["vector"], dtype=VECTOR_DTYPE) for row in rows])
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"向量维度不匹配: 期望 {self.dim}，实际 {vectors.shape[1]}")
+
+        name = self._segment_name(state.next_seq)
+        Segment.write(
+            self._kb_dir(kb_id) / name,
+            ids,
+            vectors,
+            [
+                {"doc_id": row["doc_id"], "chunk_id": row["chunk_id"], "text": row.get("text") or "", "meta": row.get("meta") or {}}
+                for row in rows
+            ],
+            self.metric_type,
+        )
+
+        # 旧段中被覆盖的主键记为已删除
+        deleted = {key: list(value) for key, value in state.deleted.items()}
+        for segment, live in zip(state.segments, state.live):
+            _, positions = segment.locate(ids)
+            overwritten = positions[live[positions]]
+            if len(overwritten):
+                deleted.setdefault(segment.name, []).extend(segment.ids[overwritten].tolist())
+        names = [segment.name for segment in state.segments] + [name]
+        self._write_manifest(kb_id, state.next_seq + 1, names, deleted)
+        self._maybe_compact(kb_id)
+
+    def _mark_deleted(self, kb_id: int, pks: np.ndarray) -> int:
+        state = self._state(kb_id)
+        deleted = {key: list(value) for key, value in state.deleted.items()}
+        count = 0
+        for segment, live in zip(state.segments, state.live):
+            _, positions = segment.locate(pks)
+            removed = positions[live[positions]]
+            if len(removed):
+                deleted.setdefault(segment.name, []).extend(segment.ids[removed].tolist())
+                count += len(removed)
+        if count:
+            self._write_manifest(kb_id, state.next_seq, [segment.name for segment in state.segments], deleted)
+            self._maybe_compact(kb_id)
+        return count
+
+    def _maybe_compact(self, kb_id: int) -> None:
+        state = self._state(kb_id)
+        total = state.total_count
+        if len(state.segments) > self.max_segments or (total and 1 - state.live_count / total > _COMPACT_DELETED_RATIO):
+            self.compact(kb_id)
+
+    # ------------------------------------------------------------------
+    # 清单
+    # ------------------------------------------------------------------
+    def _kb_dir(self, kb_id: int) -> Path:
+        return self.directory / f"kb_{kb_id}"
+
+    @staticmethod
+    def _segment_name(seq: int) -> str:
+        return f"seg_{seq:08d}"
+
+    def _state(self, kb_id: int) -> _KbState:
+        manifest_path = self._kb_dir(kb_id) / MANIFEST_NAME
+        for attempt in range(_RELOAD_ATTEMPTS):
+            try:
+                stat = manifest_path.stat()
+            except FileNotFoundError:
+                return _EMPTY_STATE
+            # 清单总是整体替换，(inode, 修改时间) 变化即表示有新的写入
+            version = (stat.st_ino, stat.st_mtime_ns)
+            cached = self._states.get(kb_id)
+            if cached is not None and cached.version == version:
+                return cached
+            try:
+                state = self._load_state(kb_id, manifest_path, version)
+            except FileNotFoundError:
+                # 其他进程正在合并数据段，重新读取清单
+                if attempt == _RELOAD_ATTEMPTS - 1:
+                    raise
+                continue
+            self._states[kb_id] = state
+            return state
+        return _EMPTY_STATE
+
+    def _load_state(self, kb_id: int, manifest_path: Path, version: Tuple[int, int]) -> _KbState:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        kb_dir = self._kb_dir(kb_id)
+        deleted: Dict[str, List[int]] = manifest.get("deleted", {})
+        segments = []
+        live = []
+        for name in manifest.get("segments", []):
+            path = kb_dir / name
+            segment = self._segments.get(path)
+            if segment is None:
+                segment = Segment(path)
+                self._segments[path] = segment
+            mask = np.ones(len(segment), dtype=bool)
+            if deleted.get(name):
+                mask &= ~np.isin(segment.ids, np.asarray(deleted[name], dtype=np.int64))
+            segments.append(segment)
+            live.append(mask)
+        return _KbState(version, int(manifest.get("next_seq", 1)), tuple(segments), tuple(live), deleted)
+
+    def _write_manifest(self, kb_id: int, next_seq: int, segments: List[str], deleted: Dict[str, List[int]]) -> None:
+        kb_dir = self._kb_dir(kb_id)
+        kb_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "next_seq": next_seq,
+            "segments": segments,
+            "deleted": {name: pks for name, pks in deleted.items() if name in segments and pks},
+        }
+        tmp_path = kb_dir / f".{MANIFEST_NAME}.tmp"
+        tmp_path.write_text(json.dumps(manifest), encoding="utf-8")
+        tmp_path.replace(kb_dir / MANIFEST_NAME)
+        self._states.pop(kb_id, None)
+
+    def _forget_segments(self, kb_dir: Path) -> None:
+        for path in [path for path in self._segments if path.parent == kb_dir]:
+            if not path.exists():
+                del self._segments[path]
+
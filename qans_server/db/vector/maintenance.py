@@ -0,0 +1,92 @@
+"""向量集合段健康度统计与压缩。
+
+频繁的重新向量化与知识库删除会在集合中留下大量删除记录（L0 段）与小段，检索时需要
+逐段过滤删除行、合并更多段的结果，延迟随时间上升。这里根据 DataCoord 的段信息统计段数量、
+已删除行比例与 growing 段大小，供维护调度器判断是否需要 flush / compaction。
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from pymilvus import MilvusClient
+
+# DataCoord 段状态（common.SegmentState）
+_SEGMENT_GROWING = 2
+_SEGMENT_DROPPED = (1, 6)
+# 段级别（common.SegmentLevel）：L0 段只保存删除记录
+_SEGMENT_LEVEL_L0 = 1
+
+# 行数低于该值的已封存段视为小段
+SMALL_SEGMENT_ROWS = 10_000
+# 等待压缩任务完成时的状态查询间隔（秒）
+_COMPACTION_POLL_INTERVAL = 5.0
+
+
+@dataclass
+class SegmentHealth:
+    """集合的段健康度指标。"""
+
+    segment_count: int = 0
+    small_segment_count: int = 0
+    growing_segment_count: int = 0
+    growing_rows: int = 0
+    l0_segment_count: int = 0
+    # 段中存储的行数（含已删除但尚未压缩掉的行）
+    stored_rows: int = 0
+    live_rows: int = 0
+
+    @property
+    def deleted_ratio(self) -> float:
+        if self.stored_rows <= 0:
+            return 0.0
+        return max(0.0, 1 - self.live_rows / self.stored_rows)
+
+    def to_dict(self) -> dict:
+        return dict(asdict(self), deleted_ratio=round(self.deleted_ratio, 4))
+
+
+def collect_segment_health(db_client: MilvusClient, collection_name: str) -> SegmentHealth:
+    """统计集合的段数量、已删除行比例与 growing 段大小。"""
+
+    infos = db_client._get_connection().get_persistent_segment_infos(collection_name)
+    health = SegmentHealth()
+    for info in infos:
+        if info.state in _SEGMENT_DROPPED:
+            continue
+        if info.level == _SEGMENT_LEVEL_L0:
+            health.l0_segment_count += 1
+            continue
+        health.segment_count += 1
+        health.stored_rows += info.num_rows
+        if info.state == _SEGMENT_GROWING:
+            health.growing_segment_count += 1
+            health.growing_rows += info.num_rows
+        elif info.num_rows < SMALL_SEGMENT_ROWS:
+            health.small_segment_count += 1
+
+    result = db_client.query(collection_name=collection_name, filter="", output_fields=["count(*)"])
+    health.live_rows = int(result[0]["count(*)"]) if result else 0
+    return health
+
+
+def compact_collection(
+    db_client: MilvusClient,
+    collection_name: str,
+    timeout: Optional[float] = None,
+) -> bool:
+    """
+    触发集合压缩（合并小段、清理删除记录）并等待完成。
+
+    Returns:
+        是否在超时前完成
+    """
+    job_id = db_client.compact(collection_name=collection_name)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while db_client.get_compaction_state(job_id) != "Completed":
+        if deadline is not None and time.monotonic() > deadline:
+            return False
+        time.sleep(_COMPACTION_POLL_INTERVAL)
+    return True
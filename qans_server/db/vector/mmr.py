@@ -0,0 +1,58 @@
+"""最大边际相关（Maximal Marginal Relevance）多样性选择。
+
+相邻分块共享 ``chunk_overlap`` 的文本，同一小节的多个分块常常一起被召回，内容几乎相同。
+MMR 每一步选择 ``λ · 与问题的相似度 − (1 − λ) · 与已选分块的最大相似度`` 最大的候选，
+在相关性与多样性之间折中；与已选分块过于相似的候选直接剔除，减少发送给大模型的重复内容。
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+
+from qans_server.util.vector_util import as_matrix, normalize_rows
+
+
+def mmr_select(
+    query_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int,
+    *,
+    lambda_mult: float = 0.7,
+    duplicate_threshold: float = 1.0,
+) -> List[int]:
+    """
+    用 MMR 从候选中选出至多 ``k`` 个，返回按选择顺序排列的候选下标。
+
+    Args:
+        query_vector: 查询向量
+        candidate_vectors: 候选向量矩阵（N×D），与查询向量处于同一向量空间
+        k: 选择数量
+        lambda_mult: 相关性权重 λ，1 表示只看相关性，0 表示只看多样性
+        duplicate_threshold: 与任一已选候选的余弦相似度达到该值的候选被剔除，大于等于 1 时不剔除
+    """
+    matrix = normalize_rows(as_matrix(candidate_vectors).copy())
+    size = len(matrix)
+    if size == 0 or k <= 0:
+        return []
+
+    query = np.asarray(query_vector, dtype=matrix.dtype)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = matrix @ query
+    similarity = matrix @ matrix.T
+
+    selected: List[int] = []
+    available = np.ones(size, dtype=bool)
+    # 与已选候选的最大相似度（尚未选择时不惩罚）
+    max_similarity = np.zeros(size, dtype=matrix.dtype)
+    while len(selected) < k and available.any():
+        penalty = max_similarity if selected else 0.0
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * penalty, -np.inf)
+        index = int(np.argmax(scores))
+        selected.append(index)
+        available[index] = False
+        max_similarity = similarity[index] if len(selected) == 1 else np.maximum(max_similarity, similarity[index])
+        if duplicate_threshold < 1:
+            available &= max_similarity < duplicate_threshold
+    return selected
@@ -0,0 +1,372 @@
+"""向量降维。
+
+向量模型支持 Matryoshka 表示时直接截断前 ``vector_dim`` 维；否则按知识库拟合 PCA 投影
+（见 ``tools/fit_vector_projection.py``），投影矩阵保存在 ``VECTOR_PROJECTION_DIR`` 下，
+未单独拟合的知识库使用共用投影 ``default``，两者都不存在时退化为截断。
+降维后重新做 L2 归一化；文档向量与查询向量必须使用同一投影。
+
+投影按版本保存（``<key>.v<version>.npz``，``<key>.npz`` 为最新版本）。知识库已有向量所用的投影
+（投影名与版本，或截断）记录在 ``bindings.json`` 中：记录存在时写入与查询都固定使用该版本，
+重新拟合不会改变已有知识库的降维方式，直到用新投影重新写入全部向量后再切换记录。
+没有记录的知识库（拟合之后新建的知识库）使用最新投影。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from qans_server.setting_config import settings
+from qans_server.util.vector_util import VECTOR_DTYPE, normalize_rows
+
+REDUCTION_TRUNCATE = "truncate"
+REDUCTION_PCA = "pca"
+
+# 未单独拟合投影的知识库共用的投影名
+DEFAULT_PROJECTION = "default"
+# 知识库与其向量所用投影的对应记录
+BINDINGS_FILE = "bindings.json"
+# 版本化之前保存的投影在固定到知识库时使用的版本号
+LEGACY_VERSION = "legacy"
+
+
+def kb_projection_key(knowledge_base_id: int) -> str:
+    """知识库专属投影的名称。"""
+
+    return f"kb_{knowledge_base_id}"
+
+
+@dataclass(frozen=True)
+class Projection:
+    """PCA 投影：``(x - mean) @ components.T``。"""
+
+    key: str
+    mean: np.ndarray
+    components: np.ndarray
+    model: str = ""
+    explained_variance: float = 0.0
+    version: str = ""
+
+    @property
+    def dim(self) -> int:
+        return int(self.components.shape[0])
+
+    @property
+    def model_dim(self) -> int:
+        return int(self.components.shape[1])
+
+    def apply(self, matrix: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray((matrix - self.mean) @ self.components.T, dtype=VECTOR_DTYPE)
+
+
+def fit_pca(matrix: np.ndarray, dim: int, key: str, model: str = "", version: str = "") -> Projection:
+    """
+    在样本向量上拟合 PCA 投影。
+
+    Args:
+        matrix: 样本向量（N×D，N 需不小于 dim）
+        dim: 目标维度
+        key: 投影名
+        model: 向量模型名称（用于校验投影与模型是否匹配）
+        version: 投影版本
+    """
+
+    samples = np.asarray(matrix, dtype=np.float64)
+    if samples.ndim != 2 or samples.shape[0] < dim or samples.shape[1] < dim:
+        raise ValueError(f"拟合 {dim} 维 PCA 至少需要 {dim} 条样本，实际样本形状: {samples.shape}")
+
+    mean = samples.mean(axis=0)
+    _, singular_values, vt = np.linalg.svd(samples - mean, full_matrices=False)
+    variance = singular_values ** 2
+    explained = float(variance[:dim].sum() / max(variance.sum(), np.finfo(np.float64).tiny))
+    return Projection(
+        key=key,
+        mean=mean.astype(VECTOR_DTYPE),
+        components=np.ascontiguousarray(vt[:dim], dtype=VECTOR_DTYPE),
+        model=model,
+        explained_variance=explained,
+        version=version,
+    )
+
+
+class ProjectionStore:
+    """投影文件存储（``<dir>/<key>.npz`` 与 ``<dir>/<key>.v<version>.npz``），文件变更后自动重新加载。"""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, str], Tuple[float, Projection]] = {}
+        self._bindings: Tuple[float, Dict[str, dict]] = (-1.0, {})
+
+    def path(self, key: str, version: str = "") -> Path:
+        """投影文件路径，``version`` 为空时为最新版本。"""
+
+        return self.directory / (f"{key}.v{version}.npz" if version else f"{key}.npz")
+
+    def load(self, key: str, version: str = "") -> Optional[Projection]:
+        """读取投影，``version`` 为空时读取最新版本。"""
+
+        path = self.path(key, version)
+        with self._lock:
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                self._cache.pop((key, version), None)
+                return None
+
+            cached = self._cache.get((key, version))
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    projection = Projection(
+                        key=key,
+                        mean=data["mean"].astype(VECTOR_DTYPE),
+                        components=np.ascontiguousarray(data["components"], dtype=VECTOR_DTYPE),
+                        model=str(data["model"]),
+                        explained_variance=float(data["explained_variance"]),
+                        version=str(data["version"]) if "version" in data.files else version,
+                    )
+            except (OSError, KeyError, ValueError) as exc:
+                logger.warning(f"读取向量投影失败 {path}: {exc}")
+                return None
+            self._cache[(key, version)] = (mtime, projection)
+            return projection
+
+    def save(self, projection: Projection, *, latest: bool = True) -> Path:
+        """保存投影：带版本时写入版本文件，``latest`` 时同时作为该投影名的最新版本。"""
+
+        paths = []
+        if projection.version:
+            paths.append(self.path(projection.key, projection.version))
+        if latest:
+            paths.append(self.path(projection.key))
+        for path in paths:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.stem + ".tmp.npz")
+            np.savez(
+                tmp_path,
+                mean=projection.mean,
+                components=projection.components,
+                model=np.array(projection.model),
+                explained_variance=np.array(projection.explained_variance),
+                version=np.array(projection.version),
+            )
+            tmp_path.replace(path)
+        return paths[-1]
+
+    def delete(self, key: str) -> bool:
+        try:
+            self.path(key).unlink()
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self._cache.pop((key, ""), None)
+        return True
+
+    # ------------------------------------------------------------------
+    # 知识库 → 投影版本
+    # ------------------------------------------------------------------
+    def binding(self, knowledge_base_id: int) -> Optional[Tuple[str, str]]:
+        """知识库向量所用的 (投影名, 版本)，截断为 ``("truncate", "")``；没有记录时返回 None。"""
+
+        entry = self._load_bindings().get(str(knowledge_base_id))
+        return (entry["key"], entry.get("version", "")) if entry else None
+
+    def bind(self, knowledge_base_ids: List[int], key: str, version: str = "") -> None:
+        """记录知识库的向量已用指定投影写入。"""
+
+        with self._lock:
+            bindings = dict(self._read_bindings())
+            for kb_id in knowledge_base_ids:
+                bindings[str(kb_id)] = {"key": key, "version": version}
+            path = self.directory / BINDINGS_FILE
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".json.tmp")
+            tmp_path.write_text(json.dumps(bindings, ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp_path.replace(path)
+
+    def _load_bindings(self) -> Dict[str, dict]:
+        with self._lock:
+            return self._read_bindings()
+
+    def _read_bindings(self) -> Dict[str, dict]:
+        # 调用方需持有 _lock
+        path = self.directory / BINDINGS_FILE
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return {}
+        if self._bindings[0] != mtime:
+            try:
+                self._bindings = (mtime, json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as exc:
+                logger.warning(f"读取向量投影记录失败 {path}: {exc}")
+                return self._bindings[1]
+        return self._bindings[1]
+
+
+class DimensionReducer:
+    """把向量模型输出的 ``model_dim`` 维向量降到 ``target_dim`` 维并重新归一化。"""
+
+    def __init__(
+        self,
+        model_dim: int,
+        target_dim: int,
+        method: str = REDUCTION_TRUNCATE,
+        store: ProjectionStore | None = None,
+        model: str = "",
+    ) -> None:
+        self.model_dim = model_dim
+        self.target_dim = target_dim
+        self.method = method
+        self.store = store
+        self.model = model
+        self._warned: set = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_dim < self.model_dim
+
+    def projection_for(self, knowledge_base_id: Optional[int]) -> Optional[Projection]:
+        """知识库使用的 PCA 投影（优先使用记录的版本）；截断模式或尚未拟合时返回 None。"""
+
+        if not self.enabled or self.method != REDUCTION_PCA or self.store is None:
+            return None
+        binding = self.store.binding(knowledge_base_id) if knowledge_base_id is not None else None
+        if binding is not None:
+            key, version = binding
+            if key == REDUCTION_TRUNCATE:
+                return None
+            projection = self.store.load(key, version)
+            if projection is not None:
+                return projection
+            self._warn_once(
+                f"bound_{knowledge_base_id}",
+                f"知识库 {knowledge_base_id} 的向量投影 {key} v{version} 文件不存在，改用最新投影（检索结果可能不准确）",
+            )
+        return self.latest_projection_for(knowledge_base_id)
+
+    def latest_projection_for(self, knowledge_base_id: Optional[int]) -> Optional[Projection]:
+        """不考虑记录时知识库应使用的最新 PCA 投影（专属投影优先，其次共用投影）。"""
+
+        if not self.enabled or self.method != REDUCTION_PCA or self.store is None:
+            return None
+        keys = [DEFAULT_PROJECTION]
+        if knowledge_base_id is not None:
+            keys.insert(0, kb_projection_key(knowledge_base_id))
+        for key in keys:
+            projection = self.store.load(key)
+            if projection is None:
+                continue
+            if projection.dim != self.target_dim or projection.model_dim != self.model_dim:
+                self._warn_once(key, f"向量投影 {key} 的维度 {projection.model_dim}→{projection.dim} 与配置不一致，已忽略")
+                continue
+            if projection.model and self.model and projection.model != self.model:
+                self._warn_once(key, f"向量投影 {key} 由模型 {projection.model} 拟合，与当前模型 {self.model} 不一致，已忽略")
+                continue
+            return projection
+        if knowledge_base_id is not None:
+            self._warn_once(f"missing_{knowledge_base_id}", f"知识库 {knowledge_base_id} 尚未拟合 PCA 投影，暂按截断降维")
+        return None
+
+    def projection_key(self, knowledge_base_id: Optional[int]) -> str:
+        """知识库使用的降维方式标识，标识相同的知识库可以共用同一个查询向量。"""
+
+        if not self.enabled:
+            return "identity"
+        projection = self.projection_for(knowledge_base_id)
+        if projection is None:
+            return REDUCTION_TRUNCATE
+        return f"{projection.key}@{projection.version}" if projection.version else projection.key
+
+    def pin(self, knowledge_base_ids: List[int]) -> None:
+        """
+        为尚无记录的知识库记录其当前使用的投影（缺少版本文件时另存一份），
+        之后重新拟合投影不会改变这些知识库的降维方式。
+        """
+        if not self.enabled or self.method != REDUCTION_PCA or self.store is None:
+            return
+        for kb_id in knowledge_base_ids:
+            if self.store.binding(kb_id) is not None:
+                continue
+            projection = self.latest_projection_for(kb_id)
+            if projection is None:
+                self.store.bind([kb_id], REDUCTION_TRUNCATE)
+                continue
+            if not projection.version:
+                projection = replace(projection, version=LEGACY_VERSION)
+            # 记录指向版本文件，之后保存的新版本不会覆盖它
+            if self.store.load(projection.key, projection.version) is None:
+                self.store.save(projection, latest=False)
+            self.store.bind([kb_id], projection.key, projection.version)
+
+    def reduce(self, matrix: np.ndarray, knowledge_base_id: Optional[int] = None) -> np.ndarray:
+        """降维并归一化，返回只读的 float32 矩阵（未启用降维时原样返回）。"""
+
+        if not self.enabled:
+            return matrix
+        return self.apply(matrix, self.projection_for(knowledge_base_id))
+
+    def apply(self, matrix: np.ndarray, projection: Optional[Projection]) -> np.ndarray:
+        """用指定投影（None 为截断）降维并归一化，返回只读的 float32 矩阵。"""
+
+        if projection is not None:
+            reduced = projection.apply(matrix)
+        else:
+            reduced = np.array(matrix[:, :self.target_dim], dtype=VECTOR_DTYPE)
+        normalize_rows(reduced)
+        reduced.setflags(write=False)
+        return reduced
+
+    def reduce_vector(self, vector: np.ndarray, knowledge_base_id: Optional[int] = None) -> np.ndarray:
+        if not self.enabled:
+            return vector
+        return self.reduce(vector.reshape(1, -1), knowledge_base_id)[0]
+
+    def group_knowledge_bases(self, knowledge_base_ids: List[int]) -> Dict[str, List[int]]:
+        """按降维方式对知识库分组，同组知识库共用一个查询向量。"""
+
+        groups: Dict[str, List[int]] = {}
+        for kb_id in knowledge_base_ids:
+            groups.setdefault(self.projection_key(kb_id), []).append(kb_id)
+        return groups
+
+    def _warn_once(self, key: str, message: str) -> None:
+        if key not in self._warned:
+            self._warned.add(key)
+            logger.warning(message)
+
+
+_store: ProjectionStore | None = None
+_reducer: DimensionReducer | None = None
+
+
+def get_projection_store() -> ProjectionStore:
+    """获取进程级的投影存储。"""
+
+    global _store
+    if _store is None:
+        _store = ProjectionStore(settings.vector_projection_dir)
+    return _store
+
+
+def get_dimension_reducer() -> DimensionReducer:
+    """获取进程级的降维器（按配置）。"""
+
+    global _reducer
+    if _reducer is None:
+        _reducer = DimensionReducer(
+            settings.embedding_dim,
+            settings.stored_vector_dim,
+            settings.vector_reduction,
+            store=get_projection_store(),
+            model=settings.embedding_model,
+        )
+    return _reducer
@@ -0,0 +1,319 @@
+"""Milvus 集合 schema 与索引定义。
+
+初始化脚本与迁移工具共用，保证新建集合与迁移后的集合结构一致。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from pymilvus import (
+    CollectionSchema,
+    DataType,
+    FieldSchema,
+    Function,
+    FunctionType,
+    MilvusClient,
+)
+
+from qans_server.db.vector.index_profile import (
+    IndexProfile,
+    binary_index_profile,
+    dense_index_profile,
+    sparse_index_profile,
+)
+from qans_server.db.vector.vector_codec import milvus_vector_type
+from qans_server.setting_config import settings
+
+# 分区布局：以 knowledge_base_id 为分区键（Milvus 按哈希映射到固定数量的物理分区）
+PARTITION_MODE_KEY = "partition_key"
+# 分区布局：每个知识库一个命名分区（受 Milvus 单集合分区数上限约束，默认 1024）
+PARTITION_MODE_PER_KB = "partition"
+
+
+# 标量索引：元数据过滤下推到 Milvus 时，按索引定位候选行而不是逐行扫描。
+# (索引名, 字段, 索引参数)；JSON 路径索引需要 Milvus 2.5.11+
+SCALAR_INDEXES = [
+    ("doc_id_index", "doc_id", {}),
+    ("knowledge_base_id_index", "knowledge_base_id", {}),
+    ("meta_file_type_index", "meta", {"json_path": 'meta["file_type"]', "json_cast_type": "varchar"}),
+    ("meta_upload_time_index", "meta", {"json_path": 'meta["upload_time"]', "json_cast_type": "double"}),
+]
+
+
+def kb_partition_name(knowledge_base_id: int) -> str:
+    """每知识库分区布局下知识库对应的分区名。"""
+
+    return f"kb_{knowledge_base_id}"
+
+
+def build_doc_chunk_schema(
+    embedding_dim: int,
+    partition_mode: str = PARTITION_MODE_KEY,
+    *,
+    storage_type: Optional[str] = None,
+    binary_index: Optional[bool] = None,
+    mmap: Optional[bool] = None,
+) -> CollectionSchema:
+    """构建文档分块集合 schema。
+
+    主键不再自增，而是由 (doc_id, chunk_index) 确定性生成（见 ``make_chunk_pk``），
+    以支持 upsert 与按主键点查 / 点删。分区键布局下 ``knowledge_base_id`` 为分区键，
+    带知识库过滤的检索与删除只会访问对应的物理分区。
+
+    ``storage_type`` 决定稠密向量字段的精度（float32 / float16 / bfloat16）；
+    ``binary_index`` 为 True 时额外保存二值量化向量 ``binary_vector`` 用于首轮检索；
+    ``mmap`` 为 True 时原始向量字段使用 mmap。未指定时均取配置。
+    """
+
+    storage_type = storage_type or settings.vector_storage_type
+    binary_index = settings.vector_binary_index if binary_index is None else binary_index
+    mmap = settings.vector_mmap if mmap is None else mmap
+    if binary_index and embedding_dim % 8:
+        raise ValueError(f"二值量化要求向量维度为 8 的倍数，实际: {embedding_dim}")
+
+    vector_params = {"mmap_enabled": True} if mmap else {}
+
+    fields = [
+        FieldSchema(
+            name="id",
+            dtype=DataType.INT64,
+            is_primary=True,
+            auto_id=False,
+            description="主键ID（由文档ID与分块序号生成）"
+        ),
+        FieldSchema(
+            name="vector",
+            dtype=milvus_vector_type(storage_type),
+            dim=embedding_dim,
+            description="文档向量",
+            **vector_params,
+        ),
+        FieldSchema(
+            name="sparse_vector",
+            dtype=DataType.SPARSE_FLOAT_VECTOR,
+            description="文档稀疏向量"
+        ),
+        FieldSchema(
+            name="doc_id",
+            dtype=DataType.INT64,
+            description="文档ID"
+        ),
+        FieldSchema(
+            name="chunk_id",
+            dtype=DataType.INT64,
+            description="分块索引"
+        ),
+        FieldSchema(
+            name="knowledge_base_id",
+            dtype=DataType.INT64,
+            is_partition_key=partition_mode == PARTITION_MODE_KEY,
+            description="知识库ID"
+        ),
+        FieldSchema(
+            name="text",
+            dtype=DataType.VARCHAR,
+            enable_analyzer=True,
+            max_length=65535,
+            description="分块文本"
+        ),
+        FieldSchema(
+            name="meta",
+            dtype=DataType.JSON,
+            description="元数据"
+        ),
+    ]
+
+    if binary_index:
+        fields.append(
+            FieldSchema(
+                name="binary_vector",
+                dtype=DataType.BINARY_VECTOR,
+                dim=embedding_dim,
+                description="二值量化向量（首轮检索）"
+            )
+        )
+
+    # 创建集合schema
+    schema = CollectionSchema(
+        fields=fields,
+        description="文档分块向量集合"
+    )
+
+    # Add function to schema, bm25 全文检索
+    bm25_function = Function(
+        name="text_bm25_emb",
+        input_field_names=["text"],
+        output_field_names=["sparse_vector"],
+        function_type=FunctionType.BM25,
+    )
+    schema.add_function(bm25_function)
+    return schema
+
+
+def doc_chunk_collection_options(partition_mode: str, num_partitions: int) -> Dict[str, Any]:
+    """``create_collection`` 的额外参数（分区键布局下的物理分区数）。"""
+
+    if partition_mode == PARTITION_MODE_KEY:
+        return {"num_partitions": num_partitions}
+    return {}
+
+
+def build_doc_chunk_index_params(
+    db_client: MilvusClient,
+    dense_profile: Optional[IndexProfile] = None,
+    sparse_profile: Optional[IndexProfile] = None,
+    binary_profile: Optional[IndexProfile] = None,
+):
+    """构建文档分块集合的索引参数，默认使用配置中的索引配置档。
+
+    指定 ``binary_profile`` 时为 ``binary_vector`` 字段建二值索引；标量索引见 ``SCALAR_INDEXES``。
+    """
+
+    dense_profile = dense_profile or dense_index_profile()
+    sparse_profile = sparse_profile or sparse_index_profile()
+
+    index_params = db_client.prepare_index_params()
+    index_params.add_index(
+        field_name="vector",
+        index_name="vector_index",
+        index_type=dense_profile.index_type,
+        metric_type=dense_profile.metric_type,
+        params=dense_profile.build_params,
+    )
+    index_params.add_index(
+        field_name="sparse_vector",
+        index_name="sparse_vector_index",
+        index_type=sparse_profile.index_type,
+        metric_type=sparse_profile.metric_type,
+        params=sparse_profile.build_params,
+    )
+    if binary_profile is not None:
+        index_params.add_index(
+            field_name="binary_vector",
+            index_name="binary_vector_index",
+            index_type=binary_profile.index_type,
+            metric_type=binary_profile.metric_type,
+            params=binary_profile.build_params,
+        )
+    _add_scalar_indexes(index_params, SCALAR_INDEXES)
+    return index_params
+
+
+def _add_scalar_indexes(index_params, indexes) -> None:
+    for index_name, field_name, params in indexes:
+        index_params.add_index(
+            field_name=field_name,
+            index_name=index_name,
+            index_type="INVERTED",
+            params=params,
+        )
+
+
+def ensure_scalar_indexes(db_client: MilvusClient, collection_name: str) -> list:
+    """为已有集合补建缺少的标量索引，返回新建的索引名。"""
+
+    existing = set(db_client.list_indexes(collection_name=collection_name))
+    missing = [index for index in SCALAR_INDEXES if index[0] not in existing]
+    if missing:
+        index_params = db_client.prepare_index_params()
+        _add_scalar_indexes(index_params, missing)
+        db_client.create_index(collection_name=collection_name, index_params=index_params)
+    return [index[0] for index in missing]
+
+
+def create_doc_chunk_collection(
+    db_client: MilvusClient,
+    collection_name: str,
+    *,
+    embedding_dim: Optional[int] = None,
+    partition_mode: Optional[str] = None,
+    dense_profile: Optional[IndexProfile] = None,
+    sparse_profile: Optional[IndexProfile] = None,
+    defer_index: bool = False,
+) -> None:
+    """按配置（或指定的布局 / 索引配置档）创建文档分块集合并建索引。
+
+    向量维度（启用降维时为 ``VECTOR_DIM``）、存储精度、二值首轮索引与 mmap 取自配置。
+    ``defer_index`` 为 True 时只建集合（未加载、不可检索），批量导入完成后再调用
+    ``build_doc_chunk_indexes`` 统一建索引并加载。
+    """
+
+    partition_mode = partition_mode or settings.vector_partition_mode
+    binary_profile = binary_index_profile() if settings.vector_binary_index else None
+    db_client.create_collection(
+        collection_name=collection_name,
+        schema=build_doc_chunk_schema(embedding_dim or settings.stored_vector_dim, partition_mode),
+        index_params=(
+            None if defer_index
+            else build_doc_chunk_index_params(db_client, dense_profile, sparse_profile, binary_profile)
+        ),
+        **doc_chunk_collection_options(partition_mode, settings.vector_partition_key_num),
+    )
+
+
+def build_doc_chunk_indexes(
+    db_client: MilvusClient,
+    collection_name: str,
+    *,
+    dense_profile: Optional[IndexProfile] = None,
+    sparse_profile: Optional[IndexProfile] = None,
+) -> None:
+    """为延迟建索引创建的集合建索引并加载（数据导入完成后调用）。"""
+
+    binary_profile = binary_index_profile() if settings.vector_binary_index else None
+    db_client.create_index(
+        collection_name=collection_name,
+        index_params=build_doc_chunk_index_params(db_client, dense_profile, sparse_profile, binary_profile),
+    )
+    # create_index 默认等待索引构建完成
+    db_client.load_collection(collection_name=collection_name)
+
+
+def create_doc_summary_collection(
+    db_client: MilvusClient,
+    collection_name: str,
+    *,
+    embedding_dim: Optional[int] = None,
+    metric_type: Optional[str] = None,
+) -> None:
+    """创建文档摘要向量集合（每个文档若干摘要向量，规模与文档数成正比，使用 AUTOINDEX）。"""
+
+    fields = [
+        FieldSchema(
+            name="id",
+            dtype=DataType.INT64,
+            is_primary=True,
+            auto_id=False,
+            description="主键ID（由文档ID与片段序号生成）"
+        ),
+        FieldSchema(
+            name="vector",
+            dtype=DataType.FLOAT_VECTOR,
+            dim=embedding_dim or settings.stored_vector_dim,
+            description="文档摘要向量"
+        ),
+        FieldSchema(
+            name="doc_id",
+            dtype=DataType.INT64,
+            description="文档ID"
+        ),
+        FieldSchema(
+            name="knowledge_base_id",
+            dtype=DataType.INT64,
+            is_partition_key=True,
+            description="知识库ID"
+        ),
+    ]
+    index_params = db_client.prepare_index_params()
+    index_params.add_index(
+        field_name="vector",
+        index_name="vector_index",
+        index_type="AUTOINDEX",
+        metric_type=metric_type or dense_index_profile().metric_type,
+    )
+    db_client.create_collection(
+        collection_name=collection_name,
+        schema=CollectionSchema(fields=fields, description="文档摘要向量集合"),
+        index_params=index_params,
+    )
@@ -0,0 +1,251 @@
+"""检索力度。
+
+把请求的质量档位（fast / balanced / accurate）或延迟预算映射为具体的检索参数
+（ef / nprobe / search_list、每路候选数量、稀疏检索丢弃比例）。
+
+存在自动调参结果（见 ``tools/tune_search_params.py``）时，按知识库从调参表中选择
+满足目标召回率或延迟预算的配置；否则按档位对索引配置档的默认检索参数进行缩放。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from qans_server.db.vector.index_profile import IndexProfile
+from qans_server.setting_config import settings
+
+QUALITY_FAST = "fast"
+QUALITY_BALANCED = "balanced"
+QUALITY_ACCURATE = "accurate"
+QUALITY_TIERS = (QUALITY_FAST, QUALITY_BALANCED, QUALITY_ACCURATE)
+
+# 档位对索引检索参数的缩放系数
+_TIER_SCALE = {QUALITY_FAST: 0.5, QUALITY_BALANCED: 1.0, QUALITY_ACCURATE: 2.0}
+# 档位对应的每路候选数量倍数（相对 top_k）
+_TIER_CANDIDATES = {QUALITY_FAST: 1, QUALITY_BALANCED: 1, QUALITY_ACCURATE: 3}
+# 使用调参表时各档位的目标召回率
+TIER_TARGET_RECALL = {QUALITY_FAST: 0.85, QUALITY_BALANCED: 0.95, QUALITY_ACCURATE: 0.99}
+# 未调参时按延迟预算（毫秒）选择档位的阈值
+_BUDGET_TIERS = ((50, QUALITY_FAST), (200, QUALITY_BALANCED))
+
+# 与检索力度正相关的索引检索参数
+EFFORT_PARAM_KEYS = ("ef", "nprobe", "search_list")
+# 检索时要求不小于 limit 的参数
+_LIMIT_BOUND_KEYS = ("ef", "search_list")
+
+
+@dataclass(frozen=True)
+class SearchEffort:
+    """一次检索实际使用的参数。"""
+
+    dense_params: Dict[str, Any] = field(default_factory=dict)
+    sparse_params: Dict[str, Any] = field(default_factory=dict)
+    candidate_multiplier: int = 1
+    source: str = "tier"
+
+
+def scale_search_params(params: Dict[str, Any], factor: float, limit: int) -> Dict[str, Any]:
+    """按系数缩放检索力度相关参数，并保证 ef / search_list 不小于 limit。"""
+
+    scaled = dict(params)
+    for key in EFFORT_PARAM_KEYS:
+        if key in scaled:
+            value = max(1, int(round(scaled[key] * factor)))
+            if key in _LIMIT_BOUND_KEYS:
+                value = max(value, limit)
+            scaled[key] = value
+    return scaled
+
+
+def quality_for_budget(latency_budget_ms: int) -> str:
+    """未调参时按延迟预算选择档位。"""
+
+    for threshold, quality in _BUDGET_TIERS:
+        if latency_budget_ms < threshold:
+            return quality
+    return QUALITY_ACCURATE
+
+
+def pick_candidate(
+    candidates: List[dict],
+    *,
+    target_recall: Optional[float] = None,
+    latency_budget_ms: Optional[float] = None,
+) -> Optional[dict]:
+    """
+    从调参候选中选择一个配置。
+
+    指定延迟预算时选择预算内召回率最高的配置（都超出预算时选最快的）；
+    否则选择达到目标召回率的最快配置（都达不到时选召回率最高的）。
+    """
+
+    if not candidates:
+        return None
+
+    by_latency = sorted(candidates, key=lambda item: item["p95_ms"])
+    if latency_budget_ms is not None:
+        within = [item for item in by_latency if item["p95_ms"] <= latency_budget_ms]
+        if not within:
+            return by_latency[0]
+        return max(within, key=lambda item: (item["recall"], -item["p95_ms"]))
+
+    target = target_recall if target_recall is not None else TIER_TARGET_RECALL[QUALITY_BALANCED]
+    for item in by_latency:
+        if item["recall"] >= target:
+            return item
+    return max(by_latency, key=lambda item: item["recall"])
+
+
+class SearchTuningTable:
+    """自动调参结果表，文件变更后自动重新加载。
+
+    文件格式::
+
+        {
+          "index_type": "HNSW",
+          "top_k": 10,
+          "knowledge_bases": {
+            "3": [{"params": {"ef": 32}, "candidate_multiplier": 1, "recall": 0.96, "p95_ms": 4.1}, ...]
+          }
+        }
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._data: Dict[str, Any] = {}
+
+    def _load(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                mtime = self.path.stat().st_mtime
+            except FileNotFoundError:
+                self._mtime, self._data = None, {}
+                return self._data
+
+            if mtime != self._mtime:
+                try:
+                    self._data = json.loads(self.path.read_text(encoding="utf-8"))
+                except (OSError, ValueError) as exc:
+                    logger.warning(f"读取检索调参文件失败 {self.path}: {exc}")
+                    self._data = {}
+                self._mtime = mtime
+            return self._data
+
+    def candidates(self, knowledge_base_id: int, index_type: str) -> List[dict]:
+        """知识库的调参候选；索引类型与调参时不一致时视为未调参。"""
+
+        data = self._load()
+        if data.get("index_type") != index_type:
+            return []
+        return list(data.get("knowledge_bases", {}).get(str(knowledge_base_id), []))
+
+    def save(self, index_type: str, top_k: int, knowledge_base_id: int, candidates: List[dict]) -> None:
+        """写入（覆盖）单个知识库的调参结果。索引类型变化时丢弃旧结果。"""
+
+        data = dict(self._load())
+        if data.get("index_type") != index_type:
+            data = {"index_type": index_type, "knowledge_bases": {}}
+        data["top_k"] = top_k
+        data.setdefault("knowledge_bases", {})[str(knowledge_base_id)] = candidates
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+
+_tuning_table: SearchTuningTable | None = None
+
+
+def get_tuning_table() -> SearchTuningTable:
+    """获取进程级的调参表。"""
+
+    global _tuning_table
+    if _tuning_table is None:
+        _tuning_table = SearchTuningTable(settings.search_tuning_path)
+    return _tuning_table
+
+
+def resolve_search_effort(
+    dense_profile: IndexProfile,
+    sparse_profile: IndexProfile,
+    top_k: int,
+    knowledge_base_ids: List[int],
+    *,
+    quality: Optional[str] = None,
+    latency_budget_ms: Optional[int] = None,
+    table: Optional[SearchTuningTable] = None,
+) -> SearchEffort:
+    """
+    计算一次检索的参数。
+
+    多个知识库共用一次检索请求，取各知识库所需力度的最大值。
+
+    Args:
+        dense_profile: 稠密向量索引配置档
+        sparse_profile: 稀疏向量索引配置档
+        top_k: 每路召回数量
+        knowledge_base_ids: 检索的知识库
+        quality: 质量档位，默认取 ``search_default_quality``
+        latency_budget_ms: 延迟预算（毫秒），优先于质量档位
+        table: 调参表，默认使用进程级调参表
+    """
+
+    if quality is not None and quality not in QUALITY_TIERS:
+        raise ValueError(f"不支持的质量档位: {quality}")
+
+    table = table or get_tuning_table()
+    if quality is None:
+        quality = quality_for_budget(latency_budget_ms) if latency_budget_ms else settings.search_default_quality
+
+    # ef / search_list 的下限是每路实际请求的候选数量 top_k × 候选倍数，而不只是 top_k
+    tier_multiplier = _TIER_CANDIDATES[quality]
+    tier_params = scale_search_params(dense_profile.search_params, _TIER_SCALE[quality], top_k * tier_multiplier)
+    dense_params: Dict[str, Any] = {}
+    multiplier = 0
+    tuned = False
+    for kb_id in knowledge_base_ids:
+        candidate = pick_candidate(
+            table.candidates(kb_id, dense_profile.index_type),
+            target_recall=TIER_TARGET_RECALL[quality],
+            latency_budget_ms=latency_budget_ms,
+        )
+        if candidate is None:
+            params, kb_multiplier = tier_params, tier_multiplier
+        else:
+            tuned = True
+            kb_multiplier = max(int(candidate.get("candidate_multiplier", 1)), 1)
+            params = scale_search_params(candidate.get("params", {}), 1.0, top_k * kb_multiplier)
+
+        for key, value in params.items():
+            if key in EFFORT_PARAM_KEYS and key in dense_params:
+                dense_params[key] = max(dense_params[key], value)
+            else:
+                dense_params[key] = value
+        multiplier = max(multiplier, kb_multiplier)
+
+    # 多个知识库取最大的候选倍数，候选数量可能超过单个知识库参数的下限
+    multiplier = max(multiplier, 1)
+    dense_params = scale_search_params(dense_params or tier_params, 1.0, top_k * multiplier)
+
+    sparse_params = dict(sparse_profile.search_params)
+    if "drop_ratio_search" in sparse_params:
+        if quality == QUALITY_FAST:
+            sparse_params["drop_ratio_search"] = max(sparse_params["drop_ratio_search"], 0.3)
+        elif quality == QUALITY_ACCURATE:
+            sparse_params["drop_ratio_search"] = 0.0
+
+    return SearchEffort(
+        dense_params=dense_params,
+        sparse_params=sparse_params,
+        candidate_multiplier=multiplier,
+        source="tuned" if tuned else quality,
+    )
@@ -0,0 +1,95 @@
+"""向量存储编码。
+
+稠密向量在 Milvus 中可以 FLOAT_VECTOR / FLOAT16_VECTOR / BFLOAT16_VECTOR 存储，
+并可额外保存符号位二值量化后的 BINARY_VECTOR 用于首轮检索。
+服务内部统一使用 float32 ``np.ndarray``，写入与读取时在这里完成编解码。
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+from pymilvus import DataType
+
+from qans_server.util.vector_util import VECTOR_DTYPE
+
+STORAGE_FLOAT32 = "float32"
+STORAGE_FLOAT16 = "float16"
+STORAGE_BFLOAT16 = "bfloat16"
+STORAGE_TYPES = (STORAGE_FLOAT32, STORAGE_FLOAT16, STORAGE_BFLOAT16)
+
+# 每个维度占用的字节数
+BYTES_PER_DIM = {STORAGE_FLOAT32: 4, STORAGE_FLOAT16: 2, STORAGE_BFLOAT16: 2}
+
+_MILVUS_TYPES = {
+    STORAGE_FLOAT32: DataType.FLOAT_VECTOR,
+    STORAGE_FLOAT16: DataType.FLOAT16_VECTOR,
+    STORAGE_BFLOAT16: DataType.BFLOAT16_VECTOR,
+}
+
+
+def milvus_vector_type(storage_type: str) -> DataType:
+    """存储类型对应的 Milvus 字段类型。"""
+
+    try:
+        return _MILVUS_TYPES[storage_type]
+    except KeyError:
+        raise ValueError(f"不支持的向量存储类型: {storage_type}，可选值: {', '.join(STORAGE_TYPES)}") from None
+
+
+def storage_type_of(data_type: Any) -> str:
+    """由 Milvus 字段类型反查存储类型（用于识别已有集合）。"""
+
+    for storage_type, milvus_type in _MILVUS_TYPES.items():
+        if data_type in (milvus_type, int(milvus_type), milvus_type.name):
+            return storage_type
+    raise ValueError(f"不是稠密向量字段类型: {data_type}")
+
+
+def float32_to_bfloat16_bytes(vector: np.ndarray) -> bytes:
+    """float32 → bfloat16（就近舍入到偶数），返回小端字节串。"""
+
+    bits = np.ascontiguousarray(vector, dtype=VECTOR_DTYPE).view(np.uint32)
+    rounding = ((bits >> 16) & 1) + 0x7FFF
+    return ((bits + rounding) >> 16).astype("<u2").tobytes()
+
+
+def bfloat16_bytes_to_float32(data: bytes) -> np.ndarray:
+    """bfloat16 小端字节串 → float32 数组。"""
+
+    return (np.frombuffer(data, dtype="<u2").astype(np.uint32) << 16).view(VECTOR_DTYPE)
+
+
+def encode_vector(vector: np.ndarray, storage_type: str) -> Any:
+    """将 float32 向量编码为写入 / 检索 Milvus 时使用的值。"""
+
+    if storage_type == STORAGE_FLOAT32:
+        return np.asarray(vector, dtype=VECTOR_DTYPE)
+    if storage_type == STORAGE_FLOAT16:
+        return np.asarray(vector, dtype=np.float16)
+    if storage_type == STORAGE_BFLOAT16:
+        return float32_to_bfloat16_bytes(vector)
+    raise ValueError(f"不支持的向量存储类型: {storage_type}")
+
+
+def decode_vector(value: Any, storage_type: str = STORAGE_FLOAT32) -> np.ndarray:
+    """将 Milvus 返回的向量值解码为一维 float32 数组。"""
+
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        if storage_type == STORAGE_FLOAT16:
+            return np.frombuffer(data, dtype="<f2").astype(VECTOR_DTYPE)
+        if storage_type == STORAGE_BFLOAT16:
+            return bfloat16_bytes_to_float32(data)
+        return np.frombuffer(data, dtype="<f4").astype(VECTOR_DTYPE)
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], (bytes, bytearray)):
+        # 部分 pymilvus 版本将半精度向量包装为单元素 bytes 列表
+        return decode_vector(value[0], storage_type)
+    return np.asarray(value, dtype=VECTOR_DTYPE)
+
+
+def binary_quantize(vector: np.ndarray) -> bytes:
+    """符号位二值量化：每个维度一位（>0 为 1），维度需为 8 的倍数。"""
+
+    return np.packbits(np.asarray(vector) > 0).tobytes()
@@ -0,0 +1,176 @@
+"""向量写入合并缓冲。
+
+并发向量化大量小文档时，每个文档只写入少量行，Milvus 会因此产生大量很小的
+growing segment。写缓冲在进程内收集多个文档的行，按行数、字节数或等待时间
+合并为一次批量写入（insert 与 upsert 分别合并）。每次提交返回一个 ``Future``，该文档的行全部写入后才会完成，
+调用方可以等待它或通过 ``add_done_callback`` 注册持久化回调。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Callable, List
+
+import numpy as np
+from loguru import logger
+
+# 单行元数据（meta JSON、标量字段）的估算字节数
+_ROW_OVERHEAD_BYTES = 256
+
+
+def estimate_row_bytes(row: dict) -> int:
+    """估算一行数据写入时的字节数。"""
+
+    vector = row.get("vector")
+    if isinstance(vector, np.ndarray):
+        size = vector.nbytes
+    elif isinstance(vector, (bytes, bytearray)):
+        size = len(vector)
+    else:
+        size = 4 * len(vector or ())
+    return size + len((row.get("text") or "").encode("utf-8")) + _ROW_OVERHEAD_BYTES
+
+
+@dataclass
+class _PendingWrite:
+    rows: List[dict]
+    size: int
+    op: str = "insert"
+    future: Future = field(default_factory=Future)
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class VectorWriteBuffer:
+    """按行数 / 字节数 / 时间阈值合并写入的进程级缓冲。"""
+
+    def __init__(
+        self,
+        write_fn: Callable[[str, List[dict]], None],
+        *,
+        max_rows: int = 5000,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_delay: float = 0.2,
+        name: str = "vector-write-buffer",
+    ) -> None:
+        self._write_fn = write_fn
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        # 取出待写批次并写入的整个过程持有该锁：flush 返回时后台线程已取出的批次也已写完，
+        # 且先取出的批次先写入（获取顺序为 _write_lock → _cond）
+        self._write_lock = threading.Lock()
+        self._pending: List[_PendingWrite] = []
+        self._pending_rows = 0
+        self._pending_bytes = 0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, rows: List[dict], op: str = "insert") -> Future:
+        """提交一批行，返回在这些行写入完成后 resolve 为行数的 ``Future``。
+
+        ``op`` 为 ``"insert"`` 或 ``"upsert"``，原样传给 ``write_fn``。
+        """
+
+        if op not in ("insert", "upsert"):
+            raise ValueError(f"不支持的写入类型: {op}")
+        pending = _PendingWrite(rows=rows, size=sum(estimate_row_bytes(row) for row in rows), op=op)
+        if not rows:
+            pending.future.set_result(0)
+            return pending.future
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("写缓冲已关闭")
+            first = not self._pending
+            self._pending.append(pending)
+            self._pending_rows += len(rows)
+            self._pending_bytes += pending.size
+            # 首个提交需要唤醒后台线程开始计时；达到阈值时立即写入
+            if first or self._should_flush():
+                self._cond.notify()
+        return pending.future
+
+    def flush(self) -> None:
+        """立即写出当前缓冲中的全部行，并等待后台线程正在写入的批次完成（阻塞直到完成）。"""
+
+        with self._write_lock:
+            with self._cond:
+                batch = self._take_all()
+            self._write(batch)
+
+    def close(self) -> None:
+        """停止后台线程并写出剩余数据。"""
+
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    # ------------------------------------------------------------------
+    # 内部实现
+    # ------------------------------------------------------------------
+    def _should_flush(self) -> bool:
+        return self._pending_rows >= self.max_rows or self._pending_bytes >= self.max_bytes
+
+    def _take_all(self) -> List[_PendingWrite]:
+        batch, self._pending = self._pending, []
+        self._pending_rows = 0
+        self._pending_bytes = 0
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending:
+                        if self._should_flush():
+                            break
+                        remaining = self._pending[0].created_at + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                closed = self._closed
+
+            with self._write_lock:
+                with self._cond:
+                    batch = self._take_all()
+                self._write(batch)
+            if closed:
+                return
+
+    def _write(self, batch: List[_PendingWrite]) -> None:
+        if not batch:
+            return
+
+        # 按提交顺序把相邻的同类提交合并，保证同一主键的先后写入顺序不变；
+        # 每组单独完成，某组写入失败只通知该组的提交方（之前的组已经写入）
+        failed = 0
+        for op, group in groupby(batch, key=lambda pending: pending.op):
+            group = list(group)
+            group_rows = [row for pending in group for row in pending.rows]
+            try:
+                for start in range(0, len(group_rows), self.max_rows):
+                    self._write_fn(op, group_rows[start:start + self.max_rows])
+            except Exception as exc:  # noqa: BLE001 - 失败需通知到该组的每个提交方
+                logger.error(f"向量写缓冲写入失败（{op}，{len(group)} 个提交，{len(group_rows)} 行）: {exc}")
+                failed += len(group)
+                for pending in group:
+                    pending.future.set_exception(exc)
+                continue
+            for pending in group:
+                pending.future.set_result(len(pending.rows))
+
+        rows = sum(len(pending.rows) for pending in batch)
+        logger.debug(f"向量写缓冲合并写入 {len(batch)} 个提交（失败 {failed} 个），共 {rows} 行")
@@ -4,13 +4,7 @@
 """
 import sys
 from pathlib import Path
-from pymilvus import (
-    FieldSchema,
-    CollectionSchema,
-    DataType, Function, FunctionType,
-)
-
-from qans_server.setting_config import settings
+from qans_server.setting_config import VECTOR_BACKEND_MILVUS, settings
 
 # 添加项目根目录到 Python 路径，以便能够导入 qans_server 模块
 # 获取当前文件的目录，然后向上查找项目根目录（包含 qans_server 目录的目录）
@@ -21,6 +15,9 @@ if str(project_root) not in sys.path:
 
 from pymilvus import MilvusClient
 
+from qans_server.db.vector.index_profile import dense_index_profile
+from qans_server.db.vector.schema import create_doc_chunk_collection, ensure_scalar_indexes
+
 def init_milvus_database(db_client: MilvusClient, db_name: str = "qans"):
     """
     初始化Milvus数据库
@@ -69,91 +66,20 @@ def init_milvus_collection(embedding_dim: int = 1024):
         
         if collection_name in collections:
             print(f"  集合 {collection_name} 已存在，跳过创建")
-            print("  注意：如果集合结构需要更新，请手动删除后重新创建")
+            created = ensure_scalar_indexes(db_client, collection_name)
+            if created:
+                print(f"✓ 已补建标量索引: {', '.join(created)}")
+            print("  注意：如果集合结构需要更新，请手动删除后重新创建；")
+            print("  旧版自增主键集合可使用 python -m qans_server.tools.migrate_chunk_pk 迁移，")
+            print("  分区布局变更可使用 python -m qans_server.tools.migrate_partition_layout 迁移")
             return
 
-        # 定义字段schema
-        fields = [
-            FieldSchema(
-                name="id",
-                dtype=DataType.INT64,
-                is_primary=True,
-                auto_id=True,
-                description="主键ID"
-            ),
-            FieldSchema(
-                name="vector",
-                dtype=DataType.FLOAT_VECTOR,
-                dim=embedding_dim,
-                description="文档向量"
-            ),
-            FieldSchema(
-                name="sparse_vector",
-                dtype=DataType.SPARSE_FLOAT_VECTOR,
-                description="文档稀疏向量"
-            ),
-            FieldSchema(
-                name="doc_id",
-                dtype=DataType.INT64,
-                description="文档ID"
-            ),
-            FieldSchema(
-                name="chunk_id",
-                dtype=DataType.INT64,
-                description="分块索引"
-            ),
-            FieldSchema(
-                name="knowledge_base_id",
-                dtype=DataType.INT64,
-                description="知识库ID"
-            ),
-            FieldSchema(
-                name="text",
-                dtype=DataType.VARCHAR,
-                enable_analyzer=True,
-                max_length=65535,
-                description="分块文本"
-            ),
-            FieldSchema(
-                name="meta",
-                dtype=DataType.JSON,
-                description="元数据"
-            ),
-        ]
-        
-        # 创建集合schema
-        schema = CollectionSchema(
-            fields=fields,
-            description="文档分块向量集合"
-        )
-
-        # Add function to schema, bm25 全文检索
-        bm25_function = Function(
-            name="text_bm25_emb",
-            input_field_names=["text"],
-            output_field_names=["sparse_vector"],
-            function_type=FunctionType.BM25,
-        )
-        schema.add_function(bm25_function)
-
+        # 字段 schema 与索引定义见 qans_server.db.vector.schema（主键由文档ID与分块序号确定性生成），
+        # 分区布局与索引类型取自配置
+        create_doc_chunk_collection(db_client, collection_name, embedding_dim=embedding_dim)
+        print(f"  分区布局: {settings.vector_partition_mode}")
+        print(f"  向量索引: {dense_index_profile().index_type}")
         print(f"✓ 集合 {collection_name} 创建成功")
-        
-        # 创建索引
-        index_params = db_client.prepare_index_params()
-        index_params.add_index(
-            field_name="vector",
-            index_type="AUTOINDEX",
-            metric_type="COSINE"
-        )
-        index_params.add_index(
-            field_name="sparse_vector",
-            index_name="sparse_vector_index",
-            index_type="SPARSE_INVERTED_INDEX",
-            metric_type="BM25",
-            params={"inverted_index_algo": "DAAT_MAXSCORE"},  # or "DAAT_WAND" or "TAAT_NAIVE"
-        )
-        
-        db_client.create_collection(collection_name=collection_name, schema=schema, index_params=index_params)
         print("✓ 集合已加载到内存")
         
     except Exception as e:
@@ -162,6 +88,10 @@ def init_milvus_collection(embedding_dim: int = 1024):
         raise
 
 
+if settings.vector_backend != VECTOR_BACKEND_MILVUS:
+    print(f"✓ VECTOR_URL={settings.vector_url} 使用本地向量后端，首次写入时自动创建，无需初始化 Milvus")
+    sys.exit(0)
+
 vector_url = settings.vector_url
 vector_db = settings.vector_db
 db_client = MilvusClient(vector_url)
@@ -176,9 +106,12 @@ def main():
     print("数据库初始化脚本")
     print("=" * 50)
 
-    # 从环境变量读取向量维度，默认1024
-    embedding_dim = int(settings.embedding_dim)
-    print(f"向量维度: {embedding_dim}")
+    # 从环境变量读取向量维度（启用降维时为 VECTOR_DIM）
+    embedding_dim = int(settings.stored_vector_dim)
+    if embedding_dim != settings.embedding_dim:
+        print(f"向量维度: {embedding_dim}（模型维度 {settings.embedding_dim}，降维方式 {settings.vector_reduction}）")
+    else:
+        print(f"向量维度: {embedding_dim}")
     
     # 初始化Milvus集合
     init_milvus_collection(embedding_dim=embedding_dim)
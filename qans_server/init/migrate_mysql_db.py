@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+MySQL数据库表结构升级脚本
+
+init_mysql_db.py 会删除并重建全部表，只适用于新安装；已有数据库运行本脚本补齐新版本的
+列与索引。每项变更先检查 information_schema，已应用的变更会跳过，可重复执行。
+使用方法：
+    python -m qans_server.init.migrate_mysql_db
+"""
+
+import sys
+from dataclasses import dataclass
+from typing import Callable, List
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+
+from qans_server.setting_config import settings
+
+
+def column_exists(conn: Connection, table: str, column: str) -> bool:
+    return bool(conn.execute(
+        text(
+            "SELECT COUNT(*) FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column"
+        ),
+        {"table": table, "column": column},
+    ).scalar())
+
+
+def index_exists(conn: Connection, table: str, index: str) -> bool:
+    return bool(conn.execute(
+        text(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :index"
+        ),
+        {"table": table, "index": index},
+    ).scalar())
+
+
+@dataclass(frozen=True)
+class Migration:
+    """一项表结构变更：``pending`` 返回 True 时执行 ``statements``。"""
+
+    description: str
+    pending: Callable[[Connection], bool]
+    statements: List[str]
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        "t_document 增加 vectorize_version 列",
+        lambda conn: not column_exists(conn, "t_document", "vectorize_version"),
+        [
+            "ALTER TABLE `t_document` ADD COLUMN `vectorize_version` INT(11) NOT NULL DEFAULT 0 "
+            "COMMENT '向量化完成次数（跨 worker 判断向量化是否已由他人完成）' AFTER `error_message`",
+        ],
+    ),
+    Migration(
+        "t_document 增加 import_progress 列，清除旧版本写入 error_message 的导入进度",
+        lambda conn: not column_exists(conn, "t_document", "import_progress"),
+        [
+            "ALTER TABLE `t_document` ADD COLUMN `import_progress` INT(11) DEFAULT NULL "
+            "COMMENT '批量导入进度（0-100），仅 importing 状态下有值' AFTER `error_message`",
+            "UPDATE `t_document` SET `error_message` = NULL "
+            "WHERE `error_message` LIKE '批量导入进度%' OR `error_message` = '批量导入失败，正在逐批写入'",
+        ],
+    ),
+    # 外键 fk_document_chunk_document 需要以 document_id 开头的索引，先建联合索引再删除旧索引
+    Migration(
+        "t_document_chunk 增加 (document_id, chunk_index) 联合索引",
+        lambda conn: not index_exists(conn, "t_document_chunk", "idx_document_chunk"),
+        ["ALTER TABLE `t_document_chunk` ADD INDEX `idx_document_chunk` (`document_id`, `chunk_index`)"],
+    ),
+    Migration(
+        "t_document_chunk 删除被联合索引覆盖的 idx_document_id",
+        lambda conn: index_exists(conn, "t_document_chunk", "idx_document_id"),
+        ["ALTER TABLE `t_document_chunk` DROP INDEX `idx_document_id`"],
+    ),
+]
+
+
+def migrate(conn: Connection) -> int:
+    """依次应用尚未应用的变更，返回本次应用的数量。"""
+
+    applied = 0
+    for index, migration in enumerate(MIGRATIONS, 1):
+        if not migration.pending(conn):
+            print(f"[{index}/{len(MIGRATIONS)}] 已是最新，跳过: {migration.description}")
+            continue
+        for statement in migration.statements:
+            # DDL 在 MySQL 中隐式提交，每项变更单独执行
+            conn.execute(text(statement))
+        conn.commit()
+        print(f"[{index}/{len(MIGRATIONS)}] ✅ 已应用: {migration.description}")
+        applied += 1
+    return applied
+
+
+def main():
+    """主函数。"""
+    mysql_dsn = settings.mysql_dsn
+    if not mysql_dsn:
+        print("❌ 错误: 未找到环境变量 MYSQL_DSN")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("MySQL数据库表结构升级脚本")
+    print(f"数据库: {mysql_dsn.split('@')[-1] if '@' in mysql_dsn else mysql_dsn}")
+    print("=" * 60)
+
+    engine = create_engine(mysql_dsn, pool_pre_ping=True)
+    try:
+        with engine.connect() as conn:
+            applied = migrate(conn)
+    except SQLAlchemyError as e:
+        print(f"❌ 升级失败: {e}")
+        sys.exit(1)
+
+    print("-" * 60)
+    print(f"✅ 升级完成，本次应用 {applied} 项变更")
+
+
+if __name__ == "__main__":
+    main()
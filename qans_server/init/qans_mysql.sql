@@ -28,8 +28,10 @@ CREATE TABLE `t_document` (
     `file_size` BIGINT(20) NOT NULL COMMENT '文件大小（字节）',
     `file_type` VARCHAR(50) NOT NULL COMMENT '文件类型（扩展名）',
     `chunk_count` INT(11) NOT NULL DEFAULT 0 COMMENT '分块数量',
-    `status` VARCHAR(20) NOT NULL DEFAULT 'uploaded' COMMENT '状态：uploaded/processing/chunked/completed/failed',
+    `status` VARCHAR(20) NOT NULL DEFAULT 'uploaded' COMMENT '状态：uploaded/processing/chunked/importing/completed/failed',
     `error_message` VARCHAR(1000) DEFAULT NULL COMMENT '错误信息',
+    `import_progress` INT(11) DEFAULT NULL COMMENT '批量导入进度（0-100），仅 importing 状态下有值',
+    `vectorize_version` INT(11) NOT NULL DEFAULT 0 COMMENT '向量化完成次数（跨 worker 判断向量化是否已由他人完成）',
     `create_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     `update_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     PRIMARY KEY (`id`),
@@ -53,7 +55,7 @@ CREATE TABLE `t_document_chunk` (
     `metadata` TEXT DEFAULT NULL COMMENT '元数据(JSON)',
     `create_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     PRIMARY KEY (`id`),
-    INDEX `idx_document_id` (`document_id`),
+    INDEX `idx_document_chunk` (`document_id`, `chunk_index`),
     INDEX `idx_kb_id` (`knowledge_base_id`),
     CONSTRAINT `fk_document_chunk_document` FOREIGN KEY (`document_id`)
         REFERENCES `t_document` (`id`) ON DELETE CASCADE
@@ -1,6 +1,16 @@
 
 from .vector_model import EmbeddingLLMClient
 from .chat_model import ChatLLMClient
-from .rerank_model import rerank_documents
+from .lexical_rerank import lexical_rerank_documents
+from .rerank_model import RerankClient, arerank_documents, get_rerank_client, rerank_documents, rerank_enabled
 
-__all__ = ["EmbeddingLLMClient", "ChatLLMClient", "rerank_documents"]
\ No newline at end of file
+__all__ = [
+    "EmbeddingLLMClient",
+    "ChatLLMClient",
+    "RerankClient",
+    "get_rerank_client",
+    "rerank_documents",
+    "arerank_documents",
+    "rerank_enabled",
+    "lexical_rerank_documents",
+]
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""进程内词法重排。
+
+未配置重排模型或重排模型不可用时的第二阶段排序：在候选集合上用 NumPy 矩阵运算计算 BM25 分数
+与（按 IDF 加权的）查询词覆盖率，再与检索阶段的融合分数加权求和。中日文除逐字成词外再加入相邻
+两字的二元词，弥补逐字匹配对词序不敏感的问题。一次重排只涉及几十个候选，不需要网络请求，耗时在
+亚毫秒级（词频按子串计数，不对候选全文分词）。
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import List, Mapping, Optional
+
+import numpy as np
+
+from qans_server.util.text_tokenizer import count_terms, tokenize_with_bigrams
+
+# BM25 参数（与 Milvus BM25 默认值一致）
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 各项分数归一化到 [0, 1] 后的权重
+WEIGHT_BM25 = 0.5
+WEIGHT_COVERAGE = 0.3
+WEIGHT_PRIOR = 0.2
+# 候选没有检索分数时按排名计算先验分数的平滑常数（同 RRF）
+PRIOR_RANK_K = 60
+
+
+def _normalize(scores: np.ndarray) -> np.ndarray:
+    top = scores.max(initial=0.0)
+    return scores / top if top > 0 else scores
+
+
+def lexical_scores(query: str, documents: List[Mapping]) -> np.ndarray:
+    """
+    计算候选分块的词法相关性分数。
+
+    Args:
+        query: 问题
+        documents: 候选分块，按检索阶段的排序排列，每项需包含 ``text``，带 ``score`` 时作为先验分数
+
+    Returns:
+        与 ``documents`` 等长的分数数组，越大越相关
+    """
+    query_counts = Counter(tokenize_with_bigrams(query))
+    size = len(documents)
+    if size == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    # 检索阶段的先验：融合分数，缺失时按排名
+    if all(isinstance(doc.get("score"), (int, float)) for doc in documents):
+        prior = np.fromiter((doc["score"] for doc in documents), dtype=np.float32, count=size)
+    else:
+        prior = 1.0 / (PRIOR_RANK_K + np.arange(1, size + 1, dtype=np.float32))
+    if not query_counts:
+        return prior
+
+    terms = list(query_counts)
+    query_weights = np.fromiter(query_counts.values(), dtype=np.float32, count=len(terms))
+
+    # 候选 × 查询词 的词频矩阵，只统计出现在问题中的词；文档长度按字符数计
+    texts = [doc.get("text") or "" for doc in documents]
+    tf = np.array(count_terms(texts, terms), dtype=np.float32).reshape(size, len(terms))
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.float32, count=size)
+
+    present = tf > 0
+    df = present.sum(axis=0)
+    idf = np.log1p((size - df + 0.5) / (df + 0.5)).astype(np.float32)
+    avg_length = max(float(lengths.mean()), 1.0)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+    bm25 = (tf * (BM25_K1 + 1) / (tf + norm[:, None])) @ (idf * query_weights)
+    coverage = present @ idf / max(float(idf.sum()), 1e-12)
+
+    return (
+        WEIGHT_BM25 * _normalize(bm25)
+        + WEIGHT_COVERAGE * coverage
+        + WEIGHT_PRIOR * _normalize(prior)
+    )
+
+
+def lexical_rerank_documents(
+    query: str,
+    documents: list[dict],
+    *,
+    extra_headers: Mapping[str, str] | None = None,
+    top_k: Optional[int] | None = None,
+) -> list[dict]:
+    """按词法相关性重排候选分块，参数与 ``rerank_documents`` 一致（``extra_headers`` 不使用）。"""
+
+    if not documents:
+        raise ValueError("documents must contain at least one entry")
+
+    scores = lexical_scores(query, documents)
+    # 稳定排序：分数相同时保留检索阶段的顺序
+    order = np.argsort(-scores, kind="stable")
+    if top_k is not None:
+        order = order[:top_k]
+    return [documents[index] for index in order]
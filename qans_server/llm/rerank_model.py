@@ -1,93 +1,439 @@
-from typing import Mapping, Optional
+"""重排模型客户端。
+
+``RerankClient`` 在进程内复用 HTTP 长连接（同步请求使用 ``requests.Session`` 连接池，异步请求使用
+``httpx.AsyncClient``），按（问题, 候选分块, 候选文本摘要）缓存重排结果，并带有熔断：连续失败或慢调用达到
+``RERANK_BREAKER_FAILURES`` 次后在 ``RERANK_BREAKER_RESET_SECONDS`` 内不再请求重排模型，
+改用降级排序（``RERANK_LEXICAL`` 开启时为进程内词法重排，否则为候选的原有顺序即融合排序），
+之后放行一次试探请求决定是否恢复。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Callable, Hashable, List, Mapping, Optional, Tuple
+
+import httpx
 import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from qans_server.llm.lexical_rerank import lexical_rerank_documents
 from qans_server.setting_config import settings
+from qans_server.util.latency_stats import LatencyStats
+from qans_server.util.loop_local import LoopLocal
+from qans_server.util.lru_cache import LRUCache
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+# 降级排序函数：(问题, 候选, top_k) -> 排序后的候选
+FallbackRanker = Callable[..., List[dict]]
+
 
 class RerankError(Exception):
     """重排序服务请求异常。"""
 
-def rerank_documents(
-    query: str,
-    documents: list[dict],
-    *,
-    extra_headers: Mapping[str, str] | None = None,
-    top_k: Optional[int] | None = None,
-) -> list[dict]:
 
-    if not documents:
-        raise ValueError("documents must contain at least one entry")
+class CircuitBreaker:
+    """连续失败计数熔断器：关闭 → 打开（拒绝请求）→ 半开（放行一次试探请求）→ 关闭 / 打开。"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return BREAKER_CLOSED
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_seconds:
+                return BREAKER_HALF_OPEN
+            return BREAKER_OPEN
+
+    def allow(self) -> bool:
+        """是否放行本次请求；半开状态下只放行一个试探请求。"""
+
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._probing = True
+            return True
+
+    def abandon(self) -> None:
+        """放行的请求被取消（未得出结果），允许下一个请求继续试探。"""
+
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.trips += 1
+            self._probing = False
+
+
+def candidate_key(document: Mapping) -> Hashable:
+    """候选分块的标识：主键，其次 (doc_id, chunk_id)，都没有时使用文本摘要。"""
+
+    if document.get("id") is not None:
+        return document["id"]
+    if document.get("doc_id") is not None and document.get("chunk_id") is not None:
+        return document["doc_id"], document["chunk_id"]
+    return hashlib.md5(document.get("text", "").encode("utf-8")).hexdigest()
+
+
+class RerankClient:
+    """带连接池、结果缓存与熔断的重排模型客户端（线程安全，进程内共享一个实例）。"""
+
+    def __init__(
+        self,
+        url: str,
+        model: str,
+        *,
+        api_key: Optional[str] = None,
+        timeout: float = 10.0,
+        pool_size: int = 10,
+        cache_size: int = 1024,
+        cache_ttl: float = 300,
+        slow_ms: int = 0,
+        breaker_failures: int = 5,
+        breaker_reset_seconds: float = 30.0,
+        fallback: Optional[FallbackRanker] = None,
+    ) -> None:
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.slow_ms = slow_ms
+        self.fallback = fallback
+        # 判断是否为千问API模型，使用不同的请求体格式
+        self.is_dash_scope = "dashscope" in url.lower()
+
+        self.headers = {"accept": "application/json", "Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        # httpx 异步客户端绑定事件循环，每个事件循环一个，旧事件循环的客户端在其结束后关闭
+        self._async_clients: LoopLocal[httpx.AsyncClient] = LoopLocal(
+            lambda: httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            ),
+            lambda client: client.aclose(),
+        )
+
+        self.cache: LRUCache[Tuple[int, ...]] = LRUCache(cache_size, cache_ttl)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_seconds)
+        self.latency = LatencyStats()
+        self._counter_lock = threading.Lock()
+        self.failures = 0
+        self.slow_calls = 0
+        self.fallbacks = 0
+
+    # ------------------------------------------------------------------
+    # 重排
+    # ------------------------------------------------------------------
+    def rerank(
+        self,
+        query: str,
+        documents: List[dict],
+        *,
+        top_k: Optional[int] = None,
+        extra_headers: Mapping[str, str] | None = None,
+    ) -> List[dict]:
+        """
+        按与问题的相关性重排候选分块。
+
+        重排模型不可用（请求失败或处于熔断中）时使用降级排序（``fallback``），未设置时按候选的原有顺序返回。
+
+        Args:
+            query: 问题
+            documents: 候选分块，按融合排序排列，每项需包含 ``text``
+            top_k: 返回数量，默认全部
+            extra_headers: 附加的请求头
+        """
+        texts = self._texts(documents)
+        key = self._cache_key(query, documents, texts)
+        order = self.cache.get(key)
+        if order is None:
+            if not self.breaker.allow():
+                return self._fallback(query, documents, top_k)
+            started = time.perf_counter()
+            try:
+                response = self._session.post(
+                    self.url,
+                    json=self._payload(query, texts),
+                    headers=self._headers(extra_headers),
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                order = self._parse(response.json(), len(documents))
+            except (requests.RequestException, ValueError, RerankError) as exc:
+                self._record_failure(exc)
+                return self._fallback(query, documents, top_k)
+            self._record_call(started)
+            self.cache.put(key, order)
+        return self._select(documents, order, top_k)
+
+    async def arerank(
+        self,
+        query: str,
+        documents: List[dict],
+        *,
+        top_k: Optional[int] = None,
+        extra_headers: Mapping[str, str] | None = None,
+    ) -> List[dict]:
+        """``rerank`` 的异步版本，等待重排模型响应期间不占用线程。"""
+
+        texts = self._texts(documents)
+        key = self._cache_key(query, documents, texts)
+        order = self.cache.get(key)
+        if order is None:
+            if not self.breaker.allow():
+                return self._fallback(query, documents, top_k)
+            started = time.perf_counter()
+            try:
+                response = await self._client().post(
+                    self.url,
+                    json=self._payload(query, texts),
+                    headers=self._headers(extra_headers),
+                )
+                response.raise_for_status()
+                order = self._parse(response.json(), len(documents))
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except (httpx.HTTPError, ValueError, RerankError) as exc:
+                self._record_failure(exc)
+                return self._fallback(query, documents, top_k)
+            self._record_call(started)
+            self.cache.put(key, order)
+        return self._select(documents, order, top_k)
+
+    def _client(self) -> httpx.AsyncClient:
+        return self._async_clients.get()
 
-    headers = {"accept": "application/json", "Content-Type": "application/json"}
-    if settings.rerank_api_key:
-        headers["Authorization"] = f"Bearer {settings.rerank_api_key}"
-    if extra_headers:
-        headers.update(extra_headers)
-
-    # 提取文本内容用于重排序
-    document_texts = []
-    for doc in documents:
-        if not isinstance(doc, dict):
-            raise ValueError("documents 中的每个元素必须是 dict 类型")
-        text = doc.get("text", "")
-        if not isinstance(text, str):
-            raise ValueError("documents 中的每个 dict 必须包含 'text' 字段且为字符串类型")
-        document_texts.append(text)
-
-    # 判断是否为千问API模型，使用不同的请求体格式
-    is_dash_scope = "dashscope" in settings.rerank_url.lower()
-
-    if is_dash_scope:
-        payload = {
-            "model": settings.rerank_model,
-            "input": {
-                "query": query,
-                "documents": document_texts,
+    async def aclose(self) -> None:
+        await self._async_clients.aclose()
+        self._session.close()
+
+    # ------------------------------------------------------------------
+    # 请求与响应
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _texts(documents: List[dict]) -> List[str]:
+        if not documents:
+            raise ValueError("documents must contain at least one entry")
+
+        # 提取文本内容用于重排序
+        document_texts = []
+        for doc in documents:
+            if not isinstance(doc, dict):
+                raise ValueError("documents 中的每个元素必须是 dict 类型")
+            text = doc.get("text", "")
+            if not isinstance(text, str):
+                raise ValueError("documents 中的每个 dict 必须包含 'text' 字段且为字符串类型")
+            document_texts.append(text)
+        return document_texts
+
+    @staticmethod
+    def _cache_key(query: str, documents: List[dict], texts: List[str]) -> Hashable:
+        # 重新向量化后分块主键不变而文本可能已变，键中包含文本摘要，旧文本的排序不会被复用
+        digest = hashlib.md5()
+        for text in texts:
+            digest.update(text.encode("utf-8"))
+            digest.update(b"\0")
+        return query, tuple(candidate_key(doc) for doc in documents), digest.hexdigest()
+
+    def _headers(self, extra_headers: Mapping[str, str] | None) -> dict:
+        if not extra_headers:
+            return self.headers
+        return {**self.headers, **extra_headers}
+
+    def _payload(self, query: str, texts: List[str]) -> dict:
+        if self.is_dash_scope:
+            return {
+                "model": self.model,
+                "input": {
+                    "query": query,
+                    "documents": texts,
+                },
             }
-        }
-    else:
-        payload = {
-            "model": settings.rerank_model,
+        return {
+            "model": self.model,
             "query": query,
-            "documents": document_texts,
+            "documents": texts,
         }
 
+    def _parse(self, data, size: int) -> Tuple[int, ...]:
+        """解析响应，返回按相关性排列的候选下标。"""
 
+        if not isinstance(data, Mapping):
+            raise RerankError("重排序服务返回了意外的响应结构")
 
-    try:
-        response = requests.post(
-            settings.rerank_url,
-            json=payload,
-            headers=headers,
-            timeout=60,
-        )
-        response.raise_for_status()
-    except requests.RequestException as exc:
-        raise RerankError("重排序服务请求失败") from exc
+        results = (data.get("output") or {}).get("results") if self.is_dash_scope else data.get("results")
+        if not isinstance(results, list):
+            raise RerankError("重排序服务返回了无效的 results 字段")
+
+        order = []
+        for item in results:
+            if not isinstance(item, Mapping):
+                raise RerankError("重排序结果项格式错误")
+
+            index = item.get("index")
+            if not isinstance(index, int) or not (0 <= index < size):
+                raise RerankError("重排序结果 index 越界或类型错误")
+
+            order.append(index)
+        return tuple(order)
+
+    @staticmethod
+    def _select(documents: List[dict], order: Tuple[int, ...], top_k: Optional[int]) -> List[dict]:
+        ranked_documents = [documents[index] for index in order]
+        if top_k is not None:
+            ranked_documents = ranked_documents[:top_k]
+        return ranked_documents
+
+    # ------------------------------------------------------------------
+    # 熔断与统计
+    # ------------------------------------------------------------------
+    def _record_call(self, started: float) -> None:
+        elapsed = (time.perf_counter() - started) * 1000
+        self.latency.add(elapsed)
+        if self.slow_ms and elapsed > self.slow_ms:
+            with self._counter_lock:
+                self.slow_calls += 1
+            logger.warning(f"重排模型响应缓慢：{elapsed:.0f}ms")
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _record_failure(self, exc: Exception) -> None:
+        with self._counter_lock:
+            self.failures += 1
+        self.breaker.record_failure()
+        logger.warning(f"重排序服务请求失败，使用降级排序: {exc}")
+
+    def _fallback(self, query: str, documents: List[dict], top_k: Optional[int]) -> List[dict]:
+        with self._counter_lock:
+            self.fallbacks += 1
+        if self.fallback is not None:
+            return self.fallback(query, documents, top_k=top_k)
+        return documents[:top_k] if top_k is not None else list(documents)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "breaker_state": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "failures": self.failures,
+            "slow_calls": self.slow_calls,
+            "fallbacks": self.fallbacks,
+            "cache_size": len(self.cache),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "latency": self.latency.to_dict(),
+        }
+
+
+_client_instance: Optional[RerankClient] = None
+_client_lock = threading.Lock()
+
+
+def get_rerank_client() -> Optional[RerankClient]:
+    """进程级共享的重排模型客户端；未配置重排模型（LLM_RERANK_URL / LLM_RERANK_MODEL）时返回 None。"""
+
+    global _client_instance
+    if not settings.rerank_url or not settings.rerank_model:
+        return None
+    with _client_lock:
+        if _client_instance is None:
+            _client_instance = RerankClient(
+                settings.rerank_url,
+                settings.rerank_model,
+                api_key=settings.rerank_api_key,
+                timeout=settings.rerank_timeout,
+                pool_size=settings.rerank_pool_size,
+                cache_size=settings.rerank_cache_size,
+                cache_ttl=settings.rerank_cache_ttl,
+                slow_ms=settings.rerank_slow_ms,
+                breaker_failures=settings.rerank_breaker_failures,
+                breaker_reset_seconds=settings.rerank_breaker_reset_seconds,
+                fallback=lexical_rerank_documents if settings.rerank_lexical else None,
+            )
+        return _client_instance
 
-    try:
-        data = response.json()
-    except ValueError as exc:
-        raise RerankError("重排序服务返回了无效的 JSON") from exc
 
-    if not isinstance(data, Mapping):
-        raise RerankError("重排序服务返回了意外的响应结构")
+async def close_rerank_client() -> None:
+    """关闭重排模型客户端的连接（应用退出时调用）。"""
 
-    results = data.get("output").get("results") if is_dash_scope else data.get("results")
-    if not isinstance(results, list):
-        raise RerankError("重排序服务返回了无效的 results 字段")
+    if _client_instance is not None:
+        await _client_instance.aclose()
 
-    ranked_documents = []
-    for item in results:
-        if not isinstance(item, Mapping):
-            raise RerankError("重排序结果项格式错误")
 
-        index = item.get("index")
-        if not isinstance(index, int) or not (0 <= index < len(documents)):
-            raise RerankError("重排序结果 index 越界或类型错误")
+def rerank_enabled() -> bool:
+    """是否执行第二阶段排序（配置了重排模型或开启了词法重排）。"""
 
-        ranked_documents.append(documents[index])
+    return get_rerank_client() is not None or settings.rerank_lexical
 
-    if top_k is not None:
-        ranked_documents = ranked_documents[:top_k]
 
-    return ranked_documents
+def _rerank_locally(query: str, documents: List[dict], top_k: Optional[int]) -> List[dict]:
+    if not documents:
+        raise ValueError("documents must contain at least one entry")
+    if settings.rerank_lexical:
+        return lexical_rerank_documents(query, documents, top_k=top_k)
+    return documents[:top_k] if top_k is not None else list(documents)
+
+
+def rerank_documents(
+    query: str,
+    documents: list[dict],
+    *,
+    extra_headers: Mapping[str, str] | None = None,
+    top_k: Optional[int] | None = None,
+) -> list[dict]:
+    """使用共享的重排模型客户端重排；未配置重排模型时使用词法重排（``RERANK_LEXICAL``）或按原有顺序返回。"""
+
+    client = get_rerank_client()
+    if client is None:
+        return _rerank_locally(query, documents, top_k)
+    return client.rerank(query, documents, top_k=top_k, extra_headers=extra_headers)
+
+
+async def arerank_documents(
+    query: str,
+    documents: list[dict],
+    *,
+    extra_headers: Mapping[str, str] | None = None,
+    top_k: Optional[int] | None = None,
+) -> list[dict]:
+    """``rerank_documents`` 的异步版本。"""
 
+    client = get_rerank_client()
+    if client is None:
+        return _rerank_locally(query, documents, top_k)
+    return await client.arerank(query, documents, top_k=top_k, extra_headers=extra_headers)
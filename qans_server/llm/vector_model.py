@@ -1,15 +1,21 @@
-from typing import List
+from typing import Callable, List
 
+import numpy as np
 from langchain_community.embeddings import DashScopeEmbeddings
+from langchain_community.embeddings.dashscope import embed_with_retry
 from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 from qans_server.setting_config import settings
+from qans_server.util.vector_util import allocate_matrix, as_matrix
 
 class EmbeddingLLMClient:
 
-    def __init__(self) -> None:
+    def __init__(self, batch_size: int | None = None) -> None:
+        # 每批请求的文本数，同时限制单批 Python float 列表的内存占用
+        self.batch_size = batch_size or settings.embedding_batch_size
         # 根据 embedding_url 判断使用哪个嵌入模型
-        if "dashscope" in settings.embedding_url.lower():
+        self.is_dashscope = "dashscope" in settings.embedding_url.lower()
+        if self.is_dashscope:
             # 通义千问向量模型调用
             self.embedding_model = DashScopeEmbeddings(model=settings.embedding_model,
                                                         dashscope_api_key=settings.embedding_api_key)
@@ -19,17 +25,43 @@ class EmbeddingLLMClient:
                                                     base_url=settings.embedding_url,
                                                     api_key=settings.embedding_api_key)
 
-    def embed_documents(self, documents: List[Document]) -> List[List[float]]:
+    def embed_documents(self, documents: List[Document]) -> np.ndarray:
         texts = [d.page_content or "" for d in documents]
-        if not texts:
-            return []
-        return self.embedding_model.embed_documents(texts)
+        return self.embed_texts(texts)
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """批量向量化，返回 ``len(texts) × embedding_dim`` 的连续 float32 矩阵。"""
+        return self._embed_batched(texts, self.embedding_model.embed_documents)
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """批量向量化查询语句，结果与逐个调用 ``embed_query`` 一致。"""
+        if self.is_dashscope:
+            # DashScope 区分查询与文档（text_type），embed_documents 会按文档向量化
+            def embed(batch: List[str]) -> List[List[float]]:
+                result = embed_with_retry(
+                    self.embedding_model, input=batch, text_type="query", model=self.embedding_model.model
+                )
+                return [item["embedding"] for item in result]
+
+            return self._embed_batched(texts, embed)
+        # OpenAI 兼容接口的查询与文档向量化是同一个请求
+        return self._embed_batched(texts, self.embedding_model.embed_documents)
 
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def _embed_batched(self, texts: List[str], embed: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
         if not texts:
-            return []
-        return self.embedding_model.embed_documents(texts)
+            return allocate_matrix(0, settings.embedding_dim)
 
-    def embed_query(self, text: str) -> List[float]:
-        return self.embedding_model.embed_query(text)
+        matrix = allocate_matrix(len(texts), settings.embedding_dim)
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            # 接口返回的 float 列表只在当前批次内存活，随即拷贝进 float32 矩阵
+            block = as_matrix(embed(batch))
+            if block.shape != (len(batch), settings.embedding_dim):
+                raise ValueError(
+                    f"向量模型返回的形状 {block.shape} 与期望 {(len(batch), settings.embedding_dim)} 不一致"
+                )
+            matrix[start:start + len(batch)] = block
+        return matrix
 
+    def embed_query(self, text: str) -> np.ndarray:
+        return np.asarray(self.embedding_model.embed_query(text), dtype=np.float32)
@@ -42,6 +42,46 @@ def create_app() -> FastAPI:
 
     app.include_router(api_router, prefix=settings.api_prefix)
 
+    if settings.vector_maintenance_enabled:
+        @app.on_event("startup")
+        async def start_vector_maintenance() -> None:
+            # 多个 worker 各自调度，执行时通过 MySQL 命名锁互斥
+            from qans_server.api.dependencies import get_maintenance_service_dep
+
+            get_maintenance_service_dep().start()
+
+    if settings.vector_load_management:
+        @app.on_event("startup")
+        async def start_partition_load_manager() -> None:
+            from qans_server.db.vector.load_manager import get_load_manager
+
+            manager = get_load_manager()
+            if manager is not None:
+                manager.start()
+
+    @app.on_event("shutdown")
+    async def close_vector_clients() -> None:
+        # 延迟导入：创建应用时不连接 Milvus
+        from qans_server.db.vector.base import close_async_clients
+
+        if settings.vector_maintenance_enabled:
+            from qans_server.api.dependencies import get_maintenance_service_dep
+
+            get_maintenance_service_dep().stop()
+        if settings.vector_load_management:
+            from qans_server.db.vector.load_manager import get_load_manager
+
+            manager = get_load_manager()
+            if manager is not None:
+                manager.stop()
+        await close_async_clients()
+
+    @app.on_event("shutdown")
+    async def close_llm_clients() -> None:
+        from qans_server.llm.rerank_model import close_rerank_client
+
+        await close_rerank_client()
+
     @app.get("/ping", tags=["健康检查"])  # pragma: no cover - trivial route
     async def ping() -> dict:
         return {"status": "ok"}
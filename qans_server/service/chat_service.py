@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 from typing import Dict, Generator, Iterable, List, Optional, Tuple
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
@@ -23,11 +24,11 @@ from qans_server.db.mysql.models.chat_session import (
     update_chat_session_kbs,
     update_chat_session_title,
 )
-from qans_server.db.vector.collections.doc_chunk import VectorDocChunk
-from qans_server.llm import rerank_documents
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, create_doc_chunk_repo
+from qans_server.db.vector.filters import FilterExpr
 from qans_server.llm.chat_model import ChatLLMClient
 from qans_server.service.embedding_service import EmbeddingService
-from qans_server.setting_config import settings
+from qans_server.service.retrieval_service import RetrievalService
 
 SYSTEM_PROMPT = (
     "你是一个文档问答助手，请基于提供的参考内容回答用户问题。"
@@ -48,10 +49,15 @@ class ChatService:
         embedding_service: EmbeddingService | None = None,
         vector_repo: VectorDocChunk | None = None,
         llm_client: ChatLLMClient | None = None,
+        retrieval_service: RetrievalService | None = None,
     ) -> None:
         self.embedding_service = embedding_service or EmbeddingService()
-        self.vector_repo = vector_repo or VectorDocChunk()
+        self.vector_repo = vector_repo or create_doc_chunk_repo()
         self.llm_client = llm_client or ChatLLMClient()
+        self.retrieval_service = retrieval_service or RetrievalService(
+            embedding_service=self.embedding_service,
+            vector_repo=self.vector_repo,
+        )
 
     # ------------------------------------------------------------------
     # 会话管理
@@ -63,6 +69,8 @@ class ChatService:
         title: Optional[str] = None,
     ) -> ChatSession:
         chat_session = create_chat_session(session, knowledge_base_ids=knowledge_base_ids, title=title)
+        # 会话创建后通常很快会提问，后台预热会话知识库的分区（未启用按需加载时无操作）
+        self.vector_repo.warm_knowledge_bases(knowledge_base_ids, wait=False)
         return chat_session
 
     def list_sessions(self, session: Session, *, limit: int = 20, offset: int = 0) -> List[ChatSession]:
@@ -80,6 +88,7 @@ class ChatService:
         session_id: int,
         knowledge_base_ids: List[int],
     ) -> ChatSession | None:
+        self.vector_repo.warm_knowledge_bases(knowledge_base_ids, wait=False)
         return update_chat_session_kbs(db, session_id, knowledge_base_ids)
 
     def delete_session(self, db: Session, session_id: int) -> bool:
@@ -97,8 +106,65 @@ class ChatService:
         query: str,
         knowledge_base_ids: Optional[List[int]] = None,
         top_k: int = 3,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        filter_expr: Optional[FilterExpr] = None,
     ) -> Tuple[Generator[str, None, None], List[dict]]:
-        """以流式方式生成回答，返回生成器和引用来源。"""
+        """以流式方式生成回答，返回生成器和引用来源。
+
+        ``quality`` / ``latency_budget_ms`` 控制检索力度，``filter_expr`` 限定检索范围，
+        见 ``RetrievalService.retrieve``。
+        """
+
+        kb_ids = self._start_turn(db, session_id, query, knowledge_base_ids)
+
+        # 混合检索 + 重排
+        rank_chunks = self.retrieval_service.retrieve(
+            query,
+            kb_ids,
+            top_k=top_k,
+            quality=quality,
+            latency_budget_ms=latency_budget_ms,
+            filter_expr=filter_expr,
+        )
+        return self._answer_stream(db, session_id, query, rank_chunks)
+
+    async def astream_message(
+        self,
+        db: Session,
+        *,
+        session_id: int,
+        query: str,
+        knowledge_base_ids: Optional[List[int]] = None,
+        top_k: int = 3,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> Tuple[Generator[str, None, None], List[dict]]:
+        """``stream_message`` 的异步版本。
+
+        向量检索通过异步 Milvus 客户端等待，不占用线程池；MySQL 读写仍是同步调用，放到线程池执行。
+        """
+
+        kb_ids = await asyncio.to_thread(self._start_turn, db, session_id, query, knowledge_base_ids)
+        rank_chunks = await self.retrieval_service.aretrieve(
+            query,
+            kb_ids,
+            top_k=top_k,
+            quality=quality,
+            latency_budget_ms=latency_budget_ms,
+            filter_expr=filter_expr,
+        )
+        return await asyncio.to_thread(self._answer_stream, db, session_id, query, rank_chunks)
+
+    def _start_turn(
+        self,
+        db: Session,
+        session_id: int,
+        query: str,
+        knowledge_base_ids: Optional[List[int]],
+    ) -> List[int]:
+        """校验问题、记录用户消息，返回本轮检索的知识库。"""
 
         if not query.strip():
             raise ValueError("问题不能为空")
@@ -110,21 +176,16 @@ class ChatService:
 
         create_chat_message(db, session_id=session_id, role=MESSAGE_ROLE_USER, content=query)
         increment_message_count(db, session_id, 1)
+        return kb_ids
 
-        query_vector = self.embedding_service.embed_query(query)
-        # 混合检索
-        related_chunks = self.vector_repo.search_similar_chunks(
-            query=query,
-            query_vector=query_vector,
-            knowledge_base_ids=kb_ids,
-            top_k=top_k,
-        )
-
-        # 重排
-        if settings.rerank_model is None:
-            rank_chunks = rerank_documents(query, related_chunks, top_k=top_k)
-        else:
-            rank_chunks = related_chunks
+    def _answer_stream(
+        self,
+        db: Session,
+        session_id: int,
+        query: str,
+        rank_chunks: List[dict],
+    ) -> Tuple[Generator[str, None, None], List[dict]]:
+        """根据检索结果构建提示词，返回回答生成器和引用来源。"""
 
         # 构建引用来源
         context_text, sources = self._build_context(rank_chunks)
@@ -0,0 +1,166 @@
+"""检索结果回填。
+
+两阶段检索时混合检索只返回主键与分数，最终（重排后）需要的分块文本与元数据
+在这里按主键批量回填：来源为 Milvus（按主键 ``get``）或 MySQL ``t_document_chunk``，
+热点分块缓存在进程内 LRU 中。
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Dict, Iterable, List, Sequence
+
+from qans_server.db.mysql.base import get_session
+from qans_server.db.mysql.models.document_chunk import get_chunks_by_keys
+from qans_server.db.vector.collections.doc_chunk import (
+    CHUNK_OUTPUT_FIELDS,
+    VectorDocChunk,
+    create_doc_chunk_repo,
+    doc_pk_range,
+    make_chunk_pk,
+    split_chunk_pk,
+)
+from qans_server.setting_config import settings
+from qans_server.util.lru_cache import LRUCache
+
+HYDRATE_SOURCE_VECTOR = "vector"
+HYDRATE_SOURCE_MYSQL = "mysql"
+
+# 可由主键直接推出的字段
+_PK_FIELDS = ("doc_id", "chunk_id")
+
+
+class ChunkHydrator:
+    """按主键回填分块字段，缓存已获取的字段。"""
+
+    def __init__(
+        self,
+        source: str = HYDRATE_SOURCE_VECTOR,
+        *,
+        vector_repo: VectorDocChunk | None = None,
+        cache_size: int = 10000,
+        cache_ttl: float = 300,
+    ) -> None:
+        if source not in (HYDRATE_SOURCE_VECTOR, HYDRATE_SOURCE_MYSQL):
+            raise ValueError(f"不支持的回填来源: {source}")
+        self.source = source
+        if vector_repo is None and source == HYDRATE_SOURCE_VECTOR:
+            vector_repo = create_doc_chunk_repo()
+        self.vector_repo = vector_repo
+        self.cache: LRUCache[dict] = LRUCache(cache_size, cache_ttl)
+
+    def hydrate(self, hits: List[dict], fields: Sequence[str] = CHUNK_OUTPUT_FIELDS) -> List[dict]:
+        """
+        为检索命中补全字段。
+
+        Args:
+            hits: 含主键 ``id`` 的命中列表（通常还带有 ``score``）
+            fields: 需要回填的字段
+
+        Returns:
+            按原顺序补全字段后的命中列表（已被删除的分块会被跳过）
+        """
+        rows = self.get_rows((hit["id"] for hit in hits), fields)
+        return [dict(hit, **rows[hit["id"]]) for hit in hits if hit["id"] in rows]
+
+    def hydrate_many(
+        self,
+        hit_lists: List[List[dict]],
+        fields: Sequence[str] = CHUNK_OUTPUT_FIELDS,
+    ) -> List[List[dict]]:
+        """为多组命中补全字段（批量检索），所有组的主键一次获取。"""
+        rows = self.get_rows((hit["id"] for hits in hit_lists for hit in hits), fields)
+        return [[dict(hit, **rows[hit["id"]]) for hit in hits if hit["id"] in rows] for hits in hit_lists]
+
+    def get_rows(self, pks: Iterable[int], fields: Sequence[str] = CHUNK_OUTPUT_FIELDS) -> Dict[int, dict]:
+        """按主键获取分块字段，优先使用缓存。"""
+
+        wanted = [field for field in fields if field not in _PK_FIELDS]
+        result: Dict[int, dict] = {}
+        missing: List[int] = []
+        missing_fields: Dict[str, None] = {}
+        for pk in dict.fromkeys(pks):
+            cached = self.cache.get(pk) or {}
+            absent = [field for field in wanted if field not in cached]
+            if cached and not absent:
+                result[pk] = cached
+            else:
+                missing.append(pk)
+                missing_fields.update(dict.fromkeys(absent))
+
+        if missing:
+            # 只请求缓存中缺少的字段（例如重排时已回填过 text，最终只需补 meta）
+            fields_to_fetch = list(missing_fields)
+            fetched = self._fetch(missing, fields_to_fetch) if fields_to_fetch else {pk: {} for pk in missing}
+            for pk, row in fetched.items():
+                # 与缓存中已有的字段合并，后续只请求缺少的字段
+                merged = dict(self.cache.get(pk) or {}, **row)
+                self.cache.put(pk, merged)
+                result[pk] = merged
+
+        output = {}
+        for pk, row in result.items():
+            doc_id, chunk_id = split_chunk_pk(pk)
+            item = {"doc_id": doc_id, "chunk_id": chunk_id}
+            item.update((field, row[field]) for field in wanted if field in row)
+            output[pk] = {field: item[field] for field in fields if field in item}
+        return output
+
+    def invalidate_document(self, doc_id: int) -> int:
+        """文档重新向量化或删除后清除其缓存的分块。"""
+
+        start, end = doc_pk_range(doc_id)
+        return self.cache.discard_where(lambda pk: start <= pk < end)
+
+    def _fetch(self, pks: List[int], fields: List[str]) -> Dict[int, dict]:
+        if self.source == HYDRATE_SOURCE_MYSQL:
+            return self._fetch_from_mysql(pks, fields)
+        return {row["id"]: row for row in self.vector_repo.get_chunks(pks, fields)}
+
+    @staticmethod
+    def _fetch_from_mysql(pks: List[int], fields: List[str]) -> Dict[int, dict]:
+        with_content = "text" in fields
+        with_metadata = "meta" in fields
+        with get_session() as session:
+            rows = get_chunks_by_keys(
+                session,
+                (split_chunk_pk(pk) for pk in pks),
+                with_content=with_content,
+                with_metadata=with_metadata,
+            )
+
+        result: Dict[int, dict] = {}
+        for row in rows:
+            item = {"knowledge_base_id": row.knowledge_base_id}
+            if with_content:
+                item["text"] = row.content or ""
+            if with_metadata:
+                # 与向量化时写入 Milvus 的 meta 保持一致
+                try:
+                    meta = json.loads(row.metadata_json) if row.metadata_json else {}
+                except json.JSONDecodeError:
+                    meta = {"raw": row.metadata_json}
+                meta.setdefault("doc_id", row.document_id)
+                meta.setdefault("knowledge_base_id", row.knowledge_base_id)
+                meta.setdefault("chunk_index", row.chunk_index)
+                item["meta"] = meta
+            result[make_chunk_pk(row.document_id, row.chunk_index)] = item
+        return result
+
+
+_hydrator: ChunkHydrator | None = None
+
+
+def get_chunk_hydrator() -> ChunkHydrator | None:
+    """获取进程级的回填器；未启用两阶段检索时返回 None。"""
+
+    global _hydrator
+    if settings.retrieval_hydration == "off":
+        return None
+    if _hydrator is None:
+        _hydrator = ChunkHydrator(
+            settings.retrieval_hydration,
+            cache_size=settings.retrieval_hydrate_cache_size,
+            cache_ttl=settings.retrieval_hydrate_cache_ttl,
+        )
+    return _hydrator
@@ -0,0 +1,144 @@
+"""相邻分块扩展。
+
+回答常常需要命中分块的前后文（同一文档的 ``chunk_index`` 连续编号）。启用 ``RETRIEVAL_CONTEXT_WINDOW=N`` 后，
+为最终结果中的每个命中补充前后各 N 个分块：所有相邻的 ``(doc_id, chunk_index)`` 一次收集、通过
+``ChunkHydrator`` 一次批量获取（MySQL ``t_document_chunk`` 走 ``(document_id, chunk_index)`` 联合索引，
+或按主键从 Milvus 获取），同一文档中相连或重叠的区间合并为一个片段，并去掉相邻分块之间 ``chunk_overlap`` 的重复文本。
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+from qans_server.db.vector.collections.doc_chunk import make_chunk_pk
+from qans_server.service.chunk_hydrator import ChunkHydrator
+
+# 判定为分块重叠的最短公共文本长度，过短的首尾相同（如同一个标点）不视为重叠
+MIN_OVERLAP_CHARS = 8
+
+
+def overlap_length(previous: str, current: str) -> int:
+    """``previous`` 的后缀与 ``current`` 的前缀重合的最大长度（低于 ``MIN_OVERLAP_CHARS`` 时为 0）。"""
+
+    limit = min(len(previous), len(current))
+    if limit < MIN_OVERLAP_CHARS:
+        return 0
+    start = len(previous) - limit
+    head = current[0]
+    # 从最长的可能重叠开始，只在首字符匹配的位置比较
+    position = previous.find(head, start)
+    while position != -1 and len(previous) - position >= MIN_OVERLAP_CHARS:
+        if current.startswith(previous[position:]):
+            return len(previous) - position
+        position = previous.find(head, position + 1)
+    return 0
+
+
+def join_chunks(texts: List[str]) -> str:
+    """按顺序拼接相邻分块，去掉分块之间的重叠文本。"""
+
+    merged = texts[0] if texts else ""
+    for previous, current in zip(texts, texts[1:]):
+        merged += current[overlap_length(previous, current):]
+    return merged
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """合并相连或重叠的闭区间。"""
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class ContextExpander:
+    """为检索结果补充相邻分块并合并为连续片段。"""
+
+    def __init__(self, hydrator: ChunkHydrator, window: int) -> None:
+        self.hydrator = hydrator
+        self.window = window
+
+    def expand(self, hits: List[dict]) -> List[dict]:
+        """
+        扩展检索结果。
+
+        Args:
+            hits: 最终（重排、回填后）的检索结果，需包含 ``doc_id``、``chunk_id`` 与 ``text``
+
+        Returns:
+            合并后的片段，按片段内排名最靠前的命中排序；每个片段保留该命中的其余字段，
+            ``text`` 为拼接后的文本，``chunk_ids`` 为片段包含的分块序号
+        """
+        return self.expand_many([hits])[0]
+
+    def expand_many(self, hit_lists: List[List[dict]]) -> List[List[dict]]:
+        """扩展多组检索结果（批量检索），所有组的相邻分块一次获取。"""
+
+        if self.window <= 0:
+            return hit_lists
+
+        # 每组结果中每个文档的扩展区间（相连或重叠的区间合并）
+        span_lists = []
+        for hits in hit_lists:
+            ranges: Dict[int, List[Tuple[int, int]]] = {}
+            for hit in hits:
+                chunk_index = hit["chunk_id"]
+                ranges.setdefault(hit["doc_id"], []).append(
+                    (max(chunk_index - self.window, 0), chunk_index + self.window)
+                )
+            span_lists.append({doc_id: _merge_ranges(doc_ranges) for doc_id, doc_ranges in ranges.items()})
+
+        # 一次批量获取全部相邻分块（命中本身的文本已在结果中）
+        known = {(hit["doc_id"], hit["chunk_id"]): hit.get("text") or "" for hits in hit_lists for hit in hits}
+        wanted = list(dict.fromkeys(
+            (doc_id, chunk_index)
+            for spans in span_lists
+            for doc_id, doc_spans in spans.items()
+            for start, end in doc_spans
+            for chunk_index in range(start, end + 1)
+            if (doc_id, chunk_index) not in known
+        ))
+        if wanted:
+            rows = self.hydrator.get_rows((make_chunk_pk(doc_id, index) for doc_id, index in wanted), ["text"])
+            for doc_id, chunk_index in wanted:
+                row = rows.get(make_chunk_pk(doc_id, chunk_index))
+                if row is not None:
+                    known[(doc_id, chunk_index)] = row.get("text") or ""
+
+        return [self._assemble(hits, spans, known) for hits, spans in zip(hit_lists, span_lists)]
+
+    @staticmethod
+    def _assemble(
+        hits: List[dict],
+        spans: Dict[int, List[Tuple[int, int]]],
+        known: Dict[Tuple[int, int], str],
+    ) -> List[dict]:
+        results: List[dict] = []
+        covered = set()
+        for hit in hits:
+            doc_id = hit["doc_id"]
+            if (doc_id, hit["chunk_id"]) in covered:
+                # 已包含在排名更靠前的命中所在的片段中
+                continue
+            span = next(span for span in spans[doc_id] if span[0] <= hit["chunk_id"] <= span[1])
+            # 超出文档范围或已删除的分块不存在，片段在该处断开时只保留包含命中的连续部分
+            chunk_ids = [hit["chunk_id"]]
+            for step in (-1, 1):
+                index = hit["chunk_id"] + step
+                while span[0] <= index <= span[1] and (doc_id, index) in known:
+                    chunk_ids.append(index)
+                    index += step
+            chunk_ids.sort()
+            covered.update((doc_id, index) for index in chunk_ids)
+            results.append(
+                dict(
+                    hit,
+                    text=join_chunks([known[(doc_id, index)] for index in chunk_ids]),
+                    chunk_ids=chunk_ids,
+                )
+            )
+        return results
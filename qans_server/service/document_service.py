@@ -3,17 +3,21 @@
 from __future__ import annotations
 
 import json
+import time
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 from fastapi import UploadFile
 from langchain_core.documents import Document as LangDocument
 from loguru import logger
 from sqlalchemy.orm import Session
 
 from qans_server.setting_config import Settings, get_settings
+from qans_server.db.mysql.base import engine, get_session
 from qans_server.db.mysql.models.document import (
     DOCUMENT_STATUS_CHUNKED,
+    DOCUMENT_STATUS_IMPORTING,
     DOCUMENT_STATUS_PROCESSING,
     DOCUMENT_STATUS_COMPLETED,
     DOCUMENT_STATUS_UPLOADED,
@@ -22,6 +26,7 @@ from qans_server.db.mysql.models.document import (
     delete_document,
     get_document_by_id,
     list_documents,
+    mark_document_vectorized,
     update_document_chunk_count,
     update_document_status,
     Document,
@@ -35,9 +40,13 @@ from qans_server.db.mysql.models.knowledge_base import (
     increment_document_count,
     update_total_size,
 )
-from qans_server.db.vector.collections.doc_chunk import VectorDocChunk
+from qans_server.db.vector.bulk_import import BulkImportProgress
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, create_doc_chunk_repo, make_chunk_pk
+from qans_server.db.vector.collections.doc_summary import VectorDocSummary, create_doc_summary_repo
+from qans_server.db.vector.filters import META_FILE_TYPE, META_UPLOAD_TIME
 from qans_server.loader.document_loader import DocumentLoader
 from qans_server.loader.text_splitter import DocumentTextSplitter
+from qans_server.service.chunk_hydrator import get_chunk_hydrator
 from qans_server.service.embedding_service import EmbeddingService
 from qans_server.util.file_util import (
     delete_file,
@@ -47,6 +56,11 @@ from qans_server.util.file_util import (
     validate_file_size,
     validate_file_type,
 )
+from qans_server.util.single_flight import SingleFlight, make_key
+
+
+# 批量导入进度写入文档记录的最小间隔（秒）
+_IMPORT_PROGRESS_INTERVAL = 5.0
 
 
 class DocumentService:
@@ -58,12 +72,15 @@ class DocumentService:
         embedding_service: EmbeddingService | None = None,
         vector_repo: VectorDocChunk | None = None,
         settings: Settings | None = None,
+        summary_repo: VectorDocSummary | None = None,
     ) -> None:
         self.settings = settings or get_settings()
         self.embedding_service = embedding_service or EmbeddingService()
-        self.vector_repo = vector_repo or VectorDocChunk()
+        self.vector_repo = vector_repo or create_doc_chunk_repo()
+        self.summary_repo = summary_repo or create_doc_summary_repo()
         self.loader = DocumentLoader()
         self.splitter = DocumentTextSplitter()
+        self.single_flight = SingleFlight(engine=engine, lock_timeout=self.settings.single_flight_lock_timeout)
 
         self.allowed_types = {
             ext.lstrip(".")
@@ -135,6 +152,9 @@ class DocumentService:
             metadata = dict(chunk.metadata or {})
             metadata["doc_id"] = document.id
             metadata["knowledge_base_id"] = document.knowledge_base_id
+            # 文件类型与上传时间用于检索时的元数据过滤（见 filters.chunk_filter）
+            metadata.setdefault(META_FILE_TYPE, document.file_type)
+            metadata[META_UPLOAD_TIME] = int(document.create_time.timestamp())
 
             chunks_to_save.append(
                 DocumentChunkCreate(
@@ -156,17 +176,67 @@ class DocumentService:
         return list_document_chunks(session, document_id)
 
     def vectorize_document(self, session: Session, document_id: int) -> int:
-        """根据已保存的分块执行向量化，并写入向量库。"""
+        """根据已保存的分块执行向量化，并写入向量库。
+
+        同一文档的并发向量化请求（多客户端、重复点击、多 worker）只会执行一次，
+        其余请求等待并共享首个请求的结果。向量化读取分块、写入状态都使用独立的短事务
+        （其他 worker 需要看到 processing / completed 状态），不提交调用方 ``session`` 中的事务，
+        因此共享的结果也不依赖任何一个请求的事务。
+        """
 
         document = get_document_by_id(session, document_id)
         if not document:
             raise ValueError("文档不存在")
+        # 进入单飞前记录向量化完成次数，拿到跨进程锁后次数增加说明其他 worker 已完成
+        version = self._get_vectorize_version(document_id)
+        return self.single_flight.do(
+            make_key("vectorize_document", document_id),
+            lambda: self._vectorize_document(document_id),
+            distributed=True,
+            reuse=lambda: self._get_vectorized_count(document_id, version),
+        )
 
-        chunks = list_document_chunks(session, document_id)
-        if not chunks:
-            raise ValueError("未找到分块记录，请先执行分块")
+    @staticmethod
+    def _get_vectorize_version(document_id: int) -> int:
+        # 使用独立 Session，读取其他 worker 已提交的状态
+        with get_session() as fresh_session:
+            document = get_document_by_id(fresh_session, document_id)
+            return document.vectorize_version if document is not None else 0
+
+    def _get_vectorized_count(self, document_id: int, version: int) -> Optional[int]:
+        """若文档已被其他 worker 在 ``version`` 之后完成向量化，返回其分块数量。"""
+
+        with get_session() as fresh_session:
+            document = get_document_by_id(fresh_session, document_id)
+            if (
+                document is not None
+                and document.status == DOCUMENT_STATUS_COMPLETED
+                and document.vectorize_version > version
+            ):
+                return document.chunk_count
+        return None
+
+    @staticmethod
+    def _write_status(
+        document_id: int,
+        status: str,
+        message: Optional[str] = None,
+        import_progress: Optional[int] = None,
+    ) -> None:
+        """在独立的短事务中写入文档状态并立即提交，其他请求与 worker 可以马上看到。"""
 
-        update_document_status(session, document_id, DOCUMENT_STATUS_PROCESSING)
+        with get_session() as status_session:
+            update_document_status(status_session, document_id, status, message, import_progress)
+
+    def _vectorize_document(self, document_id: int) -> int:
+        with get_session() as read_session:
+            document = get_document_by_id(read_session, document_id)
+            if not document:
+                raise ValueError("文档不存在")
+            chunks = list_document_chunks(read_session, document_id)
+            if not chunks:
+                raise ValueError("未找到分块记录，请先执行分块")
+            update_document_status(read_session, document_id, DOCUMENT_STATUS_PROCESSING)
 
         try:
             langchain_docs: list[LangDocument] = []
@@ -181,6 +251,9 @@ class DocumentService:
                 metadata.setdefault("doc_id", document.id)
                 metadata.setdefault("knowledge_base_id", document.knowledge_base_id)
                 metadata.setdefault("chunk_index", chunk.chunk_index)
+                # 早期分块的元数据没有文件类型与上传时间，重新向量化时补齐
+                metadata.setdefault(META_FILE_TYPE, document.file_type)
+                metadata.setdefault(META_UPLOAD_TIME, int(document.create_time.timestamp()))
 
                 langchain_docs.append(
                     LangDocument(
@@ -189,24 +262,103 @@ class DocumentService:
                     )
                 )
 
-            vectors = self.embedding_service.embed_documents(langchain_docs)
+            vectors = self.embedding_service.embed_documents(langchain_docs, document.knowledge_base_id)
 
-            # 重新向量化前先清理旧向量
-            self.vector_repo.delete_documents_by_doc_id(document_id)
-            inserted = self.vector_repo.insert_documents(
-                documents=langchain_docs,
-                vectors=vectors,
-                doc_id=document.id,
-                knowledge_base_id=document.knowledge_base_id,
+            # 主键由 (doc_id, chunk_index) 确定：已有向量时直接 upsert 覆盖，
+            # 不再先按表达式整体删除再插入
+            existing_pks = set(
+                self.vector_repo.list_chunk_pks_by_doc_id(document.id, document.knowledge_base_id)
             )
-
-            update_document_status(session, document_id, DOCUMENT_STATUS_COMPLETED)
+            if self.vector_repo.use_bulk_import(len(langchain_docs)):
+                inserted = self._bulk_import_vectors(document, langchain_docs, vectors, existing_pks)
+            else:
+                # 启用写缓冲时多个文档的行会合并写入，需等待本文档的行写入完成后才能标记 completed
+                inserted = self.vector_repo.submit_documents(
+                    documents=langchain_docs,
+                    vectors=vectors,
+                    doc_id=document.id,
+                    knowledge_base_id=document.knowledge_base_id,
+                    upsert=bool(existing_pks),
+                ).result()
+
+                # 重新分块后分块数变少时，点删多出来的旧分块
+                stale_pks = existing_pks - {
+                    make_chunk_pk(document.id, doc.metadata["chunk_index"]) for doc in langchain_docs
+                }
+                if stale_pks:
+                    self.vector_repo.delete_chunks(sorted(stale_pks))
+            self._invalidate_hydrated_chunks(document.id)
+            if self.summary_repo is not None:
+                # 文档级摘要向量（分块按 chunk_index 顺序排列）
+                self.summary_repo.upsert_document(document.id, document.knowledge_base_id, vectors)
+
+            # 在释放跨进程锁之前提交，等待中的其他 worker 才能看到完成状态
+            with get_session() as status_session:
+                mark_document_vectorized(status_session, document_id)
             return inserted
         except Exception as exc:  # noqa: BLE001
             logger.error(exc)
-            update_document_status(session, document_id, DOCUMENT_STATUS_FAILED, str(exc))
+            self._write_status(document_id, DOCUMENT_STATUS_FAILED, str(exc))
             raise
 
+    def _bulk_import_vectors(
+        self,
+        document: Document,
+        langchain_docs: list[LangDocument],
+        vectors: np.ndarray,
+        existing_pks: set[int],
+    ) -> int:
+        """
+        大文档通过 Milvus 批量导入写入向量，导入期间文档状态为 importing，进度（百分比）写入 ``import_progress``。
+
+        批量导入是追加写入，主键相同的旧分块必须在导入前删除（导入后再删会连同新行一起删掉）。
+        导入失败时文档已没有向量，改为逐批 upsert 写入恢复；逐批写入也失败时由调用方标记为 failed。
+        """
+
+        if existing_pks:
+            self.vector_repo.delete_chunks(sorted(existing_pks))
+        document_id = document.id
+        # 导入可能持续较长时间，状态立即提交供其他请求查询
+        self._write_status(document_id, DOCUMENT_STATUS_IMPORTING, import_progress=0)
+
+        last_report = 0.0
+
+        def report(progress: BulkImportProgress) -> None:
+            nonlocal last_report
+            logger.info(
+                f"文档 {document_id} 批量导入进度: {progress.percent}% "
+                f"({progress.imported_rows}/{progress.total_rows})"
+            )
+            # 限制写库频率
+            now = time.monotonic()
+            if not progress.done and now - last_report < _IMPORT_PROGRESS_INTERVAL:
+                return
+            last_report = now
+            self._write_status(document_id, DOCUMENT_STATUS_IMPORTING, import_progress=progress.percent)
+
+        try:
+            inserted = self.vector_repo.bulk_insert_documents(
+                documents=langchain_docs,
+                vectors=vectors,
+                doc_id=document_id,
+                knowledge_base_id=document.knowledge_base_id,
+                on_progress=report,
+            )
+        except Exception as exc:  # noqa: BLE001 - 旧分块已删除，必须写回向量
+            logger.warning(f"文档 {document_id} 批量导入失败，改为逐批写入: {exc}")
+            # 逐批写入没有进度回调，清除导入进度
+            self._write_status(document_id, DOCUMENT_STATUS_IMPORTING)
+            # 导入任务可能已写入部分行，upsert 覆盖同主键的行
+            inserted = self.vector_repo.submit_documents(
+                documents=langchain_docs,
+                vectors=vectors,
+                doc_id=document_id,
+                knowledge_base_id=document.knowledge_base_id,
+                upsert=True,
+            ).result()
+        # 导入进度由完成状态（mark_document_vectorized）或失败状态清除
+        return inserted
+
     # ------------------------------------------------------------------
     # 查询与删除
     # ------------------------------------------------------------------
@@ -238,7 +390,10 @@ class DocumentService:
         file_path = Path(doc.file_path)
         file_size = doc.file_size
 
-        self.vector_repo.delete_documents_by_doc_id(document_id)
+        self.vector_repo.delete_documents_by_doc_id(document_id, knowledge_base_id)
+        if self.summary_repo is not None:
+            self.summary_repo.delete_document(document_id)
+        self._invalidate_hydrated_chunks(document_id)
         delete_document(session, document_id)
 
         increment_document_count(session, knowledge_base_id, -1)
@@ -250,6 +405,13 @@ class DocumentService:
     # ------------------------------------------------------------------
     # 工具方法
     # ------------------------------------------------------------------
+    @staticmethod
+    def _invalidate_hydrated_chunks(document_id: int) -> None:
+        # 两阶段检索的回填缓存中可能还有旧分块文本
+        hydrator = get_chunk_hydrator()
+        if hydrator is not None:
+            hydrator.invalidate_document(document_id)
+
     def get_chunk_type_configs(self) -> dict:
         """返回所有类型的分块默认配置。"""
         return self.splitter.get_all_type_configs()
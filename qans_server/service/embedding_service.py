@@ -2,35 +2,114 @@
 
 from __future__ import annotations
 
-from typing import Iterable, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
 
+import numpy as np
 from langchain_core.documents import Document
 
+from qans_server.db.vector.projection import DimensionReducer, get_dimension_reducer
 from qans_server.llm.vector_model import EmbeddingLLMClient
+from qans_server.setting_config import settings
+from qans_server.util.single_flight import SingleFlight, make_key
+from qans_server.util.vector_util import allocate_matrix, prepare_matrix, prepare_vector
+
+# 客户端不支持批量查询向量化时，逐个查询向量化的并发数
+_QUERY_EMBED_WORKERS = 8
 
 
 class EmbeddingService:
-    """封装向量化相关能力。"""
+    """封装向量化相关能力。
+
+    所有向量均以连续 float32 ``np.ndarray`` 返回（批量为 N×D 矩阵，查询为一维数组），
+    已完成维度 / 数值校验与 L2 归一化，且为只读，可在并发调用之间安全共享。
 
-    def __init__(self, client: EmbeddingLLMClient | None = None) -> None:
+    配置 ``VECTOR_DIM`` 小于模型维度时，向量按知识库的降维方式（截断或 PCA 投影）
+    降到 ``dim`` 维后重新归一化，文档与查询使用同一投影。
+    """
+
+    def __init__(
+        self,
+        client: EmbeddingLLMClient | None = None,
+        reducer: DimensionReducer | None = None,
+    ) -> None:
         self._client = client or EmbeddingLLMClient()
+        self._single_flight = SingleFlight()
+        self.reducer = reducer or get_dimension_reducer()
+        # 向量模型输出维度与写入向量库的维度
+        self.model_dim = settings.embedding_dim
+        self.dim = settings.stored_vector_dim
 
-    def embed_documents(self, documents: List[Document]) -> List[List[float]]:
-        """为文档列表生成向量。"""
+    def embed_documents(self, documents: List[Document], knowledge_base_id: Optional[int] = None) -> np.ndarray:
+        """为文档列表生成向量（按知识库的投影降维）。"""
 
-        return self._client.embed_documents(documents)
+        matrix = prepare_matrix(self._client.embed_documents(documents), self.model_dim, copy=False)
+        return self.reducer.reduce(matrix, knowledge_base_id)
 
-    def embed_texts(self, texts: Iterable[str]) -> List[List[float]]:
-        """批量向量化文本。"""
+    def embed_texts(self, texts: Iterable[str], knowledge_base_id: Optional[int] = None) -> np.ndarray:
+        """批量向量化文本（按知识库的投影降维）。"""
 
         text_list = list(texts)
         if not text_list:
-            return []
-        return self._client.embed_texts(text_list)
+            return allocate_matrix(0, self.dim)
+        return self.reducer.reduce(self.embed_texts_full(text_list), knowledge_base_id)
+
+    def embed_texts_full(self, texts: Iterable[str]) -> np.ndarray:
+        """批量向量化文本，返回模型原始维度的向量（用于拟合 PCA 投影）。"""
+
+        text_list = list(texts)
+        if not text_list:
+            return allocate_matrix(0, self.model_dim)
+        return prepare_matrix(self._client.embed_texts(text_list), self.model_dim, copy=False)
 
-    def embed_query(self, text: str) -> List[float]:
-        """向量化查询语句。"""
+    def embed_query(self, text: str, knowledge_base_id: Optional[int] = None) -> np.ndarray:
+        """向量化查询语句（相同查询的并发调用只请求一次向量模型）。"""
 
-        return self._client.embed_query(text)
+        return self.reducer.reduce_vector(self._embed_query_full(text), knowledge_base_id)
+
+    def embed_query_groups(self, text: str, knowledge_base_ids: List[int]) -> List[Tuple[List[int], np.ndarray]]:
+        """
+        为多个知识库向量化查询语句。
+
+        知识库使用不同 PCA 投影时查询向量各不相同，按投影分组返回
+        ``[(知识库ID列表, 查询向量), ...]``；未降维或统一截断时只有一组。
+        """
+
+        full = self._embed_query_full(text)
+        groups = self.reducer.group_knowledge_bases(knowledge_base_ids)
+        return [(kb_ids, self.reducer.reduce_vector(full, kb_ids[0])) for kb_ids in groups.values()]
+
+    def embed_query_batch(
+        self,
+        texts: List[str],
+        knowledge_base_ids: List[int],
+    ) -> List[Tuple[List[int], np.ndarray]]:
+        """
+        批量向量化多个查询语句（按查询向量化，与 ``embed_query`` 结果一致），分组方式同 ``embed_query_groups``。
+
+        客户端支持批量查询向量化（``embed_queries``）时一次批量请求，否则并发逐个调用 ``embed_query``。
+
+        Returns:
+            ``[(知识库ID列表, 查询向量矩阵), ...]``，矩阵第 i 行对应 ``texts[i]``；``texts`` 为空时返回空列表
+        """
+
+        if not texts:
+            return []
+        full = self._embed_queries_full(texts)
+        groups = self.reducer.group_knowledge_bases(knowledge_base_ids)
+        return [(kb_ids, self.reducer.reduce(full, kb_ids[0])) for kb_ids in groups.values()]
 
+    def _embed_queries_full(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return allocate_matrix(0, self.model_dim)
+        embed_queries = getattr(self._client, "embed_queries", None)
+        if embed_queries is not None:
+            return prepare_matrix(embed_queries(texts), self.model_dim, copy=False)
+        with ThreadPoolExecutor(max_workers=min(len(texts), _QUERY_EMBED_WORKERS)) as pool:
+            return prepare_matrix(np.stack(list(pool.map(self._embed_query_full, texts))), self.model_dim, copy=False)
 
+    def _embed_query_full(self, text: str) -> np.ndarray:
+        return self._single_flight.do(
+            make_key("embed_query", text),
+            lambda: prepare_vector(self._client.embed_query(text), self.model_dim),
+        )
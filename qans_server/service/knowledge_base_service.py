@@ -20,14 +20,20 @@ from qans_server.db.mysql.models.knowledge_base import (
     list_knowledge_bases,
     update_knowledge_base,
 )
-from qans_server.db.vector.collections.doc_chunk import VectorDocChunk
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, create_doc_chunk_repo
+from qans_server.db.vector.collections.doc_summary import VectorDocSummary, create_doc_summary_repo
 
 
 class KnowledgeBaseService:
     """知识库服务。"""
 
-    def __init__(self, vector_repo: VectorDocChunk | None = None) -> None:
-        self._vector_repo = vector_repo or VectorDocChunk()
+    def __init__(
+        self,
+        vector_repo: VectorDocChunk | None = None,
+        summary_repo: VectorDocSummary | None = None,
+    ) -> None:
+        self._vector_repo = vector_repo or create_doc_chunk_repo()
+        self._summary_repo = summary_repo or create_doc_summary_repo()
 
     # ------------------------------------------------------------------
     # 基础操作
@@ -101,6 +107,8 @@ class KnowledgeBaseService:
 
         # 删除向量数据
         self._vector_repo.delete_documents_by_knowledge_base_id(kb_id)
+        if self._summary_repo is not None:
+            self._summary_repo.delete_knowledge_base(kb_id)
 
         # 删除文档记录（依赖外键级联也可以）
         for doc in documents:
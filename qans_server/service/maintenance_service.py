@@ -0,0 +1,180 @@
+"""分块集合后台维护。
+
+重新向量化前的删除与知识库删除会留下大量删除记录与小段，检索延迟随时间上升。
+维护调度器在后台线程中按 ``VECTOR_MAINTENANCE_INTERVAL`` 检查段健康度：growing 段过大时 flush，
+已删除行比例或小段数量超过阈值时触发 compaction。维护只在 ``VECTOR_MAINTENANCE_WINDOWS``
+配置的低峰时段执行（手动触发可忽略时段）；多个 worker 通过 MySQL 命名锁保证同一时刻只有一个执行。
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from typing import List, Optional
+
+from loguru import logger
+
+from qans_server.db.mysql.base import engine
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, create_doc_chunk_repo
+from qans_server.db.vector.maintenance import SegmentHealth
+from qans_server.setting_config import Settings, get_settings
+from qans_server.util.single_flight import SingleFlight, SingleFlightLockTimeout, make_key
+
+ACTION_FLUSH = "flush"
+ACTION_COMPACT = "compact"
+
+
+@dataclass(frozen=True)
+class MaintenanceWindow:
+    """每日的维护时段（本地时间），``end`` 早于 ``start`` 时表示跨零点。"""
+
+    start: time
+    end: time
+
+    @classmethod
+    def parse(cls, text: str) -> "MaintenanceWindow":
+        start, end = (time.fromisoformat(part.strip().zfill(5)) for part in text.split("-", 1))
+        return cls(start, end)
+
+    def contains(self, moment: datetime) -> bool:
+        current = moment.time()
+        if self.start <= self.end:
+            return self.start <= current < self.end
+        return current >= self.start or current < self.end
+
+    def __str__(self) -> str:
+        return f"{self.start:%H:%M}-{self.end:%H:%M}"
+
+
+@dataclass
+class MaintenanceReport:
+    """一次维护检查的结果。"""
+
+    checked_at: datetime
+    health: SegmentHealth
+    # 根据健康度需要执行的操作
+    actions: List[str] = field(default_factory=list)
+    # 实际执行完成的操作
+    executed: List[str] = field(default_factory=list)
+    skipped_reason: Optional[str] = None
+    error: Optional[str] = None
+
+
+class MaintenanceService:
+    """分块集合的段健康度检查与低峰时段维护调度。"""
+
+    def __init__(
+        self,
+        *,
+        vector_repo: VectorDocChunk | None = None,
+        settings: Settings | None = None,
+    ) -> None:
+        self.settings = settings or get_settings()
+        self.vector_repo = vector_repo or create_doc_chunk_repo()
+        self.windows = [MaintenanceWindow.parse(text) for text in self.settings.vector_maintenance_windows]
+        # 命名锁不等待：其他 worker 正在维护时本次直接跳过
+        self.single_flight = SingleFlight(engine=engine, lock_timeout=0)
+        self.last_report: Optional[MaintenanceReport] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def health(self) -> SegmentHealth:
+        """当前的段健康度指标。"""
+        return self.vector_repo.segment_health()
+
+    def in_window(self, moment: Optional[datetime] = None) -> bool:
+        moment = moment or datetime.now()
+        return any(window.contains(moment) for window in self.windows)
+
+    def plan(self, health: SegmentHealth) -> List[str]:
+        """根据健康度决定需要执行的维护操作。"""
+
+        actions = []
+        if health.growing_rows > self.settings.vector_maintenance_growing_rows:
+            actions.append(ACTION_FLUSH)
+        if (
+            health.deleted_ratio > self.settings.vector_maintenance_deleted_ratio
+            or health.small_segment_count > self.settings.vector_maintenance_max_small_segments
+        ):
+            actions.append(ACTION_COMPACT)
+        return actions
+
+    def run(self, force: bool = False) -> MaintenanceReport:
+        """
+        检查段健康度，需要时执行 flush / compaction。
+
+        Args:
+            force: 为 True 时忽略维护时段立即执行
+        """
+        health = self.health()
+        report = MaintenanceReport(checked_at=datetime.now(), health=health, actions=self.plan(health))
+        if not report.actions:
+            report.skipped_reason = "段健康度正常"
+        elif not force and not self.in_window(report.checked_at):
+            report.skipped_reason = "不在维护时段"
+        else:
+            try:
+                report.executed = self.single_flight.do(
+                    make_key("vector_maintenance", self.vector_repo.collection_name),
+                    lambda: self._execute(report.actions),
+                    distributed=True,
+                )
+            except SingleFlightLockTimeout:
+                report.skipped_reason = "其他 worker 正在执行维护"
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"分块集合维护失败: {exc}")
+                report.error = str(exc)
+
+        self.last_report = report
+        return report
+
+    def _execute(self, actions: List[str]) -> List[str]:
+        executed = []
+        if ACTION_FLUSH in actions:
+            self.vector_repo.flush()
+            executed.append(ACTION_FLUSH)
+        if ACTION_COMPACT in actions:
+            if self.vector_repo.compact(timeout=self.settings.vector_maintenance_timeout):
+                executed.append(ACTION_COMPACT)
+            else:
+                logger.warning("分块集合压缩未在超时前完成，下个检查周期继续观察")
+        logger.info(f"分块集合维护完成: {executed}")
+        return executed
+
+    # ------------------------------------------------------------------
+    # 后台调度
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """启动后台调度线程（重复调用无副作用）。"""
+
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="vector-maintenance", daemon=True)
+        self._thread.start()
+        logger.info(f"分块集合维护调度已启动，维护时段: {', '.join(map(str, self.windows))}")
+
+    def stop(self) -> None:
+        """停止后台调度线程，不等待正在执行的压缩（压缩任务在 Milvus 端继续执行）。"""
+
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=1)
+        self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.settings.vector_maintenance_interval):
+            try:
+                report = self.run()
+            except Exception as exc:  # noqa: BLE001 - 检查失败不能终止调度线程
+                logger.error(f"分块集合段健康度检查失败: {exc}")
+                continue
+            health = report.health
+            logger.debug(
+                f"分块集合段健康度: 段 {health.segment_count}（小段 {health.small_segment_count}，"
+                f"L0 {health.l0_segment_count}），已删除行比例 {health.deleted_ratio:.2%}，"
+                f"growing 行 {health.growing_rows}"
+            )
@@ -0,0 +1,533 @@
+"""检索业务逻辑。"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, create_doc_chunk_repo, make_chunk_pk
+from qans_server.db.vector.collections.doc_summary import VectorDocSummary, create_doc_summary_repo
+from qans_server.db.vector.filters import FilterExpr, field_in
+from qans_server.db.vector.fusion import cap_per_group, rrf_fuse, weighted_fuse
+from qans_server.db.vector.mmr import mmr_select
+from qans_server.llm import arerank_documents, get_rerank_client, rerank_documents, rerank_enabled
+from qans_server.service.chunk_hydrator import HYDRATE_SOURCE_VECTOR, ChunkHydrator, get_chunk_hydrator
+from qans_server.service.context_expander import ContextExpander
+from qans_server.service.embedding_service import EmbeddingService
+from qans_server.setting_config import settings
+
+
+# 并发检索的单个任务：(知识库ID, 查询向量, 过滤条件)
+_FanoutUnit = Tuple[int, np.ndarray, Optional[FilterExpr]]
+
+_fanout_executor: ThreadPoolExecutor | None = None
+_fanout_executor_lock = threading.Lock()
+
+
+def _get_fanout_executor() -> ThreadPoolExecutor:
+    global _fanout_executor
+    with _fanout_executor_lock:
+        if _fanout_executor is None:
+            _fanout_executor = ThreadPoolExecutor(
+                max_workers=settings.retrieval_fanout_workers,
+                thread_name_prefix="retrieval-fanout",
+            )
+        return _fanout_executor
+
+
+class RetrievalService:
+    """知识片段检索：查询向量化 → 混合检索 → 重排。
+
+    启用两阶段检索（``RETRIEVAL_HYDRATION``）时，混合检索只返回主键与分数，
+    重排所需的文本与最终结果的元数据再由 ``ChunkHydrator`` 按主键回填。
+
+    启用文档级摘要向量（``RETRIEVAL_DOC_SUMMARY``）时，先在摘要向量上粗选文档，
+    分块检索只在粗选出的文档中进行。
+
+    启用并发检索（``RETRIEVAL_FANOUT``）时，多个知识库各自检索（各自的候选数量）后向量化融合，
+    单个知识库的结果数受配额限制，超过时限未返回的知识库被跳过。
+
+    启用 MMR（``RETRIEVAL_MMR``）时，重排前按候选向量做最大边际相关选择，剔除与已选分块高度相似的候选，
+    保留内容互补的分块：之后还要重排时保留 ``top_k × RETRIEVAL_MMR_POOL_MULTIPLIER`` 个由重排截断，否则保留 ``top_k`` 个。
+
+    启用相邻分块扩展（``RETRIEVAL_CONTEXT_WINDOW``）时，最终结果补充前后各 N 个分块并合并为连续片段。
+    """
+
+    def __init__(
+        self,
+        *,
+        embedding_service: EmbeddingService | None = None,
+        vector_repo: VectorDocChunk | None = None,
+        hydrator: ChunkHydrator | None = None,
+        summary_repo: VectorDocSummary | None = None,
+    ) -> None:
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_repo = vector_repo or create_doc_chunk_repo()
+        self.hydrator = hydrator or get_chunk_hydrator()
+        self.summary_repo = summary_repo or create_doc_summary_repo()
+        # 相邻分块与回填使用同一来源；未启用两阶段检索时按主键从向量库获取
+        self.context_expander = ContextExpander(
+            self.hydrator or ChunkHydrator(HYDRATE_SOURCE_VECTOR, vector_repo=self.vector_repo),
+            settings.retrieval_context_window,
+        )
+
+    def retrieve(
+        self,
+        query: str,
+        knowledge_base_ids: List[int],
+        *,
+        top_k: int = 5,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[dict]:
+        """
+        检索与问题相关的知识片段。
+
+        Args:
+            query: 问题
+            knowledge_base_ids: 检索的知识库
+            top_k: 召回数量
+            quality: 质量档位（fast / balanced / accurate）
+            latency_budget_ms: 检索延迟预算（毫秒），优先于质量档位
+            filter_expr: 附加的元数据过滤条件（见 ``filters.chunk_filter``），在向量库中与知识库条件一起过滤
+        """
+
+        self._validate(query, knowledge_base_ids)
+
+        # 知识库使用不同的降维投影时，每组知识库各用自己的查询向量检索后再融合
+        groups = self.embedding_service.embed_query_groups(query, knowledge_base_ids)
+        if self._fan_out(knowledge_base_ids):
+            units = []
+            for kb_ids, query_vector in groups:
+                scope = self._scope(filter_expr, self._select_documents(query_vector, kb_ids, filter_expr))
+                units.extend((kb_id, query_vector, scope) for kb_id in kb_ids)
+            fused = self._search_fanout(query, units, top_k, quality, latency_budget_ms)
+            return self._rank(query, [fused], top_k, self._mmr_query_vector(groups))
+
+        results = [
+            # 混合检索
+            self.vector_repo.search_similar_chunks(
+                query=query,
+                query_vector=query_vector,
+                knowledge_base_ids=kb_ids,
+                top_k=top_k,
+                quality=quality,
+                latency_budget_ms=latency_budget_ms,
+                output_fields=[] if self.hydrator is not None else None,
+                filter_expr=self._scope(
+                    filter_expr,
+                    self._select_documents(query_vector, kb_ids, filter_expr),
+                ),
+            )
+            for kb_ids, query_vector in groups
+        ]
+        return self._rank(query, results, top_k, self._mmr_query_vector(groups))
+
+    async def aretrieve(
+        self,
+        query: str,
+        knowledge_base_ids: List[int],
+        *,
+        top_k: int = 5,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[dict]:
+        """
+        ``retrieve`` 的异步版本。
+
+        混合检索通过异步 Milvus 客户端执行，等待期间不占用线程池线程；
+        重排模型通过异步 HTTP 客户端调用；向量模型仍为同步 HTTP 调用，放到线程池中执行。
+        """
+
+        self._validate(query, knowledge_base_ids)
+
+        groups = await asyncio.to_thread(self.embedding_service.embed_query_groups, query, knowledge_base_ids)
+        selected = await asyncio.gather(*(
+            self._aselect_documents(query_vector, kb_ids, filter_expr) for kb_ids, query_vector in groups
+        ))
+        if self._fan_out(knowledge_base_ids):
+            units = [
+                (kb_id, query_vector, self._scope(filter_expr, doc_ids))
+                for (kb_ids, query_vector), doc_ids in zip(groups, selected)
+                for kb_id in kb_ids
+            ]
+            fused = await self._asearch_fanout(query, units, top_k, quality, latency_budget_ms)
+            return await self._arank(query, [fused], top_k, self._mmr_query_vector(groups))
+
+        results = await asyncio.gather(*(
+            self.vector_repo.asearch_similar_chunks(
+                query=query,
+                query_vector=query_vector,
+                knowledge_base_ids=kb_ids,
+                top_k=top_k,
+                quality=quality,
+                latency_budget_ms=latency_budget_ms,
+                output_fields=[] if self.hydrator is not None else None,
+                filter_expr=self._scope(filter_expr, doc_ids),
+            )
+            for (kb_ids, query_vector), doc_ids in zip(groups, selected)
+        ))
+        return await self._arank(query, list(results), top_k, self._mmr_query_vector(groups))
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        knowledge_base_ids: List[int],
+        *,
+        top_k: int = 5,
+        quality: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None,
+        filter_expr: Optional[FilterExpr] = None,
+    ) -> List[List[dict]]:
+        """
+        批量检索多个问题。
+
+        全部问题一次批量向量化，每组知识库只发起一次混合检索（nq = 问题数），分块回填也合并为一次，
+        请求往返次数不随问题数增长；重排逐个问题进行。批量检索不做文档级摘要粗选
+        （粗选需要逐个问题检索摘要集合）。
+
+        Returns:
+            与 ``queries`` 一一对应的检索结果
+        """
+
+        if not queries:
+            raise ValueError("问题列表不能为空")
+        for query in queries:
+            self._validate(query, knowledge_base_ids)
+
+        groups = self.embedding_service.embed_query_batch(queries, knowledge_base_ids)
+        group_results = [
+            self.vector_repo.search_many(
+                queries,
+                query_vectors,
+                kb_ids,
+                top_k,
+                quality=quality,
+                latency_budget_ms=latency_budget_ms,
+                output_fields=[] if self.hydrator is not None else None,
+                filter_expr=filter_expr,
+            )
+            for kb_ids, query_vectors in groups
+        ]
+        # 按问题合并各组知识库的结果
+        hit_lists = [
+            results[0] if len(results) == 1 else self._merge_groups(list(results), top_k)
+            for results in zip(*group_results)
+        ]
+        return self._rank_many(queries, hit_lists, top_k, self._mmr_query_vector(groups))
+
+    @staticmethod
+    def _fan_out(knowledge_base_ids: List[int]) -> bool:
+        return settings.retrieval_fanout and len(knowledge_base_ids) > 1
+
+    def _search_fanout(
+        self,
+        query: str,
+        units: List[_FanoutUnit],
+        top_k: int,
+        quality: Optional[str],
+        latency_budget_ms: Optional[int],
+    ) -> List[dict]:
+        """每个知识库在线程池中并发检索，等待至时限后融合已返回的结果。"""
+
+        executor = _get_fanout_executor()
+        futures = [
+            executor.submit(
+                self.vector_repo.search_similar_chunks,
+                query=query,
+                query_vector=query_vector,
+                knowledge_base_ids=[kb_id],
+                top_k=top_k,
+                quality=quality,
+                latency_budget_ms=latency_budget_ms,
+                output_fields=[],
+                filter_expr=scope,
+            )
+            for kb_id, query_vector, scope in units
+        ]
+        done, _ = wait(futures, timeout=self._fanout_timeout())
+        outcomes = []
+        for future in futures:
+            if future not in done:
+                # 已在执行的检索无法中断，结果被丢弃
+                future.cancel()
+                outcomes.append(None)
+            else:
+                outcomes.append(future.exception() or future.result())
+        fused = self._fuse_fanout(units, outcomes, top_k)
+        if self.hydrator is not None or not fused:
+            return fused
+        rows = {row["id"]: row for row in self.vector_repo.get_chunks([hit["id"] for hit in fused])}
+        return [dict(rows[hit["id"]], **hit) for hit in fused if hit["id"] in rows]
+
+    async def _asearch_fanout(
+        self,
+        query: str,
+        units: List[_FanoutUnit],
+        top_k: int,
+        quality: Optional[str],
+        latency_budget_ms: Optional[int],
+    ) -> List[dict]:
+        tasks = [
+            asyncio.ensure_future(self.vector_repo.asearch_similar_chunks(
+                query=query,
+                query_vector=query_vector,
+                knowledge_base_ids=[kb_id],
+                top_k=top_k,
+                quality=quality,
+                latency_budget_ms=latency_budget_ms,
+                output_fields=[],
+                filter_expr=scope,
+            ))
+            for kb_id, query_vector, scope in units
+        ]
+        done, pending = await asyncio.wait(tasks, timeout=self._fanout_timeout())
+        for task in pending:
+            task.cancel()
+        outcomes = [(task.exception() or task.result()) if task in done else None for task in tasks]
+        fused = self._fuse_fanout(units, outcomes, top_k)
+        if self.hydrator is not None or not fused:
+            return fused
+        rows = {row["id"]: row for row in await self.vector_repo.aget_chunks([hit["id"] for hit in fused])}
+        return [dict(rows[hit["id"]], **hit) for hit in fused if hit["id"] in rows]
+
+    @staticmethod
+    def _fanout_timeout() -> Optional[float]:
+        deadline_ms = settings.retrieval_fanout_deadline_ms
+        return deadline_ms / 1000 if deadline_ms > 0 else None
+
+    @staticmethod
+    def _fuse_fanout(units: Sequence[_FanoutUnit], outcomes: List, top_k: int) -> List[dict]:
+        """
+        融合各知识库的检索结果（只含主键与分数）。
+
+        ``outcomes`` 与 ``units`` 一一对应：命中列表、异常或 None（超过时限）。
+        部分知识库失败或超时时用其余知识库的结果作答，全部失败时抛出第一个异常。
+        """
+        hit_lists, errors = [], []
+        for (kb_id, _, _), outcome in zip(units, outcomes):
+            if outcome is None:
+                logger.warning(f"知识库 {kb_id} 检索超过 {settings.retrieval_fanout_deadline_ms}ms，本次跳过")
+            elif isinstance(outcome, BaseException):
+                logger.warning(f"知识库 {kb_id} 检索失败，本次跳过: {outcome}")
+                errors.append(outcome)
+            else:
+                hit_lists.append(outcome)
+        if not hit_lists and errors:
+            raise errors[0]
+
+        limit = top_k * 2
+        id_lists = [np.fromiter((hit["id"] for hit in hits), dtype=np.int64, count=len(hits)) for hits in hit_lists]
+        score_lists = None
+        if settings.retrieval_fanout_fusion == "score":
+            # 各知识库使用同一 RRF ranker 与平滑常数，融合分数可直接比较
+            score_lists = [
+                np.fromiter((hit["score"] for hit in hits), dtype=np.float64, count=len(hits)) for hits in hit_lists
+            ]
+        ids, scores, sources = weighted_fuse(id_lists, score_lists, k=limit)
+        keep = cap_per_group(sources, settings.retrieval_fanout_kb_quota)
+        ids, scores = ids[keep][:limit], scores[keep][:limit]
+        return [{"id": int(pk), "score": float(score)} for pk, score in zip(ids, scores)]
+
+    def _select_documents(
+        self,
+        query_vector,
+        knowledge_base_ids: List[int],
+        filter_expr: Optional[FilterExpr],
+    ) -> List[int]:
+        """粗选阶段：在文档摘要向量上选出最相关的文档，未启用或无需粗选时返回空列表。"""
+        if self.summary_repo is None or filter_expr:
+            # 带元数据过滤的请求范围已经缩小，且摘要集合不含元数据，直接检索分块
+            return []
+        return self.summary_repo.search_documents(query_vector, knowledge_base_ids, settings.retrieval_doc_top_n)
+
+    async def _aselect_documents(
+        self,
+        query_vector,
+        knowledge_base_ids: List[int],
+        filter_expr: Optional[FilterExpr],
+    ) -> List[int]:
+        if self.summary_repo is None or filter_expr:
+            return []
+        return await self.summary_repo.asearch_documents(query_vector, knowledge_base_ids, settings.retrieval_doc_top_n)
+
+    @staticmethod
+    def _scope(filter_expr: Optional[FilterExpr], doc_ids: List[int]) -> Optional[FilterExpr]:
+        # 粗选没有结果（如摘要尚未生成）时退回在全部分块上检索
+        return field_in("doc_id", doc_ids) if doc_ids else filter_expr
+
+    @staticmethod
+    def _validate(query: str, knowledge_base_ids: List[int]) -> None:
+        if not query.strip():
+            raise ValueError("问题不能为空")
+        if not knowledge_base_ids:
+            raise ValueError("未选择知识库，无法执行检索")
+
+    def _rank(
+        self,
+        query: str,
+        results: List[List[dict]],
+        top_k: int,
+        query_vector: Optional[np.ndarray] = None,
+    ) -> List[dict]:
+        """合并各组检索结果，（MMR 选择、）重排并回填分块内容。"""
+
+        related_chunks = results[0] if len(results) == 1 else self._merge_groups(results, top_k)
+
+        if not related_chunks:
+            return []
+
+        if query_vector is not None:
+            related_chunks = self._diversify(related_chunks, query_vector, self._mmr_limit(top_k))
+
+        # 重排（重排模型不可用时使用词法重排或按融合排序返回）
+        if rerank_enabled():
+            if self.hydrator is not None:
+                # 重排只需要文本，元数据只为重排后保留的结果回填
+                related_chunks = self.hydrator.hydrate(related_chunks, ["text"])
+            related_chunks = rerank_documents(query, related_chunks, top_k=top_k)
+        if self.hydrator is not None:
+            related_chunks = self.hydrator.hydrate(related_chunks)
+        return self.context_expander.expand(related_chunks)
+
+    async def _arank(
+        self,
+        query: str,
+        results: List[List[dict]],
+        top_k: int,
+        query_vector: Optional[np.ndarray] = None,
+    ) -> List[dict]:
+        """``_rank`` 的异步版本：重排请求走异步 HTTP 客户端，向量读取与分块回填（MySQL）放到线程池中执行。"""
+
+        related_chunks = results[0] if len(results) == 1 else self._merge_groups(results, top_k)
+
+        if not related_chunks:
+            return []
+
+        if query_vector is not None:
+            related_chunks = await asyncio.to_thread(
+                self._diversify, related_chunks, query_vector, self._mmr_limit(top_k)
+            )
+
+        if rerank_enabled():
+            if self.hydrator is not None:
+                related_chunks = await asyncio.to_thread(self.hydrator.hydrate, related_chunks, ["text"])
+            related_chunks = await arerank_documents(query, related_chunks, top_k=top_k)
+        if self.hydrator is not None:
+            related_chunks = await asyncio.to_thread(self.hydrator.hydrate, related_chunks)
+        if self.context_expander.window <= 0:
+            return related_chunks
+        return await asyncio.to_thread(self.context_expander.expand, related_chunks)
+
+    def _rank_many(
+        self,
+        queries: List[str],
+        hit_lists: List[List[dict]],
+        top_k: int,
+        query_vectors: Optional[np.ndarray] = None,
+    ) -> List[List[dict]]:
+        """``_rank`` 的批量版本：候选向量与回填各合并为一次读取，重排模型请求并发执行。"""
+
+        if query_vectors is not None:
+            vectors = self._candidate_vectors([hit for hits in hit_lists for hit in hits])
+            hit_lists = [
+                self._diversify(hits, query_vector, self._mmr_limit(top_k), vectors)
+                for hits, query_vector in zip(hit_lists, query_vectors)
+            ]
+
+        if rerank_enabled():
+            if self.hydrator is not None:
+                hit_lists = self.hydrator.hydrate_many(hit_lists, ["text"])
+
+            def rerank(query: str, hits: List[dict]) -> List[dict]:
+                return rerank_documents(query, hits, top_k=top_k) if hits else []
+
+            client = get_rerank_client()
+            if client is not None and len(queries) > 1:
+                with ThreadPoolExecutor(max_workers=min(len(queries), client.pool_size)) as pool:
+                    hit_lists = list(pool.map(rerank, queries, hit_lists))
+            else:
+                hit_lists = [rerank(query, hits) for query, hits in zip(queries, hit_lists)]
+        if self.hydrator is not None:
+            hit_lists = self.hydrator.hydrate_many(hit_lists)
+        return self.context_expander.expand_many(hit_lists)
+
+    @staticmethod
+    def _mmr_query_vector(groups: List[Tuple[List[int], np.ndarray]]) -> Optional[np.ndarray]:
+        """MMR 使用的查询向量（或批量检索的查询矩阵）；未启用或知识库使用不同的降维投影时返回 None。"""
+
+        # 不同投影下的候选向量不在同一空间，无法相互比较
+        if not settings.retrieval_mmr or len(groups) != 1:
+            return None
+        return groups[0][1]
+
+    @staticmethod
+    def _mmr_limit(top_k: int) -> int:
+        """MMR 保留的候选数：之后还要重排时多保留一些，由重排截断到 ``top_k``，避免 MMR 先丢掉重排会选中的分块。"""
+
+        return top_k * settings.retrieval_mmr_pool_multiplier if rerank_enabled() else top_k
+
+    @staticmethod
+    def _chunk_pk(hit: dict) -> int:
+        return hit["id"] if "id" in hit else make_chunk_pk(hit["doc_id"], hit["chunk_id"])
+
+    def _candidate_vectors(self, hits: List[dict]) -> Dict[int, np.ndarray]:
+        """按主键一次读取候选分块的向量。"""
+
+        return self.vector_repo.get_vectors({self._chunk_pk(hit) for hit in hits})
+
+    def _diversify(
+        self,
+        hits: List[dict],
+        query_vector: np.ndarray,
+        top_k: int,
+        vectors: Optional[Dict[int, np.ndarray]] = None,
+    ) -> List[dict]:
+        """
+        MMR 选择：从候选中选出 ``top_k`` 个相关且互不重复的分块，按选择顺序返回。
+
+        Args:
+            hits: 融合后的候选（按融合分数排序）
+            query_vector: 查询向量
+            top_k: 保留数量（见 ``_mmr_limit``）
+            vectors: 已读取的候选向量（批量检索时传入），为空时按主键读取
+        """
+        if len(hits) <= 1:
+            return hits
+        if vectors is None:
+            vectors = self._candidate_vectors(hits)
+        # 读不到向量的候选（如刚被删除）直接丢弃
+        hits = [hit for hit in hits if self._chunk_pk(hit) in vectors]
+        if not hits:
+            return []
+        matrix = np.stack([vectors[self._chunk_pk(hit)] for hit in hits])
+        selected = mmr_select(
+            query_vector,
+            matrix,
+            top_k,
+            lambda_mult=settings.retrieval_mmr_lambda,
+            duplicate_threshold=settings.retrieval_mmr_duplicate_threshold,
+        )
+        return [hits[index] for index in selected]
+
+    @staticmethod
+    def _merge_groups(results: List[List[dict]], top_k: int) -> List[dict]:
+        """按 RRF 融合各组知识库的检索结果。"""
+
+        chunks = {}
+        rankings = []
+        for hits in results:
+            keys = []
+            for hit in hits:
+                key = hit["id"] if "id" in hit else (hit["doc_id"], hit["chunk_id"])
+                chunks.setdefault(key, hit)
+                keys.append(key)
+            rankings.append(keys)
+        return [chunks[key] for key, _ in rrf_fuse(rankings, k=top_k * 2, limit=top_k * 2)]
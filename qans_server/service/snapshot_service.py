@@ -0,0 +1,500 @@
+"""知识库快照导出与恢复。
+
+快照为一个 zip 文件，内部按列存储：
+    manifest.json                 版本、知识库信息、列 schema 与各文件 sha256 校验和
+    documents.json                文档行（数量通常较少，直接 JSON 存储）
+    chunks/<column>.bin           MySQL 分块表的各列
+    vectors/<column>.bin          Milvus 向量行的各列（向量为 float32 N×D 矩阵，D 为降维后的维度）
+    projection.npz                知识库的 PCA 投影（可选，导入时安装为新知识库的投影）
+
+定长列为原始小端二进制数组；变长文本列为 utf-8 拼接数据（``<column>.bin``）
+加 int64 偏移数组（``<column>.offsets.bin``）。导入时不调用向量模型。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from qans_server.db.mysql.models.document import Document, iter_knowledge_base_documents
+from qans_server.db.mysql.models.document_chunk import (
+    bulk_insert_document_chunks,
+    iter_knowledge_base_chunks,
+)
+from qans_server.db.mysql.models.knowledge_base import (
+    KnowledgeBase,
+    create_knowledge_base,
+    get_knowledge_base_by_id,
+)
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, create_doc_chunk_repo, make_chunk_pk
+from qans_server.db.vector.collections.doc_summary import (
+    VectorDocSummary,
+    create_doc_summary_repo,
+    rebuild_knowledge_base_summaries,
+)
+from qans_server.db.vector.projection import DimensionReducer, get_dimension_reducer, kb_projection_key
+from qans_server.db.vector.vector_codec import decode_vector
+from qans_server.setting_config import Settings, get_settings
+from qans_server.util.file_util import ensure_directory
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+_CHUNK_FIXED_COLUMNS = {"document_id": "<i8", "chunk_index": "<i8"}
+_VECTOR_FIXED_COLUMNS = {"doc_id": "<i8", "chunk_id": "<i8"}
+# 知识库的 PCA 投影（仅 VECTOR_REDUCTION=pca 且已拟合时存在）
+_PROJECTION_MEMBER = "projection.npz"
+
+
+class SnapshotError(Exception):
+    """快照格式或校验异常。"""
+
+
+class _ColumnWriter:
+    """按批次追加写入列文件，同时计算 sha256。"""
+
+    def __init__(self, root: Path, prefix: str) -> None:
+        self._root = root
+        self._prefix = prefix
+        self._files: Dict[str, object] = {}
+        self._hashes: Dict[str, object] = {}
+        self._text_offsets: Dict[str, int] = {}
+        self.schema: Dict[str, dict] = {}
+
+    def append_fixed(self, name: str, values: np.ndarray, dtype: str) -> None:
+        array = np.ascontiguousarray(values, dtype=np.dtype(dtype))
+        column = self.schema.setdefault(
+            name, {"kind": "fixed", "dtype": dtype, "shape": [0, *array.shape[1:]]}
+        )
+        column["shape"][0] += array.shape[0]
+        self._write(f"{name}.bin", array.tobytes())
+
+    def append_text(self, name: str, values: Iterable[str]) -> None:
+        if name not in self.schema:
+            self.schema[name] = {"kind": "text", "rows": 0}
+            self._text_offsets[name] = 0
+            # 偏移数组以 0 开头，便于按 [offsets[i], offsets[i+1]) 切片
+            self._write(f"{name}.offsets.bin", np.zeros(1, dtype="<i8").tobytes())
+        start = self._text_offsets[name]
+        encoded = [value.encode("utf-8") for value in values]
+        lengths = np.fromiter((len(item) for item in encoded), dtype=np.int64, count=len(encoded))
+        offsets = start + np.cumsum(lengths, dtype=np.int64)
+        self._write(f"{name}.offsets.bin", offsets.astype("<i8").tobytes())
+        self._write(f"{name}.bin", b"".join(encoded))
+        self._text_offsets[name] = int(offsets[-1]) if len(offsets) else start
+        self.schema[name]["rows"] += len(encoded)
+
+    def close(self) -> Dict[str, str]:
+        for handle in self._files.values():
+            handle.close()
+        return {member: digest.hexdigest() for member, digest in self._hashes.items()}
+
+    def _write(self, file_name: str, data: bytes) -> None:
+        member = f"{self._prefix}/{file_name}"
+        if member not in self._files:
+            path = self._root / member
+            ensure_directory(path.parent)
+            self._files[member] = path.open("wb")
+            self._hashes[member] = hashlib.sha256()
+        self._files[member].write(data)
+        self._hashes[member].update(data)
+
+
+class _ColumnReader:
+    """读取解压后的列文件（定长列使用内存映射）。"""
+
+    def __init__(self, root: Path, prefix: str, schema: Dict[str, dict]) -> None:
+        self._root = root / prefix
+        self._schema = schema
+
+    def fixed(self, name: str) -> np.ndarray:
+        column = self._schema.get(name)
+        if column is None:
+            return np.empty((0,), dtype=np.int64)
+        shape = tuple(column["shape"])
+        if shape[0] == 0:
+            return np.empty(shape, dtype=np.dtype(column["dtype"]))
+        return np.memmap(self._root / f"{name}.bin", dtype=np.dtype(column["dtype"]), mode="r", shape=shape)
+
+    def rows(self, name: str) -> int:
+        """列的行数。"""
+        column = self._schema.get(name)
+        if column is None:
+            return 0
+        return column["rows"] if column["kind"] == "text" else column["shape"][0]
+
+    def text(self, name: str, start: int, stop: int) -> List[str]:
+        """读取文本列 ``[start, stop)`` 范围内的行（按批解码，不一次性载入整列）。"""
+        stop = min(stop, self.rows(name))
+        if start >= stop:
+            return []
+        offsets = np.memmap(self._root / f"{name}.offsets.bin", dtype="<i8", mode="r")
+        bounds = np.asarray(offsets[start:stop + 1])
+        if bounds[-1] == bounds[0]:
+            return [""] * (stop - start)
+        with (self._root / f"{name}.bin").open("rb") as handle:
+            handle.seek(int(bounds[0]))
+            data = handle.read(int(bounds[-1] - bounds[0]))
+        relative = bounds - bounds[0]
+        return [data[relative[i]:relative[i + 1]].decode("utf-8") for i in range(stop - start)]
+
+
+class SnapshotService:
+    """知识库快照导出 / 导入，用于快速克隆与恢复（不重新向量化）。"""
+
+    def __init__(
+        self,
+        *,
+        vector_repo: VectorDocChunk | None = None,
+        settings: Settings | None = None,
+        reducer: DimensionReducer | None = None,
+        summary_repo: VectorDocSummary | None = None,
+    ) -> None:
+        self.settings = settings or get_settings()
+        self.vector_repo = vector_repo or create_doc_chunk_repo()
+        self.reducer = reducer or get_dimension_reducer()
+        self.summary_repo = summary_repo or create_doc_summary_repo()
+
+    # ------------------------------------------------------------------
+    # 导出
+    # ------------------------------------------------------------------
+    def export_knowledge_base(
+        self,
+        session: Session,
+        kb_id: int,
+        target_path: Optional[Path] = None,
+        batch_size: int = 5000,
+    ) -> Path:
+        """导出知识库为快照文件，返回快照路径。"""
+
+        kb = get_knowledge_base_by_id(session, kb_id)
+        if not kb:
+            raise ValueError("知识库不存在")
+
+        if target_path is None:
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            target_path = ensure_directory(self.settings.snapshot_dir) / f"kb_{kb_id}_{timestamp}.qsnap"
+
+        documents = [doc for batch in iter_knowledge_base_documents(session, kb_id) for doc in batch]
+
+        with tempfile.TemporaryDirectory(prefix="qans_snapshot_") as tmp:
+            root = Path(tmp)
+
+            chunk_writer = _ColumnWriter(root, "chunks")
+            chunk_count = 0
+            for batch in iter_knowledge_base_chunks(session, kb_id, batch_size=batch_size):
+                chunk_writer.append_fixed(
+                    "document_id", np.array([row.document_id for row in batch]), _CHUNK_FIXED_COLUMNS["document_id"]
+                )
+                chunk_writer.append_fixed(
+                    "chunk_index", np.array([row.chunk_index for row in batch]), _CHUNK_FIXED_COLUMNS["chunk_index"]
+                )
+                chunk_writer.append_text("content", (row.content or "" for row in batch))
+                chunk_writer.append_text("metadata", (row.metadata_json or "" for row in batch))
+                chunk_count += len(batch)
+            checksums = chunk_writer.close()
+
+            vector_writer = _ColumnWriter(root, "vectors")
+            vector_count = 0
+            for batch in self.vector_repo.iter_rows_by_knowledge_base_id(
+                kb_id,
+                output_fields=["vector", "doc_id", "chunk_id", "text", "meta"],
+                batch_size=min(batch_size, 2000),
+            ):
+                vectors = np.asarray(
+                    [decode_vector(row["vector"], self.vector_repo.storage_type) for row in batch],
+                    dtype=np.float32,
+                )
+                vector_writer.append_fixed("vector", vectors, "<f4")
+                vector_writer.append_fixed(
+                    "doc_id", np.array([row["doc_id"] for row in batch]), _VECTOR_FIXED_COLUMNS["doc_id"]
+                )
+                vector_writer.append_fixed(
+                    "chunk_id", np.array([row["chunk_id"] for row in batch]), _VECTOR_FIXED_COLUMNS["chunk_id"]
+                )
+                vector_writer.append_text("text", (row.get("text") or "" for row in batch))
+                vector_writer.append_text(
+                    "meta", (json.dumps(row.get("meta") or {}, ensure_ascii=False) for row in batch)
+                )
+                vector_count += len(batch)
+            checksums.update(vector_writer.close())
+
+            documents_bytes = json.dumps(
+                [self._document_to_dict(doc) for doc in documents], ensure_ascii=False
+            ).encode("utf-8")
+            (root / "documents.json").write_bytes(documents_bytes)
+            checksums["documents.json"] = hashlib.sha256(documents_bytes).hexdigest()
+
+            # 向量已按知识库的 PCA 投影降维，查询需要同一投影，随快照一起导出
+            projection = self.reducer.projection_for(kb_id)
+            if projection is not None:
+                projection_bytes = self.reducer.store.path(projection.key, projection.version).read_bytes()
+                (root / _PROJECTION_MEMBER).write_bytes(projection_bytes)
+                checksums[_PROJECTION_MEMBER] = hashlib.sha256(projection_bytes).hexdigest()
+
+            manifest = {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "created_at": datetime.now().isoformat(),
+                "embedding_model": self.settings.embedding_model,
+                "embedding_dim": self.settings.embedding_dim,
+                "vector_dim": self.settings.stored_vector_dim,
+                "vector_reduction": self.reducer.projection_key(kb_id),
+                "knowledge_base": {"id": kb.id, "name": kb.name, "description": kb.description},
+                "counts": {
+                    "documents": len(documents),
+                    "chunks": chunk_count,
+                    "vectors": vector_count,
+                },
+                "columns": {"chunks": chunk_writer.schema, "vectors": vector_writer.schema},
+                "checksums": checksums,
+            }
+
+            ensure_directory(target_path.parent)
+            with zipfile.ZipFile(target_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+                for member in checksums:
+                    # 向量矩阵压缩收益很低，直接存储以加快读写
+                    compression = zipfile.ZIP_STORED if member.startswith("vectors/vector") else zipfile.ZIP_DEFLATED
+                    archive.write(root / member, arcname=member, compress_type=compression)
+
+        logger.info(
+            f"知识库 {kb_id} 快照导出完成: {target_path}，文档 {len(documents)}，分块 {chunk_count}，向量 {vector_count}"
+        )
+        return target_path
+
+    # ------------------------------------------------------------------
+    # 导入
+    # ------------------------------------------------------------------
+    def import_knowledge_base(
+        self,
+        session: Session,
+        snapshot_path: Path,
+        name: Optional[str] = None,
+        batch_size: int = 5000,
+    ) -> KnowledgeBase:
+        """从快照恢复为一个新的知识库，返回新建的知识库。"""
+
+        with tempfile.TemporaryDirectory(prefix="qans_snapshot_") as tmp:
+            root = Path(tmp)
+            manifest = self._extract_and_verify(Path(snapshot_path), root)
+
+            if manifest["embedding_dim"] != self.settings.embedding_dim:
+                raise SnapshotError(
+                    f"快照向量维度 {manifest['embedding_dim']} 与当前配置 {self.settings.embedding_dim} 不一致"
+                )
+            vector_dim = manifest.get("vector_dim", manifest["embedding_dim"])
+            if vector_dim != self.settings.stored_vector_dim:
+                raise SnapshotError(
+                    f"快照向量库维度 {vector_dim} 与当前配置 {self.settings.stored_vector_dim} 不一致"
+                )
+            has_projection = (root / _PROJECTION_MEMBER).exists()
+            if not has_projection and self.reducer.projection_for(None) is not None:
+                # 快照按截断降维，而新知识库会落到共用 PCA 投影上，查询向量将与快照向量不一致
+                raise SnapshotError("快照向量按截断降维，与当前共用的 PCA 投影不一致")
+            if manifest.get("embedding_model") != self.settings.embedding_model:
+                logger.warning(
+                    f"快照向量模型 {manifest.get('embedding_model')} 与当前配置 {self.settings.embedding_model} 不一致"
+                )
+
+            kb_info = manifest["knowledge_base"]
+            kb = create_knowledge_base(
+                session,
+                name=name or kb_info["name"],
+                description=kb_info.get("description"),
+            )
+
+            documents = json.loads((root / "documents.json").read_text(encoding="utf-8"))
+            doc_id_map = self._import_documents(session, kb, documents)
+
+            chunks = _ColumnReader(root, "chunks", manifest["columns"]["chunks"])
+            self._import_chunks(session, kb.id, chunks, doc_id_map, batch_size)
+
+            vectors = _ColumnReader(root, "vectors", manifest["columns"]["vectors"])
+            try:
+                self._import_vectors(kb.id, vectors, doc_id_map, batch_size)
+                if self.summary_repo is not None:
+                    rebuild_knowledge_base_summaries(self.vector_repo, self.summary_repo, kb.id, batch_size)
+            except Exception:
+                # MySQL 事务会整体回滚，这里清理已写入的向量，避免残留孤立数据
+                self.vector_repo.delete_documents_by_knowledge_base_id(kb.id)
+                if self.summary_repo is not None:
+                    self.summary_repo.delete_knowledge_base(kb.id)
+                raise
+
+            if has_projection:
+                destination = self.reducer.store.path(kb_projection_key(kb.id))
+                ensure_directory(destination.parent)
+                shutil.copy2(root / _PROJECTION_MEMBER, destination)
+                # 固定新知识库使用该投影，之后重新拟合不会改变已导入向量的查询投影
+                self.reducer.pin([kb.id])
+
+        logger.info(f"快照 {snapshot_path} 已恢复为知识库 {kb.id}")
+        return kb
+
+    def _extract_and_verify(self, snapshot_path: Path, root: Path) -> dict:
+        if not snapshot_path.exists():
+            raise FileNotFoundError(f"快照文件不存在: {snapshot_path}")
+
+        try:
+            with zipfile.ZipFile(snapshot_path) as archive:
+                manifest = json.loads(archive.read("manifest.json"))
+                if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+                    raise SnapshotError(f"不支持的快照版本: {manifest.get('format_version')}")
+
+                for member, expected in manifest["checksums"].items():
+                    digest = hashlib.sha256()
+                    target = root / member
+                    ensure_directory(target.parent)
+                    with archive.open(member) as source, target.open("wb") as sink:
+                        for block in iter(lambda: source.read(1 << 20), b""):
+                            digest.update(block)
+                            sink.write(block)
+                    if digest.hexdigest() != expected:
+                        raise SnapshotError(f"快照文件校验失败: {member}")
+        except (zipfile.BadZipFile, KeyError) as exc:
+            raise SnapshotError("快照文件格式错误") from exc
+
+        return manifest
+
+    def _import_documents(self, session: Session, kb: KnowledgeBase, documents: List[dict]) -> Dict[int, int]:
+        upload_dir = self.settings.upload_dir / str(kb.id)
+        doc_id_map: Dict[int, int] = {}
+        total_size = 0
+
+        for item in documents:
+            # 克隆的知识库需要独立的文件副本，否则删除其中一个会影响另一个
+            file_path = Path(item["file_path"])
+            if file_path.exists():
+                destination = ensure_directory(upload_dir) / file_path.name
+                shutil.copy2(file_path, destination)
+                file_path = destination
+
+            doc = Document(
+                knowledge_base_id=kb.id,
+                file_name=item["file_name"],
+                file_path=str(file_path),
+                file_size=item["file_size"],
+                file_type=item["file_type"],
+                chunk_count=item["chunk_count"],
+                status=item["status"],
+                error_message=item.get("error_message"),
+                create_time=datetime.fromisoformat(item["create_time"]),
+                update_time=datetime.now(),
+            )
+            session.add(doc)
+            session.flush()
+            doc_id_map[item["id"]] = doc.id
+            total_size += item["file_size"]
+
+        kb.document_count = len(documents)
+        kb.total_size = total_size
+        session.flush()
+        return doc_id_map
+
+    def _import_chunks(
+        self,
+        session: Session,
+        kb_id: int,
+        chunks: _ColumnReader,
+        doc_id_map: Dict[int, int],
+        batch_size: int,
+    ) -> None:
+        document_ids = chunks.fixed("document_id")
+        chunk_indexes = chunks.fixed("chunk_index")
+        total = chunks.rows("content")
+
+        for start in range(0, total, batch_size):
+            stop = min(start + batch_size, total)
+            contents = chunks.text("content", start, stop)
+            metadata = chunks.text("metadata", start, stop)
+            rows = []
+            for offset, i in enumerate(range(start, stop)):
+                new_doc_id = doc_id_map[int(document_ids[i])]
+                rows.append(
+                    {
+                        "document_id": new_doc_id,
+                        "knowledge_base_id": kb_id,
+                        "chunk_index": int(chunk_indexes[i]),
+                        "content": contents[offset],
+                        "metadata_json": self._remap_metadata(metadata[offset], new_doc_id, kb_id) or None,
+                        "create_time": datetime.now(),
+                    }
+                )
+            bulk_insert_document_chunks(session, rows, batch_size=batch_size)
+
+    def _import_vectors(
+        self,
+        kb_id: int,
+        vectors: _ColumnReader,
+        doc_id_map: Dict[int, int],
+        batch_size: int,
+    ) -> None:
+        matrix = vectors.fixed("vector")
+        doc_ids = vectors.fixed("doc_id")
+        chunk_ids = vectors.fixed("chunk_id")
+        total = vectors.rows("text")
+
+        # 大知识库走 Milvus 批量导入，行先写入本地 Parquet 文件，全部写完后统一导入
+        bulk = self.vector_repo.bulk_import() if self.vector_repo.use_bulk_import(total) else None
+        write = bulk.add if bulk is not None else self.vector_repo.insert_rows
+        with bulk if bulk is not None else contextlib.nullcontext():
+            # 向量列内存映射、文本列按批读取，内存占用与批大小相关而与知识库大小无关
+            for start in range(0, total, batch_size):
+                stop = min(start + batch_size, total)
+                block = np.ascontiguousarray(matrix[start:stop], dtype=np.float32)
+                texts = vectors.text("text", start, stop)
+                metas = vectors.text("meta", start, stop)
+                rows = []
+                for offset, i in enumerate(range(start, stop)):
+                    new_doc_id = doc_id_map[int(doc_ids[i])]
+                    rows.append(
+                        {
+                            "id": make_chunk_pk(new_doc_id, int(chunk_ids[i])),
+                            "vector": block[offset],
+                            "doc_id": new_doc_id,
+                            "chunk_id": int(chunk_ids[i]),
+                            "knowledge_base_id": kb_id,
+                            "text": texts[offset],
+                            "meta": json.loads(self._remap_metadata(metas[offset], new_doc_id, kb_id) or "{}"),
+                        }
+                    )
+                write(rows)
+
+    @staticmethod
+    def _remap_metadata(raw: str, doc_id: int, kb_id: int) -> str:
+        if not raw:
+            return raw
+        try:
+            metadata = json.loads(raw)
+        except json.JSONDecodeError:
+            return raw
+        if isinstance(metadata, dict):
+            if "doc_id" in metadata:
+                metadata["doc_id"] = doc_id
+            if "knowledge_base_id" in metadata:
+                metadata["knowledge_base_id"] = kb_id
+        return json.dumps(metadata, ensure_ascii=False)
+
+    @staticmethod
+    def _document_to_dict(doc: Document) -> dict:
+        return {
+            "id": doc.id,
+            "file_name": doc.file_name,
+            "file_path": doc.file_path,
+            "file_size": doc.file_size,
+            "file_type": doc.file_type,
+            "chunk_count": doc.chunk_count,
+            "status": doc.status,
+            "error_message": doc.error_message,
+            "create_time": doc.create_time.isoformat(),
+        }
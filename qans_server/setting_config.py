@@ -6,6 +6,7 @@
 from __future__ import annotations
 
 import os
+import re
 from dataclasses import dataclass, field
 from functools import lru_cache
 from pathlib import Path
@@ -14,6 +15,10 @@ from typing import List
 from dotenv import load_dotenv
 from loguru import logger
 
+VECTOR_BACKEND_MILVUS = "milvus"
+VECTOR_BACKEND_LOCAL = "local"
+_LOCAL_VECTOR_SCHEME = "local://"
+
 
 @dataclass
 class Settings:
@@ -21,7 +26,7 @@ class Settings:
 
     Attributes:
         mysql_dsn: MySQL 连接字符串（必填）。
-        vector_url: Milvus 服务地址。
+        vector_url: Milvus 服务地址；``local://<目录>`` 表示使用进程内的本地向量后端（无需 Milvus）。
         vector_db: Milvus 数据库名称。
         base_url: llm 服务地址。
         api_key: llm api key
@@ -30,10 +35,87 @@ class Settings:
         embedding_api_key: 向量模型api key
         embedding_model: 向量化模型。
         embedding_dim: 向量维度
+        embedding_batch_size: 单次请求向量模型的文本数量。
         rerank_url: 重排模型url
         rerank_api_key: 重排模型api key
         rerank_model: 重排模型
+        rerank_timeout: 重排模型请求超时时间（秒）。
+        rerank_pool_size: 重排模型 HTTP 连接池大小（保持长连接的连接数）。
+        rerank_cache_size: 重排结果缓存条目数，0 表示不缓存。
+        rerank_cache_ttl: 重排结果缓存过期时间（秒），0 表示不过期。
+        rerank_slow_ms: 重排请求超过该耗时（毫秒）记为一次慢调用，与失败一起计入熔断，0 表示不统计慢调用。
+        rerank_breaker_failures: 连续失败（或慢调用）达到该次数时熔断重排模型，改用融合排序。
+        rerank_breaker_reset_seconds: 熔断后经过该时间（秒）放行一次试探请求。
+        rerank_lexical: 未配置重排模型或重排模型不可用时，是否使用进程内词法重排代替融合排序。
         upload_dir: 文档上传目录。
+        snapshot_dir: 知识库快照导出目录。
+        single_flight_lock_timeout: 跨 worker 去重命名锁的等待超时时间（秒）。
+        vector_write_buffer_enabled: 是否启用向量写入合并缓冲。
+        vector_write_buffer_max_rows: 写缓冲达到该行数时立即写入。
+        vector_write_buffer_max_bytes: 写缓冲达到该字节数时立即写入。
+        vector_write_buffer_max_delay_ms: 写缓冲中数据的最长等待时间（毫秒）。
+        vector_partition_mode: 向量集合分区布局：partition_key（以 knowledge_base_id 为分区键）或 partition（每个知识库一个分区）。
+        vector_partition_key_num: 分区键布局下的物理分区数量。
+        vector_index_type: 稠密向量索引类型：AUTOINDEX、HNSW、IVF_FLAT、IVF_SQ8、IVF_PQ、DISKANN。
+        vector_metric_type: 稠密向量相似度度量。
+        vector_hnsw_m: HNSW 每个节点的最大连接数 M。
+        vector_hnsw_ef_construction: HNSW 建索引时的候选集大小 efConstruction。
+        vector_hnsw_ef: HNSW 检索时的候选集大小 ef。
+        vector_ivf_nlist: IVF 系列索引的聚类中心数量 nlist。
+        vector_ivf_nprobe: IVF 系列索引检索时探测的聚类数量 nprobe。
+        vector_pq_m: IVF_PQ 的子向量数量 m（需整除向量维度）。
+        vector_pq_nbits: IVF_PQ 每个子向量的编码位数。
+        vector_diskann_search_list: DISKANN 检索时的候选列表大小 search_list。
+        sparse_index_type: 稀疏向量索引类型：SPARSE_INVERTED_INDEX 或 SPARSE_WAND。
+        sparse_inverted_index_algo: 稀疏倒排索引的检索算法：DAAT_MAXSCORE、DAAT_WAND、TAAT_NAIVE。
+        sparse_drop_ratio_search: 稀疏检索时忽略的低权重查询词比例。
+        vector_storage_type: 稠密向量存储精度：float32、float16、bfloat16。
+        vector_binary_index: 是否额外保存二值量化向量并以其做首轮检索。
+        vector_rescore: 是否对首轮候选使用原始向量精确重算相似度（半精度存储时只在启用二值首轮索引时生效）。
+        vector_rescore_multiplier: 重算时首轮候选数量相对最终候选数量的倍数。
+        vector_mmap: 原始向量字段是否使用 mmap（量化索引常驻内存，原始向量留在磁盘）。
+        vector_dim: 写入向量库的向量维度，小于 embedding_dim 时启用降维（为空表示不降维）。
+        vector_reduction: 降维方式：truncate（Matryoshka 截断）或 pca（按知识库拟合的 PCA 投影）。
+        vector_projection_dir: PCA 投影矩阵的存放目录（每个知识库一个文件）。
+        search_default_quality: 默认检索质量档位：fast、balanced、accurate。
+        search_tuning_path: 自动调参结果（按知识库的检索参数表）文件路径。
+        retrieval_hydration: 两阶段检索的分块回填来源：off（检索时直接返回文本与元数据）、vector（按主键从 Milvus 获取）、mysql（从 t_document_chunk 获取）。
+        retrieval_hydrate_cache_size: 回填分块的进程内 LRU 缓存条目数（0 表示不缓存）。
+        retrieval_hydrate_cache_ttl: 回填缓存条目的过期时间（秒，0 表示不过期）。
+        retrieval_doc_summary: 是否启用文档级摘要向量：向量化时为每个文档计算摘要向量，检索时先粗选文档再在其分块中检索。
+        retrieval_doc_summary_vectors: 每个文档的摘要向量数（按分块顺序分为若干连续片段，各取质心）。
+        retrieval_doc_top_n: 粗选阶段保留的文档数，分块检索只在这些文档中进行。
+        retrieval_batch_max_queries: 批量检索接口单次请求的最大问题数。
+        retrieval_fanout: 多知识库检索时是否对每个知识库并发检索后融合（各知识库单独的候选数量）。
+        retrieval_fanout_fusion: 并发检索结果的融合方式：score（按各知识库的融合分数加权合并）或 rrf（按排名）。
+        retrieval_fanout_kb_quota: 并发检索时单个知识库在融合结果中最多占的条数，0 表示不限制。
+        retrieval_fanout_deadline_ms: 并发检索的等待时限（毫秒），超时未返回的知识库被跳过，0 表示等待全部完成。
+        retrieval_fanout_workers: 并发检索的线程数（同步检索路径）。
+        retrieval_mmr: 是否在重排前按最大边际相关（MMR）选择多样的分块，减少重复内容。
+        retrieval_mmr_lambda: MMR 的相关性权重 λ（0~1，越小越偏向多样性）。
+        retrieval_mmr_duplicate_threshold: 与已选分块的余弦相似度达到该值的候选视为重复直接剔除，大于等于 1 表示不剔除。
+        retrieval_mmr_pool_multiplier: MMR 在重排之前执行；启用重排时 MMR 选出 top_k × 该倍数个候选，由重排截断到 top_k，未启用重排时 MMR 直接选出 top_k 个。
+        retrieval_context_window: 最终结果的相邻分块扩展窗口：每个命中前后各补充 N 个分块并合并为连续片段，0 表示不扩展。
+        vector_async_connections: 异步检索使用的 Milvus 连接（gRPC 通道）数量，0 表示异步接口退化为线程池中调用同步客户端。
+        vector_local_max_segments: 本地向量后端（VECTOR_URL=local://<目录>）每个知识库的增量段数量上限，超过后合并为一个段。
+        vector_bulk_threshold: Milvus 批量导入（bulk insert）的行数阈值：一次写入的分块数不少于该值时改用 Parquet 文件导入，0 表示不启用。
+        vector_bulk_dir: 批量导入 Parquet 文件的本地暂存目录。
+        vector_bulk_file_rows: 批量导入时每个 Parquet 文件（即每个导入任务）的最大行数。
+        vector_bulk_minio_endpoint: Milvus 使用的对象存储地址（如 http://minio:9000），导入文件上传到该存储后由 Milvus 读取。
+        vector_bulk_minio_access_key: 对象存储访问密钥 ID。
+        vector_bulk_minio_secret_key: 对象存储访问密钥。
+        vector_bulk_minio_bucket: Milvus 配置的对象存储桶（milvus.yaml 中的 minio.bucketName）。
+        vector_maintenance_enabled: 是否启用分块集合的后台维护（按段健康度在低峰时段执行 flush / compaction）。
+        vector_maintenance_windows: 允许执行维护的低峰时段（本地时间，如 "02:00-05:00,13:00-13:30"，可跨零点）。
+        vector_maintenance_interval: 维护调度器检查段健康度的间隔（秒）。
+        vector_maintenance_deleted_ratio: 已删除行比例超过该值时触发压缩。
+        vector_maintenance_max_small_segments: 小段（行数低于一万）数量超过该值时触发压缩。
+        vector_maintenance_growing_rows: growing 段总行数超过该值时触发 flush。
+        vector_maintenance_timeout: 单次压缩的最长等待时间（秒），超时后在下个检查周期继续观察。
+        vector_load_management: 是否按需加载 / 释放知识库分区（冷热分离，需 VECTOR_PARTITION_MODE=partition）。
+        vector_load_idle_seconds: 知识库分区空闲多久（秒）后释放。
+        vector_load_memory_budget_mb: 已加载分区的估算内存上限（MB，0 表示不限制），超出时按最近最少使用释放。
+        vector_load_check_interval: 空闲分区检查间隔（秒）。
         max_file_size: 允许上传的最大文件大小（字节）。
         api_prefix: 后端 API 前缀。
         cors_origins: 允许跨域的来源列表。
@@ -59,7 +141,84 @@ class Settings:
     rerank_url: str | None
     rerank_api_key: str | None
     rerank_model: str | None
+    rerank_timeout: float = 10.0
+    rerank_pool_size: int = 10
+    rerank_cache_size: int = 1024
+    rerank_cache_ttl: int = 300
+    rerank_slow_ms: int = 3000
+    rerank_breaker_failures: int = 5
+    rerank_breaker_reset_seconds: float = 30.0
+    rerank_lexical: bool = True
     upload_dir: Path = field(default_factory=lambda: Path("uploads"))
+    snapshot_dir: Path = field(default_factory=lambda: Path("snapshots"))
+    embedding_batch_size: int = 256
+    single_flight_lock_timeout: int = 600
+    vector_write_buffer_enabled: bool = False
+    vector_write_buffer_max_rows: int = 5000
+    vector_write_buffer_max_bytes: int = 64 * 1024 * 1024  # 64 MB
+    vector_write_buffer_max_delay_ms: int = 200
+    vector_partition_mode: str = "partition_key"
+    vector_partition_key_num: int = 64
+    vector_index_type: str = "AUTOINDEX"
+    vector_metric_type: str = "COSINE"
+    vector_hnsw_m: int = 16
+    vector_hnsw_ef_construction: int = 200
+    vector_hnsw_ef: int = 64
+    vector_ivf_nlist: int = 1024
+    vector_ivf_nprobe: int = 32
+    vector_pq_m: int = 16
+    vector_pq_nbits: int = 8
+    vector_diskann_search_list: int = 100
+    sparse_index_type: str = "SPARSE_INVERTED_INDEX"
+    sparse_inverted_index_algo: str = "DAAT_MAXSCORE"
+    sparse_drop_ratio_search: float = 0.2
+    vector_storage_type: str = "float32"
+    vector_binary_index: bool = False
+    vector_rescore: bool = False
+    vector_rescore_multiplier: int = 4
+    vector_mmap: bool = False
+    vector_dim: int | None = None
+    vector_reduction: str = "truncate"
+    vector_projection_dir: Path = field(default_factory=lambda: Path("vector_projections"))
+    search_default_quality: str = "balanced"
+    search_tuning_path: Path = field(default_factory=lambda: Path("search_tuning.json"))
+    retrieval_hydration: str = "off"
+    retrieval_hydrate_cache_size: int = 10000
+    retrieval_hydrate_cache_ttl: int = 300
+    retrieval_doc_summary: bool = False
+    retrieval_doc_summary_vectors: int = 1
+    retrieval_doc_top_n: int = 50
+    retrieval_batch_max_queries: int = 64
+    retrieval_fanout: bool = False
+    retrieval_fanout_fusion: str = "score"
+    retrieval_fanout_kb_quota: int = 0
+    retrieval_fanout_deadline_ms: int = 0
+    retrieval_fanout_workers: int = 8
+    retrieval_mmr: bool = False
+    retrieval_mmr_lambda: float = 0.7
+    retrieval_mmr_duplicate_threshold: float = 0.95
+    retrieval_mmr_pool_multiplier: int = 2
+    retrieval_context_window: int = 0
+    vector_async_connections: int = 4
+    vector_local_max_segments: int = 8
+    vector_bulk_threshold: int = 0
+    vector_bulk_dir: Path = field(default_factory=lambda: Path("bulk_import"))
+    vector_bulk_file_rows: int = 100000
+    vector_bulk_minio_endpoint: str | None = None
+    vector_bulk_minio_access_key: str = "minioadmin"
+    vector_bulk_minio_secret_key: str = "minioadmin"
+    vector_bulk_minio_bucket: str = "a-bucket"
+    vector_maintenance_enabled: bool = False
+    vector_maintenance_windows: List[str] = field(default_factory=lambda: ["02:00-05:00"])
+    vector_maintenance_interval: int = 600
+    vector_maintenance_deleted_ratio: float = 0.1
+    vector_maintenance_max_small_segments: int = 32
+    vector_maintenance_growing_rows: int = 100000
+    vector_maintenance_timeout: int = 3600
+    vector_load_management: bool = False
+    vector_load_idle_seconds: int = 1800
+    vector_load_memory_budget_mb: int = 0
+    vector_load_check_interval: int = 60
     max_file_size: int = 100 * 1024 * 1024  # 100 MB
     api_prefix: str = "/api"
     cors_origins: List[str] = field(default_factory=lambda: ["*"])
@@ -71,10 +230,29 @@ class Settings:
     log_retention: str = "30 days"
     log_serialize: bool = False
 
+    @property
+    def stored_vector_dim(self) -> int:
+        """写入向量库的向量维度（未启用降维时等于 embedding_dim）。"""
+
+        return self.vector_dim or self.embedding_dim
+
+    @property
+    def vector_backend(self) -> str:
+        """向量后端：milvus 或 local（由 VECTOR_URL 的 scheme 决定）。"""
+
+        return VECTOR_BACKEND_LOCAL if self.vector_url.startswith(_LOCAL_VECTOR_SCHEME) else VECTOR_BACKEND_MILVUS
+
+    @property
+    def vector_local_dir(self) -> Path:
+        """本地向量后端的数据目录。"""
+
+        return Path(self.vector_url[len(_LOCAL_VECTOR_SCHEME):] or "vector_data")
+
     def ensure_directories(self) -> None:
         """确保关键目录存在。"""
 
         self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
         self.log_dir.mkdir(parents=True, exist_ok=True)
 
 
@@ -87,6 +265,21 @@ def _parse_int(value: str | None, default: int) -> int:
         return default
 
 
+def _parse_float(value: str | None, default: float) -> float:
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def _parse_list(value: str | None, default: List[str]) -> List[str]:
+    if not value:
+        return list(default)
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
 def _parse_origins(value: str | None) -> List[str]:
     if not value:
         return ["*"]
@@ -122,6 +315,14 @@ def get_settings() -> Settings:
     rerank_url = os.getenv("LLM_RERANK_URL")
     rerank_api_key = os.getenv("LLM_RERANK_API_KEY")
     rerank_model = os.getenv("LLM_RERANK_MODEL")
+    rerank_timeout = max(_parse_float(os.getenv("RERANK_TIMEOUT"), 10.0), 0.1)
+    rerank_pool_size = max(_parse_int(os.getenv("RERANK_POOL_SIZE"), 10), 1)
+    rerank_cache_size = max(_parse_int(os.getenv("RERANK_CACHE_SIZE"), 1024), 0)
+    rerank_cache_ttl = max(_parse_int(os.getenv("RERANK_CACHE_TTL"), 300), 0)
+    rerank_slow_ms = max(_parse_int(os.getenv("RERANK_SLOW_MS"), 3000), 0)
+    rerank_breaker_failures = max(_parse_int(os.getenv("RERANK_BREAKER_FAILURES"), 5), 1)
+    rerank_breaker_reset_seconds = max(_parse_float(os.getenv("RERANK_BREAKER_RESET_SECONDS"), 30.0), 1.0)
+    rerank_lexical = os.getenv("RERANK_LEXICAL", "true").lower() == "true"
 
     if not mysql_dsn:
         raise RuntimeError("环境变量 MYSQL_DSN 未配置")
@@ -139,6 +340,120 @@ def get_settings() -> Settings:
         raise RuntimeError("环境变量 EMBEDDING_DIM 未配置")
 
     upload_dir = Path(os.getenv("UPLOAD_DIR", "uploads"))
+    snapshot_dir = Path(os.getenv("SNAPSHOT_DIR", "snapshots"))
+    embedding_batch_size = _parse_int(os.getenv("EMBEDDING_BATCH_SIZE"), 256)
+    single_flight_lock_timeout = _parse_int(os.getenv("SINGLE_FLIGHT_LOCK_TIMEOUT"), 600)
+
+    # 向量写缓冲
+    vector_write_buffer_enabled = os.getenv("VECTOR_WRITE_BUFFER_ENABLED", "false").lower() == "true"
+    vector_write_buffer_max_rows = _parse_int(os.getenv("VECTOR_WRITE_BUFFER_MAX_ROWS"), 5000)
+    vector_write_buffer_max_bytes = _parse_int(os.getenv("VECTOR_WRITE_BUFFER_MAX_BYTES"), 64 * 1024 * 1024)
+    vector_write_buffer_max_delay_ms = _parse_int(os.getenv("VECTOR_WRITE_BUFFER_MAX_DELAY_MS"), 200)
+
+    # 向量集合分区布局
+    vector_partition_mode = os.getenv("VECTOR_PARTITION_MODE", "partition_key").lower()
+    vector_partition_key_num = _parse_int(os.getenv("VECTOR_PARTITION_KEY_NUM"), 64)
+    if vector_partition_mode not in ("partition_key", "partition"):
+        raise RuntimeError("环境变量 VECTOR_PARTITION_MODE 仅支持 partition_key 或 partition")
+
+    # 向量索引配置
+    vector_index_type = os.getenv("VECTOR_INDEX_TYPE", "AUTOINDEX").upper()
+    vector_metric_type = os.getenv("VECTOR_METRIC_TYPE", "COSINE").upper()
+    vector_hnsw_m = _parse_int(os.getenv("VECTOR_HNSW_M"), 16)
+    vector_hnsw_ef_construction = _parse_int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION"), 200)
+    vector_hnsw_ef = _parse_int(os.getenv("VECTOR_HNSW_EF"), 64)
+    vector_ivf_nlist = _parse_int(os.getenv("VECTOR_IVF_NLIST"), 1024)
+    vector_ivf_nprobe = _parse_int(os.getenv("VECTOR_IVF_NPROBE"), 32)
+    vector_pq_m = _parse_int(os.getenv("VECTOR_PQ_M"), 16)
+    vector_pq_nbits = _parse_int(os.getenv("VECTOR_PQ_NBITS"), 8)
+    vector_diskann_search_list = _parse_int(os.getenv("VECTOR_DISKANN_SEARCH_LIST"), 100)
+    sparse_index_type = os.getenv("SPARSE_INDEX_TYPE", "SPARSE_INVERTED_INDEX").upper()
+    sparse_inverted_index_algo = os.getenv("SPARSE_INVERTED_INDEX_ALGO", "DAAT_MAXSCORE").upper()
+    sparse_drop_ratio_search = _parse_float(os.getenv("SPARSE_DROP_RATIO_SEARCH"), 0.2)
+
+    # 向量存储与量化
+    vector_storage_type = os.getenv("VECTOR_STORAGE_TYPE", "float32").lower()
+    vector_binary_index = os.getenv("VECTOR_BINARY_INDEX", "false").lower() == "true"
+    vector_rescore = os.getenv("VECTOR_RESCORE", "false").lower() == "true"
+    vector_rescore_multiplier = _parse_int(os.getenv("VECTOR_RESCORE_MULTIPLIER"), 4)
+    vector_mmap = os.getenv("VECTOR_MMAP", "false").lower() == "true"
+    if vector_storage_type not in ("float32", "float16", "bfloat16"):
+        raise RuntimeError("环境变量 VECTOR_STORAGE_TYPE 仅支持 float32、float16 或 bfloat16")
+
+    # 向量降维
+    vector_dim = _parse_int(os.getenv("VECTOR_DIM"), 0) or None
+    vector_reduction = os.getenv("VECTOR_REDUCTION", "truncate").lower()
+    vector_projection_dir = Path(os.getenv("VECTOR_PROJECTION_DIR", "vector_projections"))
+    if vector_reduction not in ("truncate", "pca"):
+        raise RuntimeError("环境变量 VECTOR_REDUCTION 仅支持 truncate 或 pca")
+    if vector_dim is not None and not 0 < vector_dim <= int(embedding_dim):
+        raise RuntimeError("环境变量 VECTOR_DIM 必须为正数且不大于 EMBEDDING_DIM")
+
+    # 检索力度
+    search_default_quality = os.getenv("SEARCH_DEFAULT_QUALITY", "balanced").lower()
+    search_tuning_path = Path(os.getenv("SEARCH_TUNING_PATH", "search_tuning.json"))
+    if search_default_quality not in ("fast", "balanced", "accurate"):
+        raise RuntimeError("环境变量 SEARCH_DEFAULT_QUALITY 仅支持 fast、balanced 或 accurate")
+
+    # 两阶段检索（延迟回填分块文本与元数据）
+    retrieval_hydration = os.getenv("RETRIEVAL_HYDRATION", "off").lower()
+    retrieval_hydrate_cache_size = _parse_int(os.getenv("RETRIEVAL_HYDRATE_CACHE_SIZE"), 10000)
+    retrieval_hydrate_cache_ttl = _parse_int(os.getenv("RETRIEVAL_HYDRATE_CACHE_TTL"), 300)
+
+    # 文档级摘要向量（两阶段检索：先选文档，再检索分块）
+    retrieval_doc_summary = os.getenv("RETRIEVAL_DOC_SUMMARY", "false").lower() == "true"
+    retrieval_doc_summary_vectors = max(_parse_int(os.getenv("RETRIEVAL_DOC_SUMMARY_VECTORS"), 1), 1)
+    retrieval_doc_top_n = max(_parse_int(os.getenv("RETRIEVAL_DOC_TOP_N"), 50), 1)
+    retrieval_batch_max_queries = max(_parse_int(os.getenv("RETRIEVAL_BATCH_MAX_QUERIES"), 64), 1)
+    retrieval_fanout = os.getenv("RETRIEVAL_FANOUT", "false").lower() == "true"
+    retrieval_fanout_fusion = os.getenv("RETRIEVAL_FANOUT_FUSION", "score").lower()
+    if retrieval_fanout_fusion not in ("score", "rrf"):
+        raise RuntimeError("环境变量 RETRIEVAL_FANOUT_FUSION 仅支持 score 或 rrf")
+    retrieval_fanout_kb_quota = max(_parse_int(os.getenv("RETRIEVAL_FANOUT_KB_QUOTA"), 0), 0)
+    retrieval_fanout_deadline_ms = max(_parse_int(os.getenv("RETRIEVAL_FANOUT_DEADLINE_MS"), 0), 0)
+    retrieval_fanout_workers = max(_parse_int(os.getenv("RETRIEVAL_FANOUT_WORKERS"), 8), 1)
+    retrieval_mmr = os.getenv("RETRIEVAL_MMR", "false").lower() == "true"
+    retrieval_mmr_lambda = min(max(_parse_float(os.getenv("RETRIEVAL_MMR_LAMBDA"), 0.7), 0.0), 1.0)
+    retrieval_mmr_duplicate_threshold = _parse_float(os.getenv("RETRIEVAL_MMR_DUPLICATE_THRESHOLD"), 0.95)
+    retrieval_mmr_pool_multiplier = max(_parse_int(os.getenv("RETRIEVAL_MMR_POOL_MULTIPLIER"), 2), 1)
+    retrieval_context_window = max(_parse_int(os.getenv("RETRIEVAL_CONTEXT_WINDOW"), 0), 0)
+    if retrieval_hydration not in ("off", "vector", "mysql"):
+        raise RuntimeError("环境变量 RETRIEVAL_HYDRATION 仅支持 off、vector 或 mysql")
+
+    # 异步 Milvus 客户端
+    vector_async_connections = _parse_int(os.getenv("VECTOR_ASYNC_CONNECTIONS"), 4)
+
+    # 本地向量后端
+    vector_local_max_segments = _parse_int(os.getenv("VECTOR_LOCAL_MAX_SEGMENTS"), 8)
+
+    # Milvus 批量导入
+    vector_bulk_threshold = _parse_int(os.getenv("VECTOR_BULK_THRESHOLD"), 0)
+    vector_bulk_dir = Path(os.getenv("VECTOR_BULK_DIR", "bulk_import"))
+    vector_bulk_file_rows = _parse_int(os.getenv("VECTOR_BULK_FILE_ROWS"), 100000)
+    vector_bulk_minio_endpoint = os.getenv("VECTOR_BULK_MINIO_ENDPOINT") or None
+    vector_bulk_minio_access_key = os.getenv("VECTOR_BULK_MINIO_ACCESS_KEY", "minioadmin")
+    vector_bulk_minio_secret_key = os.getenv("VECTOR_BULK_MINIO_SECRET_KEY", "minioadmin")
+    vector_bulk_minio_bucket = os.getenv("VECTOR_BULK_MINIO_BUCKET", "a-bucket")
+
+    # 分块集合后台维护
+    vector_maintenance_enabled = os.getenv("VECTOR_MAINTENANCE_ENABLED", "false").lower() == "true"
+    vector_maintenance_windows = _parse_list(os.getenv("VECTOR_MAINTENANCE_WINDOWS"), ["02:00-05:00"])
+    vector_maintenance_interval = _parse_int(os.getenv("VECTOR_MAINTENANCE_INTERVAL"), 600)
+    vector_maintenance_deleted_ratio = _parse_float(os.getenv("VECTOR_MAINTENANCE_DELETED_RATIO"), 0.1)
+    vector_maintenance_max_small_segments = _parse_int(os.getenv("VECTOR_MAINTENANCE_MAX_SMALL_SEGMENTS"), 32)
+    vector_maintenance_growing_rows = _parse_int(os.getenv("VECTOR_MAINTENANCE_GROWING_ROWS"), 100000)
+    vector_maintenance_timeout = _parse_int(os.getenv("VECTOR_MAINTENANCE_TIMEOUT"), 3600)
+
+    # 知识库分区按需加载（冷热分离）
+    vector_load_management = os.getenv("VECTOR_LOAD_MANAGEMENT", "false").lower() == "true"
+    vector_load_idle_seconds = _parse_int(os.getenv("VECTOR_LOAD_IDLE_SECONDS"), 1800)
+    vector_load_memory_budget_mb = _parse_int(os.getenv("VECTOR_LOAD_MEMORY_BUDGET_MB"), 0)
+    vector_load_check_interval = max(_parse_int(os.getenv("VECTOR_LOAD_CHECK_INTERVAL"), 60), 1)
+    if any(not re.fullmatch(r"\d{1,2}:\d{2}-\d{1,2}:\d{2}", window) for window in vector_maintenance_windows):
+        raise RuntimeError("环境变量 VECTOR_MAINTENANCE_WINDOWS 格式应为 HH:MM-HH:MM，多个时段用逗号分隔")
+    if vector_bulk_threshold > 0 and not vector_bulk_minio_endpoint:
+        raise RuntimeError("启用 VECTOR_BULK_THRESHOLD 时必须配置 VECTOR_BULK_MINIO_ENDPOINT")
+
     max_file_size = _parse_int(os.getenv("MAX_FILE_SIZE"), 100 * 1024 * 1024)
     api_prefix = os.getenv("API_PREFIX", "/api")
     cors_origins = _parse_origins(os.getenv("CORS_ORIGINS"))
@@ -166,7 +481,84 @@ def get_settings() -> Settings:
         rerank_url=rerank_url,
         rerank_api_key=rerank_api_key,
         rerank_model=rerank_model,
+        rerank_timeout=rerank_timeout,
+        rerank_pool_size=rerank_pool_size,
+        rerank_cache_size=rerank_cache_size,
+        rerank_cache_ttl=rerank_cache_ttl,
+        rerank_slow_ms=rerank_slow_ms,
+        rerank_breaker_failures=rerank_breaker_failures,
+        rerank_breaker_reset_seconds=rerank_breaker_reset_seconds,
+        rerank_lexical=rerank_lexical,
         upload_dir=upload_dir,
+        snapshot_dir=snapshot_dir,
+        embedding_batch_size=embedding_batch_size,
+        single_flight_lock_timeout=single_flight_lock_timeout,
+        vector_write_buffer_enabled=vector_write_buffer_enabled,
+        vector_write_buffer_max_rows=vector_write_buffer_max_rows,
+        vector_write_buffer_max_bytes=vector_write_buffer_max_bytes,
+        vector_write_buffer_max_delay_ms=vector_write_buffer_max_delay_ms,
+        vector_partition_mode=vector_partition_mode,
+        vector_partition_key_num=vector_partition_key_num,
+        vector_index_type=vector_index_type,
+        vector_metric_type=vector_metric_type,
+        vector_hnsw_m=vector_hnsw_m,
+        vector_hnsw_ef_construction=vector_hnsw_ef_construction,
+        vector_hnsw_ef=vector_hnsw_ef,
+        vector_ivf_nlist=vector_ivf_nlist,
+        vector_ivf_nprobe=vector_ivf_nprobe,
+        vector_pq_m=vector_pq_m,
+        vector_pq_nbits=vector_pq_nbits,
+        vector_diskann_search_list=vector_diskann_search_list,
+        sparse_index_type=sparse_index_type,
+        sparse_inverted_index_algo=sparse_inverted_index_algo,
+        sparse_drop_ratio_search=sparse_drop_ratio_search,
+        vector_storage_type=vector_storage_type,
+        vector_binary_index=vector_binary_index,
+        vector_rescore=vector_rescore,
+        vector_rescore_multiplier=vector_rescore_multiplier,
+        vector_mmap=vector_mmap,
+        vector_dim=vector_dim,
+        vector_reduction=vector_reduction,
+        vector_projection_dir=vector_projection_dir,
+        search_default_quality=search_default_quality,
+        search_tuning_path=search_tuning_path,
+        retrieval_hydration=retrieval_hydration,
+        retrieval_hydrate_cache_size=retrieval_hydrate_cache_size,
+        retrieval_hydrate_cache_ttl=retrieval_hydrate_cache_ttl,
+        retrieval_doc_summary=retrieval_doc_summary,
+        retrieval_doc_summary_vectors=retrieval_doc_summary_vectors,
+        retrieval_doc_top_n=retrieval_doc_top_n,
+        retrieval_batch_max_queries=retrieval_batch_max_queries,
+        retrieval_fanout=retrieval_fanout,
+        retrieval_fanout_fusion=retrieval_fanout_fusion,
+        retrieval_fanout_kb_quota=retrieval_fanout_kb_quota,
+        retrieval_fanout_deadline_ms=retrieval_fanout_deadline_ms,
+        retrieval_fanout_workers=retrieval_fanout_workers,
+        retrieval_mmr=retrieval_mmr,
+        retrieval_mmr_lambda=retrieval_mmr_lambda,
+        retrieval_mmr_duplicate_threshold=retrieval_mmr_duplicate_threshold,
+        retrieval_mmr_pool_multiplier=retrieval_mmr_pool_multiplier,
+        retrieval_context_window=retrieval_context_window,
+        vector_async_connections=vector_async_connections,
+        vector_local_max_segments=vector_local_max_segments,
+        vector_bulk_threshold=vector_bulk_threshold,
+        vector_bulk_dir=vector_bulk_dir,
+        vector_bulk_file_rows=vector_bulk_file_rows,
+        vector_bulk_minio_endpoint=vector_bulk_minio_endpoint,
+        vector_bulk_minio_access_key=vector_bulk_minio_access_key,
+        vector_bulk_minio_secret_key=vector_bulk_minio_secret_key,
+        vector_bulk_minio_bucket=vector_bulk_minio_bucket,
+        vector_maintenance_enabled=vector_maintenance_enabled,
+        vector_maintenance_windows=vector_maintenance_windows,
+        vector_maintenance_interval=vector_maintenance_interval,
+        vector_maintenance_deleted_ratio=vector_maintenance_deleted_ratio,
+        vector_maintenance_max_small_segments=vector_maintenance_max_small_segments,
+        vector_maintenance_growing_rows=vector_maintenance_growing_rows,
+        vector_maintenance_timeout=vector_maintenance_timeout,
+        vector_load_management=vector_load_management,
+        vector_load_idle_seconds=vector_load_idle_seconds,
+        vector_load_memory_budget_mb=vector_load_memory_budget_mb,
+        vector_load_check_interval=vector_load_check_interval,
         max_file_size=max_file_size,
         api_prefix=api_prefix,
         cors_origins=cors_origins,
@@ -0,0 +1,274 @@
+"""
+向量索引配置档基准
+从线上集合抽样向量，按每个索引配置档建临时集合，以 NumPy 精确检索结果为基准，
+报告各配置档的 recall@k、检索延迟与建索引耗时。
+
+查询默认取样本向量加少量噪声；指定 --query-file（每行一个查询）时使用向量模型生成真实查询向量。
+
+--storage 指定临时集合的向量存储精度（float32 / float16 / bfloat16）；BIN_FLAT / BIN_IVF_FLAT
+配置档在二值量化向量上检索。--rescore N 时首轮取 top_k×N 个候选，再用全精度向量重新打分，
+同时报告重算前后的召回率，用于评估量化带来的召回损失。
+
+使用方法：
+    python -m qans_server.tools.bench_index_profiles --profiles AUTOINDEX,HNSW,IVF_FLAT,IVF_SQ8
+    python -m qans_server.tools.bench_index_profiles --kb-id 3 --query-file queries.txt --top-k 10
+    python -m qans_server.tools.bench_index_profiles --profiles HNSW_SQ,BIN_IVF_FLAT --storage float16 --rescore 4
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from pymilvus import DataType
+
+from qans_server.db.vector.base import db_client
+from qans_server.db.vector.collections.doc_chunk import COLLECTION_NAME
+from qans_server.db.vector.index_profile import (
+    BINARY_INDEX_TYPES,
+    DENSE_INDEX_TYPES,
+    IndexProfile,
+    binary_index_profile,
+    dense_index_profile,
+)
+from qans_server.db.vector.vector_codec import (
+    BYTES_PER_DIM,
+    STORAGE_FLOAT32,
+    STORAGE_TYPES,
+    binary_quantize,
+    decode_vector,
+    encode_vector,
+    milvus_vector_type,
+)
+from qans_server.setting_config import settings
+from qans_server.tools.collection_migration import detect_vector_storage
+from qans_server.util.vector_util import allocate_matrix, normalize_rows
+
+
+def load_sample(kb_id: Optional[int], limit: int, batch_size: int = 1000):
+    """从线上集合抽取至多 limit 行 (id, vector)。"""
+
+    iterator = db_client.query_iterator(
+        collection_name=COLLECTION_NAME,
+        batch_size=batch_size,
+        limit=limit,
+        filter=f"knowledge_base_id == {kb_id}" if kb_id is not None else "",
+        output_fields=["id", "vector"],
+    )
+    storage_type = detect_vector_storage(db_client, COLLECTION_NAME)
+    ids: List[int] = []
+    matrix = allocate_matrix(limit, settings.stored_vector_dim)
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            for row in batch:
+                matrix[len(ids)] = decode_vector(row["vector"], storage_type)
+                ids.append(row["id"])
+    finally:
+        iterator.close()
+    return np.asarray(ids, dtype=np.int64), matrix[:len(ids)]
+
+
+def build_queries(
+    corpus: np.ndarray,
+    count: int,
+    query_file: Optional[str],
+    seed: int,
+    kb_id: Optional[int] = None,
+) -> np.ndarray:
+    if query_file:
+        from qans_server.service.embedding_service import EmbeddingService
+
+        texts = [line.strip() for line in Path(query_file).read_text(encoding="utf-8").splitlines() if line.strip()]
+        return np.array(EmbeddingService().embed_texts(texts[:count], kb_id))
+
+    rng = np.random.default_rng(seed)
+    picked = corpus[rng.choice(len(corpus), size=min(count, len(corpus)), replace=False)]
+    queries = picked + rng.normal(scale=0.05, size=picked.shape).astype(np.float32)
+    return normalize_rows(queries)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    """精确检索（余弦 / 内积）得到基准结果的行号。"""
+
+    scores = queries @ normalize_rows(corpus.copy()).T
+    top = np.argpartition(-scores, kth=min(top_k, scores.shape[1] - 1), axis=1)[:, :top_k]
+    return top
+
+
+def wait_for_index(collection_name: str, total: int, index_name: str = "vector_index", timeout: float = 1800) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = db_client.describe_index(collection_name=collection_name, index_name=index_name)
+        if info.get("indexed_rows", 0) >= total and info.get("pending_index_rows", 0) == 0:
+            return
+        time.sleep(1)
+    raise TimeoutError(f"集合 {collection_name} 建索引超时")
+
+
+def rescore(corpus: np.ndarray, row_of: dict, query: np.ndarray, pks: List[int], top_k: int) -> List[int]:
+    """用全精度向量对候选重新打分（余弦 / 内积）。"""
+
+    pks = [pk for pk in pks if pk in row_of]
+    if not pks:
+        return []
+    scores = corpus[[row_of[pk] for pk in pks]] @ query
+    return [pks[i] for i in np.argsort(-scores, kind="stable")[:top_k]]
+
+
+def bench_profile(
+    profile: IndexProfile,
+    ids: np.ndarray,
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    top_k: int,
+    keep: bool,
+    storage_type: str = STORAGE_FLOAT32,
+    rescore_multiplier: int = 0,
+) -> dict:
+    binary = profile.index_type in BINARY_INDEX_TYPES
+    collection_name = f"{COLLECTION_NAME}_bench_{profile.name}_{storage_type}"
+    if db_client.has_collection(collection_name=collection_name):
+        db_client.drop_collection(collection_name=collection_name)
+
+    dim = corpus.shape[1]
+    schema = db_client.create_schema(auto_id=False)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field("vector", milvus_vector_type(storage_type), dim=dim)
+    if binary:
+        schema.add_field("binary_vector", DataType.BINARY_VECTOR, dim=dim)
+    db_client.create_collection(collection_name=collection_name, schema=schema)
+
+    def encode_row(i: int) -> dict:
+        row = {"id": int(ids[i]), "vector": encode_vector(corpus[i], storage_type)}
+        if binary:
+            row["binary_vector"] = binary_quantize(corpus[i])
+        return row
+
+    try:
+        for start in range(0, len(ids), 2000):
+            db_client.insert(
+                collection_name=collection_name,
+                data=[encode_row(i) for i in range(start, min(start + 2000, len(ids)))],
+            )
+        db_client.flush(collection_name=collection_name)
+
+        build_start = time.perf_counter()
+        index_params = db_client.prepare_index_params()
+        if binary:
+            # 二值配置档只在 binary_vector 上检索，原始向量字段建 FLAT 索引以满足加载要求
+            index_params.add_index(field_name="vector", index_name="vector_index", index_type="FLAT",
+                                   metric_type=settings.vector_metric_type)
+        index_name = "binary_vector_index" if binary else "vector_index"
+        index_params.add_index(
+            field_name="binary_vector" if binary else "vector",
+            index_name=index_name,
+            index_type=profile.index_type,
+            metric_type=profile.metric_type,
+            params=profile.build_params,
+        )
+        db_client.create_index(collection_name=collection_name, index_params=index_params)
+        wait_for_index(collection_name, len(ids), index_name)
+        build_seconds = time.perf_counter() - build_start
+        db_client.load_collection(collection_name=collection_name)
+
+        anns_field = "binary_vector" if binary else "vector"
+        limit = top_k * rescore_multiplier if rescore_multiplier else top_k
+        row_of = {int(pk): row for row, pk in enumerate(ids)}
+
+        def search(query: np.ndarray):
+            data = binary_quantize(query) if binary else encode_vector(query, storage_type)
+            return db_client.search(
+                collection_name=collection_name,
+                data=[data],
+                anns_field=anns_field,
+                limit=limit,
+                search_params={"metric_type": profile.metric_type, "params": profile.search_params},
+            )
+
+        # 预热
+        for query in queries[:5]:
+            search(query)
+
+        latencies = []
+        recalls = []
+        rescored_recalls = []
+        for query, expected in zip(queries, truth):
+            expected_ids = set(ids[expected].tolist())
+            start = time.perf_counter()
+            result = search(query)
+            pks = [hit["id"] for hit in result[0]]
+            if rescore_multiplier:
+                rescored = rescore(corpus, row_of, query, pks, top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(set(pks[:top_k]) & expected_ids) / top_k)
+            if rescore_multiplier:
+                rescored_recalls.append(len(set(rescored) & expected_ids) / top_k)
+    finally:
+        if not keep:
+            db_client.drop_collection(collection_name=collection_name)
+
+    latency = np.asarray(latencies)
+    return {
+        "profile": f"{profile.index_type} {profile.build_params} {profile.search_params}",
+        "storage": "binary" if binary else storage_type,
+        "bytes": dim // 8 if binary else dim * BYTES_PER_DIM[storage_type],
+        "recall": float(np.mean(recalls)),
+        "rescored": float(np.mean(rescored_recalls)) if rescored_recalls else None,
+        "p50": float(np.percentile(latency, 50)),
+        "p95": float(np.percentile(latency, 95)),
+        "build": build_seconds,
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="向量索引配置档基准")
+    parser.add_argument("--profiles", default="AUTOINDEX,HNSW,IVF_FLAT,IVF_SQ8",
+                        help=f"逗号分隔的索引类型，可选: {','.join(DENSE_INDEX_TYPES + BINARY_INDEX_TYPES)}")
+    parser.add_argument("--storage", choices=STORAGE_TYPES, default=STORAGE_FLOAT32, help="临时集合的向量存储精度")
+    parser.add_argument("--rescore", type=int, default=0, help="首轮候选倍数，大于 0 时用全精度向量重新打分")
+    parser.add_argument("--kb-id", type=int, default=None, help="只抽取指定知识库的向量")
+    parser.add_argument("--sample", type=int, default=20_000, help="抽样向量数量")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量")
+    parser.add_argument("--query-file", default=None, help="真实查询文本文件，每行一个")
+    parser.add_argument("--top-k", type=int, default=10, help="召回数量")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--keep", action="store_true", help="保留临时集合")
+    args = parser.parse_args()
+
+    ids, corpus = load_sample(args.kb_id, args.sample)
+    if len(ids) <= args.top_k:
+        print(f"✗ 样本数量 {len(ids)} 不足")
+        return 1
+    queries = build_queries(corpus, args.queries, args.query_file, args.seed, args.kb_id)
+    truth = exact_top_k(corpus, queries, args.top_k)
+    print(f"样本: {len(ids)} 条向量 × {corpus.shape[1]} 维，查询: {len(queries)} 条，top_k: {args.top_k}")
+
+    results = []
+    for index_type in [item.strip().upper() for item in args.profiles.split(",") if item.strip()]:
+        if index_type in BINARY_INDEX_TYPES:
+            profile = binary_index_profile(index_type)
+        else:
+            profile = dense_index_profile(index_type)
+        print(f"  测试 {profile.index_type}（{args.storage}）...")
+        results.append(bench_profile(
+            profile, ids, corpus, queries, truth, args.top_k, args.keep,
+            storage_type=args.storage, rescore_multiplier=args.rescore,
+        ))
+
+    print()
+    print(f"{'存储':>8} {'字节/向量':>9} {'recall@k':>9} {'重算后':>8} {'p50(ms)':>9} {'p95(ms)':>9} {'建索引(s)':>10}  配置档")
+    for item in results:
+        rescored = f"{item['rescored']:.4f}" if item["rescored"] is not None else "-"
+        print(f"{item['storage']:>8} {item['bytes']:>9} {item['recall']:>9.4f} {rescored:>8} "
+              f"{item['p50']:>9.2f} {item['p95']:>9.2f} {item['build']:>10.1f}  {item['profile']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+向量批次内存基准
+对比 List[List[float]] 与连续 float32 矩阵两种表示在向量化链路中的内存占用。
+
+使用方法：
+    python -m qans_server.tools.bench_vector_memory --rows 10000 --dim 1024
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from qans_server.util.vector_util import allocate_matrix, as_matrix, prepare_matrix
+
+
+def _measure(label: str, build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40} 常驻: {current / 1024 / 1024:>9.1f} MB  峰值: {peak / 1024 / 1024:>9.1f} MB  耗时: {elapsed:.2f}s")
+    return value, current
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="向量批次内存基准")
+    parser.add_argument("--rows", type=int, default=10_000, help="向量数量")
+    parser.add_argument("--dim", type=int, default=1024, help="向量维度")
+    parser.add_argument("--batch-size", type=int, default=256, help="模拟向量模型单批返回的数量")
+    args = parser.parse_args()
+
+    rows, dim, batch_size = args.rows, args.dim, args.batch_size
+    rng = random.Random(0)
+
+    def fake_api_batch(n: int):
+        # 模拟向量模型接口返回的 Python float 列表
+        return [[rng.random() for _ in range(dim)] for _ in range(n)]
+
+    print("=" * 90)
+    print(f"向量批次内存基准: {rows} × {dim}，单批 {batch_size}")
+    print("=" * 90)
+
+    # 旧链路：全部向量以 List[List[float]] 保存并在各层之间传递
+    def build_lists():
+        vectors = []
+        for start in range(0, rows, batch_size):
+            vectors.extend(fake_api_batch(min(batch_size, rows - start)))
+        return vectors
+
+    lists, list_bytes = _measure("List[List[float]]", build_lists)
+    del lists
+
+    # 新链路：每批接口结果立即拷入预分配的 float32 矩阵后释放
+    def build_matrix():
+        matrix = allocate_matrix(rows, dim)
+        for start in range(0, rows, batch_size):
+            n = min(batch_size, rows - start)
+            matrix[start:start + n] = as_matrix(fake_api_batch(n))
+        return prepare_matrix(matrix, dim, copy=False)
+
+    matrix, matrix_bytes = _measure("float32 ndarray（分批拷贝 + 归一化）", build_matrix)
+
+    print("-" * 90)
+    print(f"理论大小: float32 矩阵 {matrix.nbytes / 1024 / 1024:.1f} MB")
+    print(f"常驻内存降低: {list_bytes / max(matrix_bytes, 1):.1f} 倍")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+重建文档级摘要向量
+启用 RETRIEVAL_DOC_SUMMARY 前已向量化的文档没有摘要向量，粗选阶段检索不到这些文档；
+修改 RETRIEVAL_DOC_SUMMARY_VECTORS 后也需要重建。本工具读取向量库中已有的分块向量计算摘要，
+不调用向量模型。未指定 --kb-id 时重建所有知识库。
+
+重建期间该知识库的摘要会先被清空，粗选没有结果时检索自动退回在全部分块上进行。
+
+使用方法：
+    python -m qans_server.tools.build_doc_summaries
+    python -m qans_server.tools.build_doc_summaries --kb-id 3 --kb-id 5
+"""
+import argparse
+import sys
+import time
+
+from qans_server.db.mysql.base import get_session
+from qans_server.db.mysql.models.knowledge_base import list_knowledge_bases
+from qans_server.db.vector.collections.doc_chunk import create_doc_chunk_repo
+from qans_server.db.vector.collections.doc_summary import create_doc_summary_repo, rebuild_knowledge_base_summaries
+from qans_server.setting_config import settings
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="根据已有分块向量重建文档级摘要向量")
+    parser.add_argument("--kb-id", type=int, action="append", help="知识库ID，可重复，默认全部知识库")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批读取的分块数量")
+    args = parser.parse_args()
+
+    summary_repo = create_doc_summary_repo()
+    if summary_repo is None:
+        print("✗ 需要设置 RETRIEVAL_DOC_SUMMARY=true")
+        return 1
+
+    if args.kb_id:
+        kb_ids = args.kb_id
+    else:
+        with get_session() as session:
+            kb_ids = [kb.id for kb in list_knowledge_bases(session, limit=1_000_000)]
+
+    chunk_repo = create_doc_chunk_repo()
+    print(f"每个文档 {settings.retrieval_doc_summary_vectors} 个摘要向量，共 {len(kb_ids)} 个知识库")
+    for kb_id in kb_ids:
+        started = time.perf_counter()
+        count = rebuild_knowledge_base_summaries(chunk_repo, summary_repo, kb_id, args.batch_size)
+        print(f"✓ 知识库 {kb_id}: {count} 个文档，耗时 {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+本地向量后端与 Milvus 的结果一致性检查
+把知识库的向量行从 Milvus 复制到临时的本地向量存储，用相同的查询分别执行稠密检索与
+混合检索（稠密 + BM25 + RRF），比较两个后端 top_k 结果的重合率。查询取自聊天记录中的历史提问，
+没有查询日志时从分块文本中截取。
+
+需在 VECTOR_URL 指向 Milvus 时运行；平均混合检索重合率低于 --min-overlap 时返回非零退出码。
+Milvus 的 HNSW / IVF 为近似检索而本地后端默认精确检索，稠密检索的重合率即为 Milvus 的召回率；
+BM25 分词近似 Milvus standard 分析器，混合检索结果允许少量差异。
+
+使用方法：
+    python -m qans_server.tools.check_local_parity --kb-id 3
+    python -m qans_server.tools.check_local_parity --kb-id 3 --queries 100 --top-k 10 --min-overlap 0.9
+"""
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk
+from qans_server.db.vector.collections.local_doc_chunk import LocalDocChunk
+from qans_server.db.vector.local.store import LocalVectorStore
+from qans_server.db.vector.vector_codec import decode_vector
+from qans_server.service.embedding_service import EmbeddingService
+from qans_server.setting_config import VECTOR_BACKEND_MILVUS, settings
+from qans_server.tools.tune_search_params import load_query_log
+
+_COPY_FIELDS = ["id", "vector", "doc_id", "chunk_id", "knowledge_base_id", "text", "meta"]
+# 从分块文本截取查询时的长度
+_QUERY_CHARS = 48
+
+
+def copy_knowledge_base(milvus_repo: VectorDocChunk, local_repo: LocalDocChunk, kb_id: int) -> List[str]:
+    """把知识库的全部行复制到本地存储，返回分块文本（用于构造查询）。"""
+
+    texts: List[str] = []
+    for batch in milvus_repo.iter_rows_by_knowledge_base_id(kb_id, _COPY_FIELDS, batch_size=2000):
+        rows = [dict(row, vector=decode_vector(row["vector"], milvus_repo.storage_type)) for row in batch]
+        local_repo.upsert_rows(rows)
+        texts.extend(row.get("text") or "" for row in batch)
+    # 合并为单个数据段，与长期运行后的状态一致
+    local_repo.store.compact(kb_id)
+    return texts
+
+
+def overlap(expected: List[int], found: List[int]) -> float:
+    if not expected:
+        return 1.0 if not found else 0.0
+    return len(set(expected) & set(found)) / len(expected)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="检查本地向量后端与 Milvus 的检索结果一致性")
+    parser.add_argument("--kb-id", type=int, action="append", required=True, help="知识库ID，可重复")
+    parser.add_argument("--queries", type=int, default=50, help="每个知识库的查询数量")
+    parser.add_argument("--top-k", type=int, default=5, help="比较的结果数量")
+    parser.add_argument("--min-overlap", type=float, default=0.8, help="混合检索平均重合率的下限")
+    parser.add_argument("--local-dir", default=None, help="本地存储目录，默认使用临时目录并在结束后删除")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    if settings.vector_backend != VECTOR_BACKEND_MILVUS:
+        print("✗ 需要 VECTOR_URL 指向 Milvus")
+        return 1
+
+    local_dir = Path(args.local_dir) if args.local_dir else Path(tempfile.mkdtemp(prefix="qans_parity_"))
+    milvus_repo = VectorDocChunk()
+    local_repo = LocalDocChunk(
+        LocalVectorStore(
+            local_dir,
+            settings.stored_vector_dim,
+            metric_type=milvus_repo.dense_profile.metric_type,
+            max_segments=settings.vector_local_max_segments,
+        )
+    )
+    embedding_service = EmbeddingService()
+    query_log = load_query_log(10_000)
+    rng = random.Random(args.seed)
+    failed = False
+
+    try:
+        for kb_id in args.kb_id:
+            texts = copy_knowledge_base(milvus_repo, local_repo, kb_id)
+            print(f"知识库 {kb_id}: 已复制 {local_repo.count_by_knowledge_base_id(kb_id)} 行")
+            queries = query_log.get(kb_id) or [text[:_QUERY_CHARS] for text in texts if text.strip()]
+            if not queries:
+                print("  没有可用的查询，跳过")
+                continue
+            queries = rng.sample(queries, min(args.queries, len(queries)))
+
+            dense_overlaps: List[float] = []
+            hybrid_overlaps: List[float] = []
+            for query in queries:
+                query_vector = embedding_service.embed_query(query, kb_id)
+                dense_overlaps.append(overlap(
+                    milvus_repo.search_dense(np.stack([query_vector]), [kb_id], args.top_k)[0],
+                    local_repo.search_dense(np.stack([query_vector]), [kb_id], args.top_k)[0],
+                ))
+                expected = milvus_repo.search_similar_chunks(query, query_vector, [kb_id], args.top_k, output_fields=[])
+                found = local_repo.search_similar_chunks(query, query_vector, [kb_id], args.top_k, output_fields=[])
+                hybrid_overlaps.append(overlap([hit["id"] for hit in expected], [hit["id"] for hit in found]))
+
+            dense_mean, hybrid_mean = float(np.mean(dense_overlaps)), float(np.mean(hybrid_overlaps))
+            status = "✓" if hybrid_mean >= args.min_overlap else "✗"
+            print(f"  {status} {len(queries)} 条查询，top_{args.top_k} 重合率: 稠密 {dense_mean:.4f} / 混合 {hybrid_mean:.4f}"
+                  f"（混合最低 {min(hybrid_overlaps):.4f}）")
+            failed = failed or hybrid_mean < args.min_overlap
+    finally:
+        if not args.local_dir:
+            shutil.rmtree(local_dir, ignore_errors=True)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
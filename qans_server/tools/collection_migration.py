@@ -0,0 +1,155 @@
+"""
+Milvus 集合迁移公共方法
+按"新建影子集合 → 分批复制 → 校验行数 → 重命名切换"的流程迁移集合结构，
+切换前线上集合保持可读写，切换后旧集合以备份名保留，确认无误后再手动删除。
+"""
+from typing import Callable, Iterable, List, Optional
+
+from pymilvus import MilvusClient
+
+from qans_server.db.vector.bulk_import import BulkImportProgress
+from qans_server.db.vector.schema import PARTITION_MODE_KEY, PARTITION_MODE_PER_KB
+from qans_server.db.vector.vector_codec import decode_vector, storage_type_of
+
+# 复制时读取的字段；sparse_vector 由 BM25 函数根据 text 自动生成，不能写入
+DOC_CHUNK_COPY_FIELDS = ["id", "vector", "doc_id", "chunk_id", "knowledge_base_id", "text", "meta"]
+
+
+def copy_collection(
+    db_client: MilvusClient,
+    source: str,
+    target: str,
+    *,
+    output_fields: List[str],
+    transform: Optional[Callable[[dict], Optional[dict]]] = None,
+    batch_size: int = 1000,
+    filter_expr: str = "",
+    upsert: bool = False,
+    write: Optional[Callable[[List[dict]], None]] = None,
+) -> int:
+    """
+    分批把 source 集合的数据复制到 target 集合。
+
+    Args:
+        db_client: Milvus 客户端
+        source: 源集合
+        target: 目标集合（需已创建）
+        output_fields: 从源集合读取的字段
+        transform: 行转换函数，返回 None 表示丢弃该行
+        batch_size: 每批读取 / 写入的行数
+        filter_expr: 源集合过滤表达式，为空时复制全部
+        upsert: 为 True 时使用 upsert 写入（可重复执行）
+        write: 自定义写入函数（如按分区写入），指定后忽略 upsert
+
+    Returns:
+        写入的行数
+    """
+    iterator = db_client.query_iterator(
+        collection_name=source,
+        batch_size=batch_size,
+        filter=filter_expr,
+        output_fields=output_fields,
+    )
+    if write is None:
+        insert = db_client.upsert if upsert else db_client.insert
+        write = lambda rows: insert(collection_name=target, data=rows)  # noqa: E731
+    copied = 0
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            rows = _transform_rows(batch, transform)
+            if rows:
+                write(rows)
+                copied += len(rows)
+                print(f"  已复制 {copied} 行")
+    finally:
+        iterator.close()
+
+    db_client.flush(collection_name=target)
+    return copied
+
+
+def print_bulk_progress(progress: BulkImportProgress) -> None:
+    """批量导入进度输出（作为 ``open_bulk_import`` 的 on_progress）。"""
+
+    print(f"  批量导入 {progress.percent}%（{progress.imported_rows}/{progress.total_rows} 行）")
+
+
+def _transform_rows(batch: Iterable[dict], transform) -> List[dict]:
+    rows = []
+    for row in batch:
+        row = dict(row)
+        if transform is not None:
+            row = transform(row)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def count_rows(db_client: MilvusClient, collection_name: str) -> int:
+    """统计集合行数（不受 query 结果窗口限制）。"""
+
+    result = db_client.query(
+        collection_name=collection_name,
+        filter="",
+        output_fields=["count(*)"],
+    )
+    return int(result[0]["count(*)"]) if result else 0
+
+
+def detect_partition_mode(db_client: MilvusClient, collection_name: str) -> str:
+    """识别集合当前的分区布局，未分区时返回 "none"。"""
+
+    description = db_client.describe_collection(collection_name=collection_name)
+    for field in description.get("fields", []):
+        if field.get("name") == "knowledge_base_id" and field.get("is_partition_key"):
+            return PARTITION_MODE_KEY
+    partitions = db_client.list_partitions(collection_name=collection_name)
+    if any(name != "_default" for name in partitions):
+        return PARTITION_MODE_PER_KB
+    return "none"
+
+
+def detect_vector_storage(db_client: MilvusClient, collection_name: str) -> str:
+    """识别集合稠密向量字段的存储精度（float32 / float16 / bfloat16）。"""
+
+    description = db_client.describe_collection(collection_name=collection_name)
+    for field in description.get("fields", []):
+        if field.get("name") == "vector":
+            return storage_type_of(field.get("type"))
+    raise ValueError(f"集合 {collection_name} 没有 vector 字段")
+
+
+def vector_decoder(storage_type: str) -> Callable[[dict], dict]:
+    """复制时将源集合的向量解码为 float32 的 transform，写入时再按配置重新编码。"""
+
+    def decode(row: dict) -> dict:
+        row["vector"] = decode_vector(row["vector"], storage_type)
+        return row
+
+    return decode
+
+
+def swap_collection(db_client: MilvusClient, live: str, shadow: str, backup: str) -> None:
+    """
+    将影子集合切换为线上集合：live → backup，shadow → live。
+
+    Args:
+        db_client: Milvus 客户端
+        live: 线上集合名
+        shadow: 已复制完成的影子集合名
+        backup: 旧集合的备份名
+    """
+    if db_client.has_collection(collection_name=backup):
+        raise RuntimeError(f"备份集合 {backup} 已存在，请确认后手动删除")
+
+    db_client.rename_collection(old_name=live, new_name=backup)
+    try:
+        db_client.rename_collection(old_name=shadow, new_name=live)
+    except Exception:
+        # 回滚，保证线上集合名始终可用
+        db_client.rename_collection(old_name=backup, new_name=live)
+        raise
+    db_client.load_collection(collection_name=live)
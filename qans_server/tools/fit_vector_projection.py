@@ -0,0 +1,196 @@
+"""
+拟合 PCA 降维投影
+用于不支持 Matryoshka 截断的向量模型（VECTOR_REDUCTION=pca）：从知识库分块中抽样文本，
+用向量模型生成原始维度的向量，拟合 EMBEDDING_DIM → VECTOR_DIM 的 PCA 投影并保存到
+VECTOR_PROJECTION_DIR。未指定 --kb-id 时拟合所有知识库共用的 default 投影。
+
+投影按版本保存。保存前先记录每个知识库当前所用的投影（bindings.json），已有知识库继续用原投影
+写入与查询；--reembed 用新投影重新向量化分块文本并按主键 upsert，某个知识库全部写完后才切换为
+新投影（重写期间该知识库的部分向量已是新投影，检索结果可能不准确，建议在低峰期执行）。
+未加 --reembed 时新投影只用于之后新建的知识库，可稍后用 --reembed-only 重新写入并切换。
+
+使用方法：
+    python -m qans_server.tools.fit_vector_projection --kb-id 3 --reembed
+    python -m qans_server.tools.fit_vector_projection --sample 20000
+    python -m qans_server.tools.fit_vector_projection --kb-id 3 --reembed-only
+"""
+import argparse
+import random
+import sys
+from dataclasses import replace
+from datetime import datetime
+from typing import List
+
+import numpy as np
+
+from qans_server.db.mysql.base import get_session
+from qans_server.db.mysql.models.document_chunk import iter_knowledge_base_chunks
+from qans_server.db.mysql.models.knowledge_base import list_knowledge_bases
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, create_doc_chunk_repo
+from qans_server.db.vector.projection import (
+    DEFAULT_PROJECTION,
+    REDUCTION_PCA,
+    DimensionReducer,
+    Projection,
+    fit_pca,
+    get_dimension_reducer,
+    kb_projection_key,
+)
+from qans_server.service.embedding_service import EmbeddingService
+from qans_server.setting_config import settings
+
+_REEMBED_FIELDS = ["id", "doc_id", "chunk_id", "knowledge_base_id", "text", "meta"]
+
+
+def sample_texts(kb_ids: List[int], limit: int, seed: int) -> List[str]:
+    """从知识库分块中均匀抽样文本（蓄水池抽样）。"""
+
+    rng = random.Random(seed)
+    reservoir: List[str] = []
+    seen = 0
+    with get_session() as session:
+        for kb_id in kb_ids:
+            for batch in iter_knowledge_base_chunks(session, kb_id):
+                for row in batch:
+                    text = (row.content or "").strip()
+                    if not text:
+                        continue
+                    seen += 1
+                    if len(reservoir) < limit:
+                        reservoir.append(text)
+                    else:
+                        slot = rng.randrange(seen)
+                        if slot < limit:
+                            reservoir[slot] = text
+    return reservoir
+
+
+def neighbour_overlap(full: np.ndarray, reduced: np.ndarray, top_k: int = 10, queries: int = 200) -> float:
+    """样本内近邻重合率：降维前后 top_k 近邻的平均重合比例。"""
+
+    count = min(queries, len(full))
+    top_k = min(top_k, len(full) - 1)
+    if count == 0 or top_k <= 0:
+        return 0.0
+
+    def neighbours(matrix: np.ndarray) -> np.ndarray:
+        scores = matrix[:count] @ matrix.T
+        scores[np.arange(count), np.arange(count)] = -np.inf
+        return np.argpartition(-scores, kth=top_k - 1, axis=1)[:, :top_k]
+
+    expected, found = neighbours(full), neighbours(reduced)
+    return float(np.mean([len(set(a) & set(b)) / top_k for a, b in zip(expected, found)]))
+
+
+def reembed_knowledge_base(
+    repo: VectorDocChunk,
+    embedding_service: EmbeddingService,
+    reducer: DimensionReducer,
+    projection: Projection,
+    kb_id: int,
+    batch_size: int,
+) -> int:
+    """用指定投影重新向量化知识库的全部分块并 upsert，全部写完后把知识库切换到该投影。"""
+
+    total = 0
+    for batch in repo.iter_rows_by_knowledge_base_id(kb_id, _REEMBED_FIELDS, batch_size=batch_size):
+        full = embedding_service.embed_texts_full([row.get("text") or "" for row in batch])
+        vectors = reducer.apply(full, projection)
+        rows = [dict(row, vector=vectors[i]) for i, row in enumerate(batch)]
+        total += repo.upsert_rows(rows)
+    reducer.store.bind([kb_id], projection.key, projection.version)
+    return total
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="拟合 PCA 降维投影")
+    parser.add_argument("--kb-id", type=int, action="append", default=None,
+                        help="为指定知识库单独拟合投影，可重复；默认拟合共用的 default 投影")
+    parser.add_argument("--sample", type=int, default=10_000, help="每个投影抽样的文本数量")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--reembed", action="store_true", help="拟合后用新投影重新写入知识库的向量")
+    parser.add_argument("--reembed-only", action="store_true",
+                        help="不重新拟合，用已保存的最新投影重新写入知识库的向量并切换")
+    parser.add_argument("--batch-size", type=int, default=500, help="重新向量化时每批的分块数量")
+    parser.add_argument("--dry-run", action="store_true", help="只报告拟合效果，不保存投影")
+    args = parser.parse_args()
+
+    reducer = get_dimension_reducer()
+    if settings.vector_reduction != REDUCTION_PCA or not reducer.enabled:
+        print("✗ 需要设置 VECTOR_REDUCTION=pca 且 VECTOR_DIM 小于 EMBEDDING_DIM")
+        return 1
+
+    with get_session() as session:
+        all_kb_ids = [kb.id for kb in list_knowledge_bases(session, limit=1_000_000)]
+    if args.kb_id:
+        targets = [(kb_projection_key(kb_id), [kb_id]) for kb_id in args.kb_id]
+    else:
+        targets = [(DEFAULT_PROJECTION, all_kb_ids)]
+
+    embedding_service = EmbeddingService(reducer=reducer)
+    repo = create_doc_chunk_repo()
+    print(f"投影: {settings.embedding_dim} → {settings.stored_vector_dim} 维，目录: {reducer.store.directory}")
+    if not args.dry_run:
+        # 先固定已有知识库当前使用的投影，保存新投影不会改变它们的查询方式
+        reducer.pin(all_kb_ids)
+    version = datetime.now().strftime("%Y%m%d%H%M%S")
+
+    for key, kb_ids in targets:
+        if args.reembed_only:
+            projection = reducer.store.load(key)
+            if projection is None:
+                print(f"✗ {key}: 投影不存在，跳过")
+                continue
+            if not projection.version:
+                # 版本化之前保存的投影，补存一份版本文件供记录引用
+                projection = replace(projection, version=version)
+                reducer.store.save(projection)
+            reembed_targets(repo, embedding_service, reducer, projection, kb_ids, args.batch_size)
+            continue
+
+        texts = sample_texts(kb_ids, args.sample, args.seed)
+        if len(texts) < settings.stored_vector_dim:
+            print(f"✗ {key}: 样本数量 {len(texts)} 少于目标维度 {settings.stored_vector_dim}，跳过")
+            continue
+
+        full = embedding_service.embed_texts_full(texts)
+        projection = fit_pca(full, settings.stored_vector_dim, key, settings.embedding_model, version)
+        reduced = projection.apply(full)
+        reduced /= np.maximum(np.linalg.norm(reduced, axis=1, keepdims=True), 1e-12)
+        truncated = np.array(full[:, :settings.stored_vector_dim])
+        truncated /= np.maximum(np.linalg.norm(truncated, axis=1, keepdims=True), 1e-12)
+        print(f"  {key}: 样本 {len(texts)} 条，解释方差 {projection.explained_variance:.4f}，"
+              f"近邻重合率 PCA {neighbour_overlap(full, reduced):.4f} / 截断 {neighbour_overlap(full, truncated):.4f}")
+        if args.dry_run:
+            continue
+
+        path = reducer.store.save(projection)
+        print(f"✓ 投影已保存: {path}（版本 {projection.version}）")
+
+        if args.reembed:
+            reembed_targets(repo, embedding_service, reducer, projection, kb_ids, args.batch_size)
+        else:
+            print("  已有知识库继续使用原投影，用 --reembed-only 重新写入后切换到新投影")
+    return 0
+
+
+def reembed_targets(
+    repo: VectorDocChunk,
+    embedding_service: EmbeddingService,
+    reducer: DimensionReducer,
+    projection: Projection,
+    kb_ids: List[int],
+    batch_size: int,
+) -> None:
+    """用投影重新写入知识库的向量；default 投影只作用于没有专属投影的知识库。"""
+
+    if projection.key == DEFAULT_PROJECTION:
+        kb_ids = [kb_id for kb_id in kb_ids if reducer.store.load(kb_projection_key(kb_id)) is None]
+    for kb_id in kb_ids:
+        count = reembed_knowledge_base(repo, embedding_service, reducer, projection, kb_id, batch_size)
+        print(f"  知识库 {kb_id}: 已重新写入 {count} 条向量，切换到投影 {projection.key} v{projection.version}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
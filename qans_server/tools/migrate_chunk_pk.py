@@ -0,0 +1,82 @@
+"""
+文档分块集合主键迁移
+将自增主键（auto_id）的 t_doc_chunk 迁移为由 (doc_id, chunk_index) 确定性生成的主键，
+迁移后重新向量化使用 upsert 覆盖，删除按主键点删。
+
+迁移期间新写入的向量不会被复制，请先停止向量化任务。
+
+使用方法：
+    python -m qans_server.tools.migrate_chunk_pk
+    python -m qans_server.tools.migrate_chunk_pk --no-swap   # 只复制到影子集合，不切换
+"""
+import argparse
+import sys
+
+from qans_server.db.vector.base import db_client
+from qans_server.db.vector.collections.doc_chunk import COLLECTION_NAME, make_chunk_pk, write_chunk_rows
+from qans_server.db.vector.schema import create_doc_chunk_collection
+from qans_server.tools.collection_migration import (
+    DOC_CHUNK_COPY_FIELDS,
+    copy_collection,
+    count_rows,
+    swap_collection,
+)
+
+
+def _assign_pk(row: dict) -> dict:
+    row["id"] = make_chunk_pk(int(row["doc_id"]), int(row["chunk_id"]))
+    return row
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="文档分块集合主键迁移")
+    parser.add_argument("--shadow", default=f"{COLLECTION_NAME}_pk_migrating", help="影子集合名")
+    parser.add_argument("--backup", default=f"{COLLECTION_NAME}_autoid_bak", help="旧集合备份名")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批复制的行数")
+    parser.add_argument("--no-swap", action="store_true", help="只复制，不切换线上集合")
+    args = parser.parse_args()
+
+    if not db_client.has_collection(collection_name=COLLECTION_NAME):
+        print(f"✗ 集合 {COLLECTION_NAME} 不存在，请先执行 init_milvus_db")
+        return 1
+
+    description = db_client.describe_collection(collection_name=COLLECTION_NAME)
+    if not description.get("auto_id"):
+        print(f"  集合 {COLLECTION_NAME} 已使用确定性主键，无需迁移")
+        return 0
+
+    if db_client.has_collection(collection_name=args.shadow):
+        print(f"  删除上次未完成的影子集合 {args.shadow}")
+        db_client.drop_collection(collection_name=args.shadow)
+
+    create_doc_chunk_collection(db_client, args.shadow)
+    print(f"✓ 影子集合 {args.shadow} 创建成功")
+
+    # 旧集合可能残留同一分块的重复行，upsert 按新主键去重
+    copied = copy_collection(
+        db_client,
+        COLLECTION_NAME,
+        args.shadow,
+        output_fields=[field for field in DOC_CHUNK_COPY_FIELDS if field != "id"],
+        transform=_assign_pk,
+        batch_size=args.batch_size,
+        write=lambda rows: write_chunk_rows("upsert", rows, args.shadow),
+    )
+    source_count = count_rows(db_client, COLLECTION_NAME)
+    target_count = count_rows(db_client, args.shadow)
+    print(f"✓ 复制完成：读取 {copied} 行，源集合 {source_count} 行，影子集合 {target_count} 行")
+    if target_count < source_count:
+        print(f"  注意：{source_count - target_count} 行为同一分块的重复向量，已合并")
+
+    if args.no_swap:
+        print(f"  已跳过切换，影子集合保留为 {args.shadow}")
+        return 0
+
+    swap_collection(db_client, COLLECTION_NAME, args.shadow, args.backup)
+    print(f"✓ 已切换：{COLLECTION_NAME} 使用确定性主键，旧集合备份为 {args.backup}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+文档分块集合分区布局迁移
+在"以 knowledge_base_id 为分区键"与"每个知识库一个分区"两种布局之间迁移 t_doc_chunk，
+也用于把未分区的旧集合迁移到分区布局。迁移完成后需将 VECTOR_PARTITION_MODE
+设置为目标布局并重启服务。
+
+迁移期间新写入的向量不会被复制，请先停止向量化任务。
+--bulk 时通过 Milvus 批量导入写入影子集合，导入完成后再建索引（需配置 VECTOR_BULK_MINIO_ENDPOINT）。
+
+使用方法：
+    python -m qans_server.tools.migrate_partition_layout --mode partition_key
+    python -m qans_server.tools.migrate_partition_layout --mode partition --no-swap
+    python -m qans_server.tools.migrate_partition_layout --mode partition_key --bulk
+"""
+import argparse
+import sys
+
+from qans_server.db.vector.base import db_client
+from qans_server.db.vector.collections.doc_chunk import COLLECTION_NAME, open_bulk_import, write_chunk_rows
+from qans_server.db.vector.schema import (
+    PARTITION_MODE_KEY,
+    PARTITION_MODE_PER_KB,
+    build_doc_chunk_indexes,
+    create_doc_chunk_collection,
+)
+from qans_server.setting_config import settings
+from qans_server.tools.collection_migration import (
+    DOC_CHUNK_COPY_FIELDS,
+    copy_collection,
+    count_rows,
+    detect_partition_mode,
+    detect_vector_storage,
+    print_bulk_progress,
+    swap_collection,
+    vector_decoder,
+)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="文档分块集合分区布局迁移")
+    parser.add_argument(
+        "--mode",
+        choices=[PARTITION_MODE_KEY, PARTITION_MODE_PER_KB],
+        default=settings.vector_partition_mode,
+        help="目标分区布局，默认取 VECTOR_PARTITION_MODE",
+    )
+    parser.add_argument("--shadow", default=f"{COLLECTION_NAME}_layout_migrating", help="影子集合名")
+    parser.add_argument("--backup", default=None, help="旧集合备份名，默认按旧布局命名")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批复制的行数")
+    parser.add_argument("--no-swap", action="store_true", help="只复制，不切换线上集合")
+    parser.add_argument("--bulk", action="store_true", help="使用批量导入复制，导入完成后再建索引")
+    args = parser.parse_args()
+
+    if not db_client.has_collection(collection_name=COLLECTION_NAME):
+        print(f"✗ 集合 {COLLECTION_NAME} 不存在，请先执行 init_milvus_db")
+        return 1
+
+    current_mode = detect_partition_mode(db_client, COLLECTION_NAME)
+    print(f"  当前分区布局: {current_mode}，目标分区布局: {args.mode}")
+    if current_mode == args.mode:
+        print("  无需迁移")
+        return 0
+
+    if db_client.has_collection(collection_name=args.shadow):
+        print(f"  删除上次未完成的影子集合 {args.shadow}")
+        db_client.drop_collection(collection_name=args.shadow)
+
+    create_doc_chunk_collection(db_client, args.shadow, partition_mode=args.mode, defer_index=args.bulk)
+    print(f"✓ 影子集合 {args.shadow} 创建成功")
+
+    def copy(write) -> int:
+        return copy_collection(
+            db_client,
+            COLLECTION_NAME,
+            args.shadow,
+            output_fields=DOC_CHUNK_COPY_FIELDS,
+            transform=vector_decoder(detect_vector_storage(db_client, COLLECTION_NAME)),
+            batch_size=args.batch_size,
+            write=write,
+        )
+
+    if args.bulk:
+        with open_bulk_import(args.shadow, args.mode, on_progress=print_bulk_progress) as job:
+            copied = copy(job.add)
+        print("  导入完成，开始建索引...")
+        build_doc_chunk_indexes(db_client, args.shadow)
+    else:
+        copied = copy(lambda rows: write_chunk_rows("upsert", rows, args.shadow, args.mode))
+    source_count = count_rows(db_client, COLLECTION_NAME)
+    target_count = count_rows(db_client, args.shadow)
+    print(f"✓ 复制完成：读取 {copied} 行，源集合 {source_count} 行，影子集合 {target_count} 行")
+    if target_count != source_count:
+        print("✗ 行数不一致，已跳过切换，请检查后重试")
+        return 1
+
+    if args.no_swap:
+        print(f"  已跳过切换，影子集合保留为 {args.shadow}")
+        return 0
+
+    backup = args.backup or f"{COLLECTION_NAME}_{current_mode}_bak"
+    swap_collection(db_client, COLLECTION_NAME, args.shadow, backup)
+    print(f"✓ 已切换：{COLLECTION_NAME} 使用 {args.mode} 布局，旧集合备份为 {backup}")
+    print(f"  请设置 VECTOR_PARTITION_MODE={args.mode} 并重启服务")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+向量索引在线重建
+Milvus 删除索引前必须先释放集合，原地重建期间集合不可检索。这里改为在影子集合上按
+新的索引配置档建索引并复制数据，完成后重命名切换，重建期间线上集合始终可检索。
+
+索引类型与参数取自配置（VECTOR_INDEX_TYPE、VECTOR_HNSW_M 等），请先修改配置再执行，
+向量存储精度（VECTOR_STORAGE_TYPE）、二值首轮索引（VECTOR_BINARY_INDEX）与 mmap 的变更
+同样通过本工具生效：源向量先解码为 float32，写入影子集合时按新配置重新编码。
+切换后重启服务以使用匹配的检索参数。复制期间新写入的向量可通过 --catch-up 补齐
+（确定性主键下 upsert 可重复执行），复制期间的删除不会同步，请避免在重建时删除文档。
+
+--bulk 时影子集合先不建索引，首轮复制写成 Parquet 文件通过 Milvus 批量导入（需配置
+VECTOR_BULK_MINIO_ENDPOINT），导入完成后统一建索引并加载，适合千万级分块的集合。
+
+使用方法：
+    VECTOR_INDEX_TYPE=HNSW python -m qans_server.tools.rebuild_vector_index
+    python -m qans_server.tools.rebuild_vector_index --index-type IVF_SQ8 --catch-up
+    python -m qans_server.tools.rebuild_vector_index --bulk --catch-up
+"""
+import argparse
+import sys
+
+from qans_server.db.vector.base import db_client
+from qans_server.db.vector.collections.doc_chunk import COLLECTION_NAME, open_bulk_import, write_chunk_rows
+from qans_server.db.vector.index_profile import DENSE_INDEX_TYPES, dense_index_profile, sparse_index_profile
+from qans_server.db.vector.schema import build_doc_chunk_indexes, create_doc_chunk_collection
+from qans_server.setting_config import settings
+from qans_server.tools.collection_migration import (
+    DOC_CHUNK_COPY_FIELDS,
+    copy_collection,
+    count_rows,
+    detect_partition_mode,
+    detect_vector_storage,
+    print_bulk_progress,
+    swap_collection,
+    vector_decoder,
+)
+
+
+def describe_vector_index(collection_name: str) -> str:
+    """返回集合当前稠密向量索引的描述。"""
+
+    for index_name in db_client.list_indexes(collection_name=collection_name):
+        info = db_client.describe_index(collection_name=collection_name, index_name=index_name)
+        if info.get("field_name") == "vector":
+            params = {k: v for k, v in info.items() if k not in ("field_name", "index_name")}
+            return f"{index_name} {params}"
+    return "无"
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="向量索引在线重建")
+    parser.add_argument(
+        "--index-type",
+        choices=DENSE_INDEX_TYPES,
+        default=settings.vector_index_type,
+        help="稠密向量索引类型，默认取 VECTOR_INDEX_TYPE",
+    )
+    parser.add_argument("--shadow", default=f"{COLLECTION_NAME}_index_rebuilding", help="影子集合名")
+    parser.add_argument("--backup", default=f"{COLLECTION_NAME}_index_bak", help="旧集合备份名")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批复制的行数")
+    parser.add_argument("--catch-up", action="store_true", help="复制完成后再 upsert 一轮，补齐复制期间的新写入")
+    parser.add_argument("--no-swap", action="store_true", help="只复制，不切换线上集合")
+    parser.add_argument("--bulk", action="store_true", help="首轮复制使用批量导入，导入完成后再建索引")
+    args = parser.parse_args()
+
+    if not db_client.has_collection(collection_name=COLLECTION_NAME):
+        print(f"✗ 集合 {COLLECTION_NAME} 不存在，请先执行 init_milvus_db")
+        return 1
+
+    dense_profile = dense_index_profile(args.index_type)
+    sparse_profile = sparse_index_profile()
+    partition_mode = detect_partition_mode(db_client, COLLECTION_NAME)
+    if partition_mode == "none":
+        partition_mode = settings.vector_partition_mode
+
+    print(f"  当前索引: {describe_vector_index(COLLECTION_NAME)}")
+    print(f"  目标索引: {dense_profile.index_type} {dense_profile.build_params}，检索参数 {dense_profile.search_params}")
+    print(f"  稀疏索引: {sparse_profile.index_type} {sparse_profile.build_params}")
+    source_storage = detect_vector_storage(db_client, COLLECTION_NAME)
+    print(f"  向量存储: {source_storage} → {settings.vector_storage_type}"
+          f"{'，二值首轮索引' if settings.vector_binary_index else ''}")
+
+    if db_client.has_collection(collection_name=args.shadow):
+        print(f"  删除上次未完成的影子集合 {args.shadow}")
+        db_client.drop_collection(collection_name=args.shadow)
+
+    create_doc_chunk_collection(
+        db_client,
+        args.shadow,
+        partition_mode=partition_mode,
+        dense_profile=dense_profile,
+        sparse_profile=sparse_profile,
+        defer_index=args.bulk,
+    )
+    print(f"✓ 影子集合 {args.shadow} 创建成功（分区布局: {partition_mode}）")
+
+    def copy(write) -> int:
+        return copy_collection(
+            db_client,
+            COLLECTION_NAME,
+            args.shadow,
+            output_fields=DOC_CHUNK_COPY_FIELDS,
+            transform=vector_decoder(source_storage),
+            batch_size=args.batch_size,
+            write=write,
+        )
+
+    def upsert(rows) -> None:
+        write_chunk_rows("upsert", rows, args.shadow, partition_mode)
+
+    if args.bulk:
+        with open_bulk_import(args.shadow, partition_mode, on_progress=print_bulk_progress) as job:
+            copied = copy(job.add)
+        print("  导入完成，开始建索引...")
+        build_doc_chunk_indexes(db_client, args.shadow, dense_profile=dense_profile, sparse_profile=sparse_profile)
+    else:
+        copied = copy(upsert)
+    if args.catch_up:
+        print("  补齐复制期间的新写入...")
+        copied = copy(upsert)
+
+    source_count = count_rows(db_client, COLLECTION_NAME)
+    target_count = count_rows(db_client, args.shadow)
+    print(f"✓ 复制完成：读取 {copied} 行，源集合 {source_count} 行，影子集合 {target_count} 行")
+    if target_count != source_count:
+        print("✗ 行数不一致，已跳过切换，请检查后重试（或使用 --catch-up）")
+        return 1
+
+    if args.no_swap:
+        print(f"  已跳过切换，影子集合保留为 {args.shadow}")
+        return 0
+
+    swap_collection(db_client, COLLECTION_NAME, args.shadow, args.backup)
+    print(f"✓ 已切换：{COLLECTION_NAME} 使用 {dense_profile.index_type} 索引，旧集合备份为 {args.backup}")
+    if args.index_type != settings.vector_index_type:
+        print(f"  请设置 VECTOR_INDEX_TYPE={args.index_type} 并重启服务")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
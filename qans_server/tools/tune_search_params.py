@@ -0,0 +1,199 @@
+"""
+检索参数自动调参
+从聊天记录中抽样用户提问作为查询日志，对每个知识库用 NumPy 精确检索得到基准结果，
+在当前索引类型的检索参数网格（ef / nprobe / search_list × 候选倍数）上测量
+recall@k 与 p95 延迟，并写入调参文件（SEARCH_TUNING_PATH）。
+
+检索时按请求的质量档位（目标召回率）或延迟预算，从调参文件中为每个知识库选择
+满足条件的最快配置；调参文件更新后服务自动重新加载，无需重启。
+
+使用方法：
+    python -m qans_server.tools.tune_search_params
+    python -m qans_server.tools.tune_search_params --kb-id 3 --queries 300 --top-k 10
+"""
+import argparse
+import random
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from qans_server.db.mysql.base import get_session
+from qans_server.db.mysql.models.chat_message import list_recent_user_queries
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, create_doc_chunk_repo
+from qans_server.db.vector.vector_codec import decode_vector
+from qans_server.db.vector.search_tuning import (
+    EFFORT_PARAM_KEYS,
+    QUALITY_TIERS,
+    TIER_TARGET_RECALL,
+    get_tuning_table,
+    pick_candidate,
+    scale_search_params,
+)
+from qans_server.service.embedding_service import EmbeddingService
+from qans_server.util.vector_util import allocate_matrix
+
+# 各检索参数的默认网格
+DEFAULT_GRIDS = {
+    "ef": [16, 32, 64, 128, 256, 512],
+    "nprobe": [1, 2, 4, 8, 16, 32, 64, 128],
+    "search_list": [16, 32, 64, 100, 200, 400],
+}
+
+
+def load_query_log(limit: int) -> Dict[int, List[str]]:
+    """按知识库分组的历史提问（去重）。"""
+
+    grouped: Dict[int, List[str]] = {}
+    with get_session() as session:
+        for content, kb_ids in list_recent_user_queries(session, limit=limit):
+            text = (content or "").strip()
+            if not text:
+                continue
+            for kb_id in kb_ids:
+                queries = grouped.setdefault(int(kb_id), [])
+                if text not in queries:
+                    queries.append(text)
+    return grouped
+
+
+def load_kb_vectors(repo: VectorDocChunk, kb_id: int, dim: int):
+    count = repo.count_by_knowledge_base_id(kb_id)
+    ids: List[int] = []
+    matrix = allocate_matrix(count, dim)
+    for batch in repo.iter_rows_by_knowledge_base_id(kb_id, ["id", "vector"]):
+        for row in batch:
+            if len(ids) >= count:
+                break
+            matrix[len(ids)] = decode_vector(row["vector"], repo.storage_type)
+            ids.append(row["id"])
+    return np.asarray(ids, dtype=np.int64), matrix[:len(ids)]
+
+
+def build_grid(search_params: dict, top_k: int, multipliers: List[int]) -> List[dict]:
+    keys = [key for key in EFFORT_PARAM_KEYS if key in search_params]
+    if not keys:
+        bases = [dict(search_params)]
+    else:
+        key = keys[0]
+        bases = [dict(search_params, **{key: value}) for value in DEFAULT_GRIDS[key]]
+
+    grid = []
+    seen = set()
+    for multiplier in multipliers:
+        limit = top_k * multiplier
+        for base in bases:
+            params = scale_search_params(base, 1.0, limit)
+            signature = (multiplier, tuple(sorted(params.items())))
+            if signature not in seen:
+                seen.add(signature)
+                grid.append({"params": params, "candidate_multiplier": multiplier})
+    return grid
+
+
+def measure(repo: VectorDocChunk, kb_id: int, queries: np.ndarray, truth_ids: List[set], top_k: int, entry: dict) -> dict:
+    limit = top_k * entry["candidate_multiplier"]
+    # 预热
+    repo.search_dense(queries[:1], [kb_id], limit, entry["params"])
+
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth_ids):
+        start = time.perf_counter()
+        hits = repo.search_dense(query[None, :], [kb_id], limit, entry["params"])[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & set(hits)) / len(expected))
+    return dict(
+        entry,
+        recall=round(float(np.mean(recalls)), 4),
+        p95_ms=round(float(np.percentile(latencies, 95)), 2),
+        p50_ms=round(float(np.percentile(latencies, 50)), 2),
+    )
+
+
+def tune_knowledge_base(
+    repo: VectorDocChunk,
+    embedding_service: EmbeddingService,
+    kb_id: int,
+    texts: List[str],
+    top_k: int,
+    multipliers: List[int],
+) -> List[dict]:
+    ids, corpus = load_kb_vectors(repo, kb_id, embedding_service.dim)
+    if len(ids) <= top_k:
+        print(f"  知识库 {kb_id} 向量数量 {len(ids)} 不足，跳过")
+        return []
+
+    queries = embedding_service.embed_texts(texts, kb_id)
+    # 精确检索基准（向量已归一化，余弦相似度即内积）
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, kth=top_k - 1, axis=1)[:, :top_k]
+    truth_ids = [set(ids[row].tolist()) for row in top]
+
+    results = []
+    for entry in build_grid(repo.dense_profile.search_params, top_k, multipliers):
+        result = measure(repo, kb_id, queries, truth_ids, top_k, entry)
+        print(f"    {result['params']} ×{result['candidate_multiplier']}: "
+              f"recall={result['recall']:.4f} p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms")
+        results.append(result)
+    return results
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="检索参数自动调参")
+    parser.add_argument("--kb-id", type=int, action="append", default=None, help="只调参指定知识库，可重复")
+    parser.add_argument("--queries", type=int, default=200, help="每个知识库抽样的查询数量")
+    parser.add_argument("--log-limit", type=int, default=20_000, help="读取的最近提问数量")
+    parser.add_argument("--top-k", type=int, default=10, help="召回数量")
+    parser.add_argument("--multipliers", default="1,2,4", help="逗号分隔的候选数量倍数")
+    parser.add_argument("--latency-budget-ms", type=float, default=None, help="报告该延迟预算下的选择")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--dry-run", action="store_true", help="只输出结果，不写入调参文件")
+    args = parser.parse_args()
+
+    multipliers = sorted({int(item) for item in args.multipliers.split(",") if item.strip()})
+    query_log = load_query_log(args.log_limit)
+    kb_ids = args.kb_id or sorted(query_log)
+    if not kb_ids:
+        print("✗ 没有可用的查询日志")
+        return 1
+
+    repo = create_doc_chunk_repo()
+    embedding_service = EmbeddingService()
+    table = get_tuning_table()
+    rng = random.Random(args.seed)
+    index_type = repo.dense_profile.index_type
+    print(f"索引类型: {index_type}，top_k: {args.top_k}，调参文件: {table.path}")
+
+    for kb_id in kb_ids:
+        texts = query_log.get(kb_id, [])
+        if not texts:
+            print(f"  知识库 {kb_id} 没有查询日志，跳过")
+            continue
+        texts = rng.sample(texts, min(args.queries, len(texts)))
+        print(f"  知识库 {kb_id}: {len(texts)} 条查询")
+
+        candidates = tune_knowledge_base(repo, embedding_service, kb_id, texts, args.top_k, multipliers)
+        if not candidates:
+            continue
+
+        for quality in QUALITY_TIERS:
+            chosen = pick_candidate(candidates, target_recall=TIER_TARGET_RECALL[quality])
+            print(f"    {quality}（目标召回率 {TIER_TARGET_RECALL[quality]}）→ {chosen['params']} ×{chosen['candidate_multiplier']}")
+        if args.latency_budget_ms is not None:
+            chosen = pick_candidate(candidates, latency_budget_ms=args.latency_budget_ms)
+            print(f"    延迟预算 {args.latency_budget_ms}ms → {chosen['params']} ×{chosen['candidate_multiplier']}"
+                  f"（recall={chosen['recall']:.4f}）")
+
+        if not args.dry_run:
+            table.save(index_type, args.top_k, kb_id, candidates)
+
+    if not args.dry_run:
+        print(f"✓ 调参结果已写入 {table.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""延迟统计（保留最近若干个样本计算均值与分位数）。"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Deque
+
+# 默认保留的最近样本数
+DEFAULT_SAMPLES = 1000
+
+
+class LatencyStats:
+    """线程安全的延迟统计，``count`` 为累计次数，均值与分位数按最近 ``samples`` 个样本计算。"""
+
+    def __init__(self, samples: int = DEFAULT_SAMPLES) -> None:
+        self._lock = threading.Lock()
+        self._samples: Deque[float] = deque(maxlen=samples)
+        self.count = 0
+
+    def add(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            values = sorted(self._samples)
+            count = self.count
+        if not values:
+            return {"count": count, "avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": count,
+            "avg_ms": round(sum(values) / len(values), 1),
+            "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+            "max_ms": round(values[-1], 1),
+        }
@@ -0,0 +1,67 @@
+"""按事件循环隔离的异步资源。
+
+gRPC aio 通道、``httpx.AsyncClient`` 等绑定创建时的事件循环，不能跨事件循环使用。
+``LoopLocal`` 为每个使用它的事件循环创建一份资源：多个线程各自运行事件循环时互不替换，
+工具脚本多次 ``asyncio.run`` 时旧事件循环的资源在下次创建时关闭，应用退出时 ``aclose`` 关闭全部资源。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Generic, List, Set, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class LoopLocal(Generic[T]):
+    """每个事件循环一份的异步资源（线程安全）。"""
+
+    def __init__(self, factory: Callable[[], T], closer: Callable[[T], Awaitable[None]]) -> None:
+        self._factory = factory
+        self._closer = closer
+        self._lock = threading.Lock()
+        self._values: Dict[asyncio.AbstractEventLoop, T] = {}
+        # 后台关闭任务需要保留引用，避免执行中被回收
+        self._closing: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get(self) -> T:
+        """当前事件循环的资源，首次使用时创建。"""
+
+        loop = asyncio.get_running_loop()
+        stale: List[T] = []
+        with self._lock:
+            value = self._values.get(loop)
+            if value is None:
+                # 已结束的事件循环无法再执行关闭，在当前事件循环中尽力关闭其资源
+                for owner in [owner for owner in self._values if owner.is_closed()]:
+                    stale.append(self._values.pop(owner))
+                value = self._values[loop] = self._factory()
+        for old in stale:
+            task = loop.create_task(self._close_quietly(old))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        return value
+
+    async def aclose(self) -> None:
+        """关闭全部资源；仍在其他线程中运行的事件循环的资源提交到该循环中关闭。"""
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            values, self._values = self._values, {}
+        for owner, value in values.items():
+            if owner is not loop and owner.is_running() and not owner.is_closed():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._close_quietly(value), owner))
+            else:
+                await self._close_quietly(value)
+
+    async def _close_quietly(self, value: T) -> None:
+        try:
+            await self._closer(value)
+        except Exception as exc:  # noqa: BLE001 - 原事件循环已结束时关闭可能失败，连接由垃圾回收释放
+            logger.debug(f"关闭事件循环绑定的资源失败: {exc}")
@@ -0,0 +1,67 @@
+"""线程安全的 LRU 缓存（可选过期时间）。"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """容量受限的 LRU 缓存，超出容量时淘汰最久未访问的条目。
+
+    ``ttl`` 大于 0 时条目在写入 ``ttl`` 秒后过期（多 worker 部署下限制缓存的陈旧时间）。
+    """
+
+    def __init__(self, maxsize: int, ttl: float = 0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (self.ttl > 0 and time.monotonic() - item[0] > self.ttl):
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: Hashable, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            item = self._data.pop(key, None)
+            return item[1] if item is not None else None
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """删除 key 满足条件的全部条目，返回删除数量。"""
+
+        with self._lock:
+            keys: List[Hashable] = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,125 @@
+"""单飞（single-flight）去重工具。
+
+同一 key 的并发调用只执行一次，其余调用等待并共享首个调用的结果（或异常）。
+进程内通过线程事件实现；跨 worker 通过 MySQL 命名锁（GET_LOCK/RELEASE_LOCK）串行化，
+拿到锁后可先调用 ``reuse`` 检查其他 worker 是否已完成同样的工作，从而直接复用结果。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generator, Optional, TypeVar
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+T = TypeVar("T")
+
+
+class SingleFlightLockTimeout(Exception):
+    """等待跨进程命名锁超时。"""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+def make_key(operation: str, *args: Any) -> str:
+    """根据操作名与参数生成去重 key。"""
+
+    return f"{operation}:{json.dumps(args, ensure_ascii=False, sort_keys=True, default=str)}"
+
+
+class SingleFlight:
+    """并发相同操作的去重执行器。"""
+
+    def __init__(self, engine: Engine | None = None, lock_timeout: int = 600) -> None:
+        self._engine = engine
+        self._lock_timeout = lock_timeout
+        self._mutex = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], T],
+        *,
+        distributed: bool = False,
+        reuse: Optional[Callable[[], Optional[T]]] = None,
+    ) -> T:
+        """执行 ``fn``，同一 key 的并发调用共享同一结果。
+
+        Args:
+            key: 去重 key，建议使用 ``make_key`` 生成
+            fn: 实际执行的操作
+            distributed: 是否同时使用 MySQL 命名锁做跨 worker 去重
+            reuse: 拿到跨进程锁后调用，返回非 None 表示其他 worker 已完成，直接复用该结果
+
+        Returns:
+            ``fn`` 或 ``reuse`` 的返回值
+        """
+        with self._mutex:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if distributed:
+                with self._advisory_lock(key):
+                    reused = reuse() if reuse is not None else None
+                    call.result = reused if reused is not None else fn()
+            else:
+                call.result = fn()
+        except BaseException as exc:  # noqa: BLE001 - 异常同样需要共享给等待者
+            call.error = exc
+            raise
+        finally:
+            with self._mutex:
+                self._calls.pop(key, None)
+            if call.waiters:
+                logger.debug(f"single-flight 合并了 {call.waiters} 个重复调用: {key}")
+            call.done.set()
+
+        return call.result
+
+    @contextmanager
+    def _advisory_lock(self, key: str) -> Generator[None, None, None]:
+        if self._engine is None or self._engine.dialect.name != "mysql":
+            yield
+            return
+
+        # MySQL 命名锁名称最长 64 个字符
+        name = "qans:" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+        # 命名锁与连接绑定，必须在同一连接上获取与释放
+        with self._engine.connect() as conn:
+            acquired = conn.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"),
+                {"name": name, "timeout": self._lock_timeout},
+            ).scalar()
+            if acquired != 1:
+                raise SingleFlightLockTimeout(f"等待操作锁超时: {key}")
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
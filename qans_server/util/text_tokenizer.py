@@ -0,0 +1,71 @@
+"""全文检索分词。
+
+与 Milvus ``enable_analyzer=True`` 默认使用的 standard 分析器保持一致：按 Unicode 单词边界切分、
+转为小写，中日文字符逐字成词。本地向量后端的 BM25 索引与查询都使用这里的分词结果。
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+# 中日文字符（CJK 统一表意文字、扩展 A、兼容表意文字、平假名 / 片假名）逐字成词
+_CJK_CHARS = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK_CHARS}]|[^\W{_CJK_CHARS}]+")
+_CJK_RUN_PATTERN = re.compile(rf"[{_CJK_CHARS}]{{2,}}")
+_CJK_CHAR_PATTERN = re.compile(rf"[{_CJK_CHARS}]")
+
+
+def tokenize(text: str) -> List[str]:
+    """将文本切分为小写词元列表。"""
+
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def tokenize_with_bigrams(text: str) -> List[str]:
+    """``tokenize`` 的结果加上中日文相邻两字的二元词（用于对词序更敏感的相关性打分，不用于 BM25 索引）。"""
+
+    terms = tokenize(text)
+    for run in _CJK_RUN_PATTERN.findall(text.lower()):
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def count_terms(texts: Sequence[str], terms: Sequence[str]) -> List[List[int]]:
+    """
+    统计给定词元（``tokenize_with_bigrams`` 的切分结果）在每个文本中的出现次数。
+
+    中日文单字与二元词直接按子串计数，其他词用一个带词边界的正则一次匹配，
+    不需要完整切分文本（重排时候选文本远长于问题）。
+
+    Returns:
+        ``len(texts) × len(terms)`` 的计数
+    """
+    is_word = [not _CJK_CHAR_PATTERN.match(term) for term in terms]
+    word_terms = [term for term, word in zip(terms, is_word) if word]
+    word_pattern = None
+    if word_terms:
+        alternation = "|".join(re.escape(term) for term in sorted(word_terms, key=len, reverse=True))
+        word_pattern = re.compile(rf"(?<![^\W{_CJK_CHARS}])(?:{alternation})(?![^\W{_CJK_CHARS}])")
+
+    counts = []
+    for text in texts:
+        lowered = text.lower()
+        words = {}
+        # 子串都不出现时不必执行带词边界的正则
+        if word_pattern is not None and any(term in lowered for term in word_terms):
+            words = Counter(word_pattern.findall(lowered))
+        counts.append([
+            words.get(term, 0) if word else lowered.count(term)
+            for term, word in zip(terms, is_word)
+        ])
+    return counts
+
+
+def term_frequencies(text: str) -> Dict[str, int]:
+    """文本的词频统计。"""
+
+    return dict(Counter(tokenize(text)))
@@ -0,0 +1,82 @@
+"""向量批处理工具（float32 连续数组）。"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+VECTOR_DTYPE = np.float32
+
+
+def allocate_matrix(rows: int, dim: int) -> np.ndarray:
+    """分配 ``rows × dim`` 的连续 float32 矩阵。"""
+
+    return np.empty((rows, dim), dtype=VECTOR_DTYPE)
+
+
+def as_matrix(vectors: Sequence[Sequence[float]] | np.ndarray, dim: int | None = None) -> np.ndarray:
+    """将向量批次转换为二维连续 float32 矩阵（已是 float32 矩阵时不复制）。"""
+
+    matrix = np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE)
+    if matrix.ndim == 1 and matrix.size == 0:
+        matrix = matrix.reshape(0, dim or 0)
+    if matrix.ndim != 2:
+        raise ValueError(f"向量批次必须是二维数组，实际维度: {matrix.ndim}")
+    return matrix
+
+
+def validate_matrix(matrix: np.ndarray, dim: int) -> None:
+    """校验向量维度与数值合法性（NaN/Inf、全零向量）。"""
+
+    if matrix.ndim != 2 or matrix.shape[1] != dim:
+        raise ValueError(f"向量维度不匹配: 期望 {dim}，实际 {matrix.shape[1] if matrix.ndim == 2 else matrix.shape}")
+    if matrix.size == 0:
+        return
+
+    finite = np.isfinite(matrix).all(axis=1)
+    if not finite.all():
+        bad_rows = np.flatnonzero(~finite)[:10].tolist()
+        raise ValueError(f"向量包含 NaN 或 Inf，行号: {bad_rows}")
+
+    zero = ~matrix.any(axis=1)
+    if zero.any():
+        bad_rows = np.flatnonzero(zero)[:10].tolist()
+        raise ValueError(f"向量为全零，行号: {bad_rows}")
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """原地对每行做 L2 归一化并返回该矩阵。"""
+
+    if matrix.size == 0:
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.maximum(norms, np.finfo(VECTOR_DTYPE).tiny, out=norms)
+    matrix /= norms
+    return matrix
+
+
+def prepare_matrix(
+    vectors: Sequence[Sequence[float]] | np.ndarray,
+    dim: int,
+    *,
+    copy: bool = True,
+) -> np.ndarray:
+    """转换、校验并归一化向量批次，返回只读的 float32 矩阵。
+
+    ``copy=False`` 表示调用方独占传入的 float32 矩阵，允许原地归一化。
+    """
+
+    matrix = as_matrix(vectors, dim)
+    if matrix is vectors and (copy or not matrix.flags.writeable):
+        matrix = matrix.copy()
+    validate_matrix(matrix, dim)
+    normalize_rows(matrix)
+    matrix.setflags(write=False)
+    return matrix
+
+
+def prepare_vector(vector: Sequence[float] | np.ndarray, dim: int) -> np.ndarray:
+    """转换、校验并归一化单个向量，返回只读的一维 float32 数组。"""
+
+    return prepare_matrix(np.array(vector, dtype=VECTOR_DTYPE).reshape(1, -1), dim, copy=False)[0]
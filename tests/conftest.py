@@ -0,0 +1,34 @@
+"""测试环境：在导入配置之前把向量库指向临时目录下的本地后端、MySQL 指向临时 SQLite 文件，
+测试不连接 Milvus 与 MySQL。"""
+
+import os
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="qans_test_")
+os.environ["VECTOR_URL"] = "local://" + os.path.join(_TMP_DIR, "vectors")
+os.environ["MYSQL_DSN"] = "sqlite:///" + os.path.join(_TMP_DIR, "qans.db")
+
+import pytest  # noqa: E402
+from sqlalchemy.schema import CreateTable  # noqa: E402
+
+from qans_server.db.mysql import Base, SessionLocal, engine  # noqa: E402
+from qans_server.db.mysql.models import Document, DocumentChunk, KnowledgeBase  # noqa: E402
+
+_TABLES = [KnowledgeBase.__table__, Document.__table__, DocumentChunk.__table__]
+
+
+@pytest.fixture
+def mysql_session():
+    """知识库 / 文档 / 分块表的 SQLite 会话，每个测试重新建表。
+
+    SQLite 的索引名在库内全局唯一，而各表复用了 ``idx_create_time`` 等名称，这里只建表不建索引。
+    """
+    with engine.begin() as connection:
+        for table in _TABLES:
+            connection.execute(CreateTable(table))
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine, tables=_TABLES)
@@ -0,0 +1,136 @@
+"""文档向量化的事务边界、跨 worker 复用判断与批量导入进度（SQLite + 本地向量后端）。"""
+
+import numpy as np
+import pytest
+
+from qans_server.db.mysql import get_session
+from qans_server.db.mysql.models import Document, KnowledgeBase
+from qans_server.db.mysql.models.document import (
+    DOCUMENT_STATUS_COMPLETED,
+    DOCUMENT_STATUS_FAILED,
+    DOCUMENT_STATUS_IMPORTING,
+)
+from qans_server.db.mysql.models.document_chunk import DocumentChunkCreate, replace_document_chunks
+from qans_server.db.mysql.models.knowledge_base import create_knowledge_base
+from qans_server.db.vector.bulk_import import BulkImportProgress
+from qans_server.db.vector.collections.local_doc_chunk import LocalDocChunk
+from qans_server.db.vector.local.store import LocalVectorStore
+from qans_server.service.document_service import DocumentService
+from qans_server.setting_config import settings
+
+
+class FakeEmbeddingService:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def embed_documents(self, documents, knowledge_base_id=None):
+        if self.fail:
+            raise RuntimeError("向量模型不可用")
+        rng = np.random.default_rng(len(documents))
+        return rng.standard_normal((len(documents), settings.stored_vector_dim)).astype(np.float32)
+
+
+@pytest.fixture
+def document_id(mysql_session):
+    kb = create_knowledge_base(mysql_session, name="kb")
+    doc = Document.create_instance(kb.id, "a.txt", "/nonexistent/a.txt", 10, "txt")
+    mysql_session.add(doc)
+    mysql_session.flush()
+    replace_document_chunks(mysql_session, doc.id, [
+        DocumentChunkCreate(knowledge_base_id=kb.id, chunk_index=index, content=f"分块 {index}", metadata_json=None)
+        for index in range(3)
+    ])
+    doc.chunk_count = 3
+    mysql_session.commit()
+    return doc.id
+
+
+def make_service(tmp_path, **kwargs):
+    return DocumentService(
+        embedding_service=FakeEmbeddingService(**kwargs),
+        vector_repo=LocalDocChunk(store=LocalVectorStore(tmp_path / "chunks", settings.stored_vector_dim)),
+        summary_repo=None,
+    )
+
+
+def load_document(document_id):
+    with get_session() as session:
+        return session.get(Document, document_id)
+
+
+def test_vectorize_commits_status_without_committing_caller_session(mysql_session, document_id, tmp_path):
+    service = make_service(tmp_path)
+    # 调用方事务中尚未提交的改动不应被向量化提交
+    mysql_session.add(KnowledgeBase.create_instance(name="未提交"))
+
+    assert service.vectorize_document(mysql_session, document_id) == 3
+    mysql_session.rollback()
+
+    document = load_document(document_id)
+    assert document.status == DOCUMENT_STATUS_COMPLETED
+    assert document.vectorize_version == 1
+    with get_session() as session:
+        assert session.query(KnowledgeBase).count() == 1
+    assert len(service.vector_repo.list_chunk_pks_by_doc_id(document_id)) == 3
+
+
+def test_reuse_check_uses_vectorize_version(mysql_session, document_id, tmp_path):
+    service = make_service(tmp_path)
+    before = service._get_vectorize_version(document_id)
+    assert service._get_vectorized_count(document_id, before) is None
+
+    service.vectorize_document(mysql_session, document_id)
+    # 同一秒内完成的向量化也能被识别
+    assert service._get_vectorized_count(document_id, before) == 3
+    assert service._get_vectorized_count(document_id, before + 1) is None
+
+    service.vectorize_document(mysql_session, document_id)
+    assert load_document(document_id).vectorize_version == before + 2
+
+
+def test_vectorize_failure_is_recorded(mysql_session, document_id, tmp_path):
+    service = make_service(tmp_path, fail=True)
+
+    with pytest.raises(RuntimeError):
+        service.vectorize_document(mysql_session, document_id)
+    mysql_session.rollback()
+
+    document = load_document(document_id)
+    assert document.status == DOCUMENT_STATUS_FAILED
+    assert document.error_message == "向量模型不可用"
+    assert document.vectorize_version == 0
+
+
+class BulkImportRepo(LocalDocChunk):
+    """走批量导入路径的本地仓库，导入过程中记录文档状态。"""
+
+    def __init__(self, store, fail=False):
+        super().__init__(store=store)
+        self.fail = fail
+        self.observed = []
+
+    def use_bulk_import(self, row_count):
+        return True
+
+    def bulk_insert_documents(self, documents, vectors, doc_id, knowledge_base_id, on_progress=None):
+        on_progress(BulkImportProgress(total_rows=len(documents), imported_rows=1, percent=33, done=True))
+        document = load_document(doc_id)
+        self.observed.append((document.status, document.import_progress, document.error_message))
+        if self.fail:
+            raise RuntimeError("导入任务失败")
+        return self.insert_documents(documents, vectors, doc_id, knowledge_base_id)
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_bulk_import_progress_is_not_an_error(mysql_session, document_id, tmp_path, fail):
+    service = make_service(tmp_path)
+    service.vector_repo = BulkImportRepo(service.vector_repo.store, fail=fail)
+
+    assert service.vectorize_document(mysql_session, document_id) == 3
+
+    assert service.vector_repo.observed == [(DOCUMENT_STATUS_IMPORTING, 33, None)]
+    document = load_document(document_id)
+    assert document.status == DOCUMENT_STATUS_COMPLETED
+    assert document.import_progress is None
+    assert document.error_message is None
+    assert len(service.vector_repo.list_chunk_pks_by_doc_id(document_id)) == 3
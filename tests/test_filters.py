@@ -0,0 +1,155 @@
+"""向量库过滤表达式：字面量引号与转义、字段名校验、范围条件、``all_of`` 参数重命名，以及检索 / 聊天接口的 400 响应。"""
+
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from qans_server.api import chat, retrieval
+from qans_server.api.dependencies import get_chat_service_dep, get_db_session, get_retrieval_service_dep
+from qans_server.db.vector.filters import (
+    FilterExpr,
+    all_of,
+    chunk_filter,
+    field_eq,
+    field_in,
+    field_range,
+    json_eq,
+    json_range,
+)
+
+
+@pytest.mark.parametrize(
+    "value, literal",
+    [
+        ('say "hi"', r'"say \"hi\""'),
+        ("back\\slash", r'"back\\slash"'),
+        ("中文", '"中文"'),
+        (True, "true"),
+        (3, "3"),
+        ([1, "a"], '[1, "a"]'),
+    ],
+)
+def test_render_quotes_and_escapes_literals(value, literal):
+    assert field_eq("name", value).render() == f"name == {literal}"
+
+
+def test_json_key_is_quoted_and_param_name_sanitized():
+    expr = json_eq("meta", "page-no", 2)
+    assert expr.template == 'meta["page-no"] == {meta_page_no}'
+    assert expr.params == {"meta_page_no": 2}
+    assert expr.matches({"meta": {"page-no": 2}})
+    assert not expr.matches({"meta": None})
+
+
+@pytest.mark.parametrize("name", ["doc id", "meta[0]", "1st", "a;b", ""])
+def test_invalid_field_name_is_rejected(name):
+    with pytest.raises(ValueError, match="非法的过滤字段名"):
+        field_eq(name, 1)
+
+
+@pytest.mark.parametrize("key", ["", 'a"b', "a\\b", "{x}"])
+def test_invalid_json_key_is_rejected(key):
+    with pytest.raises(ValueError, match="非法的 JSON 过滤键"):
+        json_eq("meta", key, 1)
+
+
+def test_range_bounds_and_predicate():
+    expr = field_range("id", 10, 20)
+    assert expr.template == "id >= {id_start} and id < {id_end}"
+    assert expr.render() == "id >= 10 and id < 20"
+    assert [value for value in (9, 10, 19, 20) if expr.matches({"id": value})] == [10, 19]
+
+    assert field_range("id", start=5).render() == "id >= 5"
+    assert field_range("id", end=5).render() == "id < 5"
+    assert not field_range("id")
+    # 缺失的键不满足范围条件
+    assert not json_range("meta", "upload_time", 0).matches({"meta": {}})
+
+
+@pytest.mark.parametrize("start, end", [(5, 5), (6, 5)])
+def test_empty_range_is_rejected(start, end):
+    with pytest.raises(ValueError, match="过滤范围不合法"):
+        field_range("id", start, end)
+
+
+def test_all_of_renames_conflicting_params():
+    expr = all_of(field_in("doc_id", [1, 2]), None, FilterExpr(), field_eq("doc_id", 3), field_in("doc_id", [4]))
+    assert expr.template == "(doc_id in {doc_id}) and (doc_id == {doc_id_2}) and (doc_id in {doc_id_3})"
+    assert expr.params == {"doc_id": [1, 2], "doc_id_2": 3, "doc_id_3": [4]}
+    assert expr.render() == "(doc_id in [1, 2]) and (doc_id == 3) and (doc_id in [4])"
+    assert expr.search_kwargs() == {"filter": expr.template, "filter_params": expr.params}
+    assert expr.ann_kwargs() == {"expr": expr.template, "expr_params": expr.params}
+    # 谓词同样按 and 组合
+    assert not expr.matches({"doc_id": 1})
+
+    # 单个条件与空条件原样返回
+    single = field_eq("doc_id", 1)
+    assert all_of(single) is single
+    assert not all_of(None, FilterExpr())
+    assert (single & None) is single
+
+
+def test_chunk_filter_combines_conditions():
+    expr = chunk_filter(
+        doc_ids=["7"],
+        file_types=[".PDF"],
+        uploaded_after=datetime(2024, 1, 1),
+        meta={"lang": "zh"},
+    )
+    assert expr.params["doc_id"] == [7]
+    assert expr.params["meta_file_type"] == ["pdf"]
+    assert expr.params["meta_upload_time_start"] == int(datetime(2024, 1, 1).timestamp())
+    assert expr.params["meta_lang"] == "zh"
+    row = {"doc_id": 7, "meta": {"file_type": "pdf", "upload_time": 2_000_000_000, "lang": "zh"}}
+    assert expr.matches(row)
+    assert not expr.matches(dict(row, doc_id=8))
+    assert not chunk_filter()
+
+
+class _UnusedService:
+    """过滤条件不合法时请求不应到达服务层。"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"不应调用 {name}")
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(retrieval.router)
+    app.include_router(chat.router)
+    app.dependency_overrides[get_retrieval_service_dep] = _UnusedService
+    app.dependency_overrides[get_chat_service_dep] = _UnusedService
+    app.dependency_overrides[get_db_session] = lambda: None
+    return TestClient(app)
+
+
+_INVALID_FILTERS = [
+    ({"meta": {'a"b': 1}}, "非法的 JSON 过滤键"),
+    ({"uploaded_after": "2024-06-01T00:00:00", "uploaded_before": "2024-01-01T00:00:00"}, "过滤范围不合法"),
+]
+
+
+@pytest.mark.parametrize("filters, message", _INVALID_FILTERS)
+@pytest.mark.parametrize("path, body", [
+    ("/retrieve", {"query": "q", "knowledge_base_ids": [1]}),
+    ("/retrieve/batch", {"queries": ["q"], "knowledge_base_ids": [1]}),
+])
+def test_retrieval_rejects_invalid_filters(client, path, body, filters, message):
+    response = client.post(path, json=dict(body, filters=filters))
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("过滤条件不合法")
+    assert message in response.json()["detail"]
+
+
+@pytest.mark.parametrize("filters, message", _INVALID_FILTERS)
+def test_chat_stream_rejects_invalid_filters(client, filters, message):
+    response = client.post(
+        f"{chat.router.prefix}/messages/stream",
+        json={"session_id": 1, "query": "q", "knowledge_base_ids": [1], "filters": filters},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("过滤条件不合法")
+    assert message in response.json()["detail"]
@@ -0,0 +1,82 @@
+"""全文检索分词（中英文混排）与进程内词法重排的排序。"""
+
+import numpy as np
+import pytest
+
+from qans_server.llm.lexical_rerank import lexical_rerank_documents, lexical_scores
+from qans_server.util.text_tokenizer import count_terms, term_frequencies, tokenize, tokenize_with_bigrams
+
+
+def test_tokenize_mixed_cjk_and_ascii():
+    assert tokenize("Milvus 2.5的BM25检索，HNSW-索引") == [
+        "milvus", "2", "5", "的", "bm25", "检", "索", "hnsw", "索", "引",
+    ]
+    # 假名逐字成词，下划线属于单词字符
+    assert tokenize("テスト snake_case") == ["テ", "ス", "ト", "snake_case"]
+    assert tokenize("") == []
+    assert tokenize("，。！") == []
+
+
+def test_tokenize_with_bigrams_adds_adjacent_cjk_pairs():
+    terms = tokenize_with_bigrams("向量检索 API")
+    assert terms[:5] == ["向", "量", "检", "索", "api"]
+    assert terms[5:] == ["向量", "量检", "检索"]
+    # 被 ASCII 隔开的单个中文字符不产生二元词
+    assert tokenize_with_bigrams("a中b文") == ["a", "中", "b", "文"]
+
+
+def test_term_frequencies():
+    assert term_frequencies("Apple apple 苹果 果") == {"apple": 2, "苹": 1, "果": 2}
+
+
+def test_count_terms_respects_word_boundaries():
+    texts = ["BM25 排序 bm25x bm25", "检索排序", ""]
+    terms = ["bm25", "排", "排序"]
+    assert count_terms(texts, terms) == [[2, 1, 1], [0, 1, 1], [0, 0, 0]]
+
+
+def test_rerank_prefers_documents_covering_query_terms():
+    documents = [
+        {"id": "unrelated", "text": "今天天气晴朗，适合出门散步。"},
+        {"id": "partial", "text": "向量数据库可以存储 embedding。"},
+        {"id": "exact", "text": "Milvus 是一个向量数据库，支持 HNSW 索引与混合检索。"},
+    ]
+    ranked = lexical_rerank_documents("Milvus 向量数据库 HNSW 索引", documents)
+    assert [doc["id"] for doc in ranked] == ["exact", "partial", "unrelated"]
+
+
+def test_rerank_uses_word_order_through_bigrams():
+    documents = [
+        {"id": "scrambled", "text": "库据数量向"},
+        {"id": "ordered", "text": "向量数据库"},
+    ]
+    # 逐字计数相同，二元词区分词序
+    ranked = lexical_rerank_documents("向量数据库", documents)
+    assert [doc["id"] for doc in ranked] == ["ordered", "scrambled"]
+
+
+def test_rerank_keeps_retrieval_order_on_ties_and_applies_top_k():
+    documents = [{"id": index, "text": "same text"} for index in range(4)]
+    assert [doc["id"] for doc in lexical_rerank_documents("unrelated", documents)] == [0, 1, 2, 3]
+    assert [doc["id"] for doc in lexical_rerank_documents("same", documents, top_k=2)] == [0, 1]
+
+
+def test_scores_fall_back_to_prior_without_query_terms():
+    documents = [{"text": "a", "score": 0.2}, {"text": "b", "score": 0.9}]
+    np.testing.assert_allclose(lexical_scores("，", documents), [0.2, 0.9])
+    # 没有检索分数时按排名
+    scores = lexical_scores("", [{"text": "a"}, {"text": "b"}])
+    assert scores[0] > scores[1]
+
+
+def test_retrieval_score_breaks_lexical_ties():
+    documents = [
+        {"id": "low", "text": "向量检索", "score": 0.1},
+        {"id": "high", "text": "向量检索", "score": 0.8},
+    ]
+    assert [doc["id"] for doc in lexical_rerank_documents("向量检索", documents)] == ["high", "low"]
+
+
+def test_rerank_rejects_empty_candidates():
+    with pytest.raises(ValueError):
+        lexical_rerank_documents("q", [])
@@ -0,0 +1,138 @@
+"""本地向量后端（``VECTOR_URL=local://``）的自包含测试，不依赖 Milvus 与 MySQL。
+
+覆盖写入 / 覆盖 / 删除、删除记录与数据段合并、稠密 + BM25 的 RRF 融合排序以及过滤条件。
+与 Milvus 的结果一致性见 ``test_vector_parity.py`` 与 ``python -m qans_server.tools.check_local_parity``。
+
+运行：``python -m pytest -q tests``
+"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from qans_server.db.vector.collections.local_doc_chunk import LocalDocChunk
+from qans_server.db.vector.filters import chunk_filter, field_eq, json_eq
+from qans_server.db.vector.fusion import rrf_fuse
+from qans_server.db.vector.local.store import MANIFEST_NAME, LocalVectorStore
+
+DIM = 4
+
+
+def make_row(pk, vector, text="", *, kb_id=1, doc_id=1, chunk_id=0, meta=None):
+    return {
+        "id": pk,
+        "vector": np.asarray(vector, dtype=np.float32),
+        "doc_id": doc_id,
+        "chunk_id": chunk_id,
+        "knowledge_base_id": kb_id,
+        "text": text,
+        "meta": meta or {},
+    }
+
+
+def read_manifest(store, kb_id):
+    return json.loads((store.directory / f"kb_{kb_id}" / MANIFEST_NAME).read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalVectorStore(tmp_path / "chunks", DIM, max_segments=8)
+
+
+def test_upsert_overwrites_and_delete_marks_rows(store):
+    store.upsert([make_row(pk, np.eye(DIM)[pk], f"text {pk}", chunk_id=pk) for pk in range(3)])
+    store.upsert([make_row(1, np.eye(DIM)[3], "text 1 updated", chunk_id=1)])
+
+    assert store.count(1) == 3
+    assert store.get_rows([1], ["text"])[1]["text"] == "text 1 updated"
+    # 被覆盖的旧行以删除记录保留在第一个数据段中
+    manifest = read_manifest(store, 1)
+    assert len(manifest["segments"]) == 2
+    assert manifest["deleted"] == {manifest["segments"][0]: [1]}
+    # 覆盖后的向量参与检索
+    np.testing.assert_array_equal(store.get_rows([1], ["vector"])[1]["vector"], np.eye(DIM)[3])
+    assert store.search_dense([1], np.eye(DIM)[3], 1)[0][0] == 1
+
+    assert store.delete([2, 99]) == 1
+    assert store.delete([2]) == 0
+    assert store.pks_in_range(0, 10) == [0, 1]
+    assert store.get_rows([2], ["text"]) == {}
+
+
+def test_compaction_drops_tombstones_and_persists(tmp_path):
+    store = LocalVectorStore(tmp_path / "chunks", DIM, max_segments=2)
+    for pk in range(3):
+        store.upsert([make_row(pk, np.eye(DIM)[pk], f"text {pk}", chunk_id=pk)])
+    # 第三个数据段超过 max_segments，自动合并为一个段
+    manifest = read_manifest(store, 1)
+    assert len(manifest["segments"]) == 1
+    assert manifest["deleted"] == {}
+    assert store.count(1) == 3
+
+    # 删除比例超过阈值时合并，删除记录随之清除
+    store.delete([0, 1])
+    manifest = read_manifest(store, 1)
+    assert len(manifest["segments"]) == 1
+    assert manifest["deleted"] == {}
+    assert store.pks_in_range(0, 10) == [2]
+    assert len(list((tmp_path / "chunks" / "kb_1").glob("seg_*"))) == 1
+
+    # 新实例从清单读取相同的数据
+    reopened = LocalVectorStore(tmp_path / "chunks", DIM, max_segments=2)
+    assert reopened.pks_in_range(0, 10) == [2]
+    assert reopened.get_rows([2], ["text", "chunk_id"])[2] == {"text": "text 2", "chunk_id": 2}
+
+
+def test_hybrid_search_orders_by_rrf(store):
+    query_vector = np.array([1, 0, 0, 0], dtype=np.float32)
+    store.upsert([
+        # 稠密检索第 1，不含查询词
+        make_row(10, [1, 0, 0, 0], "apple orchard", chunk_id=0),
+        # 稠密检索第 2，BM25 第 1
+        make_row(11, [0.9, 0.1, 0, 0], "banana banana", chunk_id=1),
+        # 稠密检索第 3，BM25 第 2（文本更长，词频更低）
+        make_row(12, [0, 1, 0, 0], "banana cherry date elderberry fig grape", chunk_id=2),
+    ])
+    repo = LocalDocChunk(store=store)
+
+    hits = repo.search_similar_chunks("banana", query_vector, [1], top_k=3, output_fields=[])
+
+    dense = [pk for pk, _ in store.search_dense([1], query_vector, 9)]
+    sparse = [pk for pk, _ in store.search_bm25([1], "banana", 9)]
+    assert dense == [10, 11, 12]
+    assert sparse == [11, 12]
+    # 两路都靠前的行排在只被一路召回的行之前；融合分数与 Milvus RRF ranker 公式一致（k = top_k * 2）
+    assert [hit["id"] for hit in hits] == [11, 12, 10]
+    expected = dict(rrf_fuse([dense, sparse], k=6))
+    for hit in hits:
+        assert hit["score"] == pytest.approx(expected[hit["id"]])
+
+
+def test_filters_apply_to_dense_and_bm25(store):
+    march = int(datetime(2024, 3, 1).timestamp())
+    june = int(datetime(2024, 6, 1).timestamp())
+    store.upsert([
+        make_row(1, [1, 0, 0, 0], "report", doc_id=1, meta={"file_type": "pdf", "upload_time": march}),
+        make_row(2, [1, 0.1, 0, 0], "report", doc_id=2, meta={"file_type": "docx", "upload_time": june}),
+        make_row(3, [1, 0.2, 0, 0], "report", doc_id=3, meta={"file_type": "pdf", "upload_time": june}),
+        make_row(4, [1, 0, 0, 0], "report", kb_id=2, doc_id=4, meta={"file_type": "pdf", "upload_time": june}),
+    ])
+    query_vector = np.array([1, 0, 0, 0], dtype=np.float32)
+
+    def search(expr):
+        matches = expr.matches
+        dense = {pk for pk, _ in store.search_dense([1], query_vector, 10, row_filter=matches)}
+        sparse = {pk for pk, _ in store.search_bm25([1], "report", 10, row_filter=matches)}
+        assert dense == sparse
+        return dense
+
+    assert search(chunk_filter(doc_ids=[1, 2])) == {1, 2}
+    assert search(chunk_filter(file_types=[".PDF"])) == {1, 3}
+    assert search(chunk_filter(uploaded_after=datetime(2024, 4, 1))) == {2, 3}
+    assert search(chunk_filter(file_types=["pdf"], uploaded_before=datetime(2024, 4, 1))) == {1}
+    assert search(json_eq("meta", "file_type", "docx") & field_eq("doc_id", 3)) == set()
+    # 其他知识库的行不参与检索
+    assert {pk for pk, _ in store.search_dense([1, 2], query_vector, 10)} == {1, 2, 3, 4}
+    assert {pk for pk, _ in store.search_dense([1], query_vector, 10)} == {1, 2, 3}
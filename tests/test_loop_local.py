@@ -0,0 +1,87 @@
+"""按事件循环隔离的异步资源：事件循环更替、多线程与关闭。"""
+
+import asyncio
+import threading
+
+from qans_server.util.loop_local import LoopLocal
+
+
+class Resource:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def make_local():
+    created = []
+
+    def factory():
+        created.append(Resource())
+        return created[-1]
+
+    return LoopLocal(factory, lambda resource: resource.close()), created
+
+
+def test_same_loop_reuses_value():
+    local, created = make_local()
+
+    async def use():
+        return local.get() is local.get()
+
+    assert asyncio.run(use())
+    assert len(created) == 1
+
+
+def test_value_of_finished_loop_is_closed_on_next_loop():
+    local, created = make_local()
+
+    async def use():
+        local.get()
+        # 让后台关闭任务执行完
+        await asyncio.sleep(0)
+
+    asyncio.run(use())
+    asyncio.run(use())
+
+    assert len(created) == 2
+    assert created[0].closed
+    assert not created[1].closed
+    assert len(local) == 1
+
+
+def test_threads_get_separate_values_and_aclose_closes_all():
+    local, created = make_local()
+    started = threading.Barrier(3)
+    stop = threading.Event()
+    values = {}
+
+    def worker(name):
+        async def run():
+            values[name] = local.get()
+            started.wait(5)
+            while not stop.is_set():
+                await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+
+    assert values["a"] is not values["b"]
+
+    async def shutdown():
+        local.get()
+        await local.aclose()
+
+    asyncio.run(shutdown())
+    stop.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(created) == 3
+    assert all(resource.closed for resource in created)
+    assert len(local) == 0
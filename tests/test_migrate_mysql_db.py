@@ -0,0 +1,60 @@
+"""MySQL 表结构升级：按 information_schema 判断是否需要执行，可重复执行，联合索引先建后删旧索引。"""
+
+import re
+
+import pytest
+
+from qans_server.init import migrate_mysql_db
+
+
+class FakeSchema:
+    """记录执行的 DDL，并据此维护列 / 索引是否存在。"""
+
+    def __init__(self, columns=(), indexes=()):
+        self.columns = set(columns)
+        self.indexes = set(indexes)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        table = re.search(r"ALTER TABLE `(\w+)`", sql)
+        if table is None:
+            return
+        for column in re.findall(r"ADD COLUMN `(\w+)`", sql):
+            self.columns.add((table.group(1), column))
+        for index in re.findall(r"ADD INDEX `(\w+)`", sql):
+            self.indexes.add((table.group(1), index))
+        for index in re.findall(r"DROP INDEX `(\w+)`", sql):
+            # 外键列必须始终有索引
+            assert (table.group(1), "idx_document_chunk") in self.indexes
+            self.indexes.discard((table.group(1), index))
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def schema(monkeypatch):
+    schema = FakeSchema(indexes={("t_document_chunk", "idx_document_id")})
+    monkeypatch.setattr(migrate_mysql_db, "column_exists", lambda conn, table, column: (table, column) in schema.columns)
+    monkeypatch.setattr(migrate_mysql_db, "index_exists", lambda conn, table, index: (table, index) in schema.indexes)
+    return schema
+
+
+def test_migrate_applies_pending_changes_once(schema):
+    assert migrate_mysql_db.migrate(schema) == len(migrate_mysql_db.MIGRATIONS)
+    assert ("t_document", "vectorize_version") in schema.columns
+    assert ("t_document", "import_progress") in schema.columns
+    assert schema.indexes == {("t_document_chunk", "idx_document_chunk")}
+
+    executed = len(schema.statements)
+    assert migrate_mysql_db.migrate(schema) == 0
+    assert len(schema.statements) == executed
+
+
+def test_migrate_skips_index_changes_on_new_schema(schema):
+    # init_mysql_db 新建的表已有联合索引、没有旧索引
+    schema.indexes = {("t_document_chunk", "idx_document_chunk")}
+    migrate_mysql_db.migrate(schema)
+    assert not any("t_document_chunk" in statement for statement in schema.statements)
@@ -0,0 +1,115 @@
+"""MMR 多样性选择：λ 两端、重复剔除阈值、选择数量超过候选数，以及检索服务中 MMR 与重排的先后。"""
+
+import numpy as np
+import pytest
+
+from qans_server.db.vector.collections.doc_chunk import make_chunk_pk
+from qans_server.db.vector.collections.local_doc_chunk import LocalDocChunk
+from qans_server.db.vector.local.store import LocalVectorStore
+from qans_server.db.vector.mmr import mmr_select
+from qans_server.service import retrieval_service
+from qans_server.service.retrieval_service import RetrievalService
+from qans_server.setting_config import settings
+
+QUERY = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+# 0 与 1 几乎重复且最相关，2 相关度稍低但方向不同，3 与问题无关
+CANDIDATES = np.array(
+    [
+        [0.95, 0.31, 0.0],
+        [0.94, 0.34, 0.0],
+        [0.85, -0.30, 0.43],
+        [0.0, 0.0, 1.0],
+    ],
+    dtype=np.float32,
+)
+
+
+def test_lambda_one_keeps_relevance_order():
+    assert mmr_select(QUERY, CANDIDATES, 4, lambda_mult=1.0) == [0, 1, 2, 3]
+
+
+def test_lambda_zero_picks_most_dissimilar_after_first():
+    # 第一个总是最相关的候选，之后只看与已选候选的差异
+    selected = mmr_select(QUERY, CANDIDATES, 4, lambda_mult=0.0)
+    assert selected[0] == 0
+    assert selected[1] == 3
+    assert selected[-1] == 1
+
+
+def test_default_lambda_prefers_diverse_candidate_over_near_duplicate():
+    assert mmr_select(QUERY, CANDIDATES, 2)[:2] == [0, 2]
+
+
+def test_duplicate_threshold_drops_near_duplicates():
+    assert mmr_select(QUERY, CANDIDATES, 4, lambda_mult=1.0, duplicate_threshold=0.99) == [0, 2, 3]
+    # 阈值 >= 1 时不剔除
+    assert len(mmr_select(QUERY, CANDIDATES, 4, duplicate_threshold=1.0)) == 4
+
+
+@pytest.mark.parametrize("k", [5, 100])
+def test_k_larger_than_candidates_returns_each_once(k):
+    selected = mmr_select(QUERY, CANDIDATES, k)
+    assert sorted(selected) == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize("vectors, k", [(np.zeros((0, 3), dtype=np.float32), 3), (CANDIDATES, 0)])
+def test_empty_selection(vectors, k):
+    assert mmr_select(QUERY, vectors, k) == []
+
+
+def test_input_matrix_is_not_modified():
+    vectors = CANDIDATES * 2
+    mmr_select(QUERY, vectors, 2)
+    np.testing.assert_array_equal(vectors, CANDIDATES * 2)
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    store = LocalVectorStore(tmp_path / "chunks", 3)
+    store.upsert([
+        {
+            "id": make_chunk_pk(1, index),
+            "vector": vector,
+            "doc_id": 1,
+            "chunk_id": index,
+            "knowledge_base_id": 1,
+            "text": f"chunk {index}",
+            "meta": {},
+        }
+        for index, vector in enumerate(CANDIDATES)
+    ])
+    repo = LocalDocChunk(store=store)
+    monkeypatch.setattr(settings, "retrieval_mmr_duplicate_threshold", 1.0)
+    monkeypatch.setattr(settings, "retrieval_mmr_pool_multiplier", 2)
+    service = RetrievalService(embedding_service=object(), vector_repo=repo, summary_repo=None)
+    service.hydrator = None
+    service.context_expander.window = 0
+    return service
+
+
+def hits():
+    return [{"id": make_chunk_pk(1, index), "text": f"chunk {index}"} for index in range(len(CANDIDATES))]
+
+
+def test_mmr_cuts_to_top_k_without_rerank(service, monkeypatch):
+    monkeypatch.setattr(retrieval_service, "rerank_enabled", lambda: False)
+
+    ranked = service._rank("q", [hits()], 2, QUERY)
+    assert [hit["id"] & 0xFF for hit in ranked] == [0, 2]
+
+
+def test_mmr_leaves_a_larger_pool_for_rerank(service, monkeypatch):
+    received = []
+
+    def rerank(query, documents, top_k):
+        received.append(len(documents))
+        # 重排选中了 MMR 排在 top_k 之后的候选
+        return list(reversed(documents))[:top_k]
+
+    monkeypatch.setattr(retrieval_service, "rerank_enabled", lambda: True)
+    monkeypatch.setattr(retrieval_service, "rerank_documents", rerank)
+
+    ranked = service._rank("q", [hits()], 2, QUERY)
+    assert received == [4]
+    assert len(ranked) == 2
+    assert {hit["id"] & 0xFF for hit in ranked} != {0, 2}
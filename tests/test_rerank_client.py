@@ -0,0 +1,202 @@
+"""重排模型客户端：熔断状态机（关闭 → 打开 → 半开试探 → 关闭 / 重新打开）、慢调用计数、结果缓存与降级排序。"""
+
+import time
+
+import pytest
+import requests
+
+from qans_server.llm.rerank_model import (
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    CircuitBreaker,
+    RerankClient,
+)
+
+RESET_SECONDS = 0.05
+
+
+class FakeResponse:
+    def __init__(self, order):
+        self.order = order
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"results": [{"index": index, "relevance_score": 1.0} for index in self.order]}
+
+
+class FakeSession:
+    """替代 ``requests.Session``：按下标倒序返回结果，``fail`` 为 True 时请求失败。"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.fail = False
+        self.calls = 0
+
+    def post(self, url, json, headers, timeout):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise requests.ConnectionError("重排模型不可用")
+        return FakeResponse(list(reversed(range(len(json["documents"])))))
+
+    def close(self):
+        pass
+
+
+def make_client(session, **kwargs):
+    client = RerankClient(
+        "http://rerank.test/v1/rerank",
+        "test-rerank",
+        breaker_failures=2,
+        breaker_reset_seconds=RESET_SECONDS,
+        **kwargs,
+    )
+    client._session = session
+    return client
+
+
+def candidates(*texts):
+    return [{"id": index, "text": text} for index, text in enumerate(texts)]
+
+
+def ids(documents):
+    return [doc["id"] for doc in documents]
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=RESET_SECONDS)
+    assert breaker.state == BREAKER_CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == BREAKER_CLOSED and breaker.allow()
+    # 成功清零连续失败计数
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN
+    assert breaker.trips == 1
+    assert not breaker.allow()
+
+
+@pytest.mark.parametrize("probe_succeeds", [True, False])
+def test_breaker_half_open_allows_single_probe(probe_succeeds):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=RESET_SECONDS)
+    breaker.record_failure()
+    time.sleep(RESET_SECONDS * 1.5)
+
+    assert breaker.state == BREAKER_HALF_OPEN
+    assert breaker.allow()
+    # 试探请求未返回前不放行其他请求
+    assert not breaker.allow()
+
+    if probe_succeeds:
+        breaker.record_success()
+        assert breaker.state == BREAKER_CLOSED
+        assert breaker.trips == 1
+    else:
+        breaker.record_failure()
+        assert breaker.state == BREAKER_OPEN
+        assert breaker.trips == 2
+        assert not breaker.allow()
+
+
+def test_breaker_abandoned_probe_lets_next_request_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=RESET_SECONDS)
+    breaker.record_failure()
+    time.sleep(RESET_SECONDS * 1.5)
+
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+
+def test_client_falls_back_while_open_and_recovers_after_probe():
+    session = FakeSession()
+    client = make_client(session, cache_size=0)
+    documents = candidates("a", "b", "c")
+
+    session.fail = True
+    for _ in range(2):
+        assert ids(client.rerank("q", documents)) == [0, 1, 2]
+    assert client.breaker.state == BREAKER_OPEN
+    assert session.calls == 2
+
+    # 熔断期间不请求重排模型
+    session.fail = False
+    assert ids(client.rerank("q", documents)) == [0, 1, 2]
+    assert session.calls == 2
+
+    time.sleep(RESET_SECONDS * 1.5)
+    assert ids(client.rerank("q", documents)) == [2, 1, 0]
+    assert client.breaker.state == BREAKER_CLOSED
+    stats = client.stats()
+    assert (stats["failures"], stats["fallbacks"], stats["breaker_trips"]) == (2, 3, 1)
+
+
+def test_slow_calls_count_as_failures():
+    session = FakeSession(delay=0.02)
+    client = make_client(session, cache_size=0, slow_ms=5)
+    documents = candidates("a", "b")
+
+    # 慢调用仍返回重排结果，但计入熔断
+    assert ids(client.rerank("q", documents)) == [1, 0]
+    assert ids(client.rerank("q", documents)) == [1, 0]
+    assert client.slow_calls == 2
+    assert client.failures == 0
+    assert client.breaker.state == BREAKER_OPEN
+
+    assert ids(client.rerank("q", documents)) == [0, 1]
+    assert session.calls == 2
+
+
+def test_fallback_ranker_is_used_when_unavailable():
+    session = FakeSession()
+    session.fail = True
+    client = make_client(session, fallback=lambda query, documents, top_k: list(reversed(documents))[:top_k])
+
+    assert ids(client.rerank("q", candidates("a", "b", "c"), top_k=2)) == [2, 1]
+
+
+def test_cache_hits_for_same_query_and_candidates():
+    session = FakeSession()
+    client = make_client(session)
+    documents = candidates("a", "b", "c")
+
+    assert ids(client.rerank("q", documents, top_k=2)) == [2, 1]
+    # top_k 不影响缓存键，不同的 top_k 复用同一排序
+    assert ids(client.rerank("q", documents)) == [2, 1, 0]
+    assert session.calls == 1
+    assert (client.cache.hits, client.cache.misses) == (1, 1)
+
+    client.rerank("other", documents)
+    client.rerank("q", documents[:2])
+    assert session.calls == 3
+
+
+def test_cache_misses_when_candidate_text_changes():
+    session = FakeSession()
+    client = make_client(session)
+
+    client.rerank("q", candidates("a", "b"))
+    # 重新切分 / 向量化后主键不变、文本已变
+    client.rerank("q", candidates("a", "b updated"))
+    assert session.calls == 2
+    client.rerank("q", candidates("a", "b updated"))
+    assert session.calls == 2
+
+
+def test_failures_are_not_cached():
+    session = FakeSession()
+    session.fail = True
+    client = make_client(session)
+    documents = candidates("a", "b")
+
+    client.rerank("q", documents)
+    session.fail = False
+    assert ids(client.rerank("q", documents)) == [1, 0]
+    assert session.calls == 2
@@ -0,0 +1,116 @@
+"""知识库快照导出 / 导入往返测试（SQLite + 本地向量后端）。"""
+
+import json
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from qans_server.db.mysql.models import Document
+from qans_server.db.mysql.models.document_chunk import bulk_insert_document_chunks
+from qans_server.db.mysql.models.knowledge_base import create_knowledge_base
+from qans_server.db.vector.collections.doc_chunk import make_chunk_pk
+from qans_server.db.vector.collections.local_doc_chunk import LocalDocChunk
+from qans_server.db.vector.local.store import LocalVectorStore
+from qans_server.service.snapshot_service import SnapshotService
+from qans_server.setting_config import settings
+
+# 与文档 / 知识库 ID 无关的列，往返后内容应完全一致
+_STABLE_MEMBERS = [
+    "chunks/chunk_index.bin",
+    "chunks/content.bin",
+    "chunks/content.offsets.bin",
+    "vectors/vector.bin",
+    "vectors/chunk_id.bin",
+    "vectors/text.bin",
+    "vectors/text.offsets.bin",
+]
+
+
+def read_manifest(path):
+    with zipfile.ZipFile(path) as archive:
+        return json.loads(archive.read("manifest.json"))
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return LocalDocChunk(store=LocalVectorStore(tmp_path / "chunks", settings.stored_vector_dim))
+
+
+def populate(session, repo, documents=3, chunks_per_document=4):
+    kb = create_knowledge_base(session, name="源知识库")
+    rng = np.random.default_rng(0)
+    for number in range(documents):
+        doc = Document(
+            knowledge_base_id=kb.id,
+            file_name=f"doc{number}.txt",
+            file_path=f"/nonexistent/doc{number}.txt",
+            file_size=100,
+            file_type="txt",
+            chunk_count=chunks_per_document,
+            status="completed",
+            create_time=datetime(2024, 1, 1),
+        )
+        session.add(doc)
+        session.flush()
+        texts = [f"文档{number} 分块{index} 内容 text {index}" for index in range(chunks_per_document)]
+        metadata = [json.dumps({"doc_id": doc.id, "knowledge_base_id": kb.id}) for _ in texts]
+        bulk_insert_document_chunks(session, [
+            {
+                "document_id": doc.id,
+                "knowledge_base_id": kb.id,
+                "chunk_index": index,
+                "content": text,
+                "metadata_json": meta,
+                "create_time": datetime.now(),
+            }
+            for index, (text, meta) in enumerate(zip(texts, metadata))
+        ])
+        repo.insert_rows([
+            {
+                "id": make_chunk_pk(doc.id, index),
+                "vector": rng.standard_normal(settings.stored_vector_dim).astype(np.float32),
+                "doc_id": doc.id,
+                "chunk_id": index,
+                "knowledge_base_id": kb.id,
+                "text": text,
+                "meta": {"doc_id": doc.id, "file_type": "txt"},
+            }
+            for index, text in enumerate(texts)
+        ])
+    return kb
+
+
+def test_export_import_round_trip(mysql_session, repo, tmp_path):
+    service = SnapshotService(vector_repo=repo, summary_repo=None)
+    source = populate(mysql_session, repo)
+
+    exported = service.export_knowledge_base(mysql_session, source.id, tmp_path / "source.qsnap")
+    # 小批量导入，覆盖文本列的分批读取
+    restored = service.import_knowledge_base(mysql_session, exported, name="恢复的知识库", batch_size=5)
+    reexported = service.export_knowledge_base(mysql_session, restored.id, tmp_path / "restored.qsnap")
+
+    original, copy = read_manifest(exported), read_manifest(reexported)
+    assert copy["counts"] == original["counts"] == {"documents": 3, "chunks": 12, "vectors": 12}
+    for member in _STABLE_MEMBERS:
+        assert copy["checksums"][member] == original["checksums"][member], member
+
+    # 新知识库的主键由新文档 ID 与原分块序号确定
+    source_docs = mysql_session.query(Document).filter_by(knowledge_base_id=source.id).order_by(Document.id).all()
+    restored_docs = mysql_session.query(Document).filter_by(knowledge_base_id=restored.id).order_by(Document.id).all()
+    doc_id_map = {old.id: new.id for old, new in zip(source_docs, restored_docs)}
+    source_rows = [
+        row for batch in repo.iter_rows_by_knowledge_base_id(source.id, ["doc_id", "chunk_id"]) for row in batch
+    ]
+    restored_rows = [
+        row
+        for batch in repo.iter_rows_by_knowledge_base_id(restored.id, ["id", "doc_id", "knowledge_base_id", "meta"])
+        for row in batch
+    ]
+    assert sorted(row["id"] for row in restored_rows) == sorted(
+        make_chunk_pk(doc_id_map[row["doc_id"]], row["chunk_id"]) for row in source_rows
+    )
+    for row in restored_rows:
+        assert row["knowledge_base_id"] == restored.id
+        assert row["meta"]["doc_id"] == row["doc_id"]
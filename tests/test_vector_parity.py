@@ -0,0 +1,191 @@
+"""本地向量后端与 Milvus 的行为一致性：同一份数据分别写入两个后端，比较写入、主键读取 / 删除、
+过滤条件与混合检索的结果（主键与顺序）。
+
+Milvus 取自 ``QANS_TEST_MILVUS_URL``（默认 ``http://127.0.0.1:19530``），在临时集合上运行，
+结束后删除；连接不上时跳过 Milvus 一侧。
+
+数据的稠密相似度与 BM25 词频排序一致，两路 RRF 融合不产生并列分数，HNSW 在少量行上等同精确检索，
+因此两个后端的结果应完全相同。
+"""
+
+import os
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from qans_server.db.vector.collections import doc_chunk as doc_chunk_module
+from qans_server.db.vector.collections.doc_chunk import VectorDocChunk, make_chunk_pk
+from qans_server.db.vector.collections.local_doc_chunk import LocalDocChunk
+from qans_server.db.vector.filters import chunk_filter
+from qans_server.db.vector.local.store import LocalVectorStore
+from qans_server.db.vector.schema import create_doc_chunk_collection
+from qans_server.setting_config import settings
+
+DIM = settings.stored_vector_dim
+KB_ID = 7
+DOCS = 3
+CHUNKS_PER_DOC = 4
+QUERY = "apple"
+TOP_K = 4
+_UPLOAD_TIMES = [datetime(2024, 1, 1), datetime(2024, 6, 1), datetime(2025, 1, 1)]
+_FILE_TYPES = ["pdf", "txt", "pdf"]
+
+
+def query_vector() -> np.ndarray:
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[0] = 1.0
+    return vector
+
+
+def build_rows():
+    """第 i 行与查询的夹角随 i 增大，文本中 ``apple`` 的词频随 i 减小（文本长度相同）。"""
+
+    rows = []
+    total = DOCS * CHUNKS_PER_DOC
+    for doc in range(DOCS):
+        doc_id = doc + 1
+        for chunk in range(CHUNKS_PER_DOC):
+            rank = doc * CHUNKS_PER_DOC + chunk
+            angle = (rank + 1) * np.pi / (2 * (total + 2))
+            vector = np.zeros(DIM, dtype=np.float32)
+            vector[0] = np.cos(angle)
+            vector[rank + 1] = np.sin(angle)
+            # 后一半行不含查询词，只由稠密检索召回
+            hits = max(total // 2 - rank, 0)
+            words = ["apple"] * hits + ["pear"] * (total - hits)
+            rows.append({
+                "id": make_chunk_pk(doc_id, chunk),
+                "vector": vector,
+                "doc_id": doc_id,
+                "chunk_id": chunk,
+                "knowledge_base_id": KB_ID,
+                "text": " ".join(words),
+                "meta": {
+                    "doc_id": doc_id,
+                    "file_type": _FILE_TYPES[doc],
+                    "upload_time": int(_UPLOAD_TIMES[doc].timestamp()),
+                },
+            })
+    return rows
+
+
+@pytest.fixture
+def local_repo(tmp_path):
+    return LocalDocChunk(store=LocalVectorStore(tmp_path / "chunks", DIM))
+
+
+@pytest.fixture
+def milvus_repo(monkeypatch):
+    pymilvus = pytest.importorskip("pymilvus")
+    uri = os.getenv("QANS_TEST_MILVUS_URL", "http://127.0.0.1:19530")
+    try:
+        client = pymilvus.MilvusClient(uri, timeout=3)
+    except Exception as exc:  # noqa: BLE001
+        pytest.skip(f"Milvus 不可用（{uri}）: {exc}")
+
+    # 写入 / 分区管理使用模块级客户端，测试期间指向测试连接
+    monkeypatch.setattr(doc_chunk_module, "db_client", client)
+    collection_name = f"t_doc_chunk_parity_{uuid.uuid4().hex[:8]}"
+    create_doc_chunk_collection(client, collection_name, embedding_dim=DIM)
+    repo = VectorDocChunk()
+    repo.db_client = client
+    repo.collection_name = collection_name
+    repo.write_buffer = None
+    repo.load_manager = None
+    try:
+        yield repo
+    finally:
+        client.drop_collection(collection_name=collection_name)
+        client.close()
+
+
+def wait_for_count(repo, expected, timeout=30.0):
+    """Milvus 默认 Bounded 一致性，写入 / 删除后等待可见。"""
+
+    deadline = time.monotonic() + timeout
+    while repo.count_by_knowledge_base_id(KB_ID) != expected:
+        if time.monotonic() > deadline:
+            pytest.fail(f"等待 {expected} 行可见超时")
+        time.sleep(0.2)
+
+
+def search_ids(repo, top_k=TOP_K, filter_expr=None):
+    hits = repo.search_similar_chunks(
+        QUERY, query_vector(), [KB_ID], top_k, output_fields=[], filter_expr=filter_expr
+    )
+    return [hit["id"] for hit in hits]
+
+
+def dense_ids(repo, limit=TOP_K, filter_expr=None):
+    return repo.search_dense(np.stack([query_vector()]), [KB_ID], limit, filter_expr=filter_expr)[0]
+
+
+def chunk_keys(rows):
+    return sorted((row["doc_id"], row["chunk_id"], row["text"]) for row in rows)
+
+
+def run_scenario(repo):
+    """在一个后端上执行全部操作，返回可比较的结果。"""
+
+    rows = build_rows()
+    results = {"inserted": repo.insert_rows(rows)}
+    wait_for_count(repo, len(rows))
+
+    pks = [row["id"] for row in rows]
+    results["get"] = chunk_keys(repo.get_chunks(pks[:5] + [make_chunk_pk(99, 0)]))
+    results["doc_pks"] = sorted(repo.list_chunk_pks_by_doc_id(2, KB_ID))
+
+    results["dense"] = dense_ids(repo)
+    results["hybrid"] = search_ids(repo)
+    results["hybrid_wide"] = search_ids(repo, top_k=DOCS * CHUNKS_PER_DOC)
+    filters = {
+        "doc_ids": chunk_filter(doc_ids=[1, 3]),
+        "file_type": chunk_filter(file_types=["PDF"]),
+        "uploaded": chunk_filter(uploaded_after=datetime(2024, 3, 1), uploaded_before=datetime(2024, 12, 1)),
+        "meta": chunk_filter(meta={"file_type": "txt"}),
+        "combined": chunk_filter(doc_ids=[2, 3], file_types=["pdf"]),
+    }
+    for name, expr in filters.items():
+        results[f"dense_{name}"] = dense_ids(repo, filter_expr=expr)
+        results[f"hybrid_{name}"] = search_ids(repo, top_k=DOCS * CHUNKS_PER_DOC, filter_expr=expr)
+
+    results["deleted"] = repo.delete_chunks(pks[:2])
+    wait_for_count(repo, len(rows) - 2)
+    results["get_after_delete"] = chunk_keys(repo.get_chunks(pks[:3]))
+    results["hybrid_after_delete"] = search_ids(repo)
+    return results
+
+
+def test_local_scenario_results(local_repo):
+    results = run_scenario(local_repo)
+
+    pks = [make_chunk_pk(doc, chunk) for doc in range(1, DOCS + 1) for chunk in range(CHUNKS_PER_DOC)]
+    assert results["inserted"] == len(pks)
+    assert [doc for doc, _, _ in results["get"]] == [1, 1, 1, 1, 2]
+    assert results["doc_pks"] == pks[4:8]
+    # 稠密与 BM25 排序一致，融合结果按行序
+    assert results["dense"] == pks[:TOP_K]
+    assert results["hybrid"] == pks[:TOP_K]
+    assert results["hybrid_wide"] == pks
+    assert results["dense_doc_ids"] == pks[:TOP_K]
+    assert results["dense_uploaded"] == pks[4:8]
+    assert results["hybrid_doc_ids"] == pks[:4] + pks[8:12]
+    assert results["hybrid_file_type"] == pks[:4] + pks[8:12]
+    assert results["hybrid_uploaded"] == pks[4:8]
+    assert results["hybrid_meta"] == pks[4:8]
+    assert results["hybrid_combined"] == pks[8:12]
+    assert results["deleted"] == 2
+    assert [(doc, chunk) for doc, chunk, _ in results["get_after_delete"]] == [(1, 2)]
+    assert results["hybrid_after_delete"] == pks[2:2 + TOP_K]
+
+
+def test_local_matches_milvus(local_repo, milvus_repo):
+    local = run_scenario(local_repo)
+    milvus = run_scenario(milvus_repo)
+
+    assert local.keys() == milvus.keys()
+    for key in local:
+        assert local[key] == milvus[key], key
@@ -0,0 +1,135 @@
+"""向量写入合并缓冲：按行数 / 时间触发写入、写入顺序、失败通知与 flush 等待。"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from qans_server.db.vector.write_buffer import VectorWriteBuffer
+
+
+def rows(*pks):
+    return [{"id": pk, "vector": np.zeros(4, dtype=np.float32), "text": ""} for pk in pks]
+
+
+class Recorder:
+    """记录每次写入的 (op, 主键列表)；``fail_ops`` 中的写入类型抛出异常。"""
+
+    def __init__(self, fail_ops=()):
+        self.calls = []
+        self.fail_ops = set(fail_ops)
+        self.lock = threading.Lock()
+
+    def __call__(self, op, batch):
+        if op in self.fail_ops:
+            raise RuntimeError(f"{op} 失败")
+        with self.lock:
+            self.calls.append((op, [row["id"] for row in batch]))
+
+
+@pytest.fixture
+def make_buffer():
+    buffers = []
+
+    def factory(write_fn, **kwargs):
+        buffer = VectorWriteBuffer(write_fn, **kwargs)
+        buffers.append(buffer)
+        return buffer
+
+    yield factory
+    for buffer in buffers:
+        buffer.close()
+
+
+def test_row_threshold_triggers_write(make_buffer):
+    recorder = Recorder()
+    buffer = make_buffer(recorder, max_rows=4, max_delay=60)
+
+    first = buffer.submit(rows(1, 2))
+    time.sleep(0.1)
+    assert not first.done()
+
+    second = buffer.submit(rows(3, 4))
+    assert second.result(timeout=5) == 2
+    assert first.result(timeout=5) == 2
+    assert recorder.calls == [("insert", [1, 2, 3, 4])]
+
+
+def test_delay_triggers_write(make_buffer):
+    recorder = Recorder()
+    buffer = make_buffer(recorder, max_rows=1000, max_delay=0.1)
+
+    started = time.monotonic()
+    future = buffer.submit(rows(1))
+    assert future.result(timeout=5) == 1
+    assert time.monotonic() - started >= 0.1
+    assert recorder.calls == [("insert", [1])]
+
+
+def test_writes_keep_submission_order_per_op(make_buffer):
+    recorder = Recorder()
+    buffer = make_buffer(recorder, max_rows=1000, max_delay=60)
+
+    futures = [
+        buffer.submit(rows(1), "insert"),
+        buffer.submit(rows(2), "upsert"),
+        buffer.submit(rows(1), "upsert"),
+        buffer.submit(rows(3), "insert"),
+    ]
+    buffer.flush()
+
+    assert all(future.done() for future in futures)
+    # 相邻的同类提交合并，不同类的提交保持先后顺序
+    assert recorder.calls == [("insert", [1]), ("upsert", [2, 1]), ("insert", [3])]
+
+
+def test_failure_only_fails_its_group(make_buffer):
+    recorder = Recorder(fail_ops={"upsert"})
+    buffer = make_buffer(recorder, max_rows=1000, max_delay=60)
+
+    inserted = buffer.submit(rows(1, 2), "insert")
+    upserted = buffer.submit(rows(3), "upsert")
+    later = buffer.submit(rows(4), "insert")
+    buffer.flush()
+
+    assert inserted.result(timeout=1) == 2
+    with pytest.raises(RuntimeError, match="upsert 失败"):
+        upserted.result(timeout=1)
+    assert later.result(timeout=1) == 1
+    assert recorder.calls == [("insert", [1, 2]), ("insert", [4])]
+
+
+def test_flush_waits_for_batch_taken_by_writer_thread(make_buffer):
+    release = threading.Event()
+    writing = threading.Event()
+    written = []
+
+    def slow_write(op, batch):
+        writing.set()
+        release.wait(5)
+        written.extend(row["id"] for row in batch)
+
+    buffer = make_buffer(slow_write, max_rows=1, max_delay=60)
+    buffer.submit(rows(1))
+    assert writing.wait(5)
+
+    flushed = threading.Event()
+    flusher = threading.Thread(target=lambda: (buffer.flush(), flushed.set()))
+    flusher.start()
+    # 后台线程正在写入时 flush 不能返回
+    assert not flushed.wait(0.2)
+    release.set()
+    flusher.join(5)
+    assert flushed.is_set()
+    assert written == [1]
+
+
+def test_submit_after_close_is_rejected(make_buffer):
+    buffer = make_buffer(Recorder(), max_rows=1000, max_delay=60)
+    future = buffer.submit(rows(1))
+    buffer.close()
+
+    assert future.result(timeout=1) == 1
+    with pytest.raises(RuntimeError):
+        buffer.submit(rows(2))